@@ -0,0 +1,354 @@
+"""
+Annotation scoring for Multi Arena: matches each typed annotation to the arena's targets.
+
+The discrete log has one row per annotation (RoundName, TypedName, ChosenPosition "x,y",
+TimeToAnnotation); the logs are read through session_db (incremental ingest, then the
+'annotations' canned query). Targets and their Hebrew names come from the arena CSV via
+arena_registry. Every annotation is matched twice, each time as an optimal one-to-one
+assignment per trial (scipy's linear_sum_assignment):
+
+- by name: normalised string similarity between TypedName and the target's Hebrew and
+  English names; pairs below NAME_MATCH_THRESHOLD are left unmatched
+- by position: Euclidean distance between ChosenPosition and the target positions; only
+  targets within POSITION_CANDIDATE_RADIUS (and always the nearest one) are candidates
+
+and scored as:
+- placement_error_m: distance from the annotation to the target it names
+- swap: the name matches one target but the position was assigned to a nearer other one
+- missed targets: targets no annotation names; unrecognized: annotations naming no target
+
+Candidate pairs of every trial and participant are built as one table: position candidates
+come from batch radius/nearest queries on a SpatialIndex per arena, name candidates from one
+similarity pass per distinct (typed name, arena), so the full annotation x target product is
+never expanded; only the small per-trial assignments loop. Name normalisation (niqqud and
+final letters, punctuation, Latin text typed with the Hebrew keyboard layout) and name
+similarities are memoised and kept in <results dir>/.annotation_cache/names.json between runs.
+
+Usage:
+    python annotation_scoring.py                          # every participant
+    python annotation_scoring.py --participant TS263 --arena-file exploration/Final111_New_Arenas.csv
+    python annotation_scoring.py --no-cache                # recompute all name similarities
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import unicodedata
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from cohort_analysis import default_results_dir
+from session_db import canned, default_db_path, ingest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "exploration"))
+from arena_registry import load_registry  # noqa: E402
+from spatial_index import SpatialIndex  # noqa: E402
+
+NAME_MATCH_THRESHOLD = 0.7   # SequenceMatcher ratio; one typo in a 4-letter name still matches
+POSITION_CANDIDATE_RADIUS = 1.0   # meters; about a third of the 3.3 m arena
+CACHE_DIR_NAME = ".annotation_cache"
+NAME_CACHE_FILE = "names.json"
+CACHE_VERSION = 1   # bump when normalize_name or name_similarity change
+TRIAL_KEYS = ["participant", "file", "RoundName"]
+
+# Final letter forms and the standard Hebrew keyboard layout (for Latin text typed while
+# the keyboard was left on English: 'urs' -> 'ורד')
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+_HEBREW_LAYOUT = str.maketrans("qwertyuiopasdfghjkl;zxcvbnm,.",
+                               "/'קראטוןםפשדגכעיחלךףזסבהנמצתץ")
+_NON_LETTERS = re.compile(r"[\W_]+")
+
+_name_cache = {}
+_similarity_cache = {}
+
+
+def normalize_name(text):
+    """
+    Comparable form of a typed or target name (memoised per string).
+
+    Strips niqqud/cantillation, maps Hebrew final letters to their regular form,
+    lower-cases Latin text and drops whitespace and punctuation.
+    """
+    if text in _name_cache:
+        return _name_cache[text]
+    decomposed = unicodedata.normalize("NFD", str(text))
+    letters = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    normalized = _NON_LETTERS.sub("", letters.lower().translate(_FINAL_LETTERS))
+    _name_cache[text] = normalized
+    return normalized
+
+
+def hebrew_from_layout(text):
+    """Latin keystrokes as the Hebrew letters on the same keys ('urs' -> 'ורד')."""
+    return normalize_name(str(text).lower().translate(_HEBREW_LAYOUT))
+
+
+def name_similarity(typed, names):
+    """Best SequenceMatcher ratio of typed (as typed, or re-read through the Hebrew layout) against names."""
+    key = "\t".join([str(typed)] + [str(n) for n in names])
+    if key in _similarity_cache:
+        return _similarity_cache[key]
+    candidates = {normalize_name(typed), hebrew_from_layout(typed)} - {""}
+    targets = [normalize_name(n) for n in names if n]
+    best = 0.0
+    for candidate in candidates:
+        for target in targets:
+            if target:
+                best = max(best, SequenceMatcher(None, candidate, target).ratio())
+    _similarity_cache[key] = best
+    return best
+
+
+def load_name_cache(path):
+    """Fill the normalisation and similarity memos from a saved cache (ignored when stale or unreadable)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return
+    if not isinstance(saved, dict) or saved.get("version") != CACHE_VERSION:
+        return
+    _name_cache.update(saved.get("names", {}))
+    _similarity_cache.update(saved.get("similarity", {}))
+
+
+def save_name_cache(path):
+    """Write the normalisation and similarity memos to path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": CACHE_VERSION, "names": _name_cache, "similarity": _similarity_cache},
+                  f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def parse_positions(values):
+    """(n, 2) array from 'x,y' strings (NaN where unparsable)."""
+    parts = pd.Series(values, dtype=object).astype(str).str.extract(r"^\s*\(?\s*([-+\d.eE]+)\s*[,;]\s*([-+\d.eE]+)")
+    return parts.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+
+def target_table(registry):
+    """One row per arena target: arena, target, hebrew_name, tx, ty."""
+    rows = [(name, target, hebrew, x, y)
+            for name, spec in registry.items()
+            for target, hebrew, (x, y) in zip(spec.target_names, spec.hebrew_names, spec.coords)]
+    return pd.DataFrame(rows, columns=["arena", "target", "hebrew_name", "tx", "ty"])
+
+
+def load_annotations(results_dir, participants=None, db_path=None):
+    """
+    All Multi Arena annotations of the discrete logs, as one table.
+
+    The session database is brought up to date first, so only new or changed logs are read.
+    """
+    db_path = db_path or default_db_path(results_dir)
+    ingest(results_dir, db_path, participants)
+    frames = [canned("annotations", db_path, participant=participant) for participant in participants or [None]]
+    return pd.concat(frames, ignore_index=True)
+
+
+def position_pairs(annotations, targets, radius=POSITION_CANDIDATE_RADIUS):
+    """
+    Candidate (annotation, target) pairs by position, from one SpatialIndex per arena.
+
+    Each annotation with a parsable position gets the targets within radius plus its
+    nearest target, so an annotation far from everything is still assigned.
+
+    Returns:
+        DataFrame with annotation, target_idx and distance_m
+    """
+    frames = []
+    located = annotations[np.isfinite(annotations["x"]) & np.isfinite(annotations["y"])]
+    for arena, group in located.groupby("arena", sort=False):
+        arena_targets = targets[targets["arena"] == arena]
+        if arena_targets.empty:
+            continue
+        index = SpatialIndex(arena_targets[["tx", "ty"]].to_numpy(), cell_size=radius)
+        xy = group[["x", "y"]].to_numpy()
+        within = index.query_radius_many(xy, radius)
+        nearest, _ = index.nearest(xy)
+        local = [np.union1d(hits, [n]) for hits, n in zip(within, nearest)]
+        counts = [len(hits) for hits in local]
+        local = np.concatenate(local)
+        frames.append(pd.DataFrame({
+            "annotation": np.repeat(group["annotation"].to_numpy(), counts),
+            "target_idx": arena_targets["target_idx"].to_numpy()[local],
+        }))
+    if not frames:
+        return pd.DataFrame({"annotation": [], "target_idx": [], "distance_m": []})
+    pairs = pd.concat(frames, ignore_index=True)
+    ann = annotations.set_index("annotation").loc[pairs["annotation"], ["x", "y"]].to_numpy()
+    tgt = targets.set_index("target_idx").loc[pairs["target_idx"], ["tx", "ty"]].to_numpy()
+    pairs["distance_m"] = np.hypot(ann[:, 0] - tgt[:, 0], ann[:, 1] - tgt[:, 1])
+    return pairs
+
+
+def name_pairs(annotations, targets):
+    """
+    Candidate (annotation, target) pairs by name: similarity at or above NAME_MATCH_THRESHOLD.
+
+    Similarities are computed once per distinct (typed name, arena target).
+
+    Returns:
+        DataFrame with annotation, target_idx and similarity
+    """
+    typed = annotations[["TypedName", "arena"]].drop_duplicates().merge(
+        targets[["arena", "target", "hebrew_name", "target_idx"]], on="arena")
+    typed["similarity"] = [name_similarity(t, (h, e)) for t, e, h in
+                           typed[["TypedName", "target", "hebrew_name"]].itertuples(index=False)]
+    typed = typed[typed["similarity"] >= NAME_MATCH_THRESHOLD]
+    return annotations[["annotation", "TypedName", "arena"]].merge(
+        typed, on=["TypedName", "arena"])[["annotation", "target_idx", "similarity"]]
+
+
+def _assign(pairs, cost_col):
+    """
+    One-to-one assignment per trial minimising cost_col over the candidate pairs.
+
+    Returns:
+        Boolean array over pairs marking the assigned (annotation, target) pairs
+    """
+    chosen = np.zeros(len(pairs), dtype=bool)
+    for _, group in pairs.groupby("trial_key", sort=False):
+        ann_ids, ann_pos = np.unique(group["annotation"].to_numpy(), return_inverse=True)
+        tgt_ids, tgt_pos = np.unique(group["target_idx"].to_numpy(), return_inverse=True)
+        cost = np.full((len(ann_ids), len(tgt_ids)), 1e9)
+        cost[ann_pos, tgt_pos] = group[cost_col].to_numpy()
+        rows, cols = linear_sum_assignment(cost)
+        keep = cost[rows, cols] < 1e9
+        lookup = {(a, t): i for i, a, t in zip(range(len(group)), ann_pos, tgt_pos)}
+        chosen[group.index[[lookup[(r, c)] for r, c in zip(rows[keep], cols[keep])]]] = True
+    return chosen
+
+
+def score_annotations(annotations, registry):
+    """
+    Match every annotation to the arena targets by name and by position.
+
+    Returns:
+        (per-annotation DataFrame, per-trial summary DataFrame)
+    """
+    annotations = annotations.reset_index(drop=True).copy()
+    annotations["annotation"] = np.arange(len(annotations))
+    if "x" not in annotations.columns:
+        annotations[["x", "y"]] = parse_positions(annotations["ChosenPosition"])
+    annotations[["x", "y"]] = annotations[["x", "y"]].astype(float)
+    # Trial arena: the RoundName itself, or its theme without suffixes ('garden_training_1')
+    names = annotations["RoundName"].astype(str)
+    annotations["arena"] = np.where(names.isin(registry.keys()), names, names.str.split('_').str[0])
+
+    targets = target_table(registry)
+    targets["target_idx"] = np.arange(len(targets))
+    annotations["trial_key"] = annotations.groupby(TRIAL_KEYS, sort=False).ngroup()
+    trial_of = annotations.set_index("annotation")["trial_key"]
+
+    named = name_pairs(annotations, targets)
+    named["trial_key"] = trial_of.loc[named["annotation"]].to_numpy()
+    named["name_cost"] = 1.0 - named["similarity"]
+    named = named[_assign(named, "name_cost")]
+    # Error of the named target, wherever the annotation was placed
+    ann = annotations.set_index("annotation").loc[named["annotation"], ["x", "y"]].to_numpy()
+    tgt = targets.set_index("target_idx").loc[named["target_idx"], ["tx", "ty"]].to_numpy()
+    named["distance_m"] = np.hypot(ann[:, 0] - tgt[:, 0], ann[:, 1] - tgt[:, 1])
+    named["target"] = targets["target"].to_numpy()[named["target_idx"].to_numpy(dtype=int)]
+
+    placed = position_pairs(annotations, targets)
+    placed["trial_key"] = trial_of.loc[placed["annotation"]].to_numpy()
+    placed = placed[_assign(placed, "distance_m")]
+    placed["target"] = targets["target"].to_numpy()[placed["target_idx"].to_numpy(dtype=int)]
+
+    scored = annotations.drop(columns=["arena", "trial_key"]).merge(
+        named[["annotation", "target", "similarity", "distance_m"]].rename(columns={
+            "target": "named_target", "similarity": "name_similarity", "distance_m": "placement_error_m"}),
+        on="annotation", how="left"
+    ).merge(
+        placed[["annotation", "target", "distance_m"]].rename(columns={
+            "target": "assigned_target", "distance_m": "assigned_distance_m"}),
+        on="annotation", how="left"
+    )
+    scored["recognized"] = scored["named_target"].notna()
+    scored["swap"] = (scored["recognized"] & scored["assigned_target"].notna()
+                      & (scored["assigned_target"] != scored["named_target"])
+                      & (scored["assigned_distance_m"] < scored["placement_error_m"]))
+
+    # Per trial: every target of the arena, whether some annotation named it
+    trials = annotations.drop_duplicates(TRIAL_KEYS)[["context"] + TRIAL_KEYS + ["arena"]]
+    trial_targets = trials.merge(targets[["arena", "target"]], on="arena")
+    named_keys = scored.loc[scored["recognized"], TRIAL_KEYS + ["named_target"]].rename(columns={"named_target": "target"})
+    trial_targets = trial_targets.merge(named_keys.assign(named=True), on=TRIAL_KEYS + ["target"], how="left")
+    missed = trial_targets.groupby(TRIAL_KEYS, sort=False).agg(
+        n_targets=("target", "size"), n_missed=("named", lambda s: int(s.isna().sum())))
+
+    summary = scored.groupby(TRIAL_KEYS, sort=False).agg(
+        context=("context", "first"),
+        n_annotations=("annotation", "size"),
+        n_recognized=("recognized", "sum"),
+        n_swaps=("swap", "sum"),
+        mean_placement_error_m=("placement_error_m", "mean"),
+        mean_assigned_distance_m=("assigned_distance_m", "mean"),
+    ).join(missed).reset_index()
+    summary.insert(1, "context", summary.pop("context"))
+    summary["n_unrecognized"] = summary["n_annotations"] - summary["n_recognized"]
+    summary["n_targets"] = summary["n_targets"].fillna(0).astype(int)
+    summary["n_missed"] = summary["n_missed"].fillna(summary["n_targets"]).astype(int)
+    return scored.drop(columns=["annotation"]), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score Multi Arena annotations against the arena targets')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--participant', action='append', default=None,
+                       help='Only this participant (repeatable)')
+    parser.add_argument('--arena-file', default=None,
+                       help='Arena CSV with the target positions (default: Final_New_Arenas.csv)')
+    parser.add_argument('--output-dir', default=None,
+                       help='Where to write the score tables (default: results directory)')
+    parser.add_argument('--db', default=None,
+                       help='Session database (default: <results dir>/session_logs.sqlite)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help=f'Ignore and do not update <results dir>/{CACHE_DIR_NAME}')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    if not os.path.isdir(results_dir):
+        print(f"Error: Results directory not found: {results_dir}")
+        return 1
+    registry = load_registry(args.arena_file, with_sounds=False)
+    if not registry:
+        return 1
+    annotations = load_annotations(results_dir, args.participant, args.db)
+    if annotations.empty:
+        print(f"No Multi Arena discrete logs found in {results_dir}")
+        return 1
+
+    cache_path = os.path.join(results_dir, CACHE_DIR_NAME, NAME_CACHE_FILE)
+    if not args.no_cache:
+        load_name_cache(cache_path)
+    scored, summary = score_annotations(annotations, registry)
+    if not args.no_cache:
+        save_name_cache(cache_path)
+    unknown = sorted(set(summary.loc[summary["n_targets"] == 0, "RoundName"]))
+    if unknown:
+        print(f"Warning: arenas not in the arena file: {', '.join(unknown)}")
+    print(f"{len(scored)} annotations in {len(summary)} trials of {summary['participant'].nunique()} participants")
+    print(f"Recognized names: {scored['recognized'].mean():.1%}, swaps: {int(scored['swap'].sum())}, "
+          f"missed targets: {int(summary['n_missed'].sum())}, "
+          f"mean placement error: {scored['placement_error_m'].mean():.2f} m")
+
+    output_dir = args.output_dir or results_dir
+    os.makedirs(output_dir, exist_ok=True)
+    scored.to_csv(os.path.join(output_dir, "annotation_scores.csv"), index=False, encoding='utf-8-sig')
+    summary.to_csv(os.path.join(output_dir, "annotation_trials.csv"), index=False, encoding='utf-8-sig')
+    print(f"Annotation scores saved to: {output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
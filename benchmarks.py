@@ -0,0 +1,545 @@
+"""
+Micro and macro benchmarks for the experiment code, saved as JSON and compared against a baseline.
+
+Micro benchmarks time single calls of the hot functions in-process: every draw_* of
+multi_arena.py and one_target.py (on their offscreen game surface), render_hebrew_text,
+the log writers (save_logs, save_continuous_log, save_discrete_log), load_arena_data,
+load_target_sounds and generate_target_locations. The task modules are imported and
+their startup stages run (fMRI mode, participant BENCH, SDL dummy drivers, logs in a
+temporary results dir), but no experiment.
+Each benchmark is repeated REPEAT times with as many calls per repeat as fit in
+MICRO_TARGET seconds; the per-call minimum and median are reported.
+
+Macro benchmarks run whole processes:
+- import: a fresh interpreter importing each task module
+- startup: process start to the first display flip of each task (practice mode)
+- trial: one fMRI trial of each task, headless, driven by exploration/synthetic_participant.py
+  with a fixed seed and start time (wall time, plus the session time it simulated)
+- analysis: the analysis scripts on a synthetic cohort, cloned from the trial logs with
+  shifted positions for COHORT_PARTICIPANTS participants and COHORT_RUNS runs each
+  (render_figures, the slowest by far, on the first participant only)
+
+Results go to benchmark_results/bench_<timestamp>.json with machine metadata (platform,
+CPU, Python and library versions, git commit). `compare` prints the median ratio of every
+benchmark in both files and exits with 1 if any got slower by more than --threshold percent.
+
+Usage:
+    python benchmarks.py run                                  # micro + macro
+    python benchmarks.py run --micro --filter draw_ --output baseline.json
+    python benchmarks.py compare baseline.json benchmark_results/bench_20261019_101500.json
+    python benchmarks.py compare baseline.json current.json --threshold 5
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import importlib
+import shutil
+import timeit
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPLORATION_DIR = os.path.join(ROOT_DIR, "exploration")
+sys.path.insert(0, EXPLORATION_DIR)
+from arena_registry import load_registry  # noqa: E402
+
+OUTPUT_DIR = os.path.join(ROOT_DIR, "benchmark_results")
+BENCH_PARTICIPANT = "BENCH"
+BENCH_ARENA = "hospital"
+REPEAT = 5                  # Timed repeats per micro benchmark
+MICRO_TARGET = 0.2          # Seconds per repeat; calls per repeat are scaled to fill it
+STARTUP_REPEAT = 3
+ANALYSIS_REPEAT = 3
+DEFAULT_THRESHOLD = 10.0    # Percent slowdown reported as a regression
+SEED = 1
+START_AT = 1760000000.0     # Virtual clock start of the synthetic trials (fixed, so runs are identical)
+COHORT_PARTICIPANTS = 8
+COHORT_RUNS = 4
+
+SYNTHETIC_TRIALS = {
+    "multi_arena": ["multi_arena.py", "fmri", "--participant", BENCH_PARTICIPANT, "--arena", BENCH_ARENA,
+                    "--trial", "2", "--total-trials", "12"],
+    "one_target": ["one_target.py", "fmri", "--participant", BENCH_PARTICIPANT, "--run", "1"],
+    "snake": ["snake.py", "fmri", "--participant", BENCH_PARTICIPANT, "--run", "1"],
+}
+
+# Runs the task until its first display flip, then exits (the startup benchmark)
+FIRST_FRAME_RUNNER = """
+import os, sys, runpy, pygame
+def _first_frame(*args, **kwargs):
+    os._exit(0)
+pygame.display.flip = pygame.display.update = _first_frame
+sys.argv = sys.argv[1:]
+sys.path[0] = os.getcwd()
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+# ---------------------------
+# Timing
+# ---------------------------
+def summarize_times(times, **extra):
+    """Statistics of a list of per-call (or per-run) times in seconds."""
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeat": len(times),
+        **extra,
+    }
+
+
+def time_call(func, repeat=REPEAT, target=MICRO_TARGET):
+    """Per-call times of func: `repeat` rounds of as many calls as fill `target` seconds."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * target / max(elapsed, 1e-9)))
+    return [t / number for t in timer.repeat(repeat=repeat, number=number)], number
+
+
+def time_process(cmd, repeat, cwd=ROOT_DIR, env=None, setup=None):
+    """Wall times of running cmd to completion `repeat` times (setup() runs untimed before each)."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, encoding='utf-8', errors='replace')
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+    return times
+
+
+def task_env(results_dir):
+    """Environment for headless task processes writing their logs to results_dir."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               CENTRALIZED_RESULTS_DIR=results_dir, PYTHONIOENCODING="utf-8")
+    env.pop("TRIGGER_RECEIVED_TIME", None)
+    return env
+
+
+# ---------------------------
+# Micro benchmarks
+# ---------------------------
+def load_task(module, args, results_dir):
+    """A task module after its startup stages (headless, logs in results_dir); no experiment runs."""
+    os.makedirs(results_dir, exist_ok=True)  # The tasks fall back to exploration/results if it is missing
+    os.environ.update(SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", CENTRALIZED_RESULTS_DIR=results_dir,
+                      PYGAME_HIDE_SUPPORT_PROMPT="1")
+    task = importlib.import_module(module)
+    with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):
+        task.setup(args)
+    return task
+
+
+def fake_navigation(n, rng, **columns):
+    """n continuous-log rows of a random walk inside the arena."""
+    steps = rng.normal(0, 0.02, size=(n, 2))
+    xy = np.clip(np.cumsum(steps, axis=0), -1.5, 1.5)
+    start = datetime.now()
+    return [{"RealTime": start.strftime('%H:%M:%S.%f')[:-3], "trial_time": round(i / 60, 2),
+             "phase": "exploration", "event": "", "x": round(float(x), 3), "y": round(float(y), 3),
+             "rotation_angle": round(i * 0.5 % 360, 1), **columns}
+            for i, (x, y) in enumerate(xy)]
+
+
+def micro_benchmarks(results_dir):
+    """[(name, zero-argument callable)] for every micro benchmark."""
+    from generate_target_locations import generate_target_locations
+
+    fa = load_task("multi_arena", ["fmri", "--participant", BENCH_PARTICIPANT, "--arena", BENCH_ARENA],
+                   results_dir)
+    ot = load_task("one_target", ["fmri", "--participant", BENCH_PARTICIPANT, "--run", "1"], results_dir)
+    ot.DEBUG_MODE = True  # The timing panel is drawn in debug mode only
+
+    rng = np.random.default_rng(SEED)
+    spec = load_registry(with_sounds=False)[BENCH_ARENA]
+    targets = spec.targets()
+    hebrew_names = spec.hebrew_lookup()
+    annotations = {f"{x + 0.1:.3f},{y - 0.1:.3f}": hebrew_names[name] for name, (x, y) in targets.items()}
+    now = time.time()
+    font = fa.get_hebrew_font(20)
+    hebrew = "עיינ/י בסימונים שלך. לחצ/י RETNE להמשך."
+    fa_continuous = fake_navigation(1800, rng, RoundName=f"{BENCH_ARENA}_test_run1", visibility="full")
+    fa_discrete = [{"RoundName": f"{BENCH_ARENA}_test_run1", "TypedName": name, "ChosenPosition": pos,
+                    "TimeToAnnotation": 2.5} for pos, name in annotations.items()]
+    ot_continuous = fake_navigation(1200, rng, trial=1, condition_type="test")
+    ot_discrete = [{"trial": 1, "condition_type": "test", "assigned_delay": 12, "movement_start_time": 0.02,
+                    "target_placement_time": 12.6, "exploration_time": 20.5, "annotation_time": 2.9,
+                    "target_location": "[0.94, -0.04]", "target_annotation": "[0.76, -0.03]",
+                    "error_distance": 0.18}]
+    visited = {(int(i), int(j)) for i, j in rng.integers(-15, 16, size=(300, 2))}
+    ot_dir = os.path.join(results_dir, "micro")
+    os.makedirs(ot_dir, exist_ok=True)
+
+    return [
+        ("multi_arena.draw_arena", fa.draw_arena),
+        ("multi_arena.draw_player_avatar", lambda: fa.draw_player_avatar((0.3, -0.2), 35.0)),
+        ("multi_arena.draw_targets", lambda: fa.draw_targets(targets)),
+        ("multi_arena.draw_targets_named", lambda: fa.draw_targets(targets, True, hebrew_names)),
+        ("multi_arena.draw_annotations", lambda: fa.draw_annotations(annotations, (0.2, 0.1), True, "מיט")),
+        ("multi_arena.draw_finished_button", fa.draw_finished_button),
+        ("multi_arena.draw_timer", lambda: fa.draw_timer(75.0)),
+        ("multi_arena.draw_instruction", lambda: fa.draw_instruction(hebrew)),
+        ("multi_arena.draw_thermometer", lambda: fa.draw_thermometer(1.2, True, None, now)),
+        ("multi_arena.draw_clock", lambda: fa.draw_clock(135.0, True, None, now)),
+        ("multi_arena.draw_feedback", lambda: fa.draw_feedback(targets, annotations, hebrew_names)),
+        ("multi_arena.draw_trial_counter", fa.draw_trial_counter),
+        ("multi_arena.render_hebrew_text", lambda: fa.render_hebrew_text(font, hebrew, (255, 255, 255))),
+        ("multi_arena.save_logs", lambda: fa.save_logs(fa_discrete, fa_continuous, BENCH_PARTICIPANT)),
+        ("multi_arena.load_arena_data", fa.load_arena_data),
+        ("multi_arena.load_target_sounds", lambda: fa.load_target_sounds(BENCH_ARENA)),
+        ("one_target.draw_arena", ot.draw_arena),
+        ("one_target.draw_player_avatar", lambda: ot.draw_player_avatar((0.3, -0.2), 35.0)),
+        ("one_target.draw_grid", lambda: ot.draw_grid(visited)),
+        ("one_target.draw_thermometer", lambda: ot.draw_thermometer(1.2, True, None, now)),
+        ("one_target.draw_clock", lambda: ot.draw_clock(135.0, True, None, now)),
+        ("one_target.draw_conditions", lambda: ot.draw_conditions(now + 5, 3.0, True, True, False, False, 0.8,
+                                                                      (0.3, -0.2), 35.0, visited, now)),
+        ("one_target.draw_debug_timing_panel", lambda: ot.draw_debug_timing_panel(now - 20, now - 18, now + 2,
+                                                                                      now - 20)),
+        ("one_target.render_hebrew_text", lambda: ot.render_hebrew_text(font, hebrew, (255, 255, 255))),
+        ("one_target.save_continuous_log",
+         lambda: ot.save_continuous_log(ot_continuous, os.path.join(ot_dir, "ot_continuous.csv"))),
+        ("one_target.save_discrete_log",
+         lambda: ot.save_discrete_log(ot_discrete, os.path.join(ot_dir, "ot_discrete.csv"))),
+        ("generate_target_locations.batch", lambda: generate_target_locations(5, 0.3, seed=SEED)),
+        ("generate_target_locations.bridson",
+         lambda: generate_target_locations(20, 0.3, seed=SEED, method='bridson')),
+    ]
+
+
+def run_micro(workdir, pattern=None):
+    results = {}
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    for name, func in micro_benchmarks(os.path.join(workdir, "micro_results")):
+        name = "micro." + name
+        if pattern and not re.search(pattern, name):
+            continue
+        with contextlib.redirect_stdout(devnull):
+            times, number = time_call(func)
+        results[name] = summarize_times(times, number=number, unit="s/call")
+        print(f"  {name:<50} {results[name]['median'] * 1e6:10.1f} us")
+    devnull.close()
+    return results
+
+
+# ---------------------------
+# Macro benchmarks
+# ---------------------------
+def run_startup(workdir, script, args):
+    env = task_env(os.path.join(workdir, "startup_results"))
+    cmd = [sys.executable, "-c", FIRST_FRAME_RUNNER, script] + args
+    return summarize_times(time_process(cmd, STARTUP_REPEAT, cwd=EXPLORATION_DIR, env=env), unit="s")
+
+
+def run_synthetic_trial(results_dir, task):
+    """Run one headless trial; returns (wall seconds, simulated session seconds)."""
+    # --step 0: every frame the game asks for, so the benchmark times the tasks' frame cost
+    cmd = [sys.executable, "synthetic_participant.py", "--seed", str(SEED), "--start-at", repr(START_AT),
+           "--step", "0", "--results-dir", results_dir] + SYNTHETIC_TRIALS[task]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=EXPLORATION_DIR, env=task_env(results_dir), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{task} trial exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+    match = re.search(r"([\d.]+)s of session time", result.stderr)
+    return wall, float(match.group(1)) if match else float('nan')
+
+
+def trial_results_dir(workdir):
+    """Results dir holding one synthetic trial of every task (runs the missing ones untimed)."""
+    results_dir = os.path.join(workdir, "trial_results")
+    participant_dir = os.path.join(results_dir, BENCH_PARTICIPANT)
+    expected = {"multi_arena": "_FA_fa2_continuous.csv", "one_target": "_OT_ot1_continuous.csv",
+                "snake": "_OT_snake1_continuous.csv"}
+    for task, suffix in expected.items():
+        if not os.path.exists(os.path.join(participant_dir, BENCH_PARTICIPANT + suffix)):
+            run_synthetic_trial(results_dir, task)
+    return results_dir
+
+
+def shift_clock(real_time, offset):
+    """Shift 'HH:MM:SS.mmm' RealTime strings by offset seconds (other values unchanged)."""
+    parsed = pd.to_datetime(real_time, format='%H:%M:%S.%f', errors='coerce')
+    shifted = (parsed + pd.Timedelta(seconds=offset)).dt.strftime('%H:%M:%S.%f').str[:-3]
+    return shifted.where(parsed.notna(), real_time)
+
+
+def build_cohort(workdir, n_participants=COHORT_PARTICIPANTS, n_runs=COHORT_RUNS):
+    """
+    Synthetic cohort for the analysis benchmarks: the synthetic trial logs cloned into
+    n_participants x n_runs OT / FA / snake runs, with shifted paths and clocks.
+    """
+    cohort_dir = os.path.join(workdir, "cohort")
+    if os.path.isdir(cohort_dir):
+        return cohort_dir
+    template_dir = os.path.join(trial_results_dir(workdir), BENCH_PARTICIPANT)
+    rng = np.random.default_rng(SEED)
+    templates = {}
+    for filename in os.listdir(template_dir):
+        if filename.endswith(".csv"):
+            templates[filename[len(BENCH_PARTICIPANT):]] = pd.read_csv(
+                os.path.join(template_dir, filename), encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    renames = [("_FA_fa2_", "_FA_fa{run}_"), ("_OT_ot1_", "_OT_ot{run}_"), ("_OT_snake1_", "_OT_snake{run}_"),
+               ("_OT_snake1_", "_FA_snake{run}_")]
+
+    for p in range(n_participants):
+        participant = f"SYN{p + 1:02d}"
+        participant_dir = os.path.join(cohort_dir, participant)
+        os.makedirs(participant_dir, exist_ok=True)
+        for run in range(1, n_runs + 1):
+            offset = (p * n_runs + run) * 600.0
+            for old, new in renames:
+                for suffix, df in templates.items():
+                    if not suffix.startswith(old):
+                        continue
+                    clone = df.copy()
+                    if "RealTime" in clone.columns:
+                        clone["RealTime"] = shift_clock(clone["RealTime"], offset)
+                    if suffix.endswith("_continuous.csv"):
+                        # Shift the whole path (not each sample), so path lengths stay realistic
+                        for col, shift in zip(("x", "y"), rng.normal(0, 0.1, 2)):
+                            values = pd.to_numeric(clone[col], errors='coerce')
+                            clone[col] = np.where(values != 0, np.clip(values + shift, -1.5, 1.5).round(3), values)
+                    name = participant + suffix.replace(old, new.format(run=run))
+                    clone.to_csv(os.path.join(participant_dir, name), index=False, encoding='utf-8-sig')
+    return cohort_dir
+
+
+def analysis_commands(cohort_dir, output_dir):
+    """{name: (command, untimed setup before each run)} for the analysis scripts."""
+    db_path = os.path.join(output_dir, "sessions.sqlite")
+
+    def fresh_db():
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    python = sys.executable
+    return {
+        "cohort_analysis": ([python, "cohort_analysis.py", "--results-dir", cohort_dir, "--no-cache",
+                             "--output", os.path.join(output_dir, "cohort_metrics.csv")], None),
+        "occupancy": ([python, "occupancy.py", "--results-dir", cohort_dir, "--no-cache", "--no-images",
+                       "--output-dir", os.path.join(output_dir, "occupancy")], None),
+        "fmri_regressors": ([python, "fmri_regressors.py", "--results-dir", cohort_dir,
+                             "--output-dir", os.path.join(output_dir, "regressors")], None),
+        "annotation_scoring": ([python, "annotation_scoring.py", "--results-dir", cohort_dir,
+                                "--output-dir", os.path.join(output_dir, "annotations")], None),
+        "session_db_ingest": ([python, "session_db.py", "--results-dir", cohort_dir, "--db", db_path, "ingest"],
+                              fresh_db),
+        "session_timeline": ([python, "session_timeline.py", "SYN01", "--results-dir", cohort_dir,
+                              "--output", os.path.join(output_dir, "SYN01_timeline.csv")], None),
+        "render_figures": ([python, "render_figures.py", "--results-dir", cohort_dir, "--force",
+                            "--participant", "SYN01", "--output-dir", os.path.join(output_dir, "figures")], None),
+    }
+
+
+def run_macro(workdir, pattern=None):
+    def wanted(name):
+        return not pattern or re.search(pattern, name)
+
+    results = {}
+
+    def report(name, stats):
+        results[name] = stats
+        print(f"  {name:<50} {stats['median']:10.3f} s")
+
+    for task, args in (("multi_arena", ["practice", "--participant", BENCH_PARTICIPANT]),
+                       ("one_target", ["practice", "--participant", BENCH_PARTICIPANT]),
+                       ("snake", ["practice", "--participant", BENCH_PARTICIPANT])):
+        name = f"macro.import.{task}"
+        if wanted(name):
+            report(name, summarize_times(time_process([sys.executable, "-c", f"import {task}"], STARTUP_REPEAT,
+                                                      cwd=EXPLORATION_DIR, env=task_env(workdir)), unit="s"))
+        name = f"macro.startup.{task}"
+        if wanted(name):
+            report(name, run_startup(workdir, task + ".py", args))
+
+    for task in SYNTHETIC_TRIALS:
+        name = f"macro.trial.{task}"
+        if wanted(name):
+            shutil.rmtree(os.path.join(workdir, "trial_results", BENCH_PARTICIPANT), ignore_errors=True)
+            wall, session = run_synthetic_trial(os.path.join(workdir, "trial_results"), task)
+            report(name, summarize_times([wall], unit="s", session_s=session, speedup=session / wall))
+
+    output_dir = os.path.join(workdir, "analysis_output")
+    os.makedirs(output_dir, exist_ok=True)
+    commands = None
+    for script in ("cohort_analysis", "occupancy", "fmri_regressors", "annotation_scoring",
+                   "session_db_ingest", "session_timeline", "render_figures"):
+        name = f"macro.analysis.{script}"
+        if not wanted(name):
+            continue
+        if commands is None:
+            cohort_dir = build_cohort(workdir)
+            commands = analysis_commands(cohort_dir, output_dir)
+        cmd, setup = commands[script]
+        report(name, summarize_times(time_process(cmd, ANALYSIS_REPEAT, setup=setup), unit="s",
+                                     participants=COHORT_PARTICIPANTS, runs=COHORT_RUNS))
+    return results
+
+
+# ---------------------------
+# Metadata, saving and comparison
+# ---------------------------
+def cpu_model():
+    try:
+        with open("/proc/cpuinfo", encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_metadata():
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    return {
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": git_revision(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu": cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())),
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Median ratio (current / baseline) of every benchmark in both result sets.
+
+    Returns:
+        (DataFrame with name, baseline, current, ratio, status; list of regressed names)
+    """
+    names = sorted(set(baseline["benchmarks"]) | set(current["benchmarks"]))
+    rows = []
+    for name in names:
+        before = baseline["benchmarks"].get(name, {}).get("median")
+        after = current["benchmarks"].get(name, {}).get("median")
+        ratio = after / before if before and after is not None else float('nan')
+        if before is None:
+            status = "new"
+        elif after is None:
+            status = "missing"
+        elif ratio > 1 + threshold / 100:
+            status = "SLOWER"
+        elif ratio < 1 - threshold / 100:
+            status = "faster"
+        else:
+            status = ""
+        rows.append({"name": name, "baseline": before, "current": after, "ratio": ratio, "status": status})
+    table = pd.DataFrame(rows, columns=["name", "baseline", "current", "ratio", "status"])
+    return table, table.loc[table["status"] == "SLOWER", "name"].tolist()
+
+
+def format_seconds(value):
+    if value is None or value != value:
+        return "-"
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if value >= scale:
+            return f"{value / scale:.3g} {unit}"
+    return f"{value * 1e9:.3g} ns"
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro and macro benchmarks of the experiment code')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='Run the benchmarks and save the results as JSON')
+    run_parser.add_argument('--micro', action='store_true', help='Only the micro benchmarks')
+    run_parser.add_argument('--macro', action='store_true', help='Only the macro benchmarks')
+    run_parser.add_argument('--filter', default=None, metavar='REGEX',
+                            help="Only benchmarks whose name matches (e.g. 'draw_', 'analysis')")
+    run_parser.add_argument('--output', default=None,
+                            help=f'Results file (default: {os.path.relpath(OUTPUT_DIR, ROOT_DIR)}/bench_<timestamp>.json)')
+    run_parser.add_argument('--keep-workdir', action='store_true',
+                            help='Keep the temporary logs, cohort and outputs (path is printed)')
+    compare_parser = commands.add_parser('compare', help='Compare results against a saved baseline')
+    compare_parser.add_argument('baseline', help='Baseline results JSON')
+    compare_parser.add_argument('current', help='Current results JSON')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help=f'Percent slowdown counted as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        baseline, current = load_results(args.baseline), load_results(args.current)
+        for label, results in (("Baseline", baseline), ("Current", current)):
+            meta = results.get("metadata", {})
+            print(f"{label}: {meta.get('timestamp')} {meta.get('git_commit') or ''} ({meta.get('cpu')})")
+        if baseline.get("metadata", {}).get("cpu") != current.get("metadata", {}).get("cpu"):
+            print("Warning: the results are from different CPUs")
+        table, regressions = compare(baseline, current, args.threshold)
+        for col in ("baseline", "current"):
+            table[col] = table[col].map(format_seconds)
+        table["ratio"] = table["ratio"].map(lambda r: "-" if r != r else f"{r:.2f}x")
+        print(table.to_string(index=False))
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower by more than {args.threshold:g}%")
+            return 1
+        print(f"No regressions beyond {args.threshold:g}%")
+        return 0
+
+    run_micro_set = args.micro or not args.macro
+    run_macro_set = args.macro or not args.micro
+    workdir = tempfile.mkdtemp(prefix="benchmarks_")
+    benchmarks = {}
+    try:
+        if run_micro_set:
+            print("Micro benchmarks (median per call):")
+            benchmarks.update(run_micro(workdir, args.filter))
+        if run_macro_set:
+            print("Macro benchmarks (median wall time):")
+            benchmarks.update(run_macro(workdir, args.filter))
+    finally:
+        if args.keep_workdir:
+            print(f"Working files kept in: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"metadata": machine_metadata(), "benchmarks": benchmarks}, f, indent=2)
+    print(f"Results saved to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Cohort analysis: trajectory metrics for every participant's logs in one run.
+
+Scans the results directory (CENTRALIZED_RESULTS_DIR, or exploration/results when it
+is not set) for each participant's OT, FA, snake and practice continuous logs,
+computes trajectory_metrics.compute_metrics() for every file in a process pool and
+writes one tidy table for the whole cohort.
+
+Each file's metrics are cached under <results dir>/.cohort_cache, keyed on the file's
+path, size and modification time, so re-running after a new participant only reads
+that participant's files.
+
+With --outcomes, the task outcomes (One Target error by run, snake scores) are printed
+from session_db's canned queries after an incremental ingest.
+
+Usage:
+    python cohort_analysis.py                                # all participants
+    python cohort_analysis.py --outcomes
+    python cohort_analysis.py --participant TS263 --task multi_arena
+    python cohort_analysis.py --results-dir U:/sunt/Navigation/fMRI/Results --workers 8
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from trajectory_metrics import load_continuous_log, compute_metrics
+
+CACHE_DIR_NAME = ".cohort_cache"
+MANIFEST_NAME = "manifest.json"
+CACHE_VERSION = 1  # Bump when compute_metrics() output changes to invalidate old entries
+
+TASKS = ["one_target", "multi_arena", "snake"]
+
+# Continuous log names written by the tasks (see one_target.py, multi_arena.py, snake.py
+# and unified_logging.py). The run number is empty for files combined by
+# combine_session_data.m, which replace the per-trial files.
+LOG_PATTERNS = [
+    ("one_target", re.compile(r"^(?P<pid>.+)_(?P<context>OT)_ot(?P<run>\d*)_continuous\.csv$")),
+    ("multi_arena", re.compile(r"^(?P<pid>.+)_(?P<context>FA)_fa(?P<run>\d*)_continuous\.csv$")),
+    ("snake", re.compile(r"^(?P<pid>.+)_(?P<context>OT|FA)_snake(?P<run>\d*)_continuous\.csv$")),
+    ("snake", re.compile(r"^(?P<pid>.+)_(?P<context>anatomical)_snake_continuous\.csv$")),
+    ("one_target", re.compile(r"^(?P<pid>.+)_one_target_(?P<context>run)_continuous\.csv$")),
+    ("multi_arena", re.compile(r"^(?P<pid>.+)_multi_arena_trial(?P<run>\d+)_continuous\.csv$")),
+    ("snake", re.compile(r"^(?P<pid>.+)_snake_run(?P<run>\d+)_continuous\.csv$")),
+    ("one_target", re.compile(r"^(?P<pid>.+)_one_target_(?P<context>practice)_continuous_log\.csv$")),
+    ("multi_arena", re.compile(r"^(?P<pid>.+)_multi_arena_(?P<context>practice)_continuous_log\.csv$")),
+    ("snake", re.compile(r"^(?P<pid>.+)_snake_(?P<context>practice)_continuous_log\.csv$")),
+]
+
+
+@dataclass
+class LogFile:
+    """One continuous log found in a participant directory."""
+    participant: str
+    task: str
+    context: str   # OT, FA, anatomical, practice, or run/'' for unified_logging fMRI files
+    run: str       # Trial/run number from the filename, '' for combined files
+    path: str
+
+
+def default_results_dir():
+    """CENTRALIZED_RESULTS_DIR when set and present, else the local exploration/results."""
+    centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
+    if centralized_results_dir and os.path.exists(centralized_results_dir):
+        return centralized_results_dir
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "exploration", "results")
+
+
+def discrete_log_path(continuous_path):
+    """Path of the discrete log written next to a continuous log (same name, 'discrete' for 'continuous')."""
+    directory, filename = os.path.split(continuous_path)
+    head, sep, tail = filename.rpartition("continuous")
+    return os.path.join(directory, head + "discrete" + tail if sep else filename)
+
+
+def classify_log(filename, participant):
+    """(task, context, run) for a continuous log filename of participant, or None."""
+    for task, pattern in LOG_PATTERNS:
+        match = pattern.match(filename)
+        if match and match.group("pid") == participant:
+            groups = match.groupdict()
+            return task, groups.get("context") or "", groups.get("run") or ""
+    return None
+
+
+def discover_logs(results_dir, participants=None, tasks=None):
+    """
+    Find continuous logs in results_dir/<participant>/.
+
+    Per-trial files are skipped when the combined file for the same run exists.
+    """
+    logs = []
+    if not os.path.isdir(results_dir):
+        return logs
+    for participant in sorted(os.listdir(results_dir)):
+        subid_dir = os.path.join(results_dir, participant)
+        if participant.startswith('.') or not os.path.isdir(subid_dir):
+            continue
+        if participants and participant not in participants:
+            continue
+        found = []
+        for filename in sorted(os.listdir(subid_dir)):
+            info = classify_log(filename, participant)
+            if info and (not tasks or info[0] in tasks):
+                found.append(LogFile(participant, *info, os.path.join(subid_dir, filename)))
+        combined = {(log.task, log.context) for log in found if log.run == "" and log.context in ("OT", "FA")}
+        logs.extend(log for log in found if log.run == "" or (log.task, log.context) not in combined)
+    return logs
+
+
+def analyze_file(log):
+    """Worker: metrics table of one log, tagged with its source columns."""
+    df = load_continuous_log(log.path)
+    df.insert(0, "file", os.path.basename(log.path))
+    metrics = compute_metrics(df)
+    metrics.insert(0, "participant", log.participant)
+    metrics.insert(1, "task", log.task)
+    metrics.insert(2, "context", log.context)
+    metrics.insert(3, "run", log.run)
+    return metrics
+
+
+class MetricsCache:
+    """Per-file results cache; an entry is valid while the log's size and mtime are unchanged."""
+
+    def __init__(self, cache_dir, version=CACHE_VERSION):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _signature(self, path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns, self.version]
+
+    def _entry_path(self, path):
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest + ".pkl")
+
+    def get(self, path):
+        """Cached result for path, or None when missing or stale."""
+        key = os.path.abspath(path)
+        if self.manifest.get(key) != self._signature(path):
+            return None
+        try:
+            return pd.read_pickle(self._entry_path(path))
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def put(self, path, result):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        pd.to_pickle(result, self._entry_path(path))
+        self.manifest[os.path.abspath(path)] = self._signature(path)
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def map_logs(logs, worker, cache=None, workers=None):
+    """
+    Run worker(log) for every log in a process pool, reusing and updating cache entries.
+
+    Returns:
+        ({path: result}, {'cached': n, 'computed': n, 'failed': n})
+    """
+    results = {}
+    pending = []
+    for log in logs:
+        cached = cache.get(log.path) if cache else None
+        if cached is not None:
+            results[log.path] = cached
+        else:
+            pending.append(log)
+    counts = {'cached': len(results), 'computed': 0, 'failed': 0}
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(log, pool.submit(worker, log)) for log in pending]
+            for log, future in futures:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Warning: Could not analyze {log.path}: {e}")
+                    counts['failed'] += 1
+                    continue
+                results[log.path] = result
+                counts['computed'] += 1
+                if cache:
+                    cache.put(log.path, result)
+        if cache:
+            cache.save()
+    return results, counts
+
+
+def run_cohort(results_dir, participants=None, tasks=None, workers=None, cache_dir=None, use_cache=True):
+    """
+    Compute metrics for every discovered log, reusing cached results.
+
+    Returns:
+        (metrics DataFrame for the cohort, {'cached': n, 'computed': n, 'failed': n})
+    """
+    logs = discover_logs(results_dir, participants, tasks)
+    cache = MetricsCache(cache_dir or os.path.join(results_dir, CACHE_DIR_NAME)) if use_cache else None
+    tables, counts = map_logs(logs, analyze_file, cache, workers)
+
+    ordered = [tables[log.path] for log in logs if log.path in tables]
+    cohort = pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame()
+    return cohort, counts
+
+
+def print_cohort_summary(cohort):
+    """Per participant and task: number of files and trials, mean path length and duration."""
+    if cohort.empty:
+        print("No logs found.")
+        return
+    whole = cohort[cohort["phase"] == "all"]
+    summary = whole.groupby(["participant", "task"]).agg(
+        files=("file", "nunique"),
+        trials=("file", "size"),
+        mean_path_m=("path_length_m", "mean"),
+        mean_duration_s=("duration_s", "mean"),
+        mean_speed=("mean_speed", "mean"),
+    )
+    print(summary.to_string(float_format=lambda v: f"{v:.2f}"))
+
+
+def print_task_outcomes(results_dir, participants=None, queries=("ot_error_by_run", "snake_scores")):
+    """Task outcomes per participant from session_db's canned queries (ingesting new logs first)."""
+    from session_db import canned, default_db_path, ingest  # session_db imports this module
+
+    db_path = default_db_path(results_dir)
+    ingest(results_dir, db_path, participants)
+    for name in queries:
+        result = pd.concat([canned(name, db_path, participant=participant) for participant in participants or [None]],
+                           ignore_index=True)
+        print(f"\n{name}:")
+        print(result.to_string(index=False, float_format=lambda v: f"{v:.2f}") if not result.empty else "  (no logs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute trajectory metrics for all participants')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory with one folder per participant '
+                            '(default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--participant', action='append', default=None,
+                       help='Only this participant (repeatable)')
+    parser.add_argument('--task', action='append', choices=TASKS, default=None,
+                       help='Only this task (repeatable)')
+    parser.add_argument('--output', default=None,
+                       help='CSV to write (default: <results dir>/cohort_metrics.csv)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--cache-dir', default=None,
+                       help=f'Metrics cache directory (default: <results dir>/{CACHE_DIR_NAME})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Recompute every file and leave the cache untouched')
+    parser.add_argument('--outcomes', action='store_true',
+                       help='Also print task outcomes from the session database (session_db.py)')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    if not os.path.isdir(results_dir):
+        print(f"Error: Results directory not found: {results_dir}")
+        return 1
+    print(f"Results directory: {results_dir}")
+
+    cohort, counts = run_cohort(results_dir, args.participant, args.task, args.workers,
+                                args.cache_dir, use_cache=not args.no_cache)
+    print(f"Files: {counts['computed']} computed, {counts['cached']} cached, {counts['failed']} failed")
+    print_cohort_summary(cohort)
+    if args.outcomes:
+        print_task_outcomes(results_dir, args.participant)
+    if cohort.empty:
+        return 0
+
+    output_file = args.output or os.path.join(results_dir, "cohort_metrics.csv")
+    cohort.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"Cohort metrics saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
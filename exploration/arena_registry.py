@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arena Registry Module for fMRI Navigation Experiments
+Single parser for the arena CSV files (Final_New_Arenas.csv, Final111_New_Arenas.csv,
+Arenas.csv) used by multi_arena.py and the arena/audio tooling scripts.
+
+The parsed arenas are compiled once and cached in __pycache__/, keyed on the CSV's
+mtime, size and content hash, so later process starts skip CSV parsing entirely.
+
+CSV format (header row, then one row per target):
+    theme,target,coords[,hebrew_name[,hebrew_theme]]
+    garden,Rose,(0.11; 0.63),ורד,גן
+"""
+
+import os
+import csv
+import pickle
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EXPLORATION_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARENA_FILE = os.path.join(EXPLORATION_DIR, "Final_New_Arenas.csv")
+LEGACY_ARENA_FILE = os.path.join(EXPLORATION_DIR, "Arenas.csv")
+ARENA_SOUNDS_DIR = os.path.join(EXPLORATION_DIR, "sounds", "arenas")
+CACHE_DIR = os.path.join(EXPLORATION_DIR, "__pycache__")
+CACHE_VERSION = 1
+
+CSV_HEADER = ["theme", "target", "coords", "hebrew_name", "hebrew_theme"]
+
+
+@dataclass
+class ArenaSpec:
+    """One arena: target names, positions (meters) and Hebrew labels."""
+    name: str
+    target_names: Tuple[str, ...]
+    coords: np.ndarray                      # shape (n_targets, 2), columns x, y
+    hebrew_names: Tuple[str, ...]
+    hebrew_name: str = ""                   # Hebrew arena name ('' if not in the CSV)
+    sound_paths: Tuple[Optional[str], ...] = field(default=(), compare=False)
+
+    def __len__(self):
+        return len(self.target_names)
+
+    @property
+    def base_name(self) -> str:
+        """Arena theme without trial suffixes (e.g. 'garden_training_1' -> 'garden')."""
+        return self.name.split('_')[0]
+
+    def targets(self) -> Dict[str, Tuple[float, float]]:
+        """Return {target_name: (x, y)} in CSV order."""
+        return {name: (float(x), float(y)) for name, (x, y) in zip(self.target_names, self.coords)}
+
+    def hebrew_lookup(self) -> Dict[str, str]:
+        """Return {target_name: hebrew_name}."""
+        return dict(zip(self.target_names, self.hebrew_names))
+
+
+def parse_coords(coord_str: str) -> Optional[Tuple[float, float]]:
+    """Parse '(x; y)' into (x, y); returns None if the string is malformed."""
+    parts = coord_str.strip().strip('()').split(';')
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
+
+def format_coords(x: float, y: float) -> str:
+    """Format a position the way the arena CSVs store it: '(x; y)' with 2 decimals."""
+    return f"({x:.2f}; {y:.2f})"
+
+
+def find_sound_path(arena_name: str, target_name: str) -> Optional[str]:
+    """Return the target's sound file under sounds/arenas/<theme>/, or None if missing."""
+    base = os.path.join(ARENA_SOUNDS_DIR, arena_name.split('_')[0], target_name.lower())
+    for ext in ('.mp3', '.wav'):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def parse_arena_csv(csv_path: str) -> Dict[str, dict]:
+    """
+    Parse an arena CSV (3, 4 or 5 columns) into plain per-arena tables.
+
+    Returns:
+        {arena: {'targets': [...], 'coords': [(x, y), ...], 'hebrew': [...], 'hebrew_theme': str}}
+    """
+    tables: Dict[str, dict] = {}
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip the header row
+        for row in reader:
+            if len(row) < 3:
+                continue
+            # Pad short rows so 3- and 4-column files share one code path
+            theme, target, coord_str, hebrew_name, hebrew_theme = (row + ["", ""])[:5]
+            coords = parse_coords(coord_str)
+            if coords is None:
+                print(f"Warning: Could not parse coordinates: {coord_str}")
+                continue
+
+            table = tables.setdefault(theme, {'targets': [], 'coords': [], 'hebrew': [], 'hebrew_theme': ""})
+            table['targets'].append(target)
+            table['coords'].append(coords)
+            table['hebrew'].append(hebrew_name or target)  # English name as fallback
+            if hebrew_theme:
+                table['hebrew_theme'] = hebrew_theme
+    return tables
+
+
+def _file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _cache_path(csv_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"arena_registry_{key}.pkl")
+
+
+def _load_tables(csv_path: str) -> Dict[str, dict]:
+    """Return parsed tables for csv_path, using the compiled cache when it is still valid."""
+    stat = os.stat(csv_path)
+    cache_path = _cache_path(csv_path)
+    cached = None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        cached = None
+
+    if cached and cached.get('version') == CACHE_VERSION:
+        # Fast path: unchanged mtime and size means no need to even read the CSV
+        if cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['tables']
+        # mtime changed (e.g. file copied) but contents may be identical
+        digest = _file_digest(csv_path)
+        if cached['sha256'] == digest:
+            cached['mtime_ns'] = stat.st_mtime_ns
+            _write_cache(cache_path, cached)
+            return cached['tables']
+    else:
+        digest = _file_digest(csv_path)
+
+    tables = parse_arena_csv(csv_path)
+    _write_cache(cache_path, {
+        'version': CACHE_VERSION,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': digest,
+        'tables': tables,
+    })
+    return tables
+
+
+def _write_cache(cache_path: str, payload: dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write arena cache {cache_path}: {e}")
+
+
+def resolve_arena_file(csv_path: Optional[str] = None) -> Optional[str]:
+    """Return csv_path, or Final_New_Arenas.csv falling back to Arenas.csv; None if none exist."""
+    if csv_path is not None:
+        return csv_path if os.path.exists(csv_path) else None
+    for candidate in (DEFAULT_ARENA_FILE, LEGACY_ARENA_FILE):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+_registry_memo: Dict[str, Tuple[int, Dict[str, ArenaSpec]]] = {}
+
+
+def load_registry(csv_path: Optional[str] = None, with_sounds: bool = True) -> Dict[str, ArenaSpec]:
+    """
+    Load all arenas from an arena CSV as ArenaSpec objects (in CSV order).
+
+    Args:
+        csv_path: Arena CSV to load (default: Final_New_Arenas.csv, then Arenas.csv)
+        with_sounds: Resolve each target's sound file under sounds/arenas/
+
+    Returns:
+        {arena_name: ArenaSpec}; empty if no arena file exists
+    """
+    arena_file = resolve_arena_file(csv_path)
+    if arena_file is None:
+        print(f"Warning: Arena file not found: {csv_path or DEFAULT_ARENA_FILE}")
+        return {}
+
+    memo_key = f"{os.path.abspath(arena_file)}|{with_sounds}"
+    mtime_ns = os.stat(arena_file).st_mtime_ns
+    memo = _registry_memo.get(memo_key)
+    if memo and memo[0] == mtime_ns:
+        return memo[1]
+
+    registry = {}
+    for name, table in _load_tables(arena_file).items():
+        coords = np.asarray(table['coords'], dtype=float).reshape(-1, 2)
+        coords.setflags(write=False)
+        sound_paths = tuple(find_sound_path(name, t) for t in table['targets']) if with_sounds else ()
+        registry[name] = ArenaSpec(
+            name=name,
+            target_names=tuple(table['targets']),
+            coords=coords,
+            hebrew_names=tuple(table['hebrew']),
+            hebrew_name=table['hebrew_theme'],
+            sound_paths=sound_paths,
+        )
+    _registry_memo[memo_key] = (mtime_ns, registry)
+    return registry
+
+
+def get_arena(name: str, csv_path: Optional[str] = None) -> Optional[ArenaSpec]:
+    """Return a single arena by name, or None if it is not in the CSV."""
+    return load_registry(csv_path).get(name)
+
+
+def legacy_tables(registry: Dict[str, ArenaSpec]):
+    """
+    Convert a registry into the (arenas, hebrew_names, hebrew_arena_names) dicts
+    that multi_arena.py's drawing and trial code works with.
+    """
+    arenas = {name: spec.targets() for name, spec in registry.items()}
+    hebrew_names = {name: spec.hebrew_lookup() for name, spec in registry.items()}
+    hebrew_arena_names = {name: spec.hebrew_name for name, spec in registry.items() if spec.hebrew_name}
+    return arenas, hebrew_names, hebrew_arena_names
+
+
+def write_arena_csv(output_file: str, rows: Sequence[Sequence], header: Optional[List[str]] = None):
+    """
+    Write arena rows in the standard CSV layout.
+
+    Args:
+        output_file: Path of the CSV to write
+        rows: [theme, target, (x, y) or '(x; y)', hebrew_name, hebrew_theme] (trailing columns optional)
+        header: Column names (default: as many of CSV_HEADER as the rows use)
+    """
+    n_cols = max((len(r) for r in rows), default=len(CSV_HEADER))
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header or CSV_HEADER[:n_cols])
+        for row in rows:
+            row = list(row)
+            if not isinstance(row[2], str):
+                row[2] = format_coords(*row[2])
+            writer.writerow(row)
+
+
+if __name__ == "__main__":
+    registry = load_registry()
+    print(f"Loaded {len(registry)} arenas with {sum(len(s) for s in registry.values())} targets")
+    for spec in registry.values():
+        missing = [t for t, p in zip(spec.target_names, spec.sound_paths) if p is None]
+        status = f"missing sounds: {', '.join(missing)}" if missing else "all sounds found"
+        print(f"  {spec.name:<10} {spec.hebrew_name:<10} {len(spec)} targets ({status})")
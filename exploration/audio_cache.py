@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Cache Module for fMRI Navigation Experiments
+Transcodes experiment sounds (mp3/wav) into mixer-native PCM WAV files so that
+runtime loading is a plain PCM read instead of an mp3 decode plus resample.
+
+Cached files live in sounds/cache/ and are named after a hash of the source
+file contents and the mixer format, so a changed source (or a different mixer
+profile) never picks up a stale file.
+
+Usage:
+    python audio_cache.py            # build/refresh the cache
+    python audio_cache.py --force    # re-transcode everything
+    python audio_cache.py --clean    # also remove cache files with no source
+"""
+
+import os
+import sys
+import wave
+import hashlib
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+# Mixer-native format used by multi_arena.py, one_target.py and snake.py
+MIXER_FREQUENCY = 44100
+MIXER_SIZE = -16
+MIXER_CHANNELS = 2
+MIXER_BUFFER = 512
+
+SOUNDS_DIR = os.path.join(os.path.dirname(__file__), "sounds")
+CACHE_DIR = os.path.join(SOUNDS_DIR, "cache")
+SOURCE_EXTENSIONS = ('.wav', '.mp3')
+
+
+def _format_tag(frequency: int, size: int, channels: int) -> str:
+    """Return the cache filename suffix for a mixer format."""
+    return f"{frequency}hz_{abs(size)}bit_{channels}ch"
+
+
+def source_digest(source_path: str) -> str:
+    """Return the SHA-256 hex digest of a source sound file's contents."""
+    sha = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def cached_path_for(source_path: str, mixer_format: Optional[Tuple[int, int, int]] = None) -> str:
+    """
+    Return the cache path a source sound maps to.
+
+    Args:
+        source_path: Path to the original mp3/wav file
+        mixer_format: (frequency, size, channels); defaults to the experiment's mixer format
+    """
+    frequency, size, channels = mixer_format or (MIXER_FREQUENCY, MIXER_SIZE, MIXER_CHANNELS)
+    digest = source_digest(source_path)[:20]
+    return os.path.join(CACHE_DIR, f"{digest}_{_format_tag(frequency, size, channels)}.wav")
+
+
+def resolve_sound_path(source_path: str) -> str:
+    """
+    Return the cached PCM version of a sound if one exists for the current mixer
+    format, otherwise the original path. Safe to call before or after mixer init.
+    """
+    try:
+        import pygame
+        mixer_format = pygame.mixer.get_init()
+    except Exception:
+        mixer_format = None
+
+    # Cached files are 16-bit PCM; any other mixer format loads the source directly
+    if mixer_format is None or abs(mixer_format[1]) != 16:
+        return source_path
+
+    try:
+        cached_path = cached_path_for(source_path, mixer_format)
+    except OSError:
+        return source_path
+    return cached_path if os.path.exists(cached_path) else source_path
+
+
+def find_source_sounds(sounds_dir: str = SOUNDS_DIR) -> List[str]:
+    """Find all source sounds under sounds_dir, excluding the cache itself."""
+    sources = []
+    for root, dirs, files in os.walk(sounds_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != CACHE_DIR)
+        for filename in sorted(files):
+            if filename.lower().endswith(SOURCE_EXTENSIONS) and not filename.startswith('._'):
+                sources.append(os.path.join(root, filename))
+    return sources
+
+
+def transcode_sound(source_path: str, output_path: str) -> int:
+    """
+    Decode a sound through the (already initialised) mixer and write it as PCM WAV.
+
+    Returns:
+        Number of sample frames written
+    """
+    import pygame
+    frequency, size, channels = pygame.mixer.get_init()
+    raw = pygame.mixer.Sound(source_path).get_raw()
+
+    # Write to a temporary file first so an interrupted build never leaves a truncated cache entry
+    tmp_path = output_path + '.tmp'
+    with wave.open(tmp_path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(abs(size) // 8)
+        wav.setframerate(frequency)
+        wav.writeframes(raw)
+    os.replace(tmp_path, output_path)
+    return len(raw) // (channels * abs(size) // 8)
+
+
+def build_cache(sounds_dir: str = SOUNDS_DIR, force: bool = False, clean: bool = False) -> Dict[str, int]:
+    """
+    Transcode every source sound into the cache.
+
+    Args:
+        sounds_dir: Root directory to scan for sounds
+        force: Re-transcode files even if an up-to-date cache entry exists
+        clean: Remove cache files that no longer correspond to any source
+
+    Returns:
+        Counts of 'built', 'skipped', 'failed' and 'removed' files
+    """
+    # Decoding works without an audio device, so default to SDL's dummy driver
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame
+    pygame.mixer.init(frequency=MIXER_FREQUENCY, size=MIXER_SIZE, channels=MIXER_CHANNELS, buffer=MIXER_BUFFER)
+    mixer_format = pygame.mixer.get_init()
+    print(f"Mixer format: {mixer_format[0]} Hz, {abs(mixer_format[1])}-bit, {mixer_format[2]} channels")
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    counts = {'built': 0, 'skipped': 0, 'failed': 0, 'removed': 0}
+    expected = set()
+
+    for source_path in find_source_sounds(sounds_dir):
+        rel_path = os.path.relpath(source_path, sounds_dir)
+        output_path = cached_path_for(source_path, mixer_format)
+        expected.add(os.path.basename(output_path))
+
+        if os.path.exists(output_path) and not force:
+            counts['skipped'] += 1
+            continue
+
+        try:
+            frames = transcode_sound(source_path, output_path)
+            counts['built'] += 1
+            print(f"✓ {rel_path} -> {os.path.basename(output_path)} ({frames / mixer_format[0]:.2f}s)")
+        except Exception as e:
+            counts['failed'] += 1
+            print(f"✗ Could not transcode {rel_path}: {e}")
+
+    if clean:
+        for filename in os.listdir(CACHE_DIR):
+            if filename.endswith('.wav') and filename not in expected:
+                os.remove(os.path.join(CACHE_DIR, filename))
+                counts['removed'] += 1
+                print(f"  Removed stale cache file: {filename}")
+
+    pygame.mixer.quit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the mixer-native PCM audio cache')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-transcode all sounds even if cached')
+    parser.add_argument('--clean', action='store_true',
+                       help='Remove cache files whose source no longer exists')
+    parser.add_argument('--sounds-dir', default=SOUNDS_DIR,
+                       help=f'Sounds directory to scan (default: {SOUNDS_DIR})')
+    args = parser.parse_args()
+
+    print("Building audio cache")
+    print("=" * 50)
+    counts = build_cache(args.sounds_dir, force=args.force, clean=args.clean)
+    print("=" * 50)
+    print(f"Built: {counts['built']}, up to date: {counts['skipped']}, "
+          f"failed: {counts['failed']}, removed: {counts['removed']}")
+    return 0 if counts['failed'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
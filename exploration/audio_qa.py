@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio QA Module for fMRI Navigation Experiments
+Batch analysis of the target sounds under sounds/arenas: decodes every file in
+parallel and measures duration, RMS loudness, peak level and leading/trailing silence.
+
+Leading silence matters most: it is added directly to the delay between a target
+encounter (found_<target> in the logs) and the participant hearing the word.
+
+Files are flagged when they are outliers relative to the rest of the set (robust
+z-score on duration, loudness and silence), or when they break an absolute limit
+(leading silence, clipping, too quiet). Optionally writes trimmed and loudness-
+normalised 16-bit WAV copies for the flagged or all files.
+
+Usage:
+    python audio_qa.py                                   # analyse and report
+    python audio_qa.py --write-processed sounds/processed --target-rms -20
+"""
+
+import os
+import sys
+import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from audio_cache import MIXER_FREQUENCY, MIXER_SIZE, MIXER_CHANNELS, MIXER_BUFFER
+
+ARENAS_SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds", "arenas")
+SOURCE_EXTENSIONS = ('.mp3', '.wav')
+
+SILENCE_THRESHOLD_DBFS = -45.0   # Windows quieter than this count as silence
+WINDOW_MS = 5.0                  # Envelope window for silence detection
+MAX_LEAD_SILENCE_MS = 80.0       # Absolute limit on onset delay inside the file
+CLIP_PEAK_DBFS = -0.1            # Peak at or above this is treated as clipping
+MIN_RMS_DBFS = -35.0             # Quieter overall than this is flagged
+OUTLIER_Z = 3.5                  # Robust z-score (median/MAD) outlier cutoff
+OUTLIER_METRICS = ["duration_s", "rms_dbfs", "lead_silence_ms", "trail_silence_ms"]
+
+PAD_MS = 5.0                     # Silence kept before the onset / after the offset when trimming
+FADE_MS = 3.0                    # Fade applied at trimmed edges to avoid clicks
+MAX_PEAK_DBFS = -1.0             # Normalisation never raises the peak above this
+
+REPORT_FIELDS = ["arena", "target", "path", "duration_s", "rms_dbfs", "peak_dbfs",
+                 "lead_silence_ms", "trail_silence_ms", "flags", "error"]
+
+
+def to_dbfs(value):
+    """Convert a linear amplitude (full scale = 1.0) to dBFS, with -inf for silence."""
+    with np.errstate(divide='ignore'):
+        return 20.0 * np.log10(np.asarray(value, dtype=float))
+
+
+def find_target_sounds(arenas_dir: str = ARENAS_SOUNDS_DIR) -> List[str]:
+    """All target sounds under sounds/arenas/<arena>/, sorted by arena then file name."""
+    paths = []
+    for arena in sorted(os.listdir(arenas_dir)):
+        arena_dir = os.path.join(arenas_dir, arena)
+        if not os.path.isdir(arena_dir):
+            continue
+        for filename in sorted(os.listdir(arena_dir)):
+            if filename.lower().endswith(SOURCE_EXTENSIONS) and not filename.startswith('._'):
+                paths.append(os.path.join(arena_dir, filename))
+    return paths
+
+
+def _init_decoder():
+    """Process initializer: open the mixer on SDL's dummy driver (decoding needs no device)."""
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=MIXER_FREQUENCY, size=MIXER_SIZE, channels=MIXER_CHANNELS, buffer=MIXER_BUFFER)
+
+
+def decode_sound(path: str):
+    """
+    Decode a sound through pygame's mixer.
+
+    Returns:
+        (samples, frequency): float32 array of shape (n_frames, channels) in [-1, 1]
+    """
+    _init_decoder()
+    import pygame
+    frequency, size, channels = pygame.mixer.get_init()
+    samples = pygame.sndarray.array(pygame.mixer.Sound(path))
+    samples = samples.reshape(len(samples), -1).astype(np.float32)
+    return samples / float(2 ** (abs(size) - 1)), frequency
+
+
+def window_envelope(samples: np.ndarray, frequency: int, window_ms: float = WINDOW_MS) -> np.ndarray:
+    """RMS of the channel-mixed signal over consecutive windows (last partial window included)."""
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    window = max(1, int(frequency * window_ms / 1000.0))
+    n_windows = -(-len(mono) // window)
+    padded = np.zeros(n_windows * window, dtype=np.float64)
+    padded[:len(mono)] = mono
+    return np.sqrt(np.mean(padded.reshape(n_windows, window) ** 2, axis=1))
+
+
+def analyze_samples(samples: np.ndarray, frequency: int,
+                    threshold_dbfs: float = SILENCE_THRESHOLD_DBFS, window_ms: float = WINDOW_MS) -> Dict[str, float]:
+    """Duration, RMS/peak level (dBFS) and leading/trailing silence (ms) of a decoded sound."""
+    n_frames = len(samples)
+    duration_ms = 1000.0 * n_frames / frequency
+    envelope = window_envelope(samples, frequency, window_ms)
+    loud = np.flatnonzero(to_dbfs(envelope) > threshold_dbfs)
+
+    if len(loud):
+        lead_ms = min(loud[0] * window_ms, duration_ms)
+        trail_ms = max(duration_ms - (loud[-1] + 1) * window_ms, 0.0)
+    else:
+        lead_ms, trail_ms = duration_ms, 0.0
+
+    return {
+        "duration_s": round(duration_ms / 1000.0, 4),
+        "rms_dbfs": round(float(to_dbfs(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))), 2) if n_frames else float('-inf'),
+        "peak_dbfs": round(float(to_dbfs(np.abs(samples).max())), 2) if n_frames else float('-inf'),
+        "lead_silence_ms": round(lead_ms, 1),
+        "trail_silence_ms": round(trail_ms, 1),
+    }
+
+
+def analyze_file(path: str) -> Dict[str, object]:
+    """Worker: decode and analyse one file (errors are reported, not raised)."""
+    result = {"arena": os.path.basename(os.path.dirname(path)),
+              "target": os.path.splitext(os.path.basename(path))[0],
+              "path": path, "flags": "", "error": ""}
+    try:
+        samples, frequency = decode_sound(path)
+        result.update(analyze_samples(samples, frequency))
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def analyze_all(paths: Sequence[str], workers: Optional[int] = None) -> List[Dict[str, object]]:
+    """Analyse files in a process pool (workers=1 runs in-process), preserving input order."""
+    if workers == 1:
+        return [analyze_file(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_decoder) as pool:
+        return list(pool.map(analyze_file, paths, chunksize=4))
+
+
+def flag_outliers(results: List[Dict[str, object]], z_cutoff: float = OUTLIER_Z) -> List[Dict[str, object]]:
+    """Fill each result's 'flags' with absolute-limit violations and robust outliers (in place)."""
+    ok = [r for r in results if not r["error"]]
+    flags = {id(r): [] for r in results}
+
+    for metric in OUTLIER_METRICS:
+        values = np.array([r[metric] for r in ok], dtype=float)
+        if len(values) < 3:
+            break
+        median = np.median(values)
+        mad = np.median(np.abs(values - median)) * 1.4826  # MAD scaled to a normal sd
+        if mad == 0:
+            continue
+        z = (values - median) / mad
+        for r, score in zip(ok, z):
+            if abs(score) > z_cutoff:
+                flags[id(r)].append(f"{metric} {'high' if score > 0 else 'low'} (z={score:.1f})")
+
+    for r in ok:
+        if r["lead_silence_ms"] > MAX_LEAD_SILENCE_MS:
+            flags[id(r)].append(f"lead silence > {MAX_LEAD_SILENCE_MS:.0f} ms")
+        if r["peak_dbfs"] >= CLIP_PEAK_DBFS:
+            flags[id(r)].append("clipping")
+        if r["rms_dbfs"] < MIN_RMS_DBFS:
+            flags[id(r)].append(f"quiet (< {MIN_RMS_DBFS:.0f} dBFS)")
+    for r in results:
+        if r["error"]:
+            flags[id(r)].append("decode error")
+        r["flags"] = "; ".join(flags[id(r)])
+    return results
+
+
+def process_samples(samples: np.ndarray, frequency: int, target_rms_dbfs: Optional[float] = None,
+                    trim: bool = True) -> np.ndarray:
+    """
+    Trim leading/trailing silence (keeping PAD_MS, with FADE_MS fades) and optionally
+    normalise RMS loudness to target_rms_dbfs without letting the peak exceed MAX_PEAK_DBFS.
+    """
+    out = samples.astype(np.float64)
+    if trim:
+        metrics = analyze_samples(samples, frequency)
+        start = max(0, int(frequency * (metrics["lead_silence_ms"] - PAD_MS) / 1000.0))
+        end = len(out) - max(0, int(frequency * (metrics["trail_silence_ms"] - PAD_MS) / 1000.0))
+        out = out[start:max(end, start + 1)]
+        fade = min(int(frequency * FADE_MS / 1000.0), len(out) // 2)
+        if fade > 0:
+            ramp = np.linspace(0.0, 1.0, fade)[:, None]
+            if start > 0:
+                out[:fade] *= ramp
+            if end < len(samples):
+                out[-fade:] *= ramp[::-1]
+
+    if target_rms_dbfs is not None:
+        rms = np.sqrt(np.mean(out ** 2))
+        peak = np.abs(out).max()
+        if rms > 0:
+            gain = 10 ** (target_rms_dbfs / 20.0) / rms
+            gain = min(gain, 10 ** (MAX_PEAK_DBFS / 20.0) / peak)
+            out = out * gain
+    return out
+
+
+def write_wav(path: str, samples: np.ndarray, frequency: int):
+    """Write float samples in [-1, 1] as 16-bit PCM WAV (atomically)."""
+    import wave
+    pcm = np.clip(np.round(samples * 32767.0), -32768, 32767).astype('<i2')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with wave.open(tmp_path, 'wb') as wav:
+        wav.setnchannels(pcm.shape[1] if pcm.ndim == 2 else 1)
+        wav.setsampwidth(2)
+        wav.setframerate(frequency)
+        wav.writeframes(pcm.tobytes())
+    os.replace(tmp_path, path)
+
+
+def write_processed(results: Sequence[Dict[str, object]], output_dir: str,
+                    target_rms_dbfs: Optional[float] = None, flagged_only: bool = False) -> int:
+    """Write trimmed (and optionally normalised) copies as <output_dir>/<arena>/<target>.wav."""
+    written = 0
+    for r in results:
+        if r["error"] or (flagged_only and not r["flags"]):
+            continue
+        samples, frequency = decode_sound(r["path"])
+        processed = process_samples(samples, frequency, target_rms_dbfs)
+        write_wav(os.path.join(output_dir, r["arena"], f"{r['target']}.wav"), processed, frequency)
+        written += 1
+    return written
+
+
+def write_report(results: Sequence[Dict[str, object]], report_file: str):
+    with open(report_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch QA for target sounds (levels, silence, outliers)')
+    parser.add_argument('--sounds-dir', default=ARENAS_SOUNDS_DIR,
+                       help='Directory with <arena>/<target> sounds (default: sounds/arenas)')
+    parser.add_argument('--report', default='audio_qa_report.csv',
+                       help='CSV report to write (default: audio_qa_report.csv)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Decoder processes (default: one per CPU)')
+    parser.add_argument('--write-processed', metavar='DIR', default=None,
+                       help='Write trimmed WAV copies to DIR/<arena>/<target>.wav')
+    parser.add_argument('--target-rms', type=float, default=None,
+                       help='Also normalise processed copies to this RMS level in dBFS (e.g. -20)')
+    parser.add_argument('--flagged-only', action='store_true',
+                       help='Only write processed copies for flagged files')
+    args = parser.parse_args()
+
+    paths = find_target_sounds(args.sounds_dir)
+    if not paths:
+        print(f"No sounds found under {args.sounds_dir}")
+        return 1
+
+    print(f"Analysing {len(paths)} sounds...")
+    results = flag_outliers(analyze_all(paths, args.workers))
+    write_report(results, args.report)
+
+    flagged = [r for r in results if r["flags"]]
+    print(f"{'file':<28} {'dur s':>6} {'rms':>7} {'peak':>7} {'lead ms':>8} {'trail ms':>9}  flags")
+    for r in flagged:
+        name = f"{r['arena']}/{r['target']}"
+        if r["error"]:
+            print(f"{name:<28} {r['flags']}: {r['error']}")
+            continue
+        print(f"{name:<28} {r['duration_s']:>6.2f} {r['rms_dbfs']:>7.1f} {r['peak_dbfs']:>7.1f} "
+              f"{r['lead_silence_ms']:>8.0f} {r['trail_silence_ms']:>9.0f}  {r['flags']}")
+
+    lead = np.array([r["lead_silence_ms"] for r in results if not r["error"]])
+    if len(lead):
+        print(f"\nLeading silence: median {np.median(lead):.0f} ms, max {lead.max():.0f} ms")
+    print(f"{len(flagged)} of {len(results)} files flagged. Report saved to: {args.report}")
+
+    if args.write_processed:
+        written = write_processed(results, args.write_processed, args.target_rms, args.flagged_only)
+        print(f"Wrote {written} processed files to {args.write_processed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
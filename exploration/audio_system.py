@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Subsystem for fMRI Navigation Experiments
+Wraps pygame.mixer with selectable mixer profiles, a channel pool and timestamped play
+requests, so auditory feedback timing can be logged and measured.
+
+Timing fields recorded for every play request (all times from time.perf_counter):
+- request_time:  when the task asked for the sound
+- call_ms:       time spent inside Channel.play() (includes waiting on the mixer lock)
+- buffer_ms:     the profile's buffer period (nominal, not measured); the mixer first
+                 mixes the sound in its next callback, up to one period after the request
+
+pygame does not expose the mixer's sample position, so the onset is measured by the
+self-test instead: right after each request it plays a one-sample probe on another
+channel, which the mixer finishes (and stops) in the same callback that first mixes
+the sound; the time until that channel goes idle is the request-to-mix delay.
+
+Usage (latency self-test, runs on SDL's dummy audio driver by default):
+    python audio_system.py --self-test
+    python audio_system.py --self-test --profile low_latency --repeats 200
+"""
+
+import os
+import sys
+import csv
+import time
+import array
+import math
+import argparse
+import statistics
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Any
+
+# Mixer profiles. All profiles keep 44100 Hz 16-bit stereo so the PCM cache built by
+# audio_cache.py stays valid; they differ in buffer size (latency vs. underrun risk).
+MIXER_PROFILES = {
+    'standard': {'frequency': 44100, 'size': -16, 'channels': 2, 'buffer': 512},
+    'low_latency': {'frequency': 44100, 'size': -16, 'channels': 2, 'buffer': 256},
+    'minimal': {'frequency': 44100, 'size': -16, 'channels': 2, 'buffer': 128},
+    'safe': {'frequency': 44100, 'size': -16, 'channels': 2, 'buffer': 1024},
+}
+DEFAULT_PROFILE = os.getenv('AUDIO_PROFILE', 'standard')
+if DEFAULT_PROFILE not in MIXER_PROFILES:
+    DEFAULT_PROFILE = 'standard'
+
+# Audio devices to try (in order of preference) so all sounds go to the same output
+AUDIO_DEVICES_TO_TRY = [
+    "Outside (NVIDIA High Definition Audio)",
+    "Speakers (NVIDIA High Definition Audio)",
+    "Headphones (NVIDIA High Definition Audio)",
+    "Default Audio Device",
+    None  # Fallback to system default
+]
+
+AUDIO_LOG_FIELDS = ["RealTime", "role", "sound", "loops", "profile", "request_time",
+                    "call_ms", "buffer_ms"]
+
+
+def init_mixer(profile: str = DEFAULT_PROFILE, devices: Optional[Sequence[Optional[str]]] = None) -> Optional[str]:
+    """
+    Initialize pygame.mixer with a named profile, trying each device in turn.
+
+    Args:
+        profile: Key of MIXER_PROFILES
+        devices: Device names to try in order (None entry = system default).
+                 Defaults to AUDIO_DEVICES_TO_TRY.
+
+    Returns:
+        The device name that was opened (None for the system default)
+    """
+    import pygame
+    settings = MIXER_PROFILES[profile]
+    if devices is None:
+        devices = AUDIO_DEVICES_TO_TRY
+
+    for device in devices:
+        try:
+            if device:
+                pygame.mixer.init(devicename=device, **settings)
+                print(f"Audio mixer initialized with device: {device} (profile: {profile})")
+            else:
+                pygame.mixer.init(**settings)
+                print(f"Audio mixer initialized with system default device (profile: {profile})")
+            return device
+        except Exception as e:
+            print(f"Warning: Could not initialize audio with device '{device}': {e}")
+
+    print("Error: Could not initialize audio mixer with profile settings, using pygame defaults")
+    pygame.mixer.init()  # Last resort initialization
+    return None
+
+
+def buffer_latency_ms(profile: str) -> float:
+    """Return one mixer buffer period in milliseconds for a profile at the current mixer rate."""
+    import pygame
+    init = pygame.mixer.get_init()
+    frequency = init[0] if init else MIXER_PROFILES[profile]['frequency']
+    return 1000.0 * MIXER_PROFILES[profile]['buffer'] / frequency
+
+
+class PoolChannel:
+    """
+    One role's channel: plays on an idle mixer channel and keeps it while its sound plays.
+
+    Has the Channel methods the tasks use (play, get_busy, stop), so it can stand in for
+    a dedicated pygame Channel.
+    """
+
+    def __init__(self, role: str):
+        self.role = role
+        self._channel = None
+        self._sound = None
+
+    def play(self, sound, loops: int = 0):
+        """Replace this role's sound with sound, on an idle channel (one is added when all are busy)."""
+        import pygame
+        self.stop()
+        channel = pygame.mixer.find_channel()
+        if channel is None:
+            pygame.mixer.set_num_channels(pygame.mixer.get_num_channels() + 1)
+            channel = pygame.mixer.find_channel()
+        channel.play(sound, loops=loops)
+        self._channel, self._sound = channel, sound
+
+    def get_busy(self) -> bool:
+        """This role's sound is still playing (its channel may since play someone else's)."""
+        return (self._channel is not None and self._channel.get_busy()
+                and self._channel.get_sound() is self._sound)
+
+    def stop(self):
+        if self.get_busy():
+            self._channel.stop()
+        self._channel = self._sound = None
+
+
+class ChannelPool:
+    """
+    Named playback roles (e.g. 'beep', 'target') on the mixer's free channels.
+
+    Nothing is reserved: each play takes an idle channel with find_channel(), so sounds
+    started elsewhere with Sound.play() never cut off a role's sound, and a role's new
+    sound only ever replaces its own previous one.
+    """
+
+    def __init__(self, roles: Sequence[str]):
+        self.roles = list(roles)
+        self.channels = {role: PoolChannel(role) for role in self.roles}
+
+    def __getitem__(self, role: str) -> PoolChannel:
+        return self.channels[role]
+
+    def stop_all(self):
+        for channel in self.channels.values():
+            channel.stop()
+
+
+class AudioPlayer:
+    """Channel pool plus a timestamped record of every play request."""
+
+    def __init__(self, roles: Sequence[str] = ('beep', 'target'), profile: str = DEFAULT_PROFILE, clock=None):
+        self.profile = profile
+        self.clock = clock  # Task clock for RealTime (latencies always use perf_counter)
+        self.pool = ChannelPool(roles)
+        self.events: List[Dict[str, Any]] = []
+        self.buffer_ms = round(buffer_latency_ms(profile), 3)
+
+    def channel(self, role: str) -> PoolChannel:
+        """Return the channel of a role."""
+        return self.pool[role]
+
+    def is_busy(self, role: str) -> bool:
+        return self.pool[role].get_busy()
+
+    def play(self, role: str, sound, name: str = "", loops: int = 0) -> Dict[str, Any]:
+        """Play a sound on a role's channel (replacing whatever it was playing) and log the request."""
+        channel = self.pool[role]
+        request_time = time.perf_counter()
+        channel.play(sound, loops=loops)
+        call_end = time.perf_counter()
+
+        event = {
+            "RealTime": (self.clock.now() if self.clock else datetime.now()).strftime('%H:%M:%S.%f')[:-3],
+            "role": role,
+            "sound": name,
+            "loops": loops,
+            "profile": self.profile,
+            "request_time": round(request_time, 6),
+            "call_ms": round(1000.0 * (call_end - request_time), 3),
+            "buffer_ms": self.buffer_ms,
+        }
+        self.events.append(event)
+        return event
+
+    def stop(self, role: str):
+        self.pool[role].stop()
+
+    def stop_all(self):
+        self.pool.stop_all()
+
+    def save_events(self, filename: str, append: bool = False):
+        """Write the play-request log to CSV (appending keeps one header)."""
+        if not self.events:
+            return
+        needs_header = (not append) or (not os.path.exists(filename)) or os.path.getsize(filename) == 0
+        try:
+            with open(filename, 'a' if append else 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=AUDIO_LOG_FIELDS)
+                if needs_header:
+                    writer.writeheader()
+                writer.writerows(self.events)
+            print(f"Audio log saved to: {filename}")
+            self.events = []
+        except Exception as e:
+            print(f"Error saving audio log: {e}")
+
+
+def audio_log_filename(continuous_filename: str) -> str:
+    """Derive a task's audio log filename from its continuous log filename."""
+    return continuous_filename.replace('_continuous', '_audio')
+
+
+def _make_tone(frequency: int, channels: int, duration: float = 0.05, pitch: float = 1000.0):
+    """Create a short sine tone as a pygame Sound (16-bit)."""
+    import pygame
+    n_frames = int(frequency * duration)
+    samples = array.array('h')
+    for i in range(n_frames):
+        value = int(12000 * math.sin(2 * math.pi * pitch * i / frequency))
+        samples.extend([value] * channels)
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+
+def run_latency_self_test(profile: str, repeats: int = 100) -> Dict[str, float]:
+    """
+    Measure the play-request to first-mix delay for one mixer profile.
+
+    After each request a one-sample probe is played on a second channel; the mixer mixes
+    it, and stops that channel, in the callback that first mixes the tone.
+
+    Returns:
+        Summary statistics (ms) for call_ms and the onset (request to first mix), plus buffer_ms
+    """
+    import pygame
+    pygame.mixer.quit()
+    init_mixer(profile, [None])
+    player = AudioPlayer(roles=('test', 'probe'), profile=profile)
+    frequency, _, channels = pygame.mixer.get_init()
+    tone = _make_tone(frequency, channels)
+    probe = pygame.mixer.Sound(buffer=array.array('h', [0] * channels).tobytes())
+
+    onset_ms = []
+    for i in range(repeats):
+        event = player.play('test', tone, name='tone')
+        player.pool['probe'].play(probe)
+        # Spin until the mixer has consumed the probe so the onset has sub-millisecond resolution
+        deadline = time.perf_counter() + 0.5
+        while player.pool['probe'].get_busy() and time.perf_counter() < deadline:
+            pass
+        if not player.pool['probe'].get_busy():
+            onset_ms.append(1000.0 * (time.perf_counter() - event["request_time"]))
+        # Let the tone finish; the varying gap spreads the requests over the callback period
+        time.sleep(0.06 + 0.001 * (i * 7 % 25))
+
+    call_ms = [e["call_ms"] for e in player.events if e["role"] == 'test']
+    player.stop_all()
+    pygame.mixer.quit()
+
+    def p95(values):
+        return sorted(values)[int(0.95 * (len(values) - 1))] if values else float('nan')
+
+    return {
+        "profile": profile,
+        "buffer_ms": player.buffer_ms,
+        "call_median_ms": statistics.median(call_ms),
+        "call_p95_ms": p95(call_ms),
+        "call_max_ms": max(call_ms),
+        "onset_median_ms": statistics.median(onset_ms) if onset_ms else float('nan'),
+        "onset_p95_ms": p95(onset_ms),
+        "missed": repeats - len(onset_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audio subsystem latency self-test')
+    parser.add_argument('--self-test', action='store_true',
+                       help='Run the onset-latency self-test')
+    parser.add_argument('--profile', default='all',
+                       choices=['all'] + list(MIXER_PROFILES.keys()),
+                       help='Mixer profile to test (default: all)')
+    parser.add_argument('--repeats', type=int, default=100,
+                       help='Play requests per profile (default: 100)')
+    parser.add_argument('--real-device', action='store_true',
+                       help='Use the real audio device instead of the SDL dummy driver')
+    args = parser.parse_args()
+
+    if not args.self_test:
+        parser.print_help()
+        return 0
+
+    if not args.real_device:
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    profiles = list(MIXER_PROFILES.keys()) if args.profile == 'all' else [args.profile]
+    print(f"Audio latency self-test ({'real device' if args.real_device else 'SDL dummy driver'}), "
+          f"{args.repeats} requests per profile")
+    print("=" * 78)
+    print(f"{'profile':<12} {'buffer':>8} {'call med':>9} {'call p95':>9} {'call max':>9} "
+          f"{'onset med':>9} {'onset p95':>9} {'missed':>7}")
+    for profile in profiles:
+        r = run_latency_self_test(profile, args.repeats)
+        print(f"{profile:<12} {r['buffer_ms']:>8.2f} {r['call_median_ms']:>9.3f} {r['call_p95_ms']:>9.3f} "
+              f"{r['call_max_ms']:>9.3f} {r['onset_median_ms']:>9.3f} {r['onset_p95_ms']:>9.3f} {r['missed']:>7}")
+    print("=" * 78)
+    print("All values in ms. onset: request to the mixer's first mix of the sound (measured);")
+    print("buffer: the profile's buffer period (nominal). A real device adds its own output latency.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Button-Box Input for the Navigation Tasks
+Consumes pygame's event queue with task-clock timestamps and keeps the exact pressed
+intervals of the MRI button-box keys (7/8/9/0), so movement can be integrated over the
+time each key was actually down within a frame instead of over whole frames.
+
+pygame does not expose SDL's event timestamps, so events are stamped when they are
+taken off the queue. The game loops pass pump() to clock.tick(), which then polls the
+queue every millisecond while it waits for the frame cap; onsets are therefore exact to
+about 1 ms instead of one frame, and a press shorter than a frame still moves the
+avatar for as long as it lasted. A clock that did not pump while its frame passed (no
+idle support) leaves the events to frame(), which stamps them at the frame's start: the
+press then counts for the whole frame in which it arrived rather than for none of it.
+A tap whose press and release come off the queue together (between two pumps, or
+anywhere in an unpumped frame) is credited with the whole interval the batch covers,
+so it still counts as pressed for its frame and its release has a duration.
+
+Every press and release of a button-box key is logged with its onset (task clock) to
+the task's _buttons.csv file for the fMRI analysis:
+- time:        onset in seconds since the epoch (same clock as TRIGGER_RECEIVED_TIME)
+- action:      press or release
+- duration_ms: how long the key was held (on release)
+
+A game loop also describes what it shows each frame with show() (phase, player and
+target positions, ...). Sessions have no observers, so this costs nothing; a simulated
+participant (synthetic_participant.py) registers in ButtonBox.observers to see the
+screen it answers.
+
+Usage (in a game loop):
+    button_box.reset()
+    while running:
+        dt = clock.tick(60, idle=button_box.pump) / 1000.0
+        for event in button_box.frame():
+            ...
+        if button_box[pygame.K_8]:
+            distance = MOVE_SPEED * button_box.held(pygame.K_8)
+        ...
+        button_box.show(phase=phase, player_pos=player_pos, player_angle=player_angle)
+"""
+
+import os
+import csv
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pygame
+
+# MRI button-box keys and what they do in the tasks
+BUTTON_KEYS = {
+    pygame.K_7: 'rotate_left',
+    pygame.K_8: 'forward',
+    pygame.K_9: 'backward',
+    pygame.K_0: 'rotate_right',
+}
+
+BUTTON_LOG_FIELDS = ["RealTime", "time", "key", "button", "action", "duration_ms"]
+
+
+class ButtonBox:
+    """Timestamped key events and pressed intervals of the button-box keys."""
+
+    # Followers of the game loops: observer.loop_started() on every reset() and
+    # observer.screen_shown(screen) with the keywords of every show()
+    observers: List[Any] = []
+
+    def __init__(self, clock, keys: Dict[int, str] = BUTTON_KEYS):
+        self.clock = clock
+        self.keys = dict(keys)
+        self.events: List[Dict[str, Any]] = []
+        self._queue: List[Tuple[float, Any]] = []   # (time taken off the queue, event)
+        self._down: Dict[int, float] = {}           # key -> press time, for keys held now
+        self._held = {key: 0.0 for key in self.keys}
+        self._frame_start = clock.time()
+        self._last_take = self._frame_start          # When the queue was last read
+        self._pumped = False                         # pump() ran since the last frame()
+
+    def reset(self):
+        """Start a new game loop: drop queued events and take held keys from pygame."""
+        self._queue = []
+        self._frame_start = self.clock.time()
+        pressed = pygame.key.get_pressed()
+        self._down = {key: self._frame_start for key in self.keys if pressed[key]}
+        self._held = {key: 0.0 for key in self.keys}
+        self._last_take = self._frame_start
+        self._pumped = False
+        for observer in self.observers:
+            observer.loop_started()
+
+    def show(self, **screen):
+        """Describe what the game loop shows this frame (phase, positions, ...) to the observers."""
+        for observer in self.observers:
+            observer.screen_shown(screen)
+
+    def pump(self):
+        """Take pending events off pygame's queue and timestamp them (pass to clock.tick as idle)."""
+        now = self.clock.time()
+        self._take(now, self._last_take, now)
+        self._pumped = True
+
+    def _take(self, stamp: float, since: float, until: float):
+        """
+        Queue pending events stamped at stamp. They arrived between since and until; a
+        press released in the same batch is stamped since and its release until.
+        """
+        events = pygame.event.get()
+        self._last_take = until
+        for i, event in enumerate(events):
+            key = getattr(event, 'key', None)
+            at = stamp
+            if key in self.keys and event.type in (pygame.KEYDOWN, pygame.KEYUP):
+                later = [e.type for e in events[i + 1:] if getattr(e, 'key', None) == key]
+                earlier = [e.type for e in events[:i] if getattr(e, 'key', None) == key]
+                if event.type == pygame.KEYDOWN and later[:1] == [pygame.KEYUP]:
+                    at = since
+                elif event.type == pygame.KEYUP and earlier[-1:] == [pygame.KEYDOWN]:
+                    at = until
+            self._queue.append((at, event))
+
+    def frame(self) -> list:
+        """
+        End the current frame: update the pressed intervals from its events.
+
+        Returns:
+            The frame's events in order, for the loop's usual event handling
+        """
+        frame_end = self.clock.time()
+        # Unpumped frame: the events arrived at some point of it, so count them from its start
+        if self._pumped:
+            self._take(frame_end, self._last_take, frame_end)
+        else:
+            self._take(self._frame_start, self._frame_start, frame_end)
+        self._pumped = False
+        held = {key: 0.0 for key in self.keys}
+        for stamp, event in self._queue:
+            key = getattr(event, 'key', None)
+            if key not in self.keys:
+                continue
+            if event.type == pygame.KEYDOWN and key not in self._down:
+                self._down[key] = stamp
+                self._log(stamp, key, 'press')
+            elif event.type == pygame.KEYUP and key in self._down:
+                pressed = self._down.pop(key)
+                held[key] += stamp - max(pressed, self._frame_start)
+                self._log(stamp, key, 'release', stamp - pressed)
+        for key, pressed in self._down.items():
+            held[key] += frame_end - max(pressed, self._frame_start)
+        self._held = held
+        self._frame_start = frame_end
+        events = [event for _, event in self._queue]
+        self._queue = []
+        return events
+
+    def held(self, key: int) -> float:
+        """Seconds the key was down during the last frame."""
+        return self._held.get(key, 0.0)
+
+    def __getitem__(self, key: int) -> bool:
+        """Key is down or was pressed during the last frame (get_pressed() for other keys)."""
+        if key in self.keys:
+            return key in self._down or self._held[key] > 0
+        return bool(pygame.key.get_pressed()[key])
+
+    def _log(self, stamp: float, key: int, action: str, duration: Optional[float] = None):
+        self.events.append({
+            "RealTime": datetime.fromtimestamp(stamp).strftime('%H:%M:%S.%f')[:-3],
+            "time": round(stamp, 6),
+            "key": pygame.key.name(key),
+            "button": self.keys[key],
+            "action": action,
+            "duration_ms": "" if duration is None else round(1000.0 * duration, 3),
+        })
+
+    def save_events(self, filename: str, append: bool = False):
+        """Write the press/release log to CSV (appending keeps one header)."""
+        if not self.events:
+            return
+        needs_header = (not append) or (not os.path.exists(filename)) or os.path.getsize(filename) == 0
+        try:
+            with open(filename, 'a' if append else 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=BUTTON_LOG_FIELDS)
+                if needs_header:
+                    writer.writeheader()
+                writer.writerows(self.events)
+            print(f"Button log saved to: {filename}")
+            self.events = []
+        except Exception as e:
+            print(f"Error saving button log: {e}")
+
+
+def button_log_filename(continuous_filename: str) -> str:
+    """Derive a task's button log filename from its continuous log filename."""
+    return continuous_filename.replace('_continuous', '_buttons')
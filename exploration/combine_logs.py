@@ -1,125 +1,344 @@
 #!/usr/bin/env python3
 """
-Script to combine all multi-arena log files into single files
+Script to combine per-arena / per-trial log files into single files
+
+Inputs are merged chunk by chunk (memory stays bounded by CHUNK_ROWS rows, however
+long the session), ordered by trial number (fMRI logs) or by the first logged RealTime
+(practice arenas), unwrapped across midnight so a session that runs past 00:00 keeps
+its order. File modification time only orders parts that logged no RealTime.
+
+Combining is idempotent and resumable:
+- The combined file is written to a .partial file, its row count is checked against
+  the inputs, and only then is it moved into place (and, with --delete-inputs, are the
+  inputs deleted).
+- A small state file next to the output records which inputs went into it, so kept
+  inputs (the default) or an interrupted run are not merged twice. A combined file from
+  an earlier run is kept first and any new inputs are appended to it.
+
+Groups:
+- Multi-arena practice: {SubID}_multi_arena_practice_{continuous,discrete}_log_<arena>.csv
+  -> {SubID}_multi_arena_practice_{continuous,discrete}_log.csv
+- fMRI runs (same output names as combine_session_data.m):
+  {SubID}_{OT,FA}_{ot,fa,snake}<n>_{continuous,discrete}.csv -> {SubID}_{OT,FA}_{ot,fa,snake}_{...}.csv
+
+Usage:
+    python combine_logs.py TS263                 # multi-arena practice logs
+    python combine_logs.py TS263 --fmri          # fMRI logs only (combine_session_data.m does this too)
+    python combine_logs.py TS263 --all --delete-inputs --results-dir Results
 """
 
-import pandas as pd
 import os
-import glob
-import time
+import re
+import sys
+import json
+import argparse
+
+import pandas as pd
+
+CHUNK_ROWS = 50000
+KINDS = ("continuous", "discrete")
+FMRI_RUNS = {"OT": ("ot", "snake"), "FA": ("fa", "snake")}
+STATE_SUFFIX = ".combine.json"
+SECONDS_PER_DAY = 24 * 3600
+
+
+class CombineError(RuntimeError):
+    """Raised when a combined file does not contain every input row."""
+
+
+def practice_group(participant_id):
+    """
+    (label, {kind: (input regex, output filename)}, fill_round_name) for the multi-arena
+    practice logs; the arena name in the filename fills a missing RoundName column.
+    """
+    pid = re.escape(participant_id)
+    return ("multi-arena practice", {
+        kind: (re.compile(rf"^{pid}_multi_arena_practice_{kind}_log_(?P<part>.+)\.csv$"),
+               f"{participant_id}_multi_arena_practice_{kind}_log.csv")
+        for kind in KINDS
+    }, True)
+
+
+def fmri_groups(participant_id):
+    """Groups for the fMRI OT/FA trial logs, one per (run, trial type)."""
+    pid = re.escape(participant_id)
+    groups = []
+    for run_code, trial_codes in FMRI_RUNS.items():
+        for trial_code in trial_codes:
+            groups.append((f"{run_code} {trial_code} trials", {
+                kind: (re.compile(rf"^{pid}_{run_code}_{trial_code}(?P<part>\d+)_{kind}\.csv$"),
+                       f"{participant_id}_{run_code}_{trial_code}_{kind}.csv")
+                for kind in KINDS
+            }, False))
+    return groups
+
+
+def read_header(path):
+    """Column names of a CSV log (first line only)."""
+    return list(pd.read_csv(path, encoding='utf-8-sig', nrows=0, dtype=str).columns)
+
+
+def iter_chunks(path):
+    """Rows of a CSV log as strings (values are copied through unchanged), CHUNK_ROWS at a time."""
+    return pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS)
+
+
+def count_rows(path):
+    return sum(len(chunk) for chunk in iter_chunks(path))
+
+
+def first_real_time(path):
+    """First non-empty RealTime (HH:MM:SS.fff) in a log, or None (discrete logs have none)."""
+    if "RealTime" not in read_header(path):
+        return None
+    for chunk in iter_chunks(path):
+        times = chunk["RealTime"][chunk["RealTime"].str.strip() != ""]
+        if len(times):
+            return times.iloc[0]
+    return None
+
+
+def clock_seconds(real_time):
+    """Seconds since midnight of a RealTime value (HH:MM:SS.fff), or None."""
+    try:
+        hours, minutes, seconds = real_time.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+def order_inputs(inputs, part_times):
+    """
+    Order one kind of input files for merging.
+
+    Sorts by trial number (fMRI parts are numbers), then by the first logged RealTime of the
+    part (practice parts are arena names; a discrete log uses its continuous partner's).
+    RealTime is counted from the start of the session (the time after the largest gap around
+    the clock), so 00:05 sorts after 23:55 of the same session. Parts without a RealTime go
+    last, by file modification time.
+
+    Args:
+        inputs: {path: part}
+        part_times: {part: first RealTime or None}
+    """
+    mtimes = {path: os.path.getmtime(path) for path in inputs}
+    seconds = {part: clock_seconds(real_time) for part, real_time in part_times.items()}
+    logged = sorted(s for s in seconds.values() if s is not None)
+    reference = 0.0
+    if logged:
+        gaps = [(logged[i] - logged[i - 1]) % SECONDS_PER_DAY for i in range(len(logged))]
+        reference = logged[max(range(len(logged)), key=gaps.__getitem__)]
+
+    def key(path):
+        part = inputs[path]
+        trial = int(part) if part.isdigit() else float('inf')
+        first = seconds.get(part)
+        if first is None:
+            return (trial, 1, mtimes[path])
+        return (trial, 0, (first - reference) % SECONDS_PER_DAY)
+
+    return sorted(inputs, key=key)
+
+
+def _file_info(path):
+    stat = os.stat(path)
+    return {"name": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _info_key(info):
+    return (info["name"], info["size"], info["mtime_ns"])
 
-def combine_all_multi_arena_logs(participant_id, results_dir):
-    """Combine all multi-arena log files into single files."""
-    
+
+def _load_state(output_path):
+    try:
+        with open(output_path + STATE_SUFFIX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(output_path, state):
+    tmp_path = output_path + STATE_SUFFIX + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, output_path + STATE_SUFFIX)
+
+
+def _clear_state(output_path):
+    if os.path.exists(output_path + STATE_SUFFIX):
+        os.remove(output_path + STATE_SUFFIX)
+
+
+def _already_merged(output_path, inputs):
+    """
+    Inputs recorded as merged by an earlier run that stopped before deleting them.
+
+    The record is only trusted when the output on disk is the file that run wrote.
+    """
+    state = _load_state(output_path)
+    if not state or not os.path.exists(output_path):
+        return []
+    if os.path.getsize(output_path) != state.get("output_size"):
+        return []
+    recorded = {_info_key(info) for info in state.get("inputs", [])}
+    return [path for path in inputs if _info_key(_file_info(path)) in recorded]
+
+
+def merge_files(sources, output_path, add_round_name=None):
+    """
+    Stream sources (in order) into output_path + '.partial' and verify the row count.
+
+    Args:
+        sources: Paths to merge
+        add_round_name: Optional {path: RoundName} filled in for files without that column
+
+    Returns:
+        (partial path, {path: rows}) -- the partial file is not moved into place here
+    """
+    columns = []
+    headers = {}
+    for path in sources:
+        headers[path] = read_header(path)
+        for col in headers[path]:
+            if col not in columns:
+                columns.append(col)
+    if add_round_name and "RoundName" not in columns:
+        columns.append("RoundName")
+
+    partial_path = output_path + '.partial'
+    rows = {}
+    with open(partial_path, 'w', newline='', encoding='utf-8-sig') as out:
+        pd.DataFrame(columns=columns).to_csv(out, index=False)
+        for path in sources:
+            rows[path] = 0
+            for chunk in iter_chunks(path):
+                if add_round_name and "RoundName" not in headers[path]:
+                    chunk["RoundName"] = add_round_name.get(path, "")
+                chunk.reindex(columns=columns, fill_value="").to_csv(out, index=False, header=False)
+                rows[path] += len(chunk)
+
+    written = count_rows(partial_path)
+    if written != sum(rows.values()):
+        os.remove(partial_path)
+        raise CombineError(f"{os.path.basename(output_path)}: wrote {written} rows, expected {sum(rows.values())}")
+    return partial_path, rows
+
+
+def combine_group(subid_dir, label, patterns, fill_round_name=False, delete_inputs=False, dry_run=False):
+    """
+    Combine one group's continuous and discrete logs.
+
+    Returns:
+        Number of input files handled (0 if there was nothing to do)
+    """
+    found = {}
+    for kind, (pattern, _) in patterns.items():
+        found[kind] = {}
+        for filename in sorted(os.listdir(subid_dir)):
+            match = pattern.match(filename)
+            if match:
+                found[kind][os.path.join(subid_dir, filename)] = match.group("part")
+    if not any(found.values()):
+        return 0
+
+    print(f"\n--- {label} ---")
+    merged_count = 0
+    part_times = {}
+    for kind in KINDS:  # continuous first, so discrete logs can be ordered by their partner's time
+        inputs = found[kind]
+        output_path = os.path.join(subid_dir, patterns[kind][1])
+        if kind == "continuous":
+            part_times = {part: first_real_time(path) for path, part in inputs.items()}
+        if not inputs:
+            continue
+
+        # Inputs already in the output (kept inputs, or left by an interrupted run)
+        done = _already_merged(output_path, list(inputs))
+        if done:
+            print(f"  {len(done)} {kind} files were already combined into {os.path.basename(output_path)}")
+            for path in done:
+                inputs.pop(path)
+            merged_count += len(done)
+            if delete_inputs and not dry_run:
+                for path in done:
+                    os.remove(path)
+                done = []
+        if not inputs:
+            if delete_inputs and not dry_run:
+                _clear_state(output_path)
+            continue
+
+        ordered = order_inputs(inputs, part_times)
+        sources = ([output_path] if os.path.exists(output_path) else []) + ordered
+        print(f"  Combining {len(ordered)} {kind} files into {os.path.basename(output_path)} (in session order):")
+        for path in sources:
+            print(f"    {os.path.basename(path)}")
+        if dry_run:
+            continue
+
+        partial_path, rows = merge_files(sources, output_path, inputs if fill_round_name else None)
+        _save_state(output_path, {"inputs": [_file_info(p) for p in done + ordered],
+                                  "output_size": os.path.getsize(partial_path)})
+        os.replace(partial_path, output_path)
+        print(f"  [OK] {sum(rows.values())} rows saved: {output_path}")
+
+        # The state file stays while inputs are kept, so they are not merged again next time
+        if delete_inputs:
+            for path in ordered:
+                os.remove(path)
+            print(f"  [OK] Deleted {len(ordered)} individual files")
+            _clear_state(output_path)
+        merged_count += len(ordered)
+    return merged_count
+
+
+def combine_participant_logs(participant_id, results_dir, practice=True, fmri=False,
+                             delete_inputs=False, dry_run=False):
+    """Combine a participant's practice and/or fMRI logs; returns the number of files merged."""
     subid_dir = os.path.join(results_dir, participant_id)
     if not os.path.exists(subid_dir):
         print(f"Warning: SubID directory not found: {subid_dir}")
-        return
-    
-    # Find all multi-arena continuous log files
-    continuous_pattern = os.path.join(subid_dir, f"{participant_id}_multi_arena_practice_continuous_log_*.csv")
-    continuous_files = glob.glob(continuous_pattern)
-    
-    # Find all multi-arena discrete log files
-    discrete_pattern = os.path.join(subid_dir, f"{participant_id}_multi_arena_practice_discrete_log_*.csv")
-    discrete_files = glob.glob(discrete_pattern)
-    
-    # Sort files by creation time to preserve temporal order
-    continuous_files.sort(key=lambda x: os.path.getctime(x))
-    discrete_files.sort(key=lambda x: os.path.getctime(x))
-    
-    if not continuous_files and not discrete_files:
-        print("No multi-arena log files found to combine.")
-        return
-    
-    print(f"Found {len(continuous_files)} continuous log files and {len(discrete_files)} discrete log files to combine.")
-    print("Files will be combined in temporal order (by creation time):")
-    for i, file_path in enumerate(continuous_files, 1):
-        filename = os.path.basename(file_path)
-        creation_time = os.path.getctime(file_path)
-        print(f"  {i}. {filename} (created: {time.ctime(creation_time)})")
-    
-    # Combine continuous logs
-    combined_continuous = []
-    for file_path in continuous_files:
-        try:
-            # Read the arena-specific continuous log with UTF-8 encoding
-            arena_data = pd.read_csv(file_path, encoding='utf-8-sig')
-            
-            # Add RoundName column if it doesn't exist
-            if 'RoundName' not in arena_data.columns:
-                # Extract arena name from filename
-                filename = os.path.basename(file_path)
-                parts = filename.split('_')
-                
-                # Find the arena name - it's the last part after 'log'
-                arena_name = ''
-                for i, part in enumerate(parts):
-                    if part == 'log':
-                        if i + 1 < len(parts):
-                            arena_name = parts[i + 1].replace('.csv', '')
-                        break
-                
-                # If we couldn't find it, use the last part as fallback
-                if not arena_name and parts:
-                    arena_name = parts[-1].replace('.csv', '')
-                
-                # Create RoundName column
-                arena_data['RoundName'] = arena_name
-            
-            combined_continuous.append(arena_data)
-            print(f"  Added: {os.path.basename(file_path)}")
-            
-        except Exception as e:
-            print(f"Warning: Could not read continuous log file {file_path}: {e}")
-    
-    # Combine discrete logs
-    combined_discrete = []
-    for file_path in discrete_files:
-        try:
-            # Read the arena-specific discrete log with UTF-8 encoding
-            arena_data = pd.read_csv(file_path, encoding='utf-8-sig')
-            combined_discrete.append(arena_data)
-            print(f"  Added: {os.path.basename(file_path)}")
-            
-        except Exception as e:
-            print(f"Warning: Could not read discrete log file {file_path}: {e}")
-    
-    # Save combined files with UTF-8 encoding
-    if combined_continuous:
-        combined_continuous_df = pd.concat(combined_continuous, ignore_index=True)
-        combined_continuous_filename = os.path.join(subid_dir, f"{participant_id}_multi_arena_practice_continuous_log.csv")
-        
-        # Columns are already in correct order from multi_arena.py: RealTime, trial_time, trial, RoundName, visibility, phase, event, x, y, rotation_angle
-        combined_continuous_df.to_csv(combined_continuous_filename, index=False, encoding='utf-8-sig')
-        print(f"[OK] Combined continuous log saved: {combined_continuous_filename}")
-    
-    if combined_discrete:
-        combined_discrete_df = pd.concat(combined_discrete, ignore_index=True)
-        combined_discrete_filename = os.path.join(subid_dir, f"{participant_id}_multi_arena_practice_discrete_log.csv")
-        combined_discrete_df.to_csv(combined_discrete_filename, index=False, encoding='utf-8-sig')
-        print(f"[OK] Combined discrete log saved: {combined_discrete_filename}")
-    
-    # Delete individual arena files after successful combination
-    if combined_continuous and combined_discrete:
-        print("\nDeleting individual arena files...")
-        for file_path in continuous_files:
-            os.remove(file_path)
-            print(f"  Deleted: {os.path.basename(file_path)}")
-        for file_path in discrete_files:
-            os.remove(file_path)
-            print(f"  Deleted: {os.path.basename(file_path)}")
-        print("[OK] All individual arena files deleted.")
+        return 0
+
+    groups = ([practice_group(participant_id)] if practice else []) + (fmri_groups(participant_id) if fmri else [])
+    total = sum(combine_group(subid_dir, label, patterns, fill_round_name, delete_inputs, dry_run)
+                for label, patterns, fill_round_name in groups)
+    if total == 0 and not dry_run:
+        print("No log files found to combine.")
+    return total
+
+
+def combine_all_multi_arena_logs(participant_id, results_dir, delete_inputs=False):
+    """Combine all multi-arena practice log files into single files."""
+    return combine_participant_logs(participant_id, results_dir, practice=True, fmri=False,
+                                    delete_inputs=delete_inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Combine per-arena and per-trial log files')
+    parser.add_argument('participant_id', nargs='?', default='test',
+                       help='Participant ID (default: test)')
+    parser.add_argument('--results-dir', default=os.getenv('CENTRALIZED_RESULTS_DIR') or r'U:\sunt\Navigation\fMRI\Results',
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR)')
+    parser.add_argument('--fmri', action='store_true', help='Only the fMRI OT/FA logs instead of the practice logs')
+    parser.add_argument('--all', action='store_true', help='Both the practice and the fMRI OT/FA logs')
+    parser.add_argument('--delete-inputs', action='store_true',
+                        help='Delete the individual files once the combined file is verified')
+    parser.add_argument('--dry-run', action='store_true', help='Only list what would be combined')
+    args = parser.parse_args()
+
+    print(f"Combining log files for participant: {args.participant_id}")
+    print(f"Results directory: {args.results_dir}")
+
+    try:
+        combine_participant_logs(args.participant_id, args.results_dir, args.all or not args.fmri, args.all or args.fmri,
+                                 delete_inputs=args.delete_inputs, dry_run=args.dry_run)
+    except CombineError as e:
+        print(f"Error: {e} -- no input files were deleted")
+        return 1
 
-if __name__ == "__main__":
-    # Set parameters
-    participant_id = 'test'
-    results_dir = r'U:\sunt\Navigation\fMRI\Results'
-    
-    print(f"Combining multi-arena log files for participant: {participant_id}")
-    print(f"Results directory: {results_dir}")
-    
-    # Run the combination function
-    combine_all_multi_arena_logs(participant_id, results_dir)
-    
     print("Combination complete!")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
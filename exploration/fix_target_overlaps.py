@@ -5,10 +5,10 @@ Fix target overlaps by replacing overlapping targets with unique ones.
 
 import random
 import math
-import csv
 import os
 import sys
-from generate_target_locations import generate_target_locations
+from layout_optimizer import optimize_layouts
+from arena_registry import format_coords, write_arena_csv
 
 # Dor's overlapping targets (to avoid)
 DOR_OVERLAPPING_TARGETS = [
@@ -150,25 +150,24 @@ def generate_final_arenas_csv():
     # Create the final arenas list
     final_arenas_data = []
     
+    # Generate 5 target locations per arena, balanced in difficulty across arenas
+    layouts, _ = optimize_layouts(FINAL_ARENAS, num_targets=5, min_distance=0.3)
+    
     for arena_name in FINAL_ARENAS:
-        # Generate 5 target locations for this arena
-        locations = generate_target_locations(5, min_distance=0.3)
+        locations = layouts[arena_name]
         targets = FINAL_ARENA_TARGETS[arena_name]
         
         # Add each target with its location
         for i, target in enumerate(targets):
             x, y = locations[i]
             # Format coordinates as in the original CSV: "(x; y)"
-            coords = f"({x:.2f}; {y:.2f})"
+            coords = format_coords(x, y)
             hebrew_name = FINAL_HEBREW_NAMES.get(target, target)
             final_arenas_data.append([arena_name, target, coords, hebrew_name])
     
     # Write to CSV file
     output_file = "Final_New_Arenas.csv"
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["theme", "target", "coords", "hebrew_name"])  # Header
-        writer.writerows(final_arenas_data)
+    write_arena_csv(output_file, final_arenas_data)
     
     print(f"Generated {output_file} with {len(final_arenas_data)} targets across {len(FINAL_ARENAS)} arenas")
     return final_arenas_data
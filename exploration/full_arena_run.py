@@ -13,12 +13,11 @@ Configuration based on run number:
 Usage: python full_arena_run.py --participant PARTICIPANT_ID --run RUN_NUMBER
 """
 
-import subprocess
 import sys
 import os
-import time
 import argparse
 from datetime import datetime
+from task_clock import make_clock, add_clock_arguments
 
 # ---------------------------
 # STANDARDIZED FIXATION CROSS FORMAT:
@@ -33,6 +32,7 @@ from datetime import datetime
 
 # Constants
 TR = 2.01  # TR in seconds
+clock = None  # Task clock (see task_clock.py), created in main()
 
 def get_unique_filename(base_filename, participant_id):
     """Generate a unique filename by adding suffix if file exists."""
@@ -71,7 +71,7 @@ def run_trial(trial_number, trial_type, participant_id, run_number, total_trials
     print(f"TRIAL {trial_number}/{total_trials}: {trial_type.upper()}")
     print(f"{'='*60}")
     
-    trial_start_time = time.time()
+    trial_start_time = clock.time()
     
     # Determine which script to run
     if trial_type == "snake":
@@ -108,9 +108,9 @@ def run_trial(trial_number, trial_type, participant_id, run_number, total_trials
     
     try:
         # Run the trial
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = clock.run(cmd, capture_output=True, text=True)
         
-        trial_end_time = time.time()
+        trial_end_time = clock.time()
         trial_duration = trial_end_time - trial_start_time
         
         print(f"Trial end time: {datetime.fromtimestamp(trial_end_time).strftime('%H:%M:%S.%f')[:-3]}")
@@ -132,7 +132,7 @@ def run_trial(trial_number, trial_type, participant_id, run_number, total_trials
         
     except Exception as e:
         print(f"ERROR running {trial_type} trial: {e}")
-        trial_end_time = time.time()
+        trial_end_time = clock.time()
         trial_duration = trial_end_time - trial_start_time
         
         return {
@@ -200,7 +200,7 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
     print(f"Note: Trial durations are randomized by individual scripts")
     print(f"{'='*80}")
     
-    block_start_time = time.time()
+    block_start_time = clock.time()
     
     trial_results = []
     next_multi_idx = 0
@@ -225,9 +225,9 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
         
         # Small delay between trials to ensure clean separation
         if trial_number < TOTAL_TRIALS:
-            time.sleep(0.1)
+            clock.sleep(0.1)
     
-    block_end_time = time.time()
+    block_end_time = clock.time()
     block_duration = block_end_time - block_start_time
     
     # Print summary
@@ -322,7 +322,7 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
         WHITE = (255, 255, 255)
         
         # 1. TR alignment fixation (if needed)
-        current_time = time.time()
+        current_time = clock.time()
         trigger_received_time = os.getenv('TRIGGER_RECEIVED_TIME')
         
         if trigger_received_time:
@@ -336,8 +336,8 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
                 print(f'TR alignment: Waiting {wait_time:.2f} seconds for TR alignment...')
                 
                 # Show TR alignment fixation
-                start_time = time.time()
-                while time.time() - start_time < wait_time:
+                start_time = clock.time()
+                while clock.time() - start_time < wait_time:
                     screen.fill(BACKGROUND_COLOR)
                     game_surface.fill(BACKGROUND_COLOR)
                     
@@ -350,6 +350,7 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
                     game_surface.blit(fixation_text, text_rect)
                     screen.blit(game_surface, (offset_x, offset_y))
                     pygame.display.flip()
+                    clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                     
                     # Check for ESC key to exit
                     for event in pygame.event.get():
@@ -367,8 +368,8 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
         print(f'Showing 4 TRs final fixation before finish screen...')
         final_fixation_duration = 4 * TR
         
-        start_time = time.time()
-        while time.time() - start_time < final_fixation_duration:
+        start_time = clock.time()
+        while clock.time() - start_time < final_fixation_duration:
             screen.fill(BACKGROUND_COLOR)
             game_surface.fill(BACKGROUND_COLOR)
             
@@ -381,6 +382,7 @@ def run_full_arena_run(participant_id, run_number, screen_number=None):
             game_surface.blit(fixation_text, text_rect)
             screen.blit(game_surface, (offset_x, offset_y))
             pygame.display.flip()
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             
             # Check for ESC key to exit
             for event in pygame.event.get():
@@ -443,6 +445,7 @@ def save_timing_log(filename, block_start_time, trial_results):
 
 def main():
     """Main function to parse arguments and run the block."""
+    global clock
     
     parser = argparse.ArgumentParser(description='Full Arena Block Wrapper')
     parser.add_argument('--participant', '-p', required=True,
@@ -452,7 +455,9 @@ def main():
     parser.add_argument('--screen', '-s', type=int, default=None,
                        help='Screen number to display on (default: None, uses fullscreen)')
     
+    add_clock_arguments(parser)
     args = parser.parse_args()
+    clock = make_clock(args.clock, args.clock_speed)
     
     # Change to the exploration directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -3,19 +3,25 @@
 Hebrew TTS Audio Generator using Edge TTS
 Generates MP3 audio files for Hebrew words from Final111_New_Arenas.csv
 Uses Edge TTS with female Hebrew voice
-Plays each sound for validation and allows regeneration with context
 Supports custom sentences for problematic words
-ONLY PROCESSES PROBLEMATIC WORDS - skips verified words
+
+Generation runs concurrently through tts_pipeline.py and skips every word whose
+(text, voice, sentence) has not changed. Newly generated files go to a review queue:
+    python generate_hebrew_audio.py              # generate changed/missing words
+    python generate_hebrew_audio.py --review     # play queued files for y/n/r/s validation
+    python generate_hebrew_audio.py --backend stub --output-dir /tmp/tts_test   # offline test
 """
 
 import os
-import csv
+import sys
 import time
 import asyncio
-import edge_tts
+import argparse
 import subprocess
 import pygame
-from pathlib import Path
+from arena_registry import load_registry
+from tts_pipeline import (BACKENDS, DEFAULT_CONCURRENCY, TTS_CACHE_DIR, TTSJob, TTSPipeline,
+                          choose_sentence, job_key)
 
 # Edge TTS Hebrew female voice
 HEBREW_VOICE = "he-IL-HilaNeural"
@@ -85,63 +91,15 @@ def play_audio_file(file_path):
         return False
 
 def load_arena_data():
-    """Load arena data from CSV file."""
-    arenas = {}
+    """Load arena data from CSV file via the arena registry."""
     arena_file = os.path.join(os.path.dirname(__file__), "Final111_New_Arenas.csv")
+    registry = load_registry(arena_file, with_sounds=False)
     
-    if not os.path.exists(arena_file):
+    if not registry:
         print(f"Error: Arena file not found: {arena_file}")
         return {}
     
-    with open(arena_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip the header row
-        for row in reader:
-            if len(row) >= 5:
-                theme, target_name, coords, hebrew_name, hebrew_theme = row
-                if theme not in arenas:
-                    arenas[theme] = {}
-                arenas[theme][target_name] = hebrew_name
-    
-    return arenas
-
-async def generate_hebrew_audio_edge_tts(hebrew_text, output_path, use_context=False, custom_sentence=None):
-    """Generate Hebrew TTS audio file using Edge TTS."""
-    try:
-        if custom_sentence:
-            print(f"  Generating with custom sentence: '{custom_sentence}'")
-            text_to_speak = custom_sentence
-        elif use_context:
-            # Create a sentence with context for better pronunciation
-            context_text = f"זה {hebrew_text}"
-            print(f"  Generating with context: '{context_text}'")
-            text_to_speak = context_text
-        else:
-            print(f"  Generating: {hebrew_text}")
-            text_to_speak = hebrew_text
-        
-        # Create Edge TTS communicate object
-        communicate = edge_tts.Communicate(text_to_speak, HEBREW_VOICE)
-        
-        # Generate the audio file
-        await communicate.save(output_path)
-        
-        # Verify file was created and has reasonable size
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            if file_size > 1000:  # Should be larger than placeholder files
-                print(f"✓ Generated: {output_path} ({file_size} bytes)")
-                return True
-            else:
-                print(f"✗ Generated file too small: {output_path} ({file_size} bytes)")
-                return False
-        else:
-            print(f"✗ Failed to create file: {output_path}")
-            return False
-            
-    except Exception as e:
-        print(f"✗ Error generating audio for '{hebrew_text}': {e}")
-        return False
+    return {theme: spec.hebrew_lookup() for theme, spec in registry.items()}
 
 def check_edge_tts_installation():
     """Check if edge-tts is installed and working."""
@@ -188,123 +146,137 @@ async def validate_audio(file_path, target_name, hebrew_name):
         else:
             print("Invalid input. Please enter: y (yes), n (no), r (replay), or s (skip)")
 
-async def main():
-    """Main function to generate Hebrew audio files using Edge TTS."""
-    print("Hebrew TTS Audio Generator using Edge TTS")
-    print("=" * 60)
-    print("ONLY PROCESSING PROBLEMATIC WORDS - skipping verified words")
-    print("=" * 60)
+def build_jobs(arenas, output_dir, backend, rejected, problematic_only=False):
+    """
+    Build one TTSJob per target word.
     
-    # Initialize pygame for audio playback
-    if not init_pygame():
-        print("Cannot proceed without pygame. Exiting.")
-        return
+    Words with CUSTOM_SENTENCES use the first variation not yet rejected in review.
+    Words whose every variation was rejected are returned separately.
     
-    # Check Edge TTS installation
-    if not check_edge_tts_installation():
+    Returns:
+        (jobs, exhausted) where exhausted lists (arena, target) pairs to fix by hand
+    """
+    jobs = []
+    exhausted = []
+    rejected = set(rejected)
+    for arena_name, lookup in arenas.items():
+        for target_name, hebrew_name in lookup.items():
+            word = target_name.lower()
+            if problematic_only and PROBLEMATIC_WORDS.get(word) != arena_name:
+                continue
+            candidates = CUSTOM_SENTENCES.get(word, [None])
+            sentence = choose_sentence(candidates, backend.name, HEBREW_VOICE, hebrew_name, rejected)
+            if job_key(backend.name, HEBREW_VOICE, hebrew_name, sentence) in rejected:
+                exhausted.append((arena_name, target_name))
+                continue
+            jobs.append(TTSJob(
+                arena=arena_name,
+                target=target_name,
+                text=hebrew_name,
+                output_path=os.path.join(output_dir, arena_name, word + backend.extension),
+                voice=HEBREW_VOICE,
+                sentence=sentence,
+            ))
+    return jobs, exhausted
+
+async def generate(args):
+    """Generate all changed or missing target sounds concurrently."""
+    backend = BACKENDS[args.backend]()
+    if backend.name == 'edge' and not check_edge_tts_installation():
         print("Cannot proceed without Edge TTS. Exiting.")
-        return
+        return 1
     
-    # Load arena data
     arenas = load_arena_data()
     if not arenas:
         print("Failed to load arena data. Exiting.")
-        return
+        return 1
     
-    # Create sounds directory structure
-    sounds_dir = os.path.join(os.path.dirname(__file__), "sounds", "arenas")
+    pipeline = TTSPipeline(backend, concurrency=args.concurrency, force=args.force,
+                           cache_dir=args.cache_dir, state_file=os.path.join(args.cache_dir, "state.json"))
+    jobs, exhausted = build_jobs(arenas, args.output_dir, backend, pipeline.state['rejected'],
+                                 problematic_only=args.problematic_only)
     
-    total_generated = 0
-    total_failed = 0
-    total_skipped = 0
+    print(f"Synthesizing {len(jobs)} words with backend '{backend.name}' "
+          f"(voice {HEBREW_VOICE}, up to {args.concurrency} at a time)")
+    start = time.perf_counter()
+    results = await pipeline.run(jobs)
+    elapsed = time.perf_counter() - start
     
-    print(f"\n🎯 Processing ONLY these problematic words:")
-    for word, arena in PROBLEMATIC_WORDS.items():
-        print(f"  - {word} ({arena})")
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+        if result['status'] == 'generated':
+            print(f"✓ Generated: {result['output_path']}")
+        elif result['status'] == 'failed':
+            print(f"✗ Failed: {result['arena']}/{result['target']}: {result['error']}")
+    for arena_name, target_name in exhausted:
+        print(f"⚠️  Every variation for '{target_name}' ({arena_name}) was rejected - "
+              f"add a sentence to CUSTOM_SENTENCES")
     
-    # Process only problematic words
-    for target_name_lower, arena_name in PROBLEMATIC_WORDS.items():
-        if arena_name not in arenas:
-            print(f"⚠️  Arena '{arena_name}' not found in CSV data")
-            continue
-            
-        # Find the Hebrew name for this target
-        hebrew_name = None
-        for target, hebrew in arenas[arena_name].items():
-            if target.lower() == target_name_lower:
-                hebrew_name = hebrew
-                break
-        
-        if not hebrew_name:
-            print(f"⚠️  Hebrew name not found for '{target_name_lower}' in '{arena_name}'")
-            continue
-        
-        print(f"\n{'='*60}")
-        print(f"Processing PROBLEMATIC word: '{target_name_lower}' -> '{hebrew_name}'")
-        print(f"Arena: {arena_name}")
-        print(f"{'='*60}")
-        
-        # Create arena directory if it doesn't exist
-        arena_dir = os.path.join(sounds_dir, arena_name)
-        os.makedirs(arena_dir, exist_ok=True)
-        
-        output_filename = f"{target_name_lower}.mp3"
-        output_path = os.path.join(arena_dir, output_filename)
-        
-        # Check if we have a custom sentence for this word
-        custom_sentences = CUSTOM_SENTENCES.get(target_name_lower)
-        
-        if not custom_sentences:
-            print(f"⚠️  No custom sentences defined for '{target_name_lower}'")
-            continue
+    print("\n" + "=" * 60)
+    print(f"Done in {elapsed:.1f}s: " + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+    queued = len(pipeline.state['review_queue'])
+    if queued:
+        print(f"{queued} file(s) waiting for review: python generate_hebrew_audio.py --review")
+    return 0 if counts.get('failed', 0) == 0 else 1
 
-        print(f"\n🔄 Trying different variations for '{target_name_lower}'...")
-        for i, sentence in enumerate(custom_sentences):
-            print(f"  Attempt {i+1}: '{sentence}'")
-            success = await generate_hebrew_audio_edge_tts(hebrew_name, output_path, use_context=False, custom_sentence=sentence)
-            
-            if success:
-                # Validate the audio
-                validation_result = await validate_audio(output_path, target_name_lower, hebrew_name)
-                
-                if validation_result == 'skip':
-                    total_skipped += 1
-                    break # Move to next problematic word
-                elif not validation_result:
-                    print(f"⚠️  Variation '{sentence}' failed for '{target_name_lower}' - trying next...")
-                    continue
-                else: # validation_result is True
-                    total_generated += 1
-                    print(f"✓ Successfully generated for '{target_name_lower}' with variation '{sentence}'")
-                    break # Found a working variation, move to next problematic word
-            else:
-                print(f"✗ Failed to generate audio for '{target_name_lower}' with variation '{sentence}'")
-                total_failed += 1
-                
-        # If no variation worked, keep the original hebrew_name
-        if total_generated == 0:
-            print(f"⚠️  All variations failed for '{target_name_lower}' - keeping original: '{hebrew_name}'")
-            total_generated += 1 # Count the original as a successful generation
-                
-        # Add small delay to avoid overwhelming the service
-        await asyncio.sleep(0.5)
+async def review(args):
+    """Play queued files and record accept/reject decisions."""
+    pipeline = TTSPipeline(BACKENDS[args.backend](), cache_dir=args.cache_dir,
+                           state_file=os.path.join(args.cache_dir, "state.json"))
+    queue = list(pipeline.state['review_queue'])
+    if not queue:
+        print("Review queue is empty.")
+        return 0
+    
+    if not init_pygame():
+        print("Cannot proceed without pygame. Exiting.")
+        return 1
+    
+    print(f"Reviewing {len(queue)} file(s)")
+    for item in queue:
+        if item.get('sentence'):
+            print(f"  Sentence: '{item['sentence']}'")
+        validation_result = await validate_audio(item['output_path'], item['target'], item['text'])
+        if validation_result == 'skip':
+            continue
+        pipeline.record_review(item, accepted=bool(validation_result))
+        if not validation_result:
+            print(f"⚠️  '{item['target']}' rejected - the next run tries the next sentence variation")
     
-    # Cleanup
     pygame.mixer.quit()
+    print(f"\n{len(pipeline.state['review_queue'])} file(s) left in the review queue")
+    return 0
+
+def main():
+    """Main function to generate Hebrew audio files, or review generated ones."""
+    default_output_dir = os.path.join(os.path.dirname(__file__), "sounds", "arenas")
     
-    print(f"\n" + "=" * 60)
-    print(f"PROBLEMATIC WORDS PROCESSING COMPLETE!")
-    print(f"Successfully generated: {total_generated} files")
-    print(f"Failed to generate: {total_failed} files")
-    print(f"Skipped: {total_skipped} files")
+    parser = argparse.ArgumentParser(description='Generate Hebrew target sounds with TTS')
+    parser.add_argument('--review', action='store_true',
+                       help='Play files waiting in the review queue instead of generating')
+    parser.add_argument('--backend', default='edge', choices=list(BACKENDS.keys()),
+                       help='TTS backend (default: edge; stub = offline test tones)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'Simultaneous synthesis requests (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-synthesize every word even if a cached output exists')
+    parser.add_argument('--problematic-only', action='store_true',
+                       help='Only process the words in PROBLEMATIC_WORDS')
+    parser.add_argument('--output-dir', default=default_output_dir,
+                       help='Directory for <arena>/<target> sound files (default: sounds/arenas)')
+    parser.add_argument('--cache-dir', default=None,
+                       help='TTS cache and state directory (default: sounds/cache/tts, '
+                            'or <output-dir>/.tts_cache for a non-default output dir)')
+    args = parser.parse_args()
     
-    if total_failed > 0:
-        print(f"\nNote: Some files failed to generate. This might be due to:")
-        print(f"- Network connectivity issues")
-        print(f"- Edge TTS service limitations")
-        print(f"- Invalid Hebrew text")
-        print(f"\nYou may need to manually create these files or retry later.")
+    if args.cache_dir is None:
+        same_dir = os.path.abspath(args.output_dir) == os.path.abspath(default_output_dir)
+        args.cache_dir = TTS_CACHE_DIR if same_dir else os.path.join(args.output_dir, ".tts_cache")
+    
+    print("Hebrew TTS Audio Generator")
+    print("=" * 60)
+    return asyncio.run(review(args) if args.review else generate(args))
 
 if __name__ == "__main__":
-    # Run the async main function
-    asyncio.run(main()) 
\ No newline at end of file
+    sys.exit(main())
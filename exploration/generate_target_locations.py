@@ -1,10 +1,21 @@
-import random
+"""
+Target Location Generator for fMRI Navigation Experiments
+Places targets inside the circular arena so that they keep a minimum spacing, stay clear
+of the centre (start position) and the border, and cover all four quadrants.
+
+Candidates are drawn in NumPy batches with area-uniform radius (r = sqrt(U(r_min², r_max²)))
+and every constraint is checked vectorized. For dense layouts a Bridson Poisson-disk
+sampler is available. Sampling is bounded: an infeasible request raises
+LayoutInfeasibleError instead of looping forever.
+"""
+
 import math
 import json
-import pygame
 import sys
 import os
 
+import numpy as np
+
 # Arena parameters (in meters)
 ARENA_DIAMETER = 3.3
 ARENA_RADIUS = ARENA_DIAMETER / 2.0
@@ -25,7 +36,206 @@ TARGET_COLOR = (0, 217, 192)        # Targets: Turquoise
 CENTER_COLOR = (255, 67, 101)       # Center: Folly
 WHITE = (255, 255, 255)
 
-def generate_target_locations(num_targets, min_distance=0.3):
+# Placement annulus for target centres
+MIN_PLACEMENT_RADIUS = CENTER_THRESHOLD
+MAX_PLACEMENT_RADIUS = ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD
+
+# Quadrant angle ranges (in radians)
+QUADRANT_RANGES = [
+    (0, math.pi/2),           # Q1: top-right
+    (math.pi/2, math.pi),     # Q2: top-left
+    (math.pi, 3*math.pi/2),   # Q3: bottom-left
+    (3*math.pi/2, 2*math.pi)  # Q4: bottom-right
+]
+
+# Sampling limits
+BATCH_SIZE = 256          # Candidates drawn per vectorized batch
+MAX_BATCHES = 200         # Batches per placement step before giving up
+BRIDSON_CANDIDATES = 30   # Candidates tried around each active point (Bridson's k)
+BRIDSON_MAX_POINTS = 2000         # Largest Poisson-disk pool grown for one layout
+BRIDSON_MAX_ITERATIONS = 20000    # Active-list steps per pool (each adds or retires a point)
+HEX_PACKING_DENSITY = math.pi / (2 * math.sqrt(3))  # Densest packing of equal disks (~0.907)
+
+
+class LayoutInfeasibleError(ValueError):
+    """Raised when targets cannot be placed under the requested constraints."""
+
+
+def make_rng(seed=None):
+    """Return a NumPy Generator from an int seed, an existing Generator, or None (fresh entropy)."""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def sample_annulus(rng, n, angle_range=(0.0, 2 * math.pi),
+                   r_min=MIN_PLACEMENT_RADIUS, r_max=MAX_PLACEMENT_RADIUS):
+    """Draw n area-uniform points in an annulus sector; returns an (n, 2) array."""
+    angle = rng.uniform(angle_range[0], angle_range[1], n)
+    r = np.sqrt(rng.uniform(r_min * r_min, r_max * r_max, n))
+    return np.column_stack((r * np.cos(angle), r * np.sin(angle)))
+
+
+def check_feasibility(num_targets, min_distance):
+    """
+    Cheap necessary condition for a layout to exist.
+
+    Each target owns a disk of radius min_distance/2 that must fit inside the placement
+    annulus grown by min_distance/2; those disks can cover at most HEX_PACKING_DENSITY
+    of that area.
+
+    Returns:
+        None if the request may be feasible, otherwise a reason string
+    """
+    if num_targets < 0:
+        return f"num_targets must be non-negative (got {num_targets})"
+    if min_distance <= 0:
+        return f"min_distance must be positive (got {min_distance})"
+    half = min_distance / 2.0
+    outer = MAX_PLACEMENT_RADIUS + half
+    inner = max(MIN_PLACEMENT_RADIUS - half, 0.0)
+    available = HEX_PACKING_DENSITY * math.pi * (outer * outer - inner * inner)
+    needed = num_targets * math.pi * half * half
+    if needed > available:
+        return (f"{num_targets} targets with min_distance={min_distance} m need {needed:.2f} m² "
+                f"but at most {available:.2f} m² of the arena can be packed")
+    return None
+
+
+def _first_fit(candidates, placed, min_distance, limit):
+    """
+    Accept candidates in draw order while they keep min_distance from every accepted point.
+
+    This is sequential random placement, done one vectorized mask update per accepted point.
+
+    Returns:
+        placed with up to `limit` accepted candidates appended
+    """
+    if limit <= 0 or len(candidates) == 0:
+        return placed
+    valid = np.ones(len(candidates), dtype=bool)
+    if len(placed):
+        d = np.hypot(candidates[:, None, 0] - placed[None, :, 0], candidates[:, None, 1] - placed[None, :, 1])
+        valid &= d.min(axis=1) >= min_distance
+
+    accepted = []
+    while len(accepted) < limit:
+        remaining = np.flatnonzero(valid)
+        if len(remaining) == 0:
+            break
+        i = remaining[0]
+        accepted.append(i)
+        valid[i] = False
+        valid &= np.hypot(candidates[:, 0] - candidates[i, 0], candidates[:, 1] - candidates[i, 1]) >= min_distance
+
+    if not accepted:
+        return placed
+    return np.vstack((placed, candidates[accepted]))
+
+
+def _quadrant_of(points):
+    """Quadrant index (0-3, matching QUADRANT_RANGES) of each point."""
+    angle = np.mod(np.arctan2(points[:, 1], points[:, 0]), 2 * math.pi)
+    return np.minimum((angle // (math.pi / 2)).astype(int), 3)
+
+
+def _batch_layout(num_targets, min_distance, rng, max_batches):
+    """One target per quadrant first, then fill the rest from full-annulus batches."""
+    placed = np.empty((0, 2))
+    for q, quadrant_range in enumerate(QUADRANT_RANGES[:num_targets]):
+        for _ in range(max_batches):
+            placed = _first_fit(sample_annulus(rng, BATCH_SIZE, quadrant_range), placed, min_distance, 1)
+            if len(placed) == q + 1:
+                break
+        else:
+            raise LayoutInfeasibleError(
+                f"Could not place a target in quadrant Q{q + 1} after {max_batches * BATCH_SIZE} candidates "
+                f"(min_distance={min_distance} m)")
+
+    for _ in range(max_batches):
+        if len(placed) >= num_targets:
+            break
+        placed = _first_fit(sample_annulus(rng, BATCH_SIZE), placed, min_distance, num_targets - len(placed))
+    if len(placed) < num_targets:
+        raise LayoutInfeasibleError(
+            f"Placed only {len(placed)} of {num_targets} targets after {max_batches * BATCH_SIZE} candidates "
+            f"(min_distance={min_distance} m); try method='bridson' or a smaller min_distance")
+    return placed
+
+
+def bridson_sample(min_distance, rng, k=BRIDSON_CANDIDATES, max_points=BRIDSON_MAX_POINTS,
+                   max_iterations=BRIDSON_MAX_ITERATIONS):
+    """
+    Bridson Poisson-disk sampling over the placement annulus.
+
+    Grows a maximal set of points with spacing >= min_distance from one random seed point,
+    trying k area-uniform candidates in the [d, 2d] ring around each active point at once.
+    Pools are capped at max_points, so each candidate batch is checked against all
+    accepted points directly rather than through a background grid.
+
+    Returns:
+        (n, 2) array of points
+
+    Raises:
+        LayoutInfeasibleError: if the pool outgrows max_points or max_iterations is reached
+    """
+    if min_distance <= 0:
+        raise LayoutInfeasibleError(f"min_distance must be positive (got {min_distance})")
+    points = sample_annulus(rng, 1)
+    active = [0]
+    for _ in range(max_iterations):
+        if not active:
+            return points
+        if len(points) > max_points:
+            raise LayoutInfeasibleError(
+                f"Bridson pool exceeded {max_points} points with min_distance={min_distance} m; "
+                f"use method='batch' or a larger min_distance")
+        slot = rng.integers(len(active))
+        origin = points[active[slot]]
+        offsets = sample_annulus(rng, k, r_min=min_distance, r_max=2 * min_distance)
+        candidates = origin + offsets
+        r = np.hypot(candidates[:, 0], candidates[:, 1])
+        candidates = candidates[(r >= MIN_PLACEMENT_RADIUS) & (r <= MAX_PLACEMENT_RADIUS)]
+        if len(candidates):
+            d = np.hypot(candidates[:, None, 0] - points[None, :, 0], candidates[:, None, 1] - points[None, :, 1])
+            ok = np.flatnonzero(d.min(axis=1) >= min_distance)
+            if len(ok):
+                points = np.vstack((points, candidates[ok[0]]))
+                active.append(len(points) - 1)
+                continue
+        active[slot] = active[-1]
+        active.pop()
+    if not active:
+        return points
+    raise LayoutInfeasibleError(
+        f"Bridson sampling did not finish in {max_iterations} iterations (min_distance={min_distance} m)")
+
+
+def _bridson_layout(num_targets, min_distance, rng, max_batches):
+    """Pick num_targets points (one per quadrant first) from a Bridson sample."""
+    for _ in range(max_batches):
+        pool = bridson_sample(min_distance, rng)
+        if len(pool) < num_targets:
+            continue
+        quadrants = _quadrant_of(pool)
+        order = rng.permutation(len(pool))
+        chosen = []
+        for q in range(min(4, num_targets)):
+            in_q = order[quadrants[order] == q]
+            if len(in_q) == 0:
+                break
+            chosen.append(in_q[0])
+        else:
+            taken = set(chosen)
+            rest = [i for i in order if i not in taken]
+            chosen.extend(rest[:num_targets - len(chosen)])
+            return pool[chosen]
+    raise LayoutInfeasibleError(
+        f"Bridson sampling never produced {num_targets} quadrant-covering targets "
+        f"with min_distance={min_distance} m in {max_batches} attempts")
+
+
+def generate_target_locations(num_targets, min_distance=0.3, seed=None, method='batch', max_batches=MAX_BATCHES):
     """
     Generate random target locations that don't overlap with each other,
     the center, or the border. Ensures at least one target in each quartile.
@@ -33,88 +243,98 @@ def generate_target_locations(num_targets, min_distance=0.3):
     Args:
         num_targets: Number of targets to generate
         min_distance: Minimum distance between targets
+        seed: int seed or np.random.Generator for reproducible layouts (None = random)
+        method: 'batch' (vectorized sequential placement) or 'bridson' (Poisson-disk, for dense layouts)
+        max_batches: Sampling budget before the layout is declared infeasible
     
     Returns:
-        List of (x, y) coordinates for target centers
-    """
-    locations = []
-    max_attempts = 1000  # Prevent infinite loops
-    
-    # Define quartile ranges (in radians)
-    quartile_ranges = [
-        (0, math.pi/2),           # Q1: top-right
-        (math.pi/2, math.pi),     # Q2: top-left
-        (math.pi, 3*math.pi/2),   # Q3: bottom-left
-        (3*math.pi/2, 2*math.pi)  # Q4: bottom-right
-    ]
-    
-    # First, ensure one target in each quartile
-    for quartile_range in quartile_ranges:
-        attempts = 0
-        while attempts < max_attempts:
-            # Generate random angle within the quartile
-            angle = random.uniform(quartile_range[0], quartile_range[1])
-            # Use square root of random number to get uniform distribution in circle
-            r = random.uniform(CENTER_THRESHOLD, ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD)
-            
-            # Calculate position
-            x = r * math.cos(angle)
-            y = r * math.sin(angle)
-            
-            # Check if this position is valid
-            valid_position = True
-            
-            # Check distance from center
-            if math.hypot(x, y) < CENTER_THRESHOLD:
-                valid_position = False
-            
-            # Check distance from border
-            if math.hypot(x, y) > (ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD):
-                valid_position = False
-            
-            # Check distance from other targets
-            for loc in locations:
-                if math.hypot(x - loc[0], y - loc[1]) < min_distance:
-                    valid_position = False
-                    break
-            
-            if valid_position:
-                locations.append((x, y))
-                break
-            
-            attempts += 1
-    
-    # Then fill the remaining targets
-    while len(locations) < num_targets:
-        # Generate random angle and radius
-        angle = random.uniform(0, 2 * math.pi)
-        r = random.uniform(CENTER_THRESHOLD, ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD)
-        
-        # Calculate position
-        x = r * math.cos(angle)
-        y = r * math.sin(angle)
-        
-        # Check if this position is valid
-        valid_position = True
-        
-        # Check distance from center
-        if math.hypot(x, y) < CENTER_THRESHOLD:
-            valid_position = False
-        
-        # Check distance from border
-        if math.hypot(x, y) > (ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD):
-            valid_position = False
-        
-        # Check distance from other targets
-        for loc in locations:
-            if math.hypot(x - loc[0], y - loc[1]) < min_distance:
-                valid_position = False
-                break
-        
-        if valid_position:
-            locations.append((x, y))
+        List of (x, y) coordinates for target centers; the first four are in Q1-Q4
     
-    return locations
+    Raises:
+        LayoutInfeasibleError: if the constraints cannot be met
+    """
+    reason = check_feasibility(num_targets, min_distance)
+    if reason:
+        raise LayoutInfeasibleError(reason)
+    if method not in ('batch', 'bridson'):
+        raise ValueError(f"Unknown method: {method} (use 'batch' or 'bridson')")
+
+    rng = make_rng(seed)
+    if method == 'bridson':
+        placed = _bridson_layout(num_targets, min_distance, rng, max_batches)
+    else:
+        placed = _batch_layout(num_targets, min_distance, rng, max_batches)
+    return [(float(x), float(y)) for x, y in placed]
+
+
+def layout_is_valid(layouts, min_distance):
+    """
+    Vectorized constraint check for a stack of layouts.
+
+    Args:
+        layouts: (n_layouts, num_targets, 2) array
+        min_distance: Minimum distance between targets
+
+    Returns:
+        Boolean array of shape (n_layouts,)
+    """
+    layouts = np.asarray(layouts, dtype=float)
+    r = np.hypot(layouts[..., 0], layouts[..., 1])
+    ok = np.all((r >= MIN_PLACEMENT_RADIUS) & (r <= MAX_PLACEMENT_RADIUS), axis=1)
+    n = layouts.shape[1]
+    if n > 1:
+        diff = layouts[:, :, None, :] - layouts[:, None, :, :]
+        d = np.hypot(diff[..., 0], diff[..., 1])
+        iu = np.triu_indices(n, k=1)
+        ok &= d[:, iu[0], iu[1]].min(axis=1) >= min_distance
+    if n >= 4:
+        quadrants = _quadrant_of(layouts.reshape(-1, 2)).reshape(len(layouts), n)
+        for q in range(4):
+            ok &= np.any(quadrants == q, axis=1)
+    return ok
+
+
+def sample_layouts(n_layouts, num_targets, min_distance=0.3, seed=None, max_batches=MAX_BATCHES):
+    """
+    Generate many independent layouts at once.
+
+    Whole layouts are drawn in batches (first four targets one per quadrant) and validated
+    with layout_is_valid(); if the acceptance rate is too low for that to pay off (dense
+    layouts), the remainder is filled one layout at a time with Bridson sampling.
+
+    Returns:
+        (n_layouts, num_targets, 2) array
+    """
+    reason = check_feasibility(num_targets, min_distance)
+    if reason:
+        raise LayoutInfeasibleError(reason)
+    rng = make_rng(seed)
+
+    n_quadrant = min(4, num_targets)
+    accepted = []
+    total = 0
+    for _ in range(max_batches):
+        if total >= n_layouts:
+            break
+        batch = max(BATCH_SIZE, 2 * (n_layouts - total))
+        layouts = np.empty((batch, num_targets, 2))
+        for q in range(n_quadrant):
+            layouts[:, q] = sample_annulus(rng, batch, QUADRANT_RANGES[q])
+        if num_targets > n_quadrant:
+            layouts[:, n_quadrant:] = sample_annulus(rng, batch * (num_targets - n_quadrant)).reshape(batch, -1, 2)
+        good = layouts[layout_is_valid(layouts, min_distance)]
+        accepted.append(good)
+        total += len(good)
+        if len(good) < 0.01 * batch:
+            break
+
+    result = np.concatenate(accepted)[:n_layouts] if accepted else np.empty((0, num_targets, 2))
+    if len(result) < n_layouts:
+        extra = [generate_target_locations(num_targets, min_distance, seed=rng, method='bridson',
+                                           max_batches=max_batches)
+                 for _ in range(n_layouts - len(result))]
+        result = np.concatenate((result, np.asarray(extra, dtype=float).reshape(-1, num_targets, 2)))
+    return result
 
 def save_locations(locations, filename):
     """Save locations to a JSON file."""
@@ -130,6 +350,7 @@ def to_screen_coords(pos):
 
 def visualize_locations(locations):
     """Visualize the arena and target locations."""
+    import pygame
     pygame.init()
     screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
     pygame.display.set_caption("Target Locations Visualization")
@@ -178,7 +399,7 @@ def visualize_locations(locations):
     pygame.quit()
 
 if __name__ == "__main__":
-    import os
+    import pygame
     
     # Create directory if it doesn't exist
     output_dir = "/Users/sunt/PhD/packngo/FullArena/Arenas"
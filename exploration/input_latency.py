@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Input-to-Display Latency Harness
+Runs a task unmodified (in practice mode) and, once its game loop is running, posts
+synthetic button-box key presses (7/8/9/0) at random times from a second thread. Each
+press is followed through the pipeline:
+
+- poll_ms:   posted -> taken off the event queue (ButtonBox.pump during the frame wait)
+- render_ms: taken off the queue -> the task calls pygame.display.flip() for the frame
+             that first responds to it
+- flip_ms:   time inside that flip() (buffer swap; waits for vsync where enabled)
+- total_ms:  posted -> flip() returned, i.e. the frame was handed to the display
+
+Presses are posted to SDL's queue, so the USB/button-box path before SDL is not included.
+For external validation, --photodiode paints a square in the top-left screen corner white
+for the frames that respond to a press (black otherwise): a photodiode on that corner and
+the button-box signal on a scope give the true press-to-light latency, projector included
+(real button-box presses flash the patch as well as the synthetic ones).
+
+Each task runs in its own process for each rendering configuration:
+- fullscreen: the task's own display mode (desktop-sized fullscreen)
+- windowed:   a 1000x800 window
+- vsync:      desktop-sized fullscreen through SDL's renderer with vsync (pygame.SCALED)
+
+Usage:
+    python input_latency.py --headless                     # all tasks, dummy video driver
+    python input_latency.py --task snake --config fullscreen vsync --presses 100
+    python input_latency.py --task multi_arena --photodiode --output latency.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import runpy
+import shutil
+import argparse
+import statistics
+import tempfile
+import threading
+import subprocess
+from typing import Any, Dict, List
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TASKS = {
+    "snake": ["snake.py", "practice"],
+    "one_target": ["one_target.py", "practice"],
+    "multi_arena": ["multi_arena.py", "practice", "--arena", "hospital", "--arenas-per-condition", "1"],
+}
+CONFIGS = ["fullscreen", "windowed", "vsync"]
+WINDOW_SIZE = (1000, 800)
+
+PRESS_GAP = (0.15, 0.35)        # Seconds between presses (random, so presses land anywhere in a frame)
+PRESS_HOLD = (0.05, 0.15)       # Seconds each key is held
+ADVANCE_INTERVAL = 0.3          # ENTER is pressed this often while no game loop is running
+IN_LOOP_TIMEOUT = 0.25          # A game loop is running if ButtonBox.frame() ran this recently
+PHOTODIODE_SIZE = 40            # Pixels
+PHOTODIODE_FRAMES = 3           # Frames the patch stays white after a response
+
+SAMPLE_FIELDS = ["task", "config", "sample", "key", "poll_ms", "render_ms", "flip_ms", "total_ms",
+                 "frame_ms", "presented"]
+
+
+# ---------------------------
+# Task process
+# ---------------------------
+class LatencyProbe:
+    """Patches pygame in the task process: posts presses, follows them to the presented frame."""
+
+    def __init__(self, config: str, presses: int, output: str, photodiode: bool = False,
+                 timeout: float = 120.0, seed: int = 1):
+        self.config = config
+        self.presses = presses
+        self.output = output
+        self.photodiode = photodiode
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.samples: List[Dict[str, Any]] = []
+        self.waiting: List[Dict[str, Any]] = []     # Taken off the queue, frame not presented yet
+        self.last_frame_call = -1.0
+        self.last_present = None
+        self.frame_times: List[float] = []
+        self.flash_frames = 0
+        self.key_pressed = False                    # A button-box key went down since the last frame
+        self.error = ""
+        self._lock = threading.Lock()
+
+    # Patched pygame functions
+    def install(self):
+        import pygame
+        import button_box
+        real_get = pygame.event.get
+        real_flip = pygame.display.flip
+        real_set_mode = pygame.display.set_mode
+        real_frame = button_box.ButtonBox.frame
+        probe = self
+
+        def event_get(*args, **kwargs):
+            events = real_get(*args, **kwargs)
+            now = time.perf_counter()
+            for event in events:
+                if event.type == pygame.KEYDOWN and getattr(event, 'key', None) in button_box.BUTTON_KEYS:
+                    probe.key_pressed = True
+                index = getattr(event, 'latency_id', None)
+                if index is not None and probe.samples[index]["taken"] is None:
+                    probe.samples[index]["taken"] = now
+                    probe.waiting.append(probe.samples[index])
+            return events
+
+        def flip():
+            start = time.perf_counter()
+            responding, probe.waiting = probe.waiting, []
+            probe.key_pressed, key_pressed = False, probe.key_pressed
+            if probe.photodiode:
+                if key_pressed:
+                    probe.flash_frames = PHOTODIODE_FRAMES
+                white = probe.flash_frames > 0
+                probe.flash_frames -= 1
+                surface = pygame.display.get_surface()
+                if surface is not None:
+                    color = (255, 255, 255) if white else (0, 0, 0)
+                    surface.fill(color, (0, 0, PHOTODIODE_SIZE, PHOTODIODE_SIZE))
+            real_flip()
+            end = time.perf_counter()
+            if probe.last_present is not None:
+                probe.frame_times.append(end - probe.last_present)
+            probe.last_present = end
+            for sample in responding:
+                sample["flip_call"] = start
+                sample["presented"] = end
+            if sum(1 for s in probe.samples if s["presented"] is not None) >= probe.presses:
+                probe.finish()
+
+        def set_mode(size=(0, 0), flags=0, *args, **kwargs):
+            if probe.config == "windowed":
+                return real_set_mode(WINDOW_SIZE)
+            if probe.config == "vsync":
+                if tuple(size) == (0, 0):
+                    size = pygame.display.get_desktop_sizes()[0]
+                try:
+                    return real_set_mode(size, flags | pygame.SCALED, vsync=1)
+                except pygame.error as e:
+                    probe.error = f"vsync unavailable: {e}"
+                    probe.finish()
+            return real_set_mode(size, flags, *args, **kwargs)
+
+        def frame(box):
+            probe.last_frame_call = time.perf_counter()
+            return real_frame(box)
+
+        pygame.event.get = event_get
+        pygame.display.flip = pygame.display.update = flip
+        pygame.display.set_mode = set_mode
+        button_box.ButtonBox.frame = frame
+
+    def in_game_loop(self) -> bool:
+        return time.perf_counter() - self.last_frame_call < IN_LOOP_TIMEOUT
+
+    def post(self, kind, key, **attributes):
+        import pygame
+        pygame.event.post(pygame.event.Event(kind, key=key, unicode=pygame.key.name(key), mod=0,
+                                             scancode=0, **attributes))
+
+    def inject(self):
+        """Injector thread: ENTER until a game loop runs, then timed presses of 8/9/7/0."""
+        import pygame
+        keys = [pygame.K_8, pygame.K_9, pygame.K_7, pygame.K_0]
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            if pygame.display.get_surface() is None:
+                time.sleep(ADVANCE_INTERVAL)    # Events can only be posted once the display is up
+                continue
+            if not self.in_game_loop():
+                self.post(pygame.KEYDOWN, pygame.K_RETURN)
+                self.post(pygame.KEYUP, pygame.K_RETURN)
+                time.sleep(ADVANCE_INTERVAL)
+                continue
+            time.sleep(self.rng.uniform(*PRESS_GAP))
+            key = keys[len(self.samples) % len(keys)]
+            sample = {"sample": len(self.samples), "key": pygame.key.name(key), "taken": None,
+                      "flip_call": None, "presented": None}
+            self.samples.append(sample)
+            sample["posted"] = time.perf_counter()
+            self.post(pygame.KEYDOWN, key, latency_id=sample["sample"])
+            time.sleep(self.rng.uniform(*PRESS_HOLD))
+            self.post(pygame.KEYUP, key)
+        self.error = self.error or f"timed out after {self.timeout:.0f} s"
+        self.finish()
+
+    def finish(self):
+        """Write the samples and end the task process (from either thread)."""
+        with self._lock:
+            with open(self.output, 'w') as f:
+                json.dump({"samples": [s for s in self.samples if s["presented"] is not None],
+                           "frame_ms": 1000.0 * statistics.median(self.frame_times) if self.frame_times else None,
+                           "error": self.error if len(self.samples) < self.presses else ""}, f)
+            os._exit(0)
+
+    def run(self, script: str, script_args: List[str]):
+        os.chdir(SCRIPT_DIR)
+        sys.path.insert(0, SCRIPT_DIR)
+        self.install()
+        threading.Thread(target=self.inject, daemon=True).start()
+        sys.argv = [script] + script_args
+        try:
+            runpy.run_path(script, run_name='__main__')
+        except SystemExit:
+            pass
+        self.error = self.error or "task ended before enough presses were answered"
+        self.finish()
+
+
+# ---------------------------
+# Harness
+# ---------------------------
+def measure(task: str, config: str, presses: int, photodiode: bool = False, headless: bool = False,
+            timeout: float = 120.0) -> Dict[str, Any]:
+    """Run one task under one rendering configuration; returns its samples (ms) and any error."""
+    fd, output = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    results_dir = tempfile.mkdtemp(prefix='latency_')
+    env = dict(os.environ, CENTRALIZED_RESULTS_DIR=results_dir, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    if headless:
+        env.update(SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    cmd = [sys.executable, os.path.abspath(__file__), "--probe", config, output, str(presses),
+           str(timeout), "1" if photodiode else "0", "--", *TASKS[task]]
+    try:
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout + 30)
+        with open(output) as f:
+            content = f.read()
+        result = json.loads(content) if content else {"samples": [], "frame_ms": None,
+                                                      "error": "task process failed"}
+    except subprocess.TimeoutExpired:
+        result = {"samples": [], "frame_ms": None, "error": "task process hung"}
+    finally:
+        os.remove(output)
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+    rows = []
+    for s in result["samples"]:
+        rows.append({
+            "task": task,
+            "config": config,
+            "sample": s["sample"],
+            "key": s["key"],
+            "poll_ms": round(1000.0 * (s["taken"] - s["posted"]), 3),
+            "render_ms": round(1000.0 * (s["flip_call"] - s["taken"]), 3),
+            "flip_ms": round(1000.0 * (s["presented"] - s["flip_call"]), 3),
+            "total_ms": round(1000.0 * (s["presented"] - s["posted"]), 3),
+            "frame_ms": round(result["frame_ms"], 3) if result["frame_ms"] else "",
+            "presented": round(s["presented"], 6),
+        })
+    return {"samples": rows, "frame_ms": result["frame_ms"], "error": result["error"]}
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Median/p95/max of the total and median of each stage (ms)."""
+    def p95(values):
+        return sorted(values)[int(0.95 * (len(values) - 1))]
+
+    totals = [r["total_ms"] for r in rows]
+    return {
+        "n": len(rows),
+        "total_median": statistics.median(totals),
+        "total_p95": p95(totals),
+        "total_max": max(totals),
+        "poll_median": statistics.median(r["poll_ms"] for r in rows),
+        "render_median": statistics.median(r["render_ms"] for r in rows),
+        "flip_median": statistics.median(r["flip_ms"] for r in rows),
+    }
+
+
+def main():
+    if "--probe" in sys.argv:
+        # Task process: --probe CONFIG OUTPUT PRESSES TIMEOUT PHOTODIODE -- script args...
+        split = sys.argv.index("--")
+        config, output, presses, timeout, photodiode = sys.argv[sys.argv.index("--probe") + 1:split]
+        probe = LatencyProbe(config, int(presses), output, photodiode == "1", float(timeout))
+        probe.run(sys.argv[split + 1], sys.argv[split + 2:])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Input-to-display latency harness')
+    parser.add_argument('--task', nargs='+', choices=list(TASKS), default=list(TASKS),
+                        help='Tasks to measure (default: all)')
+    parser.add_argument('--config', nargs='+', choices=CONFIGS, default=CONFIGS,
+                        help='Rendering configurations (default: all)')
+    parser.add_argument('--presses', type=int, default=50,
+                        help='Key presses measured per task and configuration (default: 50)')
+    parser.add_argument('--photodiode', action='store_true',
+                        help='Flash a white square in the top-left corner on the responding frames')
+    parser.add_argument('--headless', action='store_true',
+                        help="Use SDL's dummy video and audio drivers")
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help='Seconds allowed per task and configuration (default: 120)')
+    parser.add_argument('--output', help='Write every sample to this CSV file')
+    args = parser.parse_args()
+
+    print(f"Input-to-display latency ({'SDL dummy video driver' if args.headless else 'display'}), "
+          f"{args.presses} presses per task and configuration"
+          f"{', photodiode patch on' if args.photodiode else ''}")
+    print("=" * 92)
+    print(f"{'task':<12} {'config':<11} {'n':>4} {'frame':>7} {'total med':>10} {'total p95':>10} "
+          f"{'total max':>10} {'poll med':>9} {'render med':>11} {'flip med':>9}")
+    all_rows = []
+    for task in args.task:
+        for config in args.config:
+            result = measure(task, config, args.presses, args.photodiode, args.headless, args.timeout)
+            rows = result["samples"]
+            all_rows.extend(rows)
+            if not rows:
+                print(f"{task:<12} {config:<11} {'-':>4}  {result['error']}")
+                continue
+            s = summarize(rows)
+            frame = f"{result['frame_ms']:.2f}" if result['frame_ms'] else "-"
+            print(f"{task:<12} {config:<11} {s['n']:>4} {frame:>7} {s['total_median']:>10.2f} "
+                  f"{s['total_p95']:>10.2f} {s['total_max']:>10.2f} {s['poll_median']:>9.2f} "
+                  f"{s['render_median']:>11.2f} {s['flip_median']:>9.2f}"
+                  + (f"  ({result['error']})" if result['error'] else ""))
+    print("=" * 92)
+    print("All values in ms. total = posted to SDL queue -> flip() of the first frame that responds.")
+
+    if args.output and all_rows:
+        with open(args.output, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=SAMPLE_FIELDS)
+            writer.writeheader()
+            writer.writerows(all_rows)
+        print(f"Samples saved to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Layout Optimizer for the Multi-Arena Task
+Generates many candidate target layouts per arena in a process pool, scores them
+vectorized and picks one layout per arena so that difficulty is balanced across arenas.
+
+Scores per layout (start pose is (0, 0) facing 0°, i.e. +y; bearings are clockwise
+as in multi_arena.py):
+- min_spacing:          smallest distance between two targets (quality, higher is better)
+- angular_gap:          largest gap between target bearings in degrees (quality, lower is better)
+- radial_spread:        standard deviation of target distances from the centre
+- mean_start_distance:  mean distance from the start position to the targets
+- mean_turn:            mean absolute turn (degrees) from the start heading to each target
+- nearest_turn:         smallest such turn, i.e. how soon a target lies straight ahead
+
+Candidates below the per-arena quality cutoff are dropped. Each arena then gets the
+remaining candidate closest (in z-scored units) to the pooled median of the balance
+scores, which keeps those scores as similar as possible across arenas.
+
+Usage:
+    python layout_optimizer.py                       # rewrite Final_New_Arenas.csv coordinates
+    python layout_optimizer.py --seed 7 --candidates 50000 --output Balanced_Arenas.csv
+"""
+
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from generate_target_locations import sample_layouts
+from arena_registry import DEFAULT_ARENA_FILE, load_registry, write_arena_csv
+
+QUALITY_FEATURES = ["min_spacing", "angular_gap"]
+BALANCE_FEATURES = ["radial_spread", "mean_start_distance", "mean_turn", "nearest_turn"]
+FEATURES = QUALITY_FEATURES + BALANCE_FEATURES
+
+START_HEADING = 0.0  # degrees; the player starts at (0, 0) facing +y
+
+
+def score_layouts(layouts, start_heading: float = START_HEADING) -> np.ndarray:
+    """
+    Score a stack of layouts.
+
+    Args:
+        layouts: (n_layouts, num_targets, 2) array of target positions
+        start_heading: Start heading in degrees (0 = +y, clockwise)
+
+    Returns:
+        (n_layouts, len(FEATURES)) array, columns in FEATURES order
+    """
+    layouts = np.asarray(layouts, dtype=float)
+    n_layouts, num_targets = layouts.shape[:2]
+    x, y = layouts[..., 0], layouts[..., 1]
+    radius = np.hypot(x, y)
+
+    if num_targets > 1:
+        diff = layouts[:, :, None, :] - layouts[:, None, :, :]
+        dist = np.hypot(diff[..., 0], diff[..., 1])
+        iu = np.triu_indices(num_targets, k=1)
+        min_spacing = dist[:, iu[0], iu[1]].min(axis=1)
+    else:
+        min_spacing = np.full(n_layouts, np.inf)
+
+    # Bearings clockwise from +y, matching the movement code (dx = sin, dy = cos)
+    bearing = np.degrees(np.arctan2(x, y)) % 360.0
+    ordered = np.sort(bearing, axis=1)
+    gaps = np.diff(np.concatenate((ordered, ordered[:, :1] + 360.0), axis=1), axis=1)
+    turn = np.abs((bearing - start_heading + 180.0) % 360.0 - 180.0)
+
+    return np.column_stack((
+        min_spacing,
+        gaps.max(axis=1),
+        radius.std(axis=1),
+        radius.mean(axis=1),
+        turn.mean(axis=1),
+        turn.min(axis=1),
+    ))
+
+
+def _score_chunk(task):
+    """Worker: sample and score one chunk of candidates for one arena."""
+    arena_index, n_candidates, num_targets, min_distance, seed_seq = task
+    layouts = sample_layouts(n_candidates, num_targets, min_distance, seed=np.random.default_rng(seed_seq))
+    return arena_index, layouts, score_layouts(layouts)
+
+
+def generate_candidates(n_arenas: int, candidates: int, num_targets: int = 5, min_distance: float = 0.3,
+                        seed=None, workers: Optional[int] = None,
+                        chunk_size: int = 5000) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Generate and score candidates for each arena in a process pool.
+
+    Each chunk gets its own child seed, so results depend only on seed, not on the
+    number of workers or the order chunks finish in.
+
+    Returns:
+        One (layouts, scores) pair per arena
+    """
+    n_chunks = -(-candidates // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_arenas * n_chunks)
+    tasks = []
+    for arena_index in range(n_arenas):
+        for chunk in range(n_chunks):
+            size = min(chunk_size, candidates - chunk * chunk_size)
+            tasks.append((arena_index, size, num_targets, min_distance, seeds[arena_index * n_chunks + chunk]))
+
+    parts: List[List[Tuple[np.ndarray, np.ndarray]]] = [[] for _ in range(n_arenas)]
+    if workers == 1:
+        for arena_index, layouts, scores in map(_score_chunk, tasks):
+            parts[arena_index].append((layouts, scores))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for arena_index, layouts, scores in pool.map(_score_chunk, tasks):
+                parts[arena_index].append((layouts, scores))
+
+    return [(np.concatenate([p[0] for p in chunks]), np.concatenate([p[1] for p in chunks]))
+            for chunks in parts]
+
+
+def select_balanced(candidates: Sequence[Tuple[np.ndarray, np.ndarray]],
+                    quality_quantile: float = 0.5) -> List[int]:
+    """
+    Pick one candidate index per arena.
+
+    Args:
+        candidates: (layouts, scores) per arena, as returned by generate_candidates()
+        quality_quantile: Per arena, keep candidates whose min_spacing is at least this
+                          quantile and whose angular_gap is at most the (1 - q) quantile
+
+    Returns:
+        Chosen candidate index per arena
+    """
+    spacing_col = FEATURES.index("min_spacing")
+    gap_col = FEATURES.index("angular_gap")
+    balance_cols = [FEATURES.index(f) for f in BALANCE_FEATURES]
+
+    kept = []
+    for _, scores in candidates:
+        spacing_cut = np.quantile(scores[:, spacing_col], quality_quantile)
+        gap_cut = np.quantile(scores[:, gap_col], 1.0 - quality_quantile)
+        keep = np.flatnonzero((scores[:, spacing_col] >= spacing_cut) & (scores[:, gap_col] <= gap_cut))
+        if len(keep) == 0:
+            keep = np.arange(len(scores))
+        kept.append(keep)
+
+    pooled = np.concatenate([scores[keep][:, balance_cols] for (_, scores), keep in zip(candidates, kept)])
+    target = np.median(pooled, axis=0)
+    scale = pooled.std(axis=0)
+    scale[scale == 0] = 1.0
+
+    chosen = []
+    for (_, scores), keep in zip(candidates, kept):
+        z = (scores[keep][:, balance_cols] - target) / scale
+        chosen.append(int(keep[np.argmin(np.sum(z * z, axis=1))]))
+    return chosen
+
+
+def optimize_layouts(arena_names: Sequence[str], num_targets: int = 5, min_distance: float = 0.3,
+                     candidates: int = 20000, seed=None, workers: Optional[int] = None,
+                     quality_quantile: float = 0.5) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Generate a jointly balanced layout for every arena.
+
+    Returns:
+        ({arena: (num_targets, 2) layout}, {arena: scores in FEATURES order})
+    """
+    arena_names = list(arena_names)
+    results = generate_candidates(len(arena_names), candidates, num_targets, min_distance, seed, workers)
+    chosen = select_balanced(results, quality_quantile)
+    layouts = {name: results[i][0][c] for i, (name, c) in enumerate(zip(arena_names, chosen))}
+    scores = {name: results[i][1][c] for i, (name, c) in enumerate(zip(arena_names, chosen))}
+    return layouts, scores
+
+
+def print_scores(scores: Dict[str, np.ndarray]):
+    """Print the chosen layouts' scores and their spread across arenas."""
+    print(f"{'arena':<12}" + "".join(f"{f:>21}" for f in FEATURES))
+    for name, row in scores.items():
+        print(f"{name:<12}" + "".join(f"{v:>21.3f}" for v in row))
+    table = np.array(list(scores.values()))
+    print(f"{'spread (sd)':<12}" + "".join(f"{v:>21.3f}" for v in table.std(axis=0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate difficulty-balanced target layouts for all arenas')
+    parser.add_argument('--arena-file', default=DEFAULT_ARENA_FILE,
+                       help='Arena CSV providing arena/target names (default: Final_New_Arenas.csv)')
+    parser.add_argument('--output', default=None,
+                       help='CSV to write (default: overwrite --arena-file)')
+    parser.add_argument('--candidates', type=int, default=20000,
+                       help='Candidate layouts per arena (default: 20000)')
+    parser.add_argument('--min-distance', type=float, default=0.3,
+                       help='Minimum distance between targets in meters (default: 0.3)')
+    parser.add_argument('--quality-quantile', type=float, default=0.5,
+                       help='Per-arena quality cutoff quantile (default: 0.5)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Random seed for reproducible layouts')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Print the chosen layouts without writing the CSV')
+    args = parser.parse_args()
+
+    registry = load_registry(args.arena_file, with_sounds=False)
+    if not registry:
+        print(f"Error: No arenas found in {args.arena_file}")
+        return 1
+    num_targets = {len(spec) for spec in registry.values()}
+    if len(num_targets) != 1:
+        print(f"Error: Arenas have different target counts: {sorted(num_targets)}")
+        return 1
+
+    print(f"Optimizing {len(registry)} arenas, {args.candidates} candidates each...")
+    layouts, scores = optimize_layouts(list(registry), num_targets.pop(), args.min_distance,
+                                       args.candidates, args.seed, args.workers, args.quality_quantile)
+    print_scores(scores)
+
+    if args.dry_run:
+        return 0
+
+    rows = []
+    for name, spec in registry.items():
+        for target, hebrew, (x, y) in zip(spec.target_names, spec.hebrew_names, layouts[name]):
+            rows.append([name, target, (x, y), hebrew, spec.hebrew_name])
+    output_file = args.output or args.arena_file
+    write_arena_csv(output_file, rows)
+    print(f"Wrote {output_file} with {len(rows)} targets across {len(registry)} arenas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
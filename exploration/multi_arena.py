@@ -2,13 +2,19 @@ import pygame
 import sys
 import math
 import random
-import time
 import csv
 import os
 import argparse
 from datetime import datetime
 import json
 from pygame import mixer
+from audio_cache import resolve_sound_path
+from arena_registry import load_registry, legacy_tables
+from spatial_index import SpatialIndex
+from audio_system import AudioPlayer, MIXER_PROFILES, DEFAULT_PROFILE, init_mixer, audio_log_filename
+from startup_profile import StartupTimer, report_startup
+from task_clock import make_clock, add_clock_arguments
+from button_box import ButtonBox, button_log_filename
 
 # ---------------------------
 # STANDARDIZED FIXATION CROSS FORMAT:
@@ -22,59 +28,72 @@ from pygame import mixer
 # ---------------------------
 # Parse command line arguments
 # ---------------------------
-parser = argparse.ArgumentParser(description='Multi-Arena Experiment')
-parser.add_argument('mode', choices=['practice', 'fmri'], 
-                   help='Run mode: practice (outside magnet) or fmri (inside magnet)')
-parser.add_argument('--participant', '-p', default='TEST', 
-                   help='Participant initials (default: TEST)')
-parser.add_argument('--run', '-r', type=int, default=1,
-                   help='Run number for fMRI mode (default: 1)')
-parser.add_argument('--trial', '-t', type=int, default=1,
-                   help='Current trial number in sequence (default: 1)')
-parser.add_argument('--total-trials', '-tt', type=int, default=1,
-                   help='Total number of trials in sequence (default: 1)')
-parser.add_argument('--arena', '-a', default='arena1',
-                   help='Arena name to run (default: arena1)')
-parser.add_argument('--visibility', '-v', choices=['full', 'limited', 'none'], default='full',
-                   help='Visibility mode: full, limited, or none (default: full)')
-parser.add_argument('--num-trials', '-n', type=int, default=1,
-                   help='Number of trials to run for this condition (default: 1)')
-parser.add_argument('--arena-number', '-an', type=int, default=1,
-                   help='Arena number within condition (1 or 2) (default: 1)')
-parser.add_argument('--arenas-per-condition', '-apc', type=int, default=2,
-                   help='Total number of arenas per condition (default: 2)')
-parser.add_argument('--screen', '-s', type=int, default=None,
-                   help='Screen number to display on (default: None, uses fullscreen)')
-args = parser.parse_args()
-
-MODE = args.mode
-player_initials = args.participant
-run_number = args.run
-current_trial = args.trial
-total_trials = args.total_trials
-arena_name = args.arena
-visibility_mode = args.visibility
-num_trials = args.num_trials
-arena_number = args.arena_number
-arenas_per_condition = args.arenas_per_condition
-screen_number = args.screen
-TR = 2.01  # Fixed TR for fMRI experiments
-
-# Calculate multi-arena trial number for fMRI mode
-if MODE == 'fmri':
-    # In fMRI mode, trials alternate: snake, multi_arena, snake, multi_arena, etc.
-    # Multi-arena trials occur at positions 2, 4, 6, 8, 10, 12
-    # So trial 2 = multi-arena trial 1, trial 4 = multi-arena trial 2, etc.
-    multi_arena_trial_number = (current_trial + 1) // 2
-    total_multi_arena_trials = 6  # There are 6 multi-arena trials in the run
-else:
-    multi_arena_trial_number = 1
-    total_multi_arena_trials = 1
-
-# Create timestamp for the entire experiment
-EXPERIMENT_TIMESTAMP = time.strftime("%Y%m%d_%H%M%S")
-# Global experiment start time
-EXPERIMENT_START_TIME = time.time()
+def parse_arguments(argv=None):
+    """Startup stage: parse the command line into the session settings."""
+    global MODE, player_initials, run_number, current_trial, total_trials, arena_name, visibility_mode
+    global num_trials, arena_number, arenas_per_condition, screen_number, audio_profile, TR
+    global multi_arena_trial_number, total_multi_arena_trials, EXPERIMENT_TIMESTAMP, EXPERIMENT_START_TIME, clock
+    parser = argparse.ArgumentParser(description='Multi-Arena Experiment')
+    parser.add_argument('mode', choices=['practice', 'fmri'], 
+                       help='Run mode: practice (outside magnet) or fmri (inside magnet)')
+    parser.add_argument('--participant', '-p', default='TEST', 
+                       help='Participant initials (default: TEST)')
+    parser.add_argument('--run', '-r', type=int, default=1,
+                       help='Run number for fMRI mode (default: 1)')
+    parser.add_argument('--trial', '-t', type=int, default=1,
+                       help='Current trial number in sequence (default: 1)')
+    parser.add_argument('--total-trials', '-tt', type=int, default=1,
+                       help='Total number of trials in sequence (default: 1)')
+    parser.add_argument('--arena', '-a', default='arena1',
+                       help='Arena name to run (default: arena1)')
+    parser.add_argument('--visibility', '-v', choices=['full', 'limited', 'none'], default='full',
+                       help='Visibility mode: full, limited, or none (default: full)')
+    parser.add_argument('--num-trials', '-n', type=int, default=1,
+                       help='Number of trials to run for this condition (default: 1)')
+    parser.add_argument('--arena-number', '-an', type=int, default=1,
+                       help='Arena number within condition (1 or 2) (default: 1)')
+    parser.add_argument('--arenas-per-condition', '-apc', type=int, default=2,
+                       help='Total number of arenas per condition (default: 2)')
+    parser.add_argument('--screen', '-s', type=int, default=None,
+                       help='Screen number to display on (default: None, uses fullscreen)')
+    parser.add_argument('--audio-profile', choices=list(MIXER_PROFILES.keys()), default=DEFAULT_PROFILE,
+                       help=f'Mixer profile (buffer size/frequency) (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report the time of each startup stage and of the imports, then exit')
+    add_clock_arguments(parser)
+    args = parser.parse_args(argv)
+    clock = make_clock(args.clock, args.clock_speed)
+
+    MODE = args.mode
+    player_initials = args.participant
+    run_number = args.run
+    current_trial = args.trial
+    total_trials = args.total_trials
+    arena_name = args.arena
+    visibility_mode = args.visibility
+    num_trials = args.num_trials
+    arena_number = args.arena_number
+    arenas_per_condition = args.arenas_per_condition
+    screen_number = args.screen
+    audio_profile = args.audio_profile
+    TR = 2.01  # Fixed TR for fMRI experiments
+
+    # Calculate multi-arena trial number for fMRI mode
+    if MODE == 'fmri':
+        # In fMRI mode, trials alternate: snake, multi_arena, snake, multi_arena, etc.
+        # Multi-arena trials occur at positions 2, 4, 6, 8, 10, 12
+        # So trial 2 = multi-arena trial 1, trial 4 = multi-arena trial 2, etc.
+        multi_arena_trial_number = (current_trial + 1) // 2
+        total_multi_arena_trials = 6  # There are 6 multi-arena trials in the run
+    else:
+        multi_arena_trial_number = 1
+        total_multi_arena_trials = 1
+
+    # Create timestamp for the entire experiment
+    EXPERIMENT_TIMESTAMP = clock.strftime("%Y%m%d_%H%M%S")
+    # Global experiment start time
+    EXPERIMENT_START_TIME = clock.time()
+    return args
 
 # ---------------------------
 # Configuration parameters
@@ -95,6 +114,10 @@ MOVE_SPEED = 1.0
 ROTATE_SPEED = 60.0
 MOVEMENT_FADE_TIME = 0.1  # Time in seconds for movement indicator to fade out
 
+# Phase durations in TRs, the same in practice and fMRI mode (TR is set by parse_arguments)
+EXPLORATION_TRs = 60  # 60 TRs = 120.6 seconds
+ANNOTATION_TRs = 30  # 30 TRs = 60.3 seconds
+
 # Scale factor: pixels per meter
 SCALE = 200
 
@@ -106,26 +129,31 @@ CENTER_SCREEN = (WIN_WIDTH // 2, WIN_HEIGHT // 2)
 # ---------------------------
 # Set up logging files
 # ---------------------------
-# Use centralized results directory if available, otherwise use local results directory
-centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
-if centralized_results_dir and os.path.exists(centralized_results_dir):
-    # Create SubID subfolder in centralized directory
-    results_dir = os.path.join(centralized_results_dir, player_initials)
-    print(f"Using centralized results directory: {results_dir}")
-else:
-    results_dir = os.path.join(os.path.dirname(__file__), "results")
-    print(f"Using local results directory: {results_dir}")
-
-if MODE == 'fmri':
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_FA_fa{current_trial}_continuous.csv")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_FA_fa{current_trial}_discrete.csv")
-else:
-    # Practice mode: Use unified single file approach (no arena-specific suffixes)
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_multi_arena_practice_continuous_log.csv")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_multi_arena_practice_discrete_log.csv")
-
-# Ensure results directory exists
-os.makedirs(results_dir, exist_ok=True)
+def setup_results_files():
+    """Startup stage: choose the results directory and log file names and create the directory."""
+    global results_dir, continuous_filename, discrete_filename, audio_filename, button_filename
+    # Use centralized results directory if available, otherwise use local results directory
+    centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
+    if centralized_results_dir and os.path.exists(centralized_results_dir):
+        # Create SubID subfolder in centralized directory
+        results_dir = os.path.join(centralized_results_dir, player_initials)
+        print(f"Using centralized results directory: {results_dir}")
+    else:
+        results_dir = os.path.join(os.path.dirname(__file__), "results")
+        print(f"Using local results directory: {results_dir}")
+
+    if MODE == 'fmri':
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_FA_fa{current_trial}_continuous.csv")
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_FA_fa{current_trial}_discrete.csv")
+    else:
+        # Practice mode: Use unified single file approach (no arena-specific suffixes)
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_multi_arena_practice_continuous_log.csv")
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_multi_arena_practice_discrete_log.csv")
+    audio_filename = audio_log_filename(continuous_filename)
+    button_filename = button_log_filename(continuous_filename)
+
+    # Ensure results directory exists
+    os.makedirs(results_dir, exist_ok=True)
 
 # ---------------------------
 # Custom Color Palette
@@ -137,6 +165,10 @@ TARGET_COLOR = (0, 217, 192)        # Targets: Turquoise
 ANNOTATION_COLOR = (183, 173, 153)  # Annotation: Khaki
 WHITE = (255, 255, 255)
 
+# Instructions of the annotation phase: choosing a spot, then typing the target's name
+ANNOTATION_INSTRUCTION = "נווט/י למיקום אחת המטרות ולחצ/י RETNE כדי לסמן אותה"
+TYPING_INSTRUCTION = "הקלד/י את שם המטרה ולחצ/י RETNE לאישור"
+
 # ---------------------------
 # Sound paths (portable)
 # ---------------------------
@@ -144,70 +176,58 @@ SOUNDS_DIR = os.path.join(os.path.dirname(__file__), "sounds")
 BEEP_SOUND_PATH = os.path.join(SOUNDS_DIR, "beep.wav")
 
 # ---------------------------
-# Initialize Pygame and Mixer
+# Display
 # ---------------------------
-pygame.init()
-
-# Initialize mixer with explicit settings for consistent audio output
-try:
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512, devicename=None)
-    print("Audio mixer initialized with explicit settings")
-except Exception as e:
-    print(f"Warning: Could not initialize audio with explicit settings: {e}")
-    try:
-        pygame.mixer.init()
-        print("Audio mixer initialized with default settings")
-    except Exception as e2:
-        print(f"Error: Could not initialize audio mixer: {e2}")
-        pygame.mixer.init()
-
-# Create display based on screen parameter
-if screen_number is not None:
-    # Use specified screen number
-    try:
-        # Set the display environment variable for pygame
-        os.environ['DISPLAY'] = f':0.{screen_number}'
-        print(f"Setting display to screen {screen_number}")
-        
-        # Create fullscreen display on specified screen
-        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        screen_info = pygame.display.Info()
-        screen_width = screen_info.current_w
-        screen_height = screen_info.current_h
-        print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
-    except Exception as e:
-        print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
-        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        screen_info = pygame.display.Info()
-        screen_width = screen_info.current_w
-        screen_height = screen_info.current_h
-else:
-    # Use default fullscreen behavior
-    try:
-        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        screen_info = pygame.display.Info()
-        screen_width = screen_info.current_w
-        screen_height = screen_info.current_h
-        print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
-    except Exception as e:
-        print(f"Fullscreen failed, using windowed mode: {e}")
-        screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-        screen_width = WIN_WIDTH
-        screen_height = WIN_HEIGHT
+def init_display():
+    """Startup stage: open the display on the selected screen and create the game surface."""
+    global screen, screen_width, screen_height, offset_x, offset_y, game_surface, button_box
+    # Create display based on screen parameter
+    if screen_number is not None:
+        # Use specified screen number
+        try:
+            # Set the display environment variable for pygame
+            os.environ['DISPLAY'] = f':0.{screen_number}'
+            print(f"Setting display to screen {screen_number}")
+
+            # Create fullscreen display on specified screen
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+            print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
+        except Exception as e:
+            print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+    else:
+        # Use default fullscreen behavior
+        try:
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+            print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
+        except Exception as e:
+            print(f"Fullscreen failed, using windowed mode: {e}")
+            screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+            screen_width = WIN_WIDTH
+            screen_height = WIN_HEIGHT
 
-# Hide cursor for experiment (will be shown during annotation phase)
-pygame.mouse.set_visible(False)
-print("Cursor hidden for experiment (will be shown during annotation phase)")
+    # Hide cursor for experiment (will be shown during annotation phase)
+    pygame.mouse.set_visible(False)
+    print("Cursor hidden for experiment (will be shown during annotation phase)")
 
-# Calculate the offset to center the game area
-offset_x = (screen_width - WIN_WIDTH) // 2
-offset_y = (screen_height - WIN_HEIGHT) // 2
+    # Calculate the offset to center the game area
+    offset_x = (screen_width - WIN_WIDTH) // 2
+    offset_y = (screen_height - WIN_HEIGHT) // 2
 
-# Create a surface for the game content
-game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+    # Create a surface for the game content
+    game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
 
-pygame.display.set_caption("Multi-Arena Experiment")
-clock = pygame.time.Clock()
+    pygame.display.set_caption("Multi-Arena Experiment")
+    button_box = ButtonBox(clock)
 
 # ---------------------------
 # Load sounds
@@ -240,7 +260,7 @@ def load_target_sounds(arena_name):
             sound_path = os.path.join(sounds_dir, filename)
             
             try:
-                sound = pygame.mixer.Sound(sound_path)
+                sound = pygame.mixer.Sound(resolve_sound_path(sound_path))
                 # Store with lowercase key for case-insensitive matching
                 sounds[filename[:-4].lower()] = sound
                 print(f"Loaded sound: {filename}")
@@ -249,115 +269,58 @@ def load_target_sounds(arena_name):
     
     return sounds
 
-try:
-    beep_sound = pygame.mixer.Sound(BEEP_SOUND_PATH)
-except Exception as e:
-    print("Error loading beep sound:", e)
-    beep_sound = None
-
-# Create single dedicated channel for all audio output
-try:
-    pygame.mixer.set_reserved(1)
-    audio_channel = pygame.mixer.Channel(0)
-    print("Audio channel reserved successfully")
-except Exception as e:
-    print(f"Warning: Could not reserve audio channel: {e}")
-    audio_channel = None
+def load_sounds():
+    """Startup stage: load the border beep and reserve the audio channels (target sounds load per arena)."""
+    global beep_sound, audio_player
+    try:
+        beep_sound = pygame.mixer.Sound(resolve_sound_path(BEEP_SOUND_PATH))
+    except Exception as e:
+        print("Error loading beep sound:", e)
+        beep_sound = None
+
+    # Dedicated channels for the border beep and target sounds; every play request is timestamped
+    try:
+        audio_player = AudioPlayer(roles=('beep', 'target'), profile=audio_profile, clock=clock)
+        print("Audio channel pool ready")
+    except Exception as e:
+        print(f"Warning: Could not reserve audio channels: {e}")
+        audio_player = None
 
 # ---------------------------
 # Load arena data
 # ---------------------------
 def load_arena_data():
-    """Load arena data from CSV file."""
-    arenas = {}
-    hebrew_names = {}  # Dictionary to store Hebrew names
-    hebrew_arena_names = {}  # Dictionary to store Hebrew arena names
-    # Try to load from Final_New_Arenas.csv first, then fall back to original Arenas.csv
-    arena_file = os.path.join(os.path.dirname(__file__), "Final_New_Arenas.csv")
+    """Load arena data from the arena registry (compiled, cached parse of the arena CSV)."""
+    registry = load_registry()
     
-    if not os.path.exists(arena_file):
-        # Fall back to original Arenas.csv (correct path name)
-        arena_file = os.path.join(os.path.dirname(__file__), "Arenas.csv")
-        print(f"Using original arena file: {arena_file}")
-    else:
-        print(f"Using new arena file: {arena_file}")
-    
-    if not os.path.exists(arena_file):
-        print(f"Warning: Arena file not found: {arena_file}")
+    if not registry:
         # Create a default arena for testing
-        arenas['default'] = {
+        arenas = {'default': {
             "target1": (1.0, 1.0),
             "target2": (-1.0, 1.0),
             "target3": (0.0, -1.0)
-        }
-        return arenas, hebrew_names, hebrew_arena_names
+        }}
+        return arenas, {}, {}
     
-    with open(arena_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip the header row
-        for row in reader:
-            if len(row) >= 5:
-                # New format with Hebrew arena names
-                arena_name_csv, target_name, coords, hebrew_name, hebrew_arena_name = row
-                # Parse coordinates from string format "(x; y)"
-                coords = coords.strip('()').split(';')
-                if len(coords) == 2:
-                    try:
-                        x, y = float(coords[0]), float(coords[1])
-                        
-                        if arena_name_csv not in arenas:
-                            arenas[arena_name_csv] = {}
-                            hebrew_names[arena_name_csv] = {}
-                        arenas[arena_name_csv][target_name] = (x, y)
-                        hebrew_names[arena_name_csv][target_name] = hebrew_name
-                        hebrew_arena_names[arena_name_csv] = hebrew_arena_name
-                    except ValueError:
-                        print(f"Warning: Could not parse coordinates: {coords}")
-            elif len(row) >= 4:
-                # Handle 4-column format (without Hebrew arena names)
-                arena_name_csv, target_name, coords, hebrew_name = row
-                # Parse coordinates from string format "(x; y)"
-                coords = coords.strip('()').split(';')
-                if len(coords) == 2:
-                    try:
-                        x, y = float(coords[0]), float(coords[1])
-                        
-                        if arena_name_csv not in arenas:
-                            arenas[arena_name_csv] = {}
-                            hebrew_names[arena_name_csv] = {}
-                        arenas[arena_name_csv][target_name] = (x, y)
-                        hebrew_names[arena_name_csv][target_name] = hebrew_name
-                    except ValueError:
-                        print(f"Warning: Could not parse coordinates: {coords}")
-            elif len(row) >= 3:
-                # Handle old 3-column format for backward compatibility
-                arena_name_csv, target_name, coords = row
-                # Parse coordinates from string format "(x; y)"
-                coords = coords.strip('()').split(';')
-                if len(coords) == 2:
-                    try:
-                        x, y = float(coords[0]), float(coords[1])
-                        
-                        if arena_name_csv not in arenas:
-                            arenas[arena_name_csv] = {}
-                            hebrew_names[arena_name_csv] = {}
-                        arenas[arena_name_csv][target_name] = (x, y)
-                        hebrew_names[arena_name_csv][target_name] = target_name  # Use English name as fallback
-                    except ValueError:
-                        print(f"Warning: Could not parse coordinates: {coords}")
-    return arenas, hebrew_names, hebrew_arena_names
+    return legacy_tables(registry)
 
 # ---------------------------
 # Helper functions
 # ---------------------------
+_font_cache = {}
+
 def get_hebrew_font(size):
-    """Load custom font supporting Hebrew."""
+    """Load custom font supporting Hebrew (cached per size; draw functions call this every frame)."""
+    if size in _font_cache:
+        return _font_cache[size]
     try:
         font_path = os.path.join(os.path.dirname(__file__), "fonts", "Gisha.ttf")
-        return pygame.font.Font(font_path, size)
+        font = pygame.font.Font(font_path, size)
     except Exception as e:
         print(f"Could not load custom font, using default. Error: {e}")
-        return pygame.font.SysFont("Arial", size)
+        font = pygame.font.SysFont("Arial", size)
+    _font_cache[size] = font
+    return font
 
 def render_hebrew_text(font, text, color):
     """Render Hebrew text with proper right-to-left handling."""
@@ -414,11 +377,11 @@ def draw_player_avatar(player_pos, player_angle, color=AVATAR_COLOR):
 
 def draw_targets(targets, show_names=False, hebrew_names=None):
     """Draw all targets and optionally their names."""
+    font = get_hebrew_font(16) if show_names else None
     for target_name, target_pos in targets.items():
         target_screen = to_screen_coords(target_pos)
         pygame.draw.circle(game_surface, TARGET_COLOR, target_screen, int(TARGET_RADIUS * SCALE))
         if show_names:
-            font = get_hebrew_font(16)
             # Use Hebrew name if available, otherwise use English name
             display_name = target_name
             if hebrew_names and target_name in hebrew_names:
@@ -448,7 +411,7 @@ def draw_annotations(annotations, current_pos=None, typing_active=False, current
         # Draw outlined circle for current selection
         pygame.draw.circle(game_surface, ANNOTATION_COLOR, target_screen, int(ANNOTATION_RADIUS * SCALE), 2)
         # Draw a pulsing effect
-        pulse_radius = int(ANNOTATION_RADIUS * SCALE * (1 + 0.2 * math.sin(time.time() * 5)))
+        pulse_radius = int(ANNOTATION_RADIUS * SCALE * (1 + 0.2 * math.sin(clock.time() * 5)))
         pygame.draw.circle(game_surface, ANNOTATION_COLOR, target_screen, pulse_radius, 1)
         
         # Draw current name being typed above the selection
@@ -606,6 +569,7 @@ def draw_arena_intro(arena_name, arena_num, total_arenas, num_targets, hebrew_ar
     waiting = True
     print("Arena intro displayed, waiting for Enter key press...")
     while waiting:
+        clock.poll()  # Lets a virtual clock move on; no-op on the real clock
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -620,8 +584,8 @@ def draw_arena_intro(arena_name, arena_num, total_arenas, num_targets, hebrew_ar
                     # Log the Enter key press in continuous log if provided
                     if continuous_log is not None:
                         entry = {
-                            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                            "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                            "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                             "RoundName": arena_name,
                             "visibility": "none",  # No visibility during intro
                             "phase": "intro",
@@ -663,8 +627,8 @@ def show_image(image_path, duration=None, continuous_log=None, trial_info=None):
     
     if duration is not None:
         # Wait for specified duration
-        start_time = time.time()
-        while time.time() - start_time < duration:
+        start_time = clock.time()
+        while clock.time() - start_time < duration:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -679,6 +643,7 @@ def show_image(image_path, duration=None, continuous_log=None, trial_info=None):
         waiting = True
         print("Press '1' or ENTER to continue...")
         while waiting:
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -693,8 +658,8 @@ def show_image(image_path, duration=None, continuous_log=None, trial_info=None):
                         # Log the Enter key press in continuous log if provided
                         if continuous_log is not None and trial_info is not None:
                             entry = {
-                                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                                "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                                "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                                 "RoundName": trial_info,
                                 "visibility": "none",  # No visibility during instruction
                                 "phase": "instruction",
@@ -732,9 +697,9 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     
     # Log fixation start event if continuous_log is provided
     if continuous_log is not None:
-        fixation_start_time = time.time()
+        fixation_start_time = clock.time()
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "RoundName": trial_info if trial_info else "fixation",
             "visibility": "none",  # No visibility during fixation
@@ -747,8 +712,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
         continuous_log.append(entry)
     
     # Wait for specified duration
-    start_time = time.time()
-    while time.time() - start_time < duration:
+    start_time = clock.time()
+    while clock.time() - start_time < duration:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -762,8 +727,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
                     # Log fixation end event if continuous_log is provided
                     if continuous_log is not None:
                         entry = {
-                            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                            "trial_time": time.time() - start_time,
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                            "trial_time": clock.time() - start_time,
                             "RoundName": trial_info if trial_info else "fixation",
                             "visibility": "none",
                             "phase": "fixation",
@@ -779,7 +744,7 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     # Log fixation end event if continuous_log is provided
     if continuous_log is not None:
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": duration,
             "RoundName": trial_info if trial_info else "fixation",
             "visibility": "none",
@@ -849,18 +814,18 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
     player_pos = [0.0, 0.0]
     player_angle = 0.0
     phase = "exploration"
-    exploration_start_time = time.time()  # For annotation timing only
+    exploration_start_time = clock.time()  # For annotation timing only
     annotation_start_time = None
     found_targets = set()
     annotations = {}
     current_annotation_pos = None
     current_annotation_name = ""
     typing_active = False
-    beep_channel = None
-    target_audio_channel = None  # Separate channel for target sounds
-    global audio_channel  # Use global audio_channel for beep sounds
+    finished_button_rect = None
     last_encounter_times = {name: 0 for name in targets.keys()}
     ENCOUNTER_COOLDOWN = 1.0
+    # Built once per arena; each frame only checks targets in the grid cells around the player
+    target_index = SpatialIndex.from_targets(targets, cell_size=2 * TARGET_RADIUS)
     continuous_log = []
     discrete_log = []
     distance_moved = 0.0
@@ -872,36 +837,26 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
     rotation_start_angle = None
     movement_stop_time = None
     rotation_stop_time = None
-    last_log_time = time.time()
+    last_log_time = clock.time()
     LOG_INTERVAL = 0.1
     # Track initial visibility state
     trial_started = False
     first_movement_occurred = False
-    # Set exploration time based on mode
-    if MODE == 'practice':
-        # Practice mode: Same TR-aligned durations as fMRI mode
-        EXPLORATION_TRs = 60  # 60 TRs = 120.6 seconds
-        exploration_time = EXPLORATION_TRs * TR
-        # Annotation time: 1 minute aligned to TRs
-        ANNOTATION_TRs = 30  # 30 TRs = 60.3 seconds
-        annotation_time = ANNOTATION_TRs * TR
-    else:
-        # fMRI mode: Use TR-aligned durations
-        # Convert to TRs: 120 seconds = 60 TRs, use 60 TRs for exploration
-        EXPLORATION_TRs = 60  # 60 TRs = 120.6 seconds
-        exploration_time = EXPLORATION_TRs * TR
-        # Annotation time: 1 minute aligned to TRs
-        ANNOTATION_TRs = 30  # 30 TRs = 60.3 seconds
-        annotation_time = ANNOTATION_TRs * TR
+    # TR-aligned phase durations (the same in practice and fMRI mode)
+    exploration_time = EXPLORATION_TRs * TR
+    # Annotation time: 1 minute aligned to TRs
+    annotation_time = ANNOTATION_TRs * TR
+    # Button-box keys are tracked from timestamped events (see button_box.py)
+    button_box.reset()
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0
-        current_time = time.time()
+        clock.tick(60, idle=button_box.pump)  # Frame cap; key events are timestamped while waiting
+        current_time = clock.time()
         experiment_time = current_time - EXPERIMENT_START_TIME
         if experiment_time - (last_log_time - EXPERIMENT_START_TIME) >= LOG_INTERVAL:
             log_entry = {
                 "RoundName": arena_name,
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": round(current_time - EXPERIMENT_START_TIME, 3),
                 "visibility": visibility,
                 "phase": phase,
@@ -913,12 +868,12 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
             continuous_log.append(log_entry)
             save_logs([], [log_entry], player_initials, append=True)
             last_log_time = current_time
-        for event in pygame.event.get():
+        for event in button_box.frame():
             if event.type == pygame.QUIT:
                 quit_log = {
                     "RoundName": arena_name,
-                    "RealTime": round(time.time() - EXPERIMENT_START_TIME, 3),
-                    "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                    "RealTime": round(clock.time() - EXPERIMENT_START_TIME, 3),
+                    "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                     "visibility": visibility,
                     "phase": phase,
                     "event": "quit",
@@ -934,8 +889,8 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                 if event.key == pygame.K_q:
                     quit_log = {
                         "RoundName": arena_name,
-                        "RealTime": round(time.time() - EXPERIMENT_START_TIME, 3),
-                        "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                        "RealTime": round(clock.time() - EXPERIMENT_START_TIME, 3),
+                        "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                         "visibility": visibility,
                         "phase": phase,
                         "event": "quit",
@@ -960,7 +915,7 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                 elif event.key == pygame.K_2:  # Use 2 key to skip timer (debugging)
                     if phase == "exploration":
                         # Skip timer by setting exploration time to 0
-                        exploration_start_time = time.time() - exploration_time
+                        exploration_start_time = clock.time() - exploration_time
                 elif event.key == pygame.K_1 or event.key == pygame.K_RETURN:  # Use 1 or ENTER key for annotation functionality
                     if phase == "annotation":
                         if current_annotation_pos is None:
@@ -976,14 +931,14 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                                         "RoundName": arena_name,
                                         "TypedName": current_annotation_name,
                                         "ChosenPosition": pos_key,
-                                        "TimeToAnnotation": round(time.time() - annotation_start_time, 3)
+                                        "TimeToAnnotation": round(clock.time() - annotation_start_time, 3)
                                     }
                                     discrete_log.append(discrete_entry)
                                     save_logs([discrete_entry], [], player_initials, append=True)
                                     annotation_log = {
                                         "RoundName": arena_name,
-                                        "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                                        "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                                        "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                                        "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                                         "phase": phase,
                                         "event": f"{current_annotation_name}_annotated",
                                         "x": round(player_pos[0], 3),
@@ -1006,7 +961,7 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
             
             # Handle mouse clicks for the Finished button
             if event.type == pygame.MOUSEBUTTONDOWN and phase == "annotation":
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = event.pos
                 # Adjust mouse position for screen offset
                 adjusted_mouse_pos = (mouse_pos[0] - offset_x, mouse_pos[1] - offset_y)
                 if finished_button_rect.collidepoint(adjusted_mouse_pos):
@@ -1019,14 +974,14 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                                 "RoundName": arena_name,
                                 "TypedName": current_annotation_name,
                                 "ChosenPosition": pos_key,
-                                "TimeToAnnotation": round(time.time() - annotation_start_time, 3)
+                                "TimeToAnnotation": round(clock.time() - annotation_start_time, 3)
                             }
                             discrete_log.append(discrete_entry)
                             save_logs([discrete_entry], [], player_initials, append=True)
                             annotation_log = {
                                 "RoundName": arena_name,
-                                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                                "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                                "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                                 "phase": phase,
                                 "event": f"{current_annotation_name}_annotated",
                                 "x": round(player_pos[0], 3),
@@ -1040,8 +995,8 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                     # Log finish button press
                     finish_log = {
                         "RoundName": arena_name,
-                        "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                        "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                        "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                        "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                         "visibility": visibility,
                         "phase": "annotation",
                         "event": "finish_press",
@@ -1056,10 +1011,11 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                         running = False
                     else:
                         phase = "feedback"
-                        feedback_start_time = time.time()
+                        feedback_start_time = clock.time()
         
         # Handle movement with number keys - compatible with MRI control box
-        keys = pygame.key.get_pressed()
+        # Each key moves for the time it was actually held during the frame
+        keys = button_box
         
         if phase in ["exploration", "annotation"]:
             old_pos = list(player_pos)  # Store old position
@@ -1067,7 +1023,7 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
             
             # Rotation controls
             if keys[pygame.K_7]:  # Rotate left
-                player_angle = (player_angle - ROTATE_SPEED * dt) % 360
+                player_angle = (player_angle - ROTATE_SPEED * button_box.held(pygame.K_7)) % 360
                 # Reset rotation tracking if starting new rotation
                 if not is_rotating or rotation_stop_time is not None:
                     angle_rotated = 0.0
@@ -1076,7 +1032,7 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                 if rotation_start_angle is None:
                     rotation_start_angle = player_angle
             if keys[pygame.K_0]:  # Rotate right
-                player_angle = (player_angle + ROTATE_SPEED * dt) % 360
+                player_angle = (player_angle + ROTATE_SPEED * button_box.held(pygame.K_0)) % 360
                 # Reset rotation tracking if starting new rotation
                 if not is_rotating or rotation_stop_time is not None:
                     angle_rotated = 0.0
@@ -1088,8 +1044,8 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
             # Movement controls
             if keys[pygame.K_8]:  # Move forward
                 rad = math.radians(player_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_8) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_8) * math.cos(rad)
                 new_x = player_pos[0] + dx
                 new_y = player_pos[1] + dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
@@ -1103,8 +1059,8 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                     
             if keys[pygame.K_9]:  # Move backward
                 rad = math.radians(player_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_9) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_9) * math.cos(rad)
                 new_x = player_pos[0] - dx
                 new_y = player_pos[1] - dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
@@ -1165,55 +1121,51 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
         
         # Check border collision
         if math.hypot(player_pos[0], player_pos[1]) >= (ARENA_RADIUS - BORDER_THRESHOLD):
-            if beep_sound is not None:
-                if audio_channel is None or not audio_channel.get_busy():
-                    audio_channel = beep_sound.play(loops=-1)
+            if beep_sound is not None and audio_player is not None:
+                if not audio_player.is_busy('beep'):
+                    audio_player.play('beep', beep_sound, name='beep', loops=-1)
         else:
-            if audio_channel is not None:
-                audio_channel.stop()
-                audio_channel = None
+            if audio_player is not None and audio_player.is_busy('beep'):
+                audio_player.stop('beep')
         
         # Check target encounters
         if phase == "exploration":
-            for target_name, target_pos in targets.items():
-                if distance(player_pos, target_pos) <= TARGET_RADIUS:
-                    # Check if enough time has passed since last encounter
-                    if current_time - last_encounter_times[target_name] >= ENCOUNTER_COOLDOWN:
-                        if target_name not in found_targets:
-                            found_targets.add(target_name)
-                            # Log first encounter
-                            encounter_log = {
-                                "RoundName": arena_name,
-                                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                                "trial_time": round(current_time - EXPERIMENT_START_TIME, 3),
-                                "visibility": visibility,
-                                "phase": "exploration",
-                                "event": f"found_{target_name}",
-                                "x": round(player_pos[0], 3),
-                                "y": round(player_pos[1], 3),
-                                "rotation_angle": round(player_angle, 3)
-                            }
-                            continuous_log.append(encounter_log)
-                            save_logs([], [encounter_log], player_initials, append=True)
+            for target_name in target_index.query_labels(player_pos, TARGET_RADIUS):
+                # Check if enough time has passed since last encounter
+                if current_time - last_encounter_times[target_name] >= ENCOUNTER_COOLDOWN:
+                    if target_name not in found_targets:
+                        found_targets.add(target_name)
+                        # Log first encounter
+                        encounter_log = {
+                            "RoundName": arena_name,
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                            "trial_time": round(current_time - EXPERIMENT_START_TIME, 3),
+                            "visibility": visibility,
+                            "phase": "exploration",
+                            "event": f"found_{target_name}",
+                            "x": round(player_pos[0], 3),
+                            "y": round(player_pos[1], 3),
+                            "rotation_angle": round(player_angle, 3)
+                        }
+                        continuous_log.append(encounter_log)
+                        save_logs([], [encounter_log], player_initials, append=True)
                         
-                        # Play sound for any encounter - use lowercase for case-insensitive matching
-                        target_name_lower = target_name.lower()
-                        if target_name_lower in target_sounds:
-                            try:
-                                # Use a separate channel for target sounds to avoid conflicts with beep
-                                if target_audio_channel is None or not target_audio_channel.get_busy():
-                                    target_audio_channel = target_sounds[target_name_lower].play()
-                                    print(f"Playing sound for {target_name}")
-                                else:
-                                    # If channel is busy, stop current sound and play new one
-                                    target_audio_channel.stop()
-                                    target_audio_channel = target_sounds[target_name_lower].play()
-                                    print(f"Playing sound for {target_name} (replaced previous)")
-                            except Exception as e:
-                                print(f"Error playing sound for {target_name}: {e}")
-                        else:
-                            print(f"Warning: No sound found for {target_name} (tried {target_name_lower})")
-                        last_encounter_times[target_name] = current_time
+                    # Play sound for any encounter - use lowercase for case-insensitive matching
+                    target_name_lower = target_name.lower()
+                    if audio_player is None:
+                        print(f"Audio disabled, not playing sound for {target_name}")
+                    elif target_name_lower in target_sounds:
+                        try:
+                            # Target sounds have their own channel so they never cut the beep;
+                            # a new target sound replaces one that is still playing
+                            replaced = audio_player.is_busy('target')
+                            audio_player.play('target', target_sounds[target_name_lower], name=target_name)
+                            print(f"Playing sound for {target_name}{' (replaced previous)' if replaced else ''}")
+                        except Exception as e:
+                            print(f"Error playing sound for {target_name}: {e}")
+                    else:
+                        print(f"Warning: No sound found for {target_name} (tried {target_name_lower})")
+                    last_encounter_times[target_name] = current_time
         
         # Draw everything
         screen.fill(BACKGROUND_COLOR)
@@ -1263,15 +1215,15 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                 player_pos = [0.0, 0.0]
                 player_angle = 0.0
                 phase = "annotation"
-                annotation_start_time = time.time()
+                annotation_start_time = clock.time()
                 
                 # Show cursor for annotation phase
                 pygame.mouse.set_visible(True)
                 
                 phase_change_log = {
                     "RoundName": arena_name,
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                    "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                    "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                     "visibility": visibility,
                     "phase": phase,
                     "event": "phase_change",
@@ -1315,8 +1267,8 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                     # fMRI: end trial immediately (no feedback phase)
                     phase_change_log = {
                         "RoundName": arena_name,
-                        "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                        "trial_time": round(time.time() - EXPERIMENT_START_TIME, 3),
+                        "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                        "trial_time": round(clock.time() - EXPERIMENT_START_TIME, 3),
                         "visibility": visibility,
                         "phase": "annotation",
                         "event": "annotation_time_elapsed",
@@ -1332,9 +1284,9 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
                     running = False
             
             if typing_active:
-                draw_instruction("הקלד/י את שם המטרה ולחצ/י RETNE לאישור")
+                draw_instruction(TYPING_INSTRUCTION)
             else:
-                draw_instruction("נווט/י למיקום אחת המטרות ולחצ/י RETNE כדי לסמן אותה")
+                draw_instruction(ANNOTATION_INSTRUCTION)
         
         elif phase == "feedback" and MODE != 'fmri':
             draw_feedback(targets, annotations, hebrew_names)
@@ -1363,16 +1315,17 @@ def run_arena(arena_name, targets, arena_num, total_arenas, visibility="full", h
             debug_surface = font.render(debug_display, True, (0, 255, 0))
             game_surface.blit(debug_surface, (10, WIN_HEIGHT - 50))
         
+        # What this frame shows, for observers such as synthetic_participant.py
+        button_box.show(phase=phase, player_pos=player_pos, player_angle=player_angle, targets=targets,
+                        found_targets=found_targets, hebrew_names=hebrew_names, typing_active=typing_active,
+                        finish_button=finished_button_rect.move(offset_x, offset_y)
+                        if finished_button_rect is not None and phase == "annotation" and MODE == 'practice' else None)
         screen.blit(game_surface, (offset_x, offset_y))
         pygame.display.flip()
     
     # Stop all sounds when trial ends
-    if beep_channel is not None:
-        beep_channel.stop()
-    if target_audio_channel is not None:
-        target_audio_channel.stop()
-    if audio_channel is not None:
-        audio_channel.stop()
+    if audio_player is not None:
+        audio_player.stop_all()
     
     # Hide cursor when trial ends
     pygame.mouse.set_visible(False)
@@ -1475,7 +1428,7 @@ def run_multi_arena_experiment():
             trigger_time = float(trigger_received_time)
             # Log trigger received event
             trigger_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": 0.0,
                 "RoundName": f"{arena_name}_test_run{run_number}",
                 "visibility": "none",
@@ -1497,7 +1450,7 @@ def run_multi_arena_experiment():
         # Log fixation start event
         trial_info = f"{arena_name}_test_run{run_number}"
         fixation_start_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "RoundName": trial_info,
             "visibility": "none",  # No visibility during fixation
@@ -1510,8 +1463,8 @@ def run_multi_arena_experiment():
         fixation_logs.append(fixation_start_entry)
         
         # Show fixation for the determined number of TRs (no frame-by-frame logging)
-        fixation_start_time = time.time()
-        while time.time() - fixation_start_time < (fixation_trs * TR):
+        fixation_start_time = clock.time()
+        while clock.time() - fixation_start_time < (fixation_trs * TR):
             screen.fill(BACKGROUND_COLOR)
             game_surface.fill(BACKGROUND_COLOR)
             
@@ -1525,6 +1478,7 @@ def run_multi_arena_experiment():
             
             screen.blit(game_surface, (offset_x, offset_y))
             pygame.display.flip()
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             
             # Check for ESC key to exit
             for event in pygame.event.get():
@@ -1534,7 +1488,7 @@ def run_multi_arena_experiment():
         
         # Log fixation end event
         fixation_end_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": fixation_trs * TR,
             "RoundName": trial_info,
             "visibility": "none",
@@ -1556,7 +1510,7 @@ def run_multi_arena_experiment():
         # Show arena intro screen before running the arena
         draw_arena_intro(arena_name, multi_arena_trial_number, total_multi_arena_trials, len(targets), hebrew_arena_names, continuous_log=fixation_logs)
         
-        trial_start_time = time.time()
+        trial_start_time = clock.time()
         discrete_log, continuous_log = run_arena(f"{arena_name}_test_run{run_number}", targets, 1, 1, visibility="no_visibility", hebrew_names=arena_hebrew_names)
         
         # Add fixation logs to the beginning of continuous_log
@@ -1565,7 +1519,7 @@ def run_multi_arena_experiment():
         # TR alignment: Show fixation until end of current TR
         if MODE == 'fmri' and current_trial < total_trials:
             print('TR alignment: Showing fixation until end of current TR...')
-            current_time = time.time()
+            current_time = clock.time()
             elapsed_TRs = int((current_time - trial_start_time) / TR)
             next_TR_start = trial_start_time + ((elapsed_TRs + 1) * TR)
             
@@ -1576,7 +1530,7 @@ def run_multi_arena_experiment():
                 
                 # Log TR alignment fixation start event
                 tr_fixation_start_entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                     "trial_time": current_time - trial_start_time,
                     "RoundName": trial_info,
                     "visibility": "none",
@@ -1589,7 +1543,7 @@ def run_multi_arena_experiment():
                 continuous_log.append(tr_fixation_start_entry)
                 
                 # Show TR alignment fixation (no frame-by-frame logging)
-                while time.time() < next_TR_start:
+                while clock.time() < next_TR_start:
                     screen.fill(BACKGROUND_COLOR)
                     game_surface.fill(BACKGROUND_COLOR)
                     
@@ -1602,6 +1556,7 @@ def run_multi_arena_experiment():
                     game_surface.blit(fixation_text, text_rect)
                     screen.blit(game_surface, (offset_x, offset_y))
                     pygame.display.flip()
+                    clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                     
                     # Check for ESC key to exit
                     for event in pygame.event.get():
@@ -1611,8 +1566,8 @@ def run_multi_arena_experiment():
                 
                 # Log TR alignment fixation end event
                 tr_fixation_end_entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                    "trial_time": time.time() - trial_start_time,
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                    "trial_time": clock.time() - trial_start_time,
                     "RoundName": trial_info,
                     "visibility": "none",
                     "phase": "fixation",
@@ -1631,8 +1586,8 @@ def run_multi_arena_experiment():
                 
                 # Log final fixation start event
                 final_fixation_start_entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                    "trial_time": time.time() - trial_start_time,
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                    "trial_time": clock.time() - trial_start_time,
                     "RoundName": trial_info,
                     "visibility": "none",
                     "phase": "fixation",
@@ -1644,8 +1599,8 @@ def run_multi_arena_experiment():
                 continuous_log.append(final_fixation_start_entry)
                 
                 # Show 4 TRs fixation
-                final_fixation_start_time = time.time()
-                while time.time() - final_fixation_start_time < (4 * TR):
+                final_fixation_start_time = clock.time()
+                while clock.time() - final_fixation_start_time < (4 * TR):
                     screen.fill(BACKGROUND_COLOR)
                     game_surface.fill(BACKGROUND_COLOR)
                     
@@ -1658,6 +1613,7 @@ def run_multi_arena_experiment():
                     game_surface.blit(fixation_text, text_rect)
                     screen.blit(game_surface, (offset_x, offset_y))
                     pygame.display.flip()
+                    clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                     
                     # Check for ESC key to exit
                     for event in pygame.event.get():
@@ -1667,8 +1623,8 @@ def run_multi_arena_experiment():
                 
                 # Log final fixation end event
                 final_fixation_end_entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                    "trial_time": time.time() - trial_start_time,
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                    "trial_time": clock.time() - trial_start_time,
                     "RoundName": trial_info,
                     "visibility": "none",
                     "phase": "fixation",
@@ -1689,12 +1645,55 @@ def run_multi_arena_experiment():
         # Save logs after all fixation data is included
         save_logs(discrete_log, continuous_log, player_initials)
     
+    # Save timestamped audio play requests and button presses (practice mode appends across arenas)
+    if audio_player is not None:
+        audio_player.save_events(audio_filename, append=(MODE == 'practice'))
+    button_box.save_events(button_filename, append=(MODE == 'practice'))
+    
     print(f"Multi-arena experiment complete!")
     if MODE == 'fmri':
         print(f"Trial {current_trial}/{total_trials} completed")
     print(f"Data saved to: {continuous_filename}")
 
-if __name__ == "__main__":
+# ---------------------------
+# Startup
+# ---------------------------
+# Import only defines constants and functions; setup() runs the startup stages in order
+STARTUP_BUDGET = {  # seconds per stage, one second in total (see startup_profile.py)
+    "interpreter": 0.05,
+    "imports": 0.50,
+    "arguments": 0.01,
+    "results files": 0.01,
+    "mixer": 0.15,
+    "pygame": 0.05,
+    "display": 0.20,
+    "sounds": 0.03,
+}
+
+
+def setup(argv=None):
+    """Run the startup stages; returns (parsed arguments, StartupTimer with the time of each stage)."""
+    timer = StartupTimer()
+    args = timer.run("arguments", parse_arguments, argv)
+    timer.run("results files", setup_results_files)
+    # Initialize mixer with the selected profile for consistent audio output; before
+    # pygame.init(), which would otherwise open it with pygame's defaults
+    timer.run("mixer", init_mixer, audio_profile)
+    timer.run("pygame", pygame.init)
+    timer.run("display", init_display)
+    timer.run("sounds", load_sounds)
+    return args, timer
+
+
+def main(argv=None):
+    args, timer = setup(argv)
+    if args.profile_startup:
+        over_budget = report_startup("multi_arena", timer, STARTUP_BUDGET)
+        pygame.quit()
+        return 1 if over_budget else 0
     run_multi_arena_experiment()
     pygame.quit()
-    sys.exit() 
\ No newline at end of file
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main()) 
\ No newline at end of file
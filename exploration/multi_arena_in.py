@@ -7,6 +7,7 @@ Usage: python multi_arena_in.py [participant_id] [run_number] [trial_number] [to
 import sys
 import subprocess
 import os
+from task_clock import make_clock
 
 def main():
     # Get parameters from command line
@@ -59,9 +60,9 @@ def main():
         print(f"Display will be on screen: {screen_number}")
     print(f"Command: {' '.join(cmd)}")
     
-    # Run the command
+    # Run the command on the caller's task clock (TASK_CLOCK, see task_clock.py)
     try:
-        result = subprocess.run(cmd, check=True)
+        result = make_clock().run(cmd, check=True)
         print("Multi-arena fMRI session completed successfully.")
     except subprocess.CalledProcessError as e:
         print(f"Error running multi_arena fMRI session: {e}")
@@ -7,6 +7,7 @@ Usage: python multi_arena_out.py [participant_id] [arena_name] [screen_number]
 import sys
 import subprocess
 import os
+from task_clock import make_clock
 
 def main():
     # Get participant ID from command line or input
@@ -48,9 +49,9 @@ def main():
         print(f"Display will be on screen: {screen_number}")
     print(f"Command: {' '.join(cmd)}")
     
-    # Run the command
+    # Run the command on the caller's task clock (TASK_CLOCK, see task_clock.py)
     try:
-        result = subprocess.run(cmd, check=True)
+        result = make_clock().run(cmd, check=True)
         print("Multi-arena practice session completed successfully.")
     except subprocess.CalledProcessError as e:
         print(f"Error running multi_arena practice session: {e}")
@@ -2,12 +2,16 @@ import pygame
 import sys
 import math
 import random
-import time
 import csv
 import os
 import argparse
 from datetime import datetime
 import json
+from audio_cache import resolve_sound_path
+from audio_system import AudioPlayer, MIXER_PROFILES, DEFAULT_PROFILE, init_mixer, audio_log_filename
+from startup_profile import StartupTimer, report_startup
+from task_clock import make_clock, add_clock_arguments
+from button_box import ButtonBox, button_log_filename
 import argparse
 
 # ---------------------------
@@ -71,6 +75,13 @@ CLOCK_COLOR = (183, 173, 153)       # Clock rotation, Annotation and Feedback av
 WHITE = (255, 255, 255)
 DEBUG_COLOR = (50, 50, 255)
 
+# Instruction under the arena in each phase
+INSTRUCTIONS = {
+    "exploration": "למעבר סימון המטרה לחצ/י RETNE",
+    "annotation": "נווט/י למיקום המטרה ולאישור לחצ/י RETNE",
+    "feedback": "לחצ/י RETNE להמשך",
+}
+
 # ---------------------------
 # Sounds (Experiment)
 # ---------------------------
@@ -88,63 +99,73 @@ TEST_TRIALS = 3  # Changed from 5 to 3 for practice mode
 # ---------------------------
 # Parse command line arguments
 # ---------------------------
-parser = argparse.ArgumentParser(description='One Target Experiment')
-parser.add_argument('mode', choices=['practice', 'fmri'], 
-                   help='Run mode: practice (outside magnet) or fmri (inside magnet)')
-parser.add_argument('--participant', '-p', default='TEST', 
-                   help='Participant initials (default: TEST)')
-parser.add_argument('--run', '-r', type=int, default=1,
-                   help='Run number for fMRI mode (default: 1)')
-parser.add_argument('--trial', '-t', type=int, default=1,
-                   help='Current trial number in sequence (default: 1)')
-parser.add_argument('--total-trials', '-tt', type=int, default=1,
-                   help='Total number of trials in sequence (default: 1)')
-parser.add_argument('--screen', '-s', type=int, default=None,
-                   help='Screen number to display on (default: None, uses fullscreen)')
-args = parser.parse_args()
-
-MODE = args.mode
-player_initials = args.participant
-run_number = args.run
-current_trial = args.trial
-total_trials = args.total_trials
-screen_number = args.screen
-TR = 2.01  # Fixed TR for fMRI experiments
-
-# TR-aligned trial duration for fMRI mode
-if MODE == 'fmri':
-    # fMRI mode: Use random TR-aligned durations (8-13 seconds until target placement)
-    # Convert to TRs: 8-13 seconds = 4-6.5 TRs, use 4-6 TRs
-    EXPLORATION_TRs = random.randint(4, 6)  # 4-6 TRs = 8.04-12.06 seconds
-    EXPLORATION_DURATION = EXPLORATION_TRs * TR
-else:
-    # Practice mode: Same random TR-aligned durations as fMRI mode
-    EXPLORATION_TRs = random.randint(4, 6)  # 4-6 TRs = 8.04-12.06 seconds
-    EXPLORATION_DURATION = EXPLORATION_TRs * TR
-
-# Annotation phase timer (20 seconds aligned to TRs)
-ANNOTATION_TRs = 10  # 10 TRs = 20.1 seconds (close to 20 seconds)
-ANNOTATION_DURATION = ANNOTATION_TRs * TR
-
-# Adjust parameters based on mode
-if MODE == 'fmri':
-    # fMRI mode: only test trials, single run
-    TRAINING_SESSIONS = 0
-    DARK_TRAINING_TRIALS = 0
-    TEST_TRIALS = 1
-    # Use centralized results directory if available, otherwise use local results directory
-    centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
-    if centralized_results_dir and os.path.exists(centralized_results_dir):
-        # Create SubID subfolder in centralized directory
-        results_dir = os.path.join(centralized_results_dir, player_initials)
-        print(f"Using centralized results directory: {results_dir}")
+def parse_arguments(argv=None):
+    """Startup stage: parse the command line into the session settings."""
+    global MODE, player_initials, run_number, current_trial, total_trials, screen_number, audio_profile, TR
+    global EXPLORATION_TRs, EXPLORATION_DURATION, ANNOTATION_TRs, ANNOTATION_DURATION
+    global TRAINING_SESSIONS, DARK_TRAINING_TRIALS, TEST_TRIALS, DEBUG_MODE, clock
+    parser = argparse.ArgumentParser(description='One Target Experiment')
+    parser.add_argument('mode', choices=['practice', 'fmri'], 
+                       help='Run mode: practice (outside magnet) or fmri (inside magnet)')
+    parser.add_argument('--participant', '-p', default='TEST', 
+                       help='Participant initials (default: TEST)')
+    parser.add_argument('--run', '-r', type=int, default=1,
+                       help='Run number for fMRI mode (default: 1)')
+    parser.add_argument('--trial', '-t', type=int, default=1,
+                       help='Current trial number in sequence (default: 1)')
+    parser.add_argument('--total-trials', '-tt', type=int, default=1,
+                       help='Total number of trials in sequence (default: 1)')
+    parser.add_argument('--screen', '-s', type=int, default=None,
+                       help='Screen number to display on (default: None, uses fullscreen)')
+    parser.add_argument('--audio-profile', choices=list(MIXER_PROFILES.keys()), default=DEFAULT_PROFILE,
+                       help=f'Mixer profile (buffer size/frequency) (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report the time of each startup stage and of the imports, then exit')
+    add_clock_arguments(parser)
+    args = parser.parse_args(argv)
+    clock = make_clock(args.clock, args.clock_speed)
+
+    MODE = args.mode
+    player_initials = args.participant
+    run_number = args.run
+    current_trial = args.trial
+    total_trials = args.total_trials
+    screen_number = args.screen
+    audio_profile = args.audio_profile
+    TR = 2.01  # Fixed TR for fMRI experiments
+
+    # TR-aligned trial duration for fMRI mode
+    if MODE == 'fmri':
+        # fMRI mode: Use random TR-aligned durations (8-13 seconds until target placement)
+        # Convert to TRs: 8-13 seconds = 4-6.5 TRs, use 4-6 TRs
+        EXPLORATION_TRs = random.randint(4, 6)  # 4-6 TRs = 8.04-12.06 seconds
+        EXPLORATION_DURATION = EXPLORATION_TRs * TR
     else:
-        results_dir = os.path.join(os.path.dirname(__file__), "results")
-        print(f"Using local results directory: {results_dir}")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_OT_ot{current_trial}_discrete.csv")
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_OT_ot{current_trial}_continuous.csv")
-else:
-    # Practice mode: full sequence
+        # Practice mode: Same random TR-aligned durations as fMRI mode
+        EXPLORATION_TRs = random.randint(4, 6)  # 4-6 TRs = 8.04-12.06 seconds
+        EXPLORATION_DURATION = EXPLORATION_TRs * TR
+
+    # Annotation phase timer (20 seconds aligned to TRs)
+    ANNOTATION_TRs = 10  # 10 TRs = 20.1 seconds (close to 20 seconds)
+    ANNOTATION_DURATION = ANNOTATION_TRs * TR
+
+    # Adjust parameters based on mode
+    if MODE == 'fmri':
+        # fMRI mode: only test trials, single run
+        TRAINING_SESSIONS = 0
+        DARK_TRAINING_TRIALS = 0
+        TEST_TRIALS = 1
+
+    # Enable debug mode if initials are '111'
+    DEBUG_MODE = (player_initials == '111')
+    return args
+
+# ---------------------------
+# Set up logging files
+# ---------------------------
+def setup_results_files():
+    """Startup stage: choose the results directory and log file names and create the directory."""
+    global results_dir, discrete_filename, continuous_filename, audio_filename, button_filename
     # Use centralized results directory if available, otherwise use local results directory
     centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
     if centralized_results_dir and os.path.exists(centralized_results_dir):
@@ -154,14 +175,20 @@ else:
     else:
         results_dir = os.path.join(os.path.dirname(__file__), "results")
         print(f"Using local results directory: {results_dir}")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_one_target_practice_discrete_log.csv")
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_one_target_practice_continuous_log.csv")
 
-# Ensure results directory exists
-os.makedirs(results_dir, exist_ok=True)
+    if MODE == 'fmri':
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_OT_ot{current_trial}_discrete.csv")
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_OT_ot{current_trial}_continuous.csv")
+    else:
+        # Practice mode: full sequence
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_one_target_practice_discrete_log.csv")
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_one_target_practice_continuous_log.csv")
+
+    audio_filename = audio_log_filename(continuous_filename)
+    button_filename = button_log_filename(continuous_filename)
 
-# Enable debug mode if initials are '111'
-DEBUG_MODE = (player_initials == '111')
+    # Ensure results directory exists
+    os.makedirs(results_dir, exist_ok=True)
 
 # ---------------------------
 # Path to instruction images
@@ -169,120 +196,99 @@ DEBUG_MODE = (player_initials == '111')
 INSTRUCTIONS_DIR = os.path.join(os.path.dirname(__file__), "Instructions-he")
 
 # ---------------------------
-# Initialize Pygame and Mixer
+# Mixer and display
 # ---------------------------
-pygame.init()
-
-# Audio device selection - try to use a specific device to ensure all sounds go to same output
-# List of common audio device names to try (in order of preference)
-audio_devices_to_try = [
-    "Outside (NVIDIA High Definition Audio)",
-    "Speakers (NVIDIA High Definition Audio)",
-    "Headphones (NVIDIA High Definition Audio)",
-    "Default Audio Device",
-    None  # Fallback to system default
-]
-
-audio_initialized = False
-selected_device = None
-
-for device in audio_devices_to_try:
-    try:
-        if device:
-            pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512, devicename=device)
-            print(f"Audio mixer initialized successfully with device: {device}")
-        else:
-            pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-            print("Audio mixer initialized with system default device")
-        audio_initialized = True
-        selected_device = device
-        break
-    except Exception as e:
-        print(f"Warning: Could not initialize with device '{device}': {e}")
-        continue
-
-if not audio_initialized:
-    print("Error: Could not initialize audio mixer with any device")
-    pygame.mixer.init()  # Last resort initialization
-
-# Create display based on screen parameter
-if screen_number is not None:
-    # Use specified screen number
-    try:
-        # Set the display environment variable for pygame
-        os.environ['DISPLAY'] = f':0.{screen_number}'
-        print(f"Setting display to screen {screen_number}")
-        
-        # Create fullscreen display on specified screen
-        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        screen_info = pygame.display.Info()
-        screen_width = screen_info.current_w
-        screen_height = screen_info.current_h
-        print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
-    except Exception as e:
-        print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
+def init_audio():
+    """Startup stage: open the mixer with the selected profile on the first device that works."""
+    global selected_device
+    # Audio device selection - try to use a specific device to ensure all sounds go to same output
+    selected_device = init_mixer(audio_profile)
+
+def init_display():
+    """Startup stage: open the display on the selected screen and create the game surface."""
+    global screen, screen_width, screen_height, offset_x, offset_y, game_surface, button_box
+    # Create display based on screen parameter
+    if screen_number is not None:
+        # Use specified screen number
+        try:
+            # Set the display environment variable for pygame
+            os.environ['DISPLAY'] = f':0.{screen_number}'
+            print(f"Setting display to screen {screen_number}")
+
+            # Create fullscreen display on specified screen
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+            print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
+        except Exception as e:
+            print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+    else:
+        # Use default fullscreen behavior
         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
         screen_info = pygame.display.Info()
         screen_width = screen_info.current_w
         screen_height = screen_info.current_h
-else:
-    # Use default fullscreen behavior
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-    screen_info = pygame.display.Info()
-    screen_width = screen_info.current_w
-    screen_height = screen_info.current_h
-    print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
+        print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
 
-# Hide cursor for experiment
-pygame.mouse.set_visible(False)
-print("Cursor hidden for experiment")
+    # Hide cursor for experiment
+    pygame.mouse.set_visible(False)
+    print("Cursor hidden for experiment")
 
-# Calculate the offset to center the game area
-offset_x = (screen_width - WIN_WIDTH) // 2
-offset_y = (screen_height - WIN_HEIGHT) // 2
+    # Calculate the offset to center the game area
+    offset_x = (screen_width - WIN_WIDTH) // 2
+    offset_y = (screen_height - WIN_HEIGHT) // 2
 
-# Create a surface for the game content
-game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+    # Create a surface for the game content
+    game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
 
-pygame.display.set_caption("Exploration Experiment")
-clock = pygame.time.Clock()
+    pygame.display.set_caption("Exploration Experiment")
+    button_box = ButtonBox(clock)
 
 # ---------------------------
 # Initialize Sounds - Unified Audio Device
 # ---------------------------
-# Load sounds
-try:
-    beep_sound = pygame.mixer.Sound(BEEP_SOUND_PATH)
-    print("Beep sound loaded successfully")
-except Exception as e:
-    print(f"Error loading beep sound: {e}")
-    beep_sound = None
-
-try:
-    target_sound = pygame.mixer.Sound(TARGET_SOUND_PATH)
-    print("Target sound loaded successfully")
-except Exception as e:
-    print(f"Error loading target sound: {e}")
-    target_sound = None
-
-# Reserve two channels for audio - both will use the same audio device
-try:
-    pygame.mixer.set_reserved(2)
-    beep_channel = pygame.mixer.Channel(0)
-    target_channel = pygame.mixer.Channel(1)
-    print("Audio channels reserved successfully")
-    print(f"Both channels will use audio device: {selected_device or 'System Default'}")
-    
-    # Set sound volumes
-    if beep_sound is not None:
-        beep_sound.set_volume(0.8)
-    if target_sound is not None:
-        target_sound.set_volume(1.0)
-        
-except Exception as e:
-    print(f"Warning: Could not reserve audio channels: {e}")
-    beep_channel = None
-    target_channel = None
+def load_sounds():
+    """Startup stage: load the beep and target sounds and reserve their audio channels."""
+    global beep_sound, target_sound, audio_player, beep_channel, target_channel
+    # Load sounds
+    try:
+        beep_sound = pygame.mixer.Sound(resolve_sound_path(BEEP_SOUND_PATH))
+        print("Beep sound loaded successfully")
+    except Exception as e:
+        print(f"Error loading beep sound: {e}")
+        beep_sound = None
+
+    try:
+        target_sound = pygame.mixer.Sound(resolve_sound_path(TARGET_SOUND_PATH))
+        print("Target sound loaded successfully")
+    except Exception as e:
+        print(f"Error loading target sound: {e}")
+        target_sound = None
+
+    # Reserve two channels for audio - both will use the same audio device
+    try:
+        audio_player = AudioPlayer(roles=('beep', 'target'), profile=audio_profile, clock=clock)
+        beep_channel = audio_player.channel('beep')
+        target_channel = audio_player.channel('target')
+        print("Audio channel pool ready")
+        print(f"Both channels will use audio device: {selected_device or 'System Default'}")
+
+        # Set sound volumes
+        if beep_sound is not None:
+            beep_sound.set_volume(0.8)
+        if target_sound is not None:
+            target_sound.set_volume(1.0)
+
+    except Exception as e:
+        print(f"Warning: Could not reserve audio channels: {e}")
+        audio_player = None
+        beep_channel = None
+        target_channel = None
 
 # ---------------------------
 # Helper functions for visited locations tracking
@@ -331,8 +337,8 @@ def show_image(image_path, duration=None):
     
     if duration is not None:
         # Wait for specified duration
-        start_time = time.time()
-        while time.time() - start_time < duration:
+        start_time = clock.time()
+        while clock.time() - start_time < duration:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -377,9 +383,9 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     
     # Log fixation start event if continuous_log is provided
     if continuous_log is not None:
-        fixation_start_time = time.time()
+        fixation_start_time = clock.time()
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "trial": trial_counter if trial_counter is not None else "fixation",
             "condition_type": trial_info.split()[0] if trial_info and " " in trial_info else "fixation",
@@ -392,8 +398,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
         continuous_log.append(entry)
     
     # Wait for specified duration
-    start_time = time.time()
-    while time.time() - start_time < duration:
+    start_time = clock.time()
+    while clock.time() - start_time < duration:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -407,8 +413,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
                     # Log fixation end event if continuous_log is provided
                     if continuous_log is not None:
                         entry = {
-                            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                            "trial_time": time.time() - start_time,
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                            "trial_time": clock.time() - start_time,
                             "trial": trial_counter if trial_counter is not None else "fixation",
                             "condition_type": trial_info.split()[0] if trial_info and " " in trial_info else "fixation",
                             "phase": "fixation",
@@ -424,7 +430,7 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     # Log fixation end event if continuous_log is provided
     if continuous_log is not None:
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": duration,
             "trial": trial_counter if trial_counter is not None else "fixation",
             "condition_type": trial_info.split()[0] if trial_info and " " in trial_info else "fixation",
@@ -439,14 +445,20 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
 # ---------------------------
 # Helper functions for Hebrew text
 # ---------------------------
+_font_cache = {}
+
 def get_hebrew_font(size):
-    """Load custom font supporting Hebrew."""
+    """Load custom font supporting Hebrew (cached per size; draw functions call this every frame)."""
+    if size in _font_cache:
+        return _font_cache[size]
     try:
         font_path = os.path.join(os.path.dirname(__file__), "fonts", "Gisha.ttf")
-        return pygame.font.Font(font_path, size)
+        font = pygame.font.Font(font_path, size)
     except Exception as e:
         print(f"Could not load custom font, using default. Error: {e}")
-        return pygame.font.SysFont("Arial", size)
+        font = pygame.font.SysFont("Arial", size)
+    _font_cache[size] = font
+    return font
 
 def render_hebrew_text(font, text, color):
     """Render Hebrew text with proper right-to-left handling."""
@@ -590,11 +602,54 @@ def draw_grid(visited_cells):
                         (CENTER_SCREEN[0] - ARENA_RADIUS * SCALE, y),
                         (CENTER_SCREEN[0] + ARENA_RADIUS * SCALE, y), 1)
 
+def draw_target(target_position):
+    """Draw the target as a filled circle."""
+    target_screen = to_screen_coords(target_position)
+    pygame.draw.circle(game_surface, TARGET_COLOR, target_screen, int(TARGET_RADIUS * SCALE), 0)
+
+def draw_instruction(phase):
+    """Draw the phase's instruction text in the middle under the arena."""
+    font = get_hebrew_font(20)
+    instruction_text = render_hebrew_text(font, INSTRUCTIONS[phase], WHITE)
+    text_rect = instruction_text.get_rect(centerx=WIN_WIDTH//2, bottom=WIN_HEIGHT-30)
+    game_surface.blit(instruction_text, text_rect)
+
+def draw_trial_counter(trial_info):
+    """Draw the trial counter in the bottom-right corner."""
+    if MODE == 'fmri':
+        # In fMRI mode, use the sequence trial numbers (within the single run)
+        counter_text = f"{current_trial}/{total_trials}"
+    else:
+        # In practice mode, use internal trial counting
+        if trial_info.startswith("training"):
+            internal_total = TRAINING_SESSIONS
+            internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
+        elif trial_info.startswith("dark_training"):
+            internal_total = DARK_TRAINING_TRIALS
+            internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
+        elif trial_info.startswith("test"):
+            internal_total = TEST_TRIALS
+            # Handle both "test 1" and "test_run1" formats
+            if "run" in trial_info:
+                # Extract run number from "test_run1" format
+                internal_current = trial_info.split("run")[1]
+            else:
+                internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
+        else:
+            internal_total = "?"
+            internal_current = "1"
+        counter_text = f"{internal_current}/{internal_total}"
+    counter_font = pygame.font.SysFont("Arial", 24)
+    counter_surface = counter_font.render(counter_text, True, WHITE)
+    counter_rect = counter_surface.get_rect()
+    counter_rect.bottomright = (WIN_WIDTH - 20, WIN_HEIGHT - 20)
+    game_surface.blit(counter_surface, counter_rect)
+
 def draw_conditions(target_placement_time, current_trial_time, has_moved_forward, has_rotated, 
                    is_moving_forward_backward, is_rotating, distance_from_center, player_pos, player_angle, visited_cells, trial_start_time):
     """Draw indicators showing which target placement conditions are met."""
     # All condition checks are still needed for target placement logic, but we don't display them
-    time_remaining = max(0, target_placement_time - time.time())
+    time_remaining = max(0, target_placement_time - clock.time())
     time_elapsed = time_remaining <= 0
     
     tip_pos = get_player_tip_position(player_pos, player_angle)
@@ -649,7 +704,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
     is_moving = False
     trial_movement_started = False  # Track if movement has started in current trial
 
-    trial_start_time = time.time()
+    trial_start_time = clock.time()
     exploration_start_time = trial_start_time
     annotation_start_time = None
     continuous_log = []
@@ -661,12 +716,12 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
     last_tip_cell = None
     current_tip_cell = None
     
-    # Track active keys for MRI control box compatibility
-    active_keys = set()
+    # Button-box keys are tracked from timestamped events (see button_box.py)
+    button_box.reset()
 
     while not trial_done:
-        dt = clock.tick(60) / 1000.0
-        current_trial_time = time.time() - trial_start_time
+        clock.tick(60, idle=button_box.pump)  # Frame cap; key events are timestamped while waiting
+        current_trial_time = clock.time() - trial_start_time
 
         # Check if trial duration has elapsed
         if phase == "exploration" and movement_start_time is not None:
@@ -678,13 +733,13 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             distance_from_center = math.hypot(player_pos[0], player_pos[1])
             
             # When time elapses, try to place target if conditions are met
-            if not target_placed and target_placement_time is not None and time.time() >= target_placement_time:
+            if not target_placed and target_placement_time is not None and clock.time() >= target_placement_time:
                 # Check if player is moving forward/backward (8/9) and not rotating (7/0)
-                keys = pygame.key.get_pressed()
-                is_moving_forward_backward = (pygame.K_8 in active_keys or keys[pygame.K_8] or
-                    pygame.K_9 in active_keys or keys[pygame.K_9])
-                is_rotating = (pygame.K_7 in active_keys or keys[pygame.K_7] or
-                    pygame.K_0 in active_keys or keys[pygame.K_0])
+                keys = button_box
+                is_moving_forward_backward = (keys[pygame.K_8] or
+                    keys[pygame.K_9])
+                is_rotating = (keys[pygame.K_7] or
+                    keys[pygame.K_0])
                 
                 # OLD TARGET PLACEMENT LOGIC - REMOVED
                 # This was placing targets without visited cell checks
@@ -717,12 +772,12 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                             print("DEBUG: Player just entered target area")
                         
                         # Don't log for initial placement (which happens in the same frame)
-                        if current_event != "target_placed" and target_placed_time and time.time() - target_placed_time > 0.1:
+                        if current_event != "target_placed" and target_placed_time and clock.time() - target_placed_time > 0.1:
                             if DEBUG_MODE:
                                 print("DEBUG: Setting event to returned_to_target")
                             current_event = "returned_to_target"
                             encountered_goal = target_position
-                            encountered_goal_time = time.time()
+                            encountered_goal_time = clock.time()
                     target_was_inside = True
                 else:
                     target_was_inside = False
@@ -742,7 +797,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 # if DEBUG_MODE and current_event:
                 #     print(f"DEBUG: Adding log entry with event: {current_event}")
 
-        for event in pygame.event.get():
+        for event in button_box.frame():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -754,9 +809,9 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                     if phase == "exploration":
                         # Only allow proceeding to annotation if target has been placed
                         if target_placed:
-                            exploration_time = time.time() - exploration_start_time
+                            exploration_time = clock.time() - exploration_start_time
                             phase = "annotation"
-                            annotation_start_time = time.time()
+                            annotation_start_time = clock.time()
                             annotation_marker_pos = [0.0, 0.0]
                             annotation_marker_angle = 0.0
                             print(f"Annotation phase started. Timer: {ANNOTATION_DURATION:.1f} seconds ({ANNOTATION_TRs} TRs)")
@@ -769,7 +824,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                     elif phase == "annotation":
                         # Add target_annotated event when 1 or ENTER is pressed in annotation phase
                         entry = {
-                            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                             "trial_time": round(current_trial_time, 3),
                             "trial": trial_counter,  # Use actual trial number instead of trial_info
                             "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -780,7 +835,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                             "rotation_angle": round(annotation_marker_angle, 3)
                         }
                         continuous_log.append(entry)
-                        annotation_time = time.time() - annotation_start_time
+                        annotation_time = clock.time() - annotation_start_time
                         phase = "feedback"
                     elif phase == "feedback":
                         trial_done = True
@@ -796,9 +851,6 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                         if rotate_key_pressed is None:
                             rotate_key_pressed = event.key
                             rotate_start_angle = player_angle
-                # Track number key presses for MRI control box
-                if event.key in [pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_0, pygame.K_1, pygame.K_RETURN]:
-                    active_keys.add(event.key)
                 if event.key == pygame.K_k:
                     pass
             if event.type == pygame.KEYUP:
@@ -809,62 +861,59 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                     if event.key in (pygame.K_7, pygame.K_0):  # Number keys for rotation
                         rotate_key_pressed = None
                         rotate_start_angle = None
-                # Remove keys when released
-                if event.key in [pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_0, pygame.K_1, pygame.K_RETURN]:
-                    active_keys.discard(event.key)
 
         screen.fill(BACKGROUND_COLOR)  # Fill the fullscreen with background color
         game_surface.fill(BACKGROUND_COLOR)
 
         if phase == "exploration":
-            keys = pygame.key.get_pressed()
-            # Use both active_keys tracking and get_pressed() for maximum compatibility with MRI control box
-            current_is_moving = (pygame.K_7 in active_keys or keys[pygame.K_7] or 
-                               pygame.K_8 in active_keys or keys[pygame.K_8] or 
-                               pygame.K_9 in active_keys or keys[pygame.K_9] or 
-                               pygame.K_0 in active_keys or keys[pygame.K_0])
-            current_is_moving_forward_backward = (pygame.K_8 in active_keys or keys[pygame.K_8] or 
-                                                pygame.K_9 in active_keys or keys[pygame.K_9])  # Track forward/backward movement
-            current_is_rotating = (pygame.K_7 in active_keys or keys[pygame.K_7] or 
-                                 pygame.K_0 in active_keys or keys[pygame.K_0])  # Track rotation
+            # Button-box keys: down now or pressed during the frame; each moves for the time it was held
+            keys = button_box
+            current_is_moving = (keys[pygame.K_7] or 
+                               keys[pygame.K_8] or 
+                               keys[pygame.K_9] or 
+                               keys[pygame.K_0])
+            current_is_moving_forward_backward = (keys[pygame.K_8] or 
+                                                keys[pygame.K_9])  # Track forward/backward movement
+            current_is_rotating = (keys[pygame.K_7] or 
+                                 keys[pygame.K_0])  # Track rotation
             
             # Reset movement tracking when movement stops
             if not current_is_moving_forward_backward:
                 if is_moving_forward_backward:
-                    movement_stop_time = time.time()
+                    movement_stop_time = clock.time()
                 is_moving_forward_backward = False
             else:
                 movement_stop_time = None
 
             if not current_is_rotating:
                 if is_rotating:
-                    rotation_stop_time = time.time()
+                    rotation_stop_time = clock.time()
                 is_rotating = False
                 rotation_start_angle = None
             else:
                 rotation_stop_time = None
 
             # Reset indicators after fade time elapses
-            if movement_stop_time is not None and time.time() - movement_stop_time > MOVEMENT_FADE_TIME:
+            if movement_stop_time is not None and clock.time() - movement_stop_time > MOVEMENT_FADE_TIME:
                 distance_moved = 0.0
                 movement_stop_time = None
 
-            if rotation_stop_time is not None and time.time() - rotation_stop_time > MOVEMENT_FADE_TIME:
+            if rotation_stop_time is not None and clock.time() - rotation_stop_time > MOVEMENT_FADE_TIME:
                 angle_rotated = 0.0
                 rotation_stop_time = None
             
             # Start movement timer on first movement
             if current_is_moving and movement_start_time is None:
-                movement_start_time = time.time()
+                movement_start_time = clock.time()
                 trial_movement_started = True
             
             # Track movement and rotation
-            if pygame.K_8 in active_keys or keys[pygame.K_8]:  # Move forward
+            if keys[pygame.K_8]:  # Move forward
                 has_moved_forward = True
-            if pygame.K_9 in active_keys or keys[pygame.K_9]:  # Move backward
+            if keys[pygame.K_9]:  # Move backward
                 pass  # No special tracking needed
-            if (pygame.K_7 in active_keys or keys[pygame.K_7] or 
-                pygame.K_0 in active_keys or keys[pygame.K_0]):  # Rotate left or right
+            if (keys[pygame.K_7] or 
+                keys[pygame.K_0]):  # Rotate left or right
                 has_rotated = True
                 # Set rotation start angle when rotation begins
                 if rotation_start_angle is None:
@@ -874,10 +923,10 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             old_pos = list(player_pos)  # Store old position
             old_angle = player_angle    # Store old angle
             
-            if pygame.K_8 in active_keys or keys[pygame.K_8]:  # Move forward
+            if keys[pygame.K_8]:  # Move forward
                 rad = math.radians(player_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_8) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_8) * math.cos(rad)
                 new_x = player_pos[0] + dx
                 new_y = player_pos[1] + dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
@@ -888,10 +937,10 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                         distance_moved = 0.0
                         movement_stop_time = None
                     is_moving_forward_backward = True
-            if pygame.K_9 in active_keys or keys[pygame.K_9]:  # Move backward
+            if keys[pygame.K_9]:  # Move backward
                 rad = math.radians(player_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_9) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_9) * math.cos(rad)
                 new_x = player_pos[0] - dx
                 new_y = player_pos[1] - dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
@@ -902,8 +951,8 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                         distance_moved = 0.0
                         movement_stop_time = None
                     is_moving_forward_backward = True
-            if pygame.K_7 in active_keys or keys[pygame.K_7]:  # Rotate left
-                player_angle -= ROTATE_SPEED * dt
+            if keys[pygame.K_7]:  # Rotate left
+                player_angle -= ROTATE_SPEED * button_box.held(pygame.K_7)
                 # Reset rotation tracking if starting new rotation
                 if not is_rotating or rotation_stop_time is not None:
                     angle_rotated = 0.0
@@ -911,8 +960,8 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 is_rotating = True
                 if rotation_start_angle is None:
                     rotation_start_angle = player_angle
-            if pygame.K_0 in active_keys or keys[pygame.K_0]:  # Rotate right
-                player_angle += ROTATE_SPEED * dt
+            if keys[pygame.K_0]:  # Rotate right
+                player_angle += ROTATE_SPEED * button_box.held(pygame.K_0)
                 # Reset rotation tracking if starting new rotation
                 if not is_rotating or rotation_stop_time is not None:
                     angle_rotated = 0.0
@@ -945,7 +994,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             if math.hypot(player_pos[0], player_pos[1]) >= (ARENA_RADIUS - BORDER_THRESHOLD):
                 if beep_sound is not None and beep_channel is not None:
                     if not beep_channel.get_busy():
-                        beep_channel.play(beep_sound, loops=-1)
+                        audio_player.play('beep', beep_sound, name='beep', loops=-1)
             else:
                 if beep_channel is not None:
                     if beep_channel.get_busy():
@@ -954,11 +1003,11 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             # Check if all conditions are met
             all_conditions_met = (
                 target_placement_time is not None and
-                time.time() >= target_placement_time and
+                clock.time() >= target_placement_time and
                 has_moved_forward and
                 has_rotated and
-                (pygame.K_8 in active_keys or keys[pygame.K_8] or pygame.K_9 in active_keys or keys[pygame.K_9]) and
-                not (pygame.K_7 in active_keys or keys[pygame.K_7] or pygame.K_0 in active_keys or keys[pygame.K_0]) and
+                (keys[pygame.K_8] or keys[pygame.K_9]) and
+                not (keys[pygame.K_7] or keys[pygame.K_0]) and
                 math.hypot(player_pos[0], player_pos[1]) >= 0.5 and
                 math.hypot(player_pos[0], player_pos[1]) <= (ARENA_RADIUS - TARGET_RADIUS - BORDER_THRESHOLD)
             )
@@ -971,24 +1020,24 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 if distance(player_pos, target_position) <= TARGET_RADIUS:
                     if not target_was_inside:
                         if DEBUG_MODE:
-                            print(f"DEBUG: Target reached at time {time.time() - trial_start_time:.2f}")
+                            print(f"DEBUG: Target reached at time {clock.time() - trial_start_time:.2f}")
                             print(f"DEBUG: Target was placed at {target_placed_time - trial_start_time:.2f}")
                         # Play target sound when reaching target
                         if target_sound_param is not None and target_channel is not None:
-                            target_channel.play(target_sound_param)
+                            audio_player.play('target', target_sound_param, name='target')
                         elif target_sound_param is not None:
                             target_sound_param.play()
                         # Set returned_to_target event here, when we actually detect reaching the target
                         # Don't set it for the initial placement
-                        if target_placed_time and time.time() - target_placed_time > 0.1:
+                        if target_placed_time and clock.time() - target_placed_time > 0.1:
                             current_event = "returned_to_target"
                             encountered_goal = target_position
-                            encountered_goal_time = time.time()
+                            encountered_goal_time = clock.time()
                             if DEBUG_MODE:
                                 print("DEBUG: Setting returned_to_target event")
                             # Add the event to the log immediately
                             entry = {
-                                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                                 "trial_time": round(current_trial_time, 3),
                                 "trial": trial_counter,  # Use actual trial number instead of trial_info
                                 "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1030,18 +1079,18 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 # Place the target immediately since we already checked the tip cell is unvisited
                 target_position = (target_center_x, target_center_y)
                 target_placed = True
-                target_placed_time = time.time()  # Record when target was placed
+                target_placed_time = clock.time()  # Record when target was placed
                 # Play target sound when target is placed
                 if target_sound_param is not None and target_channel is not None:
-                    target_channel.play(target_sound_param)
+                    audio_player.play('target', target_sound_param, name='target')
                 elif target_sound_param is not None:
                     target_sound_param.play()
                 if DEBUG_MODE:
-                    print(f"DEBUG: Target placed at time {time.time() - trial_start_time:.2f}")
+                    print(f"DEBUG: Target placed at time {clock.time() - trial_start_time:.2f}")
                 current_event = "target_placed"
                 # Add target_placed event to continuous log
                 entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                     "trial_time": round(current_trial_time, 3),
                     "trial": trial_counter,  # Use actual trial number instead of trial_info
                     "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1084,20 +1133,16 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 draw_player_avatar(player_pos, player_angle)
 
             # Add instruction text for exploration phase
-            font = get_hebrew_font(20)
-            instruction_text = render_hebrew_text(font, "למעבר סימון המטרה לחצ/י RETNE", WHITE)
-            # Position text in the middle under the arena
-            text_rect = instruction_text.get_rect(centerx=WIN_WIDTH//2, bottom=WIN_HEIGHT-30)
-            game_surface.blit(instruction_text, text_rect)
+            draw_instruction("exploration")
 
             # Draw movement indicators with fade-out behavior
             if is_moving_forward_backward or (movement_stop_time is not None and 
-                time.time() - movement_stop_time <= MOVEMENT_FADE_TIME):
+                clock.time() - movement_stop_time <= MOVEMENT_FADE_TIME):
                 distance_moved = draw_thermometer(distance_moved, is_moving_forward_backward, 
-                               movement_stop_time, time.time())
+                               movement_stop_time, clock.time())
             if is_rotating or (rotation_stop_time is not None and 
-                time.time() - rotation_stop_time <= MOVEMENT_FADE_TIME):
-                angle_rotated = draw_clock(angle_rotated, is_rotating, rotation_stop_time, time.time())
+                clock.time() - rotation_stop_time <= MOVEMENT_FADE_TIME):
+                angle_rotated = draw_clock(angle_rotated, is_rotating, rotation_stop_time, clock.time())
 
             # Add debug timing panel
             draw_debug_timing_panel(
@@ -1111,12 +1156,12 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
 
         elif phase == "annotation":
             # Check if annotation timer has expired
-            annotation_elapsed_time = time.time() - annotation_start_time
+            annotation_elapsed_time = clock.time() - annotation_start_time
             if annotation_elapsed_time >= ANNOTATION_DURATION:
                 # Timer expired - automatically proceed to feedback phase
                 print(f"Annotation timer expired after {annotation_elapsed_time:.1f} seconds. Proceeding to feedback phase.")
                 entry = {
-                    "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                    "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                     "trial_time": round(current_trial_time, 3),
                     "trial": trial_counter,  # Use actual trial number instead of trial_info
                     "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1127,27 +1172,27 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                     "rotation_angle": round(annotation_marker_angle, 3)
                 }
                 continuous_log.append(entry)
-                annotation_time = time.time() - annotation_start_time
+                annotation_time = clock.time() - annotation_start_time
                 phase = "feedback"
             
-            keys = pygame.key.get_pressed()
-            if pygame.K_7 in active_keys or keys[pygame.K_7]:  # Rotate left
-                annotation_marker_angle -= ROTATE_SPEED * dt
-            if pygame.K_0 in active_keys or keys[pygame.K_0]:  # Rotate right
-                annotation_marker_angle += ROTATE_SPEED * dt
-            if pygame.K_8 in active_keys or keys[pygame.K_8]:  # Move forward
+            keys = button_box
+            if keys[pygame.K_7]:  # Rotate left
+                annotation_marker_angle -= ROTATE_SPEED * button_box.held(pygame.K_7)
+            if keys[pygame.K_0]:  # Rotate right
+                annotation_marker_angle += ROTATE_SPEED * button_box.held(pygame.K_0)
+            if keys[pygame.K_8]:  # Move forward
                 rad = math.radians(annotation_marker_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_8) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_8) * math.cos(rad)
                 new_x = annotation_marker_pos[0] + dx
                 new_y = annotation_marker_pos[1] + dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
                     annotation_marker_pos[0] = new_x
                     annotation_marker_pos[1] = new_y
-            if pygame.K_9 in active_keys or keys[pygame.K_9]:  # Move backward
+            if keys[pygame.K_9]:  # Move backward
                 rad = math.radians(annotation_marker_angle)
-                dx = MOVE_SPEED * dt * math.sin(rad)
-                dy = MOVE_SPEED * dt * math.cos(rad)
+                dx = MOVE_SPEED * button_box.held(pygame.K_9) * math.sin(rad)
+                dy = MOVE_SPEED * button_box.held(pygame.K_9) * math.cos(rad)
                 new_x = annotation_marker_pos[0] - dx
                 new_y = annotation_marker_pos[1] - dy
                 if math.hypot(new_x, new_y) <= ARENA_RADIUS:
@@ -1157,7 +1202,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             # Add continuous logging for annotation phase
             # REMOVED: This was causing duplicate entries since main game loop already logs all phases
             # entry = {
-            #     "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            #     "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             #     "trial_time": round(current_trial_time, 3),
             #     "trial": current_trial,  # Use actual trial number instead of trial_info
             #     "phase": "annotation",
@@ -1170,10 +1215,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
 
             draw_arena()
             # Add instruction text in the middle under the arena
-            font = get_hebrew_font(20)
-            instruction_text = render_hebrew_text(font, "נווט/י למיקום המטרה ולאישור לחצ/י RETNE", WHITE)
-            text_rect = instruction_text.get_rect(centerx=WIN_WIDTH//2, bottom=WIN_HEIGHT-30)
-            game_surface.blit(instruction_text, text_rect)
+            draw_instruction("annotation")
             # Draw annotation avatar in Khaki (CLOCK_COLOR)
             draw_player_avatar(annotation_marker_pos, annotation_marker_angle, color=CLOCK_COLOR)
 
@@ -1191,7 +1233,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             # Add continuous logging for feedback phase
             # REMOVED: This was causing duplicate entries since main game loop already logs all phases
             # entry = {
-            #     "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            #     "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             #     "trial_time": round(current_trial_time, 3),
             #     "trial": current_trial,  # Use actual trial number instead of trial_info
             #     "phase": "feedback",
@@ -1204,45 +1246,17 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
 
             draw_arena()
             if target_position is not None:
-                target_screen = to_screen_coords(target_position)
-                pygame.draw.circle(game_surface, TARGET_COLOR, target_screen, int(TARGET_RADIUS * SCALE), 0)
+                draw_target(target_position)
             # Draw feedback avatar in Khaki (CLOCK_COLOR)
             draw_player_avatar(annotation_marker_pos, annotation_marker_angle, color=CLOCK_COLOR)
         
         # Draw trial counter
-        if MODE == 'fmri':
-            # In fMRI mode, use the sequence trial numbers (within the single run)
-            counter_text = f"{current_trial}/{total_trials}"
-        else:
-            # In practice mode, use internal trial counting
-            if trial_info.startswith("training"):
-                internal_total = TRAINING_SESSIONS
-                internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
-            elif trial_info.startswith("dark_training"):
-                internal_total = DARK_TRAINING_TRIALS
-                internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
-            elif trial_info.startswith("test"):
-                internal_total = TEST_TRIALS
-                # Handle both "test 1" and "test_run1" formats
-                if "run" in trial_info:
-                    # Extract run number from "test_run1" format
-                    internal_current = trial_info.split("run")[1]
-                else:
-                    internal_current = trial_info.split()[1] if len(trial_info.split()) > 1 else "1"
-            else:
-                internal_total = "?"
-                internal_current = "1"
-            counter_text = f"{internal_current}/{internal_total}"
-        counter_font = pygame.font.SysFont("Arial", 24)
-        counter_surface = counter_font.render(counter_text, True, WHITE)
-        counter_rect = counter_surface.get_rect()
-        counter_rect.bottomright = (WIN_WIDTH - 20, WIN_HEIGHT - 20)
-        game_surface.blit(counter_surface, counter_rect)
+        draw_trial_counter(trial_info)
 
         # Add continuous logging for all phases (every frame)
         if phase == "exploration":
             entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": round(current_trial_time, 3),
                 "trial": trial_counter,  # Use actual trial number instead of trial_info
                 "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1256,7 +1270,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             current_event = None  # Reset event after logging
         elif phase == "annotation":
             entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": round(current_trial_time, 3),
                 "trial": trial_counter,  # Use actual trial number instead of trial_info
                 "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1269,7 +1283,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             continuous_log.append(entry)
         elif phase == "feedback":
             entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": round(current_trial_time, 3),
                 "trial": trial_counter,  # Use actual trial number instead of trial_info
                 "condition_type": "test" if MODE == 'fmri' else (trial_info.split()[0] if " " in trial_info else "practice"),
@@ -1295,8 +1309,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             
             # Show target if it's placed
             if target_placed and target_position is not None:
-                target_screen = to_screen_coords(target_position)
-                pygame.draw.circle(game_surface, TARGET_COLOR, target_screen, int(TARGET_RADIUS * SCALE), 0)
+                draw_target(target_position)
             
             # Show grid
             draw_grid(visited_cells)
@@ -1327,20 +1340,20 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             elif phase == "feedback":
                 draw_arena()
                 if target_position is not None:
-                    target_screen = to_screen_coords(target_position)
-                    pygame.draw.circle(game_surface, TARGET_COLOR, target_screen, int(TARGET_RADIUS * SCALE), 0)
+                    draw_target(target_position)
                 draw_player_avatar(annotation_marker_pos, annotation_marker_angle, color=CLOCK_COLOR)
                 # Draw instruction text
-                font = get_hebrew_font(20)
-                text = render_hebrew_text(font, "לחצ/י RETNE להמשך", WHITE)
-                text_rect = text.get_rect(centerx=WIN_WIDTH//2, bottom=WIN_HEIGHT-30)
-                game_surface.blit(text, text_rect)
+                draw_instruction("feedback")
 
+        # What this frame shows, for observers such as synthetic_participant.py
+        button_box.show(phase=phase, player_pos=player_pos, player_angle=player_angle,
+                        target_placed=target_placed, target_position=target_position,
+                        annotation_marker_pos=annotation_marker_pos, annotation_marker_angle=annotation_marker_angle)
         screen.blit(game_surface, (offset_x, offset_y))
         pygame.display.flip()
 
-    exploration_time = time.time() - exploration_start_time if exploration_start_time is not None else 0
-    annotation_time = time.time() - annotation_start_time if annotation_start_time is not None else 0
+    exploration_time = clock.time() - exploration_start_time if exploration_start_time is not None else 0
+    annotation_time = clock.time() - annotation_start_time if annotation_start_time is not None else 0
     error_distance = None
     # Calculate error distance between target location and annotation position
     # This should always be calculated if a target was placed, regardless of whether player returned to it
@@ -1356,7 +1369,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
     # Add TR alignment fixation for fMRI mode after trial is completely finished
     if MODE == 'fmri' and current_trial < total_trials:
         print('TR alignment: Checking if fixation needed until end of current TR...')
-        current_time = time.time()
+        current_time = clock.time()
         
         # Use trigger time as reference if available, otherwise use trial start time
         trigger_received_time = os.getenv('TRIGGER_RECEIVED_TIME')
@@ -1381,7 +1394,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             
             # Log TR alignment fixation start event
             tr_fixation_start_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": current_time - trial_start_time,
                 "trial": trial_counter,
                 "condition_type": "test",
@@ -1394,7 +1407,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             continuous_log.append(tr_fixation_start_entry)
             
             # Show TR alignment fixation using standardized format (no frame-by-frame logging)
-            while time.time() < next_TR_start:
+            while clock.time() < next_TR_start:
                 screen.fill(BACKGROUND_COLOR)
                 game_surface.fill(BACKGROUND_COLOR)
                 
@@ -1407,6 +1420,7 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
                 game_surface.blit(fixation_text, text_rect)
                 screen.blit(game_surface, (offset_x, offset_y))
                 pygame.display.flip()
+                clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                 
                 # Check for ESC key to exit
                 for event in pygame.event.get():
@@ -1416,8 +1430,8 @@ def run_trial(is_training, target_sound_param, trial_info, trial_counter):
             
             # Log TR alignment fixation end event
             tr_fixation_end_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                "trial_time": time.time() - trial_start_time,
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                "trial_time": clock.time() - trial_start_time,
                 "trial": trial_counter,
                 "condition_type": "test",
                 "phase": "fixation",
@@ -1612,7 +1626,7 @@ def run_experiment():
         print(f"Running fMRI mode (inside magnet) - Run {run_number}")
         
         # Set experiment start time for fMRI mode
-        experiment_start_time = time.time()
+        experiment_start_time = clock.time()
         
         # Check for trigger received time from environment variable
         trigger_received_time = os.getenv('TRIGGER_RECEIVED_TIME')
@@ -1620,7 +1634,7 @@ def run_experiment():
             trigger_time = float(trigger_received_time)
             # Log trigger received event
             trigger_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": 0.0,
                 "trial": current_trial,
                 "condition_type": "test",
@@ -1648,7 +1662,7 @@ def run_experiment():
         # Log fixation start event
         trial_info = f"test_run{run_number}"
         fixation_start_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "trial": current_trial,
             "condition_type": "test",
@@ -1661,8 +1675,8 @@ def run_experiment():
         all_continuous_logs.append(fixation_start_entry)
         
         # Show fixation for the determined number of TRs using standardized format (no frame-by-frame logging)
-        fixation_start_time = time.time()
-        while time.time() - fixation_start_time < (fixation_trs * TR):
+        fixation_start_time = clock.time()
+        while clock.time() - fixation_start_time < (fixation_trs * TR):
             screen.fill(BACKGROUND_COLOR)
             game_surface.fill(BACKGROUND_COLOR)
             
@@ -1676,6 +1690,7 @@ def run_experiment():
             
             screen.blit(game_surface, (offset_x, offset_y))
             pygame.display.flip()
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             
             # Check for ESC key to exit
             for event in pygame.event.get():
@@ -1685,7 +1700,7 @@ def run_experiment():
         
         # Log fixation end event
         fixation_end_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": fixation_trs * TR,
             "trial": current_trial,
             "condition_type": "test",
@@ -1703,7 +1718,7 @@ def run_experiment():
         
         # Single test trial
         trial_info = f"test_run{run_number}"
-        trial_start_time = time.time()
+        trial_start_time = clock.time()
         discrete_log, continuous_log = run_trial(False, training_target_sound, trial_info, current_trial)
         all_discrete_logs.append(discrete_log)
         all_continuous_logs.extend(continuous_log)
@@ -1719,8 +1734,8 @@ def run_experiment():
             
             # Log final fixation start event
             final_fixation_start_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                "trial_time": time.time() - experiment_start_time,
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                "trial_time": clock.time() - experiment_start_time,
                 "trial": current_trial,
                 "condition_type": "test",
                 "phase": "fixation",
@@ -1732,8 +1747,8 @@ def run_experiment():
             all_continuous_logs.append(final_fixation_start_entry)
             
             # Show 4 TRs fixation using standardized format
-            final_fixation_start_time = time.time()
-            while time.time() - final_fixation_start_time < (4 * TR):
+            final_fixation_start_time = clock.time()
+            while clock.time() - final_fixation_start_time < (4 * TR):
                 screen.fill(BACKGROUND_COLOR)
                 game_surface.fill(BACKGROUND_COLOR)
                 
@@ -1746,6 +1761,7 @@ def run_experiment():
                 game_surface.blit(fixation_text, text_rect)
                 screen.blit(game_surface, (offset_x, offset_y))
                 pygame.display.flip()
+                clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                 
                 # Check for ESC key to exit
                 for event in pygame.event.get():
@@ -1755,8 +1771,8 @@ def run_experiment():
             
             # Log final fixation end event
             final_fixation_end_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                "trial_time": time.time() - experiment_start_time,
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                "trial_time": clock.time() - experiment_start_time,
                 "trial": current_trial,
                 "condition_type": "test",
                 "phase": "fixation",
@@ -1777,6 +1793,11 @@ def run_experiment():
         print("One Target Run complete.")
         print(f"Trial {current_trial}/{total_trials} completed")
     
+    # Save timestamped audio play requests
+    if audio_player is not None:
+        audio_player.save_events(audio_filename)
+    button_box.save_events(button_filename)
+    
     # Clean up and exit
     pygame.quit()
     sys.exit()
@@ -1787,7 +1808,7 @@ def draw_debug_timing_panel(trial_start_time, movement_start_time, target_placem
     if not DEBUG_MODE:
         return
 
-    current_time = time.time()
+    current_time = clock.time()
     font = pygame.font.SysFont("Arial", 16)
     x, y = WIN_WIDTH - 300, 20  # Position panel on the right side
     spacing = 25
@@ -1843,10 +1864,48 @@ def draw_debug_timing_panel(trial_start_time, movement_start_time, target_placem
         game_surface.blit(text, (x, y))
         y += spacing
 
-if __name__ == "__main__":
+# ---------------------------
+# Startup
+# ---------------------------
+# Import only defines constants and functions; setup() runs the startup stages in order
+STARTUP_BUDGET = {  # seconds per stage, one second in total (see startup_profile.py)
+    "interpreter": 0.05,
+    "imports": 0.50,
+    "arguments": 0.01,
+    "results files": 0.01,
+    "mixer": 0.15,
+    "pygame": 0.05,
+    "display": 0.20,
+    "sounds": 0.03,
+}
+
+
+def setup(argv=None):
+    """Run the startup stages; returns (parsed arguments, StartupTimer with the time of each stage)."""
+    timer = StartupTimer()
+    args = timer.run("arguments", parse_arguments, argv)
+    timer.run("results files", setup_results_files)
+    # The mixer is opened before pygame.init(), which would otherwise open it with pygame's defaults
+    timer.run("mixer", init_audio)
+    timer.run("pygame", pygame.init)
+    timer.run("display", init_display)
+    timer.run("sounds", load_sounds)
+    return args, timer
+
+
+def main(argv=None):
+    args, timer = setup(argv)
+    if args.profile_startup:
+        over_budget = report_startup("one_target", timer, STARTUP_BUDGET)
+        pygame.quit()
+        return 1 if over_budget else 0
     print(f"Starting One Target Experiment")
     print(f"Mode: {MODE}")
     print(f"Participant: {player_initials}")
     if MODE == 'fmri':
         print(f"Run: {run_number}")
     run_experiment()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
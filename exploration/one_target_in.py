@@ -7,6 +7,7 @@ This script can be called from MATLAB for block design experiments.
 import sys
 import os
 import subprocess
+from task_clock import make_clock
 
 def run_fmri_session(participant_id="TEST", run_number=1, trial_number=1, total_trials=1, screen_number=None):
     """
@@ -35,8 +36,8 @@ def run_fmri_session(participant_id="TEST", run_number=1, trial_number=1, total_
             print(f"Display will be on screen: {screen_number}")
         print(f"Command: {' '.join(cmd)}")
         
-        # Run the command
-        result = subprocess.run(cmd, check=True)
+        # Run the command on the caller's task clock (TASK_CLOCK, see task_clock.py)
+        result = make_clock().run(cmd, check=True)
         
         print(f"fMRI run {run_number} completed successfully.")
         return True
@@ -7,6 +7,7 @@ This script can be called from MATLAB.
 import sys
 import os
 import subprocess
+from task_clock import make_clock
 
 def run_practice_session(participant_id="TEST", screen_number=None):
     """
@@ -32,8 +33,8 @@ def run_practice_session(participant_id="TEST", screen_number=None):
             print(f"Display will be on screen: {screen_number}")
         print(f"Command: {' '.join(cmd)}")
         
-        # Run the command
-        result = subprocess.run(cmd, check=True)
+        # Run the command on the caller's task clock (TASK_CLOCK, see task_clock.py)
+        result = make_clock().run(cmd, check=True)
         
         print("Practice session completed successfully.")
         return True
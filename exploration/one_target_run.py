@@ -14,12 +14,11 @@ Usage: python one_target_run.py --participant PARTICIPANT_ID --run RUN_NUMBER
 Note: Run number should be 1 for One Target Run.
 """
 
-import subprocess
 import sys
 import os
-import time
 import argparse
 from datetime import datetime
+from task_clock import make_clock, add_clock_arguments
 
 
 # ---------------------------
@@ -35,6 +34,7 @@ from datetime import datetime
 
 # Constants
 TR = 2.01  # TR in seconds
+clock = None  # Task clock (see task_clock.py), created in main()
 TOTAL_TRIALS = 12  # 6 snake + 6 one_target trials
 
 
@@ -76,7 +76,7 @@ def run_trial(trial_number, trial_type, participant_id, run_number, screen_numbe
     print(f"TRIAL {trial_number}/{TOTAL_TRIALS}: {trial_type.upper()}")
     print(f"{'='*60}")
     
-    trial_start_time = time.time()
+    trial_start_time = clock.time()
     
     # Determine which script to run
     if trial_type == "snake":
@@ -106,9 +106,9 @@ def run_trial(trial_number, trial_type, participant_id, run_number, screen_numbe
     
     try:
         # Run the trial
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = clock.run(cmd, capture_output=True, text=True)
         
-        trial_end_time = time.time()
+        trial_end_time = clock.time()
         trial_duration = trial_end_time - trial_start_time
         
         print(f"Trial end time: {datetime.fromtimestamp(trial_end_time).strftime('%H:%M:%S.%f')[:-3]}")
@@ -130,7 +130,7 @@ def run_trial(trial_number, trial_type, participant_id, run_number, screen_numbe
         
     except Exception as e:
         print(f"ERROR running {trial_type} trial: {e}")
-        trial_end_time = time.time()
+        trial_end_time = clock.time()
         trial_duration = trial_end_time - trial_start_time
         
         return {
@@ -155,7 +155,7 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
     print(f"Note: Trial durations are randomized by individual scripts")
     print(f"{'='*80}")
     
-    block_start_time = time.time()
+    block_start_time = clock.time()
     
     # Define trial sequence (6 snake + 6 one_target, intertwined)
     trial_sequence = [
@@ -175,9 +175,9 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
         
         # Small delay between trials to ensure clean separation
         if trial_number < TOTAL_TRIALS:
-            time.sleep(0.1)
+            clock.sleep(0.1)
     
-    block_end_time = time.time()
+    block_end_time = clock.time()
     block_duration = block_end_time - block_start_time
     
     # Print summary
@@ -272,7 +272,7 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
         WHITE = (255, 255, 255)
         
         # 1. TR alignment fixation (if needed)
-        current_time = time.time()
+        current_time = clock.time()
         trigger_received_time = os.getenv('TRIGGER_RECEIVED_TIME')
         
         if trigger_received_time:
@@ -286,8 +286,8 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
                 print(f'TR alignment: Waiting {wait_time:.2f} seconds for TR alignment...')
                 
                 # Show TR alignment fixation
-                start_time = time.time()
-                while time.time() - start_time < wait_time:
+                start_time = clock.time()
+                while clock.time() - start_time < wait_time:
                     screen.fill(BACKGROUND_COLOR)
                     game_surface.fill(BACKGROUND_COLOR)
                     
@@ -300,6 +300,7 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
                     game_surface.blit(fixation_text, text_rect)
                     screen.blit(game_surface, (offset_x, offset_y))
                     pygame.display.flip()
+                    clock.poll()  # Lets a virtual clock move on; no-op on the real clock
                     
                     # Check for ESC key to exit
                     for event in pygame.event.get():
@@ -317,8 +318,8 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
         print(f'Showing 4 TRs final fixation before finish screen...')
         final_fixation_duration = 4 * TR
         
-        start_time = time.time()
-        while time.time() - start_time < final_fixation_duration:
+        start_time = clock.time()
+        while clock.time() - start_time < final_fixation_duration:
             screen.fill(BACKGROUND_COLOR)
             game_surface.fill(BACKGROUND_COLOR)
             
@@ -331,6 +332,7 @@ def run_one_target_run(participant_id, run_number, screen_number=None):
             game_surface.blit(fixation_text, text_rect)
             screen.blit(game_surface, (offset_x, offset_y))
             pygame.display.flip()
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             
             # Check for ESC key to exit
             for event in pygame.event.get():
@@ -395,6 +397,7 @@ def save_timing_log(filename, block_start_time, trial_results):
 
 def main():
     """Main function to parse arguments and run the block."""
+    global clock
     
     parser = argparse.ArgumentParser(description='One Target Block Wrapper')
     parser.add_argument('--participant', '-p', required=True,
@@ -404,7 +407,9 @@ def main():
     parser.add_argument('--screen', '-s', type=int, default=None,
                        help='Screen number to display on (optional)')
     
+    add_clock_arguments(parser)
     args = parser.parse_args()
+    clock = make_clock(args.clock, args.clock_speed)
     
     # Change to the exploration directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
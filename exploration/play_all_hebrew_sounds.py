@@ -5,6 +5,7 @@ Plays all generated Hebrew audio files so you can validate their quality
 """
 
 import os
+import sys
 import time
 import pygame
 from pathlib import Path
@@ -19,8 +20,8 @@ def init_pygame():
         print(f"✗ Failed to initialize pygame mixer: {e}")
         return False
 
-def get_all_audio_files():
-    """Get all MP3 files from the arenas directory."""
+def get_all_audio_files(flagged_only=False):
+    """Get all MP3 files from the arenas directory (only those audio_qa.py flags, if requested)."""
     sounds_dir = Path(__file__).parent / "sounds" / "arenas"
     audio_files = []
     
@@ -36,6 +37,15 @@ def get_all_audio_files():
     
     # Sort by arena name, then by filename
     audio_files.sort(key=lambda x: (x[0], x[1]))
+    
+    if flagged_only:
+        from audio_qa import analyze_all, flag_outliers
+        results = flag_outliers(analyze_all([f[2] for f in audio_files]))
+        flagged = {r["path"]: r["flags"] for r in results if r["flags"]}
+        for arena_name, filename, file_path in audio_files:
+            if file_path in flagged:
+                print(f"  Flagged {arena_name}/{filename}: {flagged[file_path]}")
+        audio_files = [f for f in audio_files if f[2] in flagged]
     return audio_files
 
 def play_audio_file(file_path, arena_name, filename):
@@ -68,8 +78,8 @@ def main():
         print("Cannot proceed without pygame. Exiting.")
         return
     
-    # Get all audio files
-    audio_files = get_all_audio_files()
+    # Get all audio files (--flagged: only those the automatic QA pass flags)
+    audio_files = get_all_audio_files(flagged_only='--flagged' in sys.argv[1:])
     if not audio_files:
         print("No audio files found. Exiting.")
         return
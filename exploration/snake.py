@@ -2,12 +2,16 @@ import pygame
 import sys
 import math
 import random
-import time
 import csv
 import os
 import argparse
 from datetime import datetime
 import json
+from audio_cache import resolve_sound_path
+from audio_system import AudioPlayer, MIXER_PROFILES, DEFAULT_PROFILE, init_mixer, audio_log_filename
+from startup_profile import StartupTimer, report_startup
+from task_clock import make_clock, add_clock_arguments
+from button_box import ButtonBox, button_log_filename
 
 # ---------------------------
 # STANDARDIZED FIXATION CROSS FORMAT:
@@ -53,77 +57,95 @@ PRACTICE_ROTATE_SPEED = 70.0        # degrees per second for practice game
 # ---------------------------
 # Parse command line arguments
 # ---------------------------
-parser = argparse.ArgumentParser(description='Snake Practice Game')
-parser.add_argument('mode', choices=['practice', 'fmri', 'anatomical'], 
-                   help='Run mode: practice (outside magnet), fmri (inside magnet), or anatomical (during anatomical scan)')
-parser.add_argument('--participant', '-p', default='TEST', 
-                   help='Participant initials (default: TEST)')
-parser.add_argument('--run', '-r', type=int, default=1,
-                   help='Run number for fMRI mode (default: 1)')
-parser.add_argument('--trial', '-t', type=int, default=1,
-                   help='Current trial number in sequence (default: 1)')
-parser.add_argument('--total-trials', '-tt', type=int, default=1,
-                   help='Total number of trials in sequence (default: 1)')
-parser.add_argument('--screen', '-s', type=int, default=None,
-                   help='Screen number to display on (default: None, uses fullscreen)')
-args = parser.parse_args()
-
-MODE = args.mode
-player_initials = args.participant
-run_number = args.run
-current_trial = args.trial
-total_trials = args.total_trials
-screen_number = args.screen
-TR = 2.01  # Fixed TR for fMRI experiments
+def parse_arguments(argv=None):
+    """Startup stage: parse the command line into the session settings."""
+    global MODE, player_initials, run_number, current_trial, total_trials, screen_number
+    global audio_profile, TR, TRIAL_TRs, TRIAL_DURATION, clock
+    parser = argparse.ArgumentParser(description='Snake Practice Game')
+    parser.add_argument('mode', choices=['practice', 'fmri', 'anatomical'], 
+                       help='Run mode: practice (outside magnet), fmri (inside magnet), or anatomical (during anatomical scan)')
+    parser.add_argument('--participant', '-p', default='TEST', 
+                       help='Participant initials (default: TEST)')
+    parser.add_argument('--run', '-r', type=int, default=1,
+                       help='Run number for fMRI mode (default: 1)')
+    parser.add_argument('--trial', '-t', type=int, default=1,
+                       help='Current trial number in sequence (default: 1)')
+    parser.add_argument('--total-trials', '-tt', type=int, default=1,
+                       help='Total number of trials in sequence (default: 1)')
+    parser.add_argument('--screen', '-s', type=int, default=None,
+                       help='Screen number to display on (default: None, uses fullscreen)')
+    parser.add_argument('--audio-profile', choices=list(MIXER_PROFILES.keys()), default=DEFAULT_PROFILE,
+                       help=f'Mixer profile (buffer size/frequency) (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='Report the time of each startup stage and of the imports, then exit')
+    add_clock_arguments(parser)
+    args = parser.parse_args(argv)
+    clock = make_clock(args.clock, args.clock_speed)
+
+    MODE = args.mode
+    player_initials = args.participant
+    run_number = args.run
+    current_trial = args.trial
+    total_trials = args.total_trials
+    screen_number = args.screen
+    audio_profile = args.audio_profile
+    TR = 2.01  # Fixed TR for fMRI experiments
+
+    # Set trial duration based on mode
+    if MODE == 'fmri':
+        # fMRI mode: Use random TR-aligned durations (10-15 seconds)
+        # Convert to TRs: 10-15 seconds = 5-7.5 TRs, use 5-7 TRs
+        TRIAL_TRs = random.randint(5, 7)  # 5-7 TRs = 10.05-14.07 seconds
+        TRIAL_DURATION = TRIAL_TRs * TR
+    elif MODE == 'anatomical':
+        # Anatomical mode: No time limit (endless gameplay)
+        TRIAL_DURATION = None
+    else:
+        # Practice mode: Fixed 1 minute duration
+        TRIAL_DURATION = 60.0  # 1 minute = 60 seconds
+    return args
 
 # ---------------------------
 # Set up logging files
 # ---------------------------
-# Use centralized results directory if available, otherwise use local results directory
-centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
-if centralized_results_dir and os.path.exists(centralized_results_dir):
-    # Create SubID subfolder in centralized directory
-    results_dir = os.path.join(centralized_results_dir, player_initials)
-    print(f"Using centralized results directory: {results_dir}")
-else:
-    results_dir = os.path.join(os.path.dirname(__file__), "results")
-    print(f"Using local results directory: {results_dir}")
-
-if MODE == 'fmri':
-    # Determine run context based on run_number
-    # Run 1 = One Target Run, Run 2 = Full Arena Run
-    if run_number == 1:
-        run_context = "OT"
-    elif run_number == 2:
-        run_context = "FA"
+def setup_results_files():
+    """Startup stage: choose the results directory and log file names and create the directory."""
+    global results_dir, run_context, continuous_filename, discrete_filename, audio_filename, button_filename
+    # Use centralized results directory if available, otherwise use local results directory
+    centralized_results_dir = os.getenv('CENTRALIZED_RESULTS_DIR')
+    if centralized_results_dir and os.path.exists(centralized_results_dir):
+        # Create SubID subfolder in centralized directory
+        results_dir = os.path.join(centralized_results_dir, player_initials)
+        print(f"Using centralized results directory: {results_dir}")
     else:
-        # Fallback for any other run numbers
-        run_context = f"run{run_number}"
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_{run_context}_snake{current_trial}_continuous.csv")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_{run_context}_snake{current_trial}_discrete.csv")
-elif MODE == 'anatomical':
-    # Anatomical mode: use special naming for anatomical scan period
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_anatomical_snake_continuous.csv")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_anatomical_snake_discrete.csv")
-else:
-    continuous_filename = os.path.join(results_dir, f"{player_initials}_snake_practice_continuous_log.csv")
-    discrete_filename = os.path.join(results_dir, f"{player_initials}_snake_practice_discrete_log.csv")
-
-# Ensure results directory exists
-os.makedirs(results_dir, exist_ok=True)
-
-# Set trial duration based on mode
-if MODE == 'fmri':
-    # fMRI mode: Use random TR-aligned durations (10-15 seconds)
-    # Convert to TRs: 10-15 seconds = 5-7.5 TRs, use 5-7 TRs
-    TRIAL_TRs = random.randint(5, 7)  # 5-7 TRs = 10.05-14.07 seconds
-    TRIAL_DURATION = TRIAL_TRs * TR
-elif MODE == 'anatomical':
-    # Anatomical mode: No time limit (endless gameplay)
-    TRIAL_DURATION = None
-else:
-    # Practice mode: Fixed 1 minute duration
-    TRIAL_DURATION = 60.0  # 1 minute = 60 seconds
+        results_dir = os.path.join(os.path.dirname(__file__), "results")
+        print(f"Using local results directory: {results_dir}")
+
+    if MODE == 'fmri':
+        # Determine run context based on run_number
+        # Run 1 = One Target Run, Run 2 = Full Arena Run
+        if run_number == 1:
+            run_context = "OT"
+        elif run_number == 2:
+            run_context = "FA"
+        else:
+            # Fallback for any other run numbers
+            run_context = f"run{run_number}"
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_{run_context}_snake{current_trial}_continuous.csv")
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_{run_context}_snake{current_trial}_discrete.csv")
+    elif MODE == 'anatomical':
+        # Anatomical mode: use special naming for anatomical scan period
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_anatomical_snake_continuous.csv")
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_anatomical_snake_discrete.csv")
+    else:
+        continuous_filename = os.path.join(results_dir, f"{player_initials}_snake_practice_continuous_log.csv")
+        discrete_filename = os.path.join(results_dir, f"{player_initials}_snake_practice_discrete_log.csv")
+
+    audio_filename = audio_log_filename(continuous_filename)
+    button_filename = button_log_filename(continuous_filename)
+
+    # Ensure results directory exists
+    os.makedirs(results_dir, exist_ok=True)
 
 # ---------------------------
 # Sounds
@@ -138,120 +160,99 @@ BEEP_SOUND_PATH = os.path.join(SOUNDS_DIR, "beep.wav")
 INSTRUCTIONS_DIR = os.path.join(os.path.dirname(__file__), "Instructions-he")
 
 # ---------------------------
-# Initialize Pygame and Mixer
+# Mixer and display
 # ---------------------------
-pygame.init()
-
-# Audio device selection - try to use a specific device to ensure all sounds go to same output
-# List of common audio device names to try (in order of preference)
-audio_devices_to_try = [
-    "Outside (NVIDIA High Definition Audio)",
-    "Speakers (NVIDIA High Definition Audio)",
-    "Headphones (NVIDIA High Definition Audio)",
-    "Default Audio Device",
-    None  # Fallback to system default
-]
-
-audio_initialized = False
-selected_device = None
-
-for device in audio_devices_to_try:
-    try:
-        if device:
-            pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512, devicename=device)
-            print(f"Audio mixer initialized successfully with device: {device}")
-        else:
-            pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-            print("Audio mixer initialized with system default device")
-        audio_initialized = True
-        selected_device = device
-        break
-    except Exception as e:
-        print(f"Warning: Could not initialize with device '{device}': {e}")
-        continue
-
-if not audio_initialized:
-    print("Error: Could not initialize audio mixer with any device")
-    pygame.mixer.init()  # Last resort initialization
-
-# Create display based on screen parameter
-if screen_number is not None:
-    # Use specified screen number
-    try:
-        # Set the display environment variable for pygame
-        os.environ['DISPLAY'] = f':0.{screen_number}'
-        print(f"Setting display to screen {screen_number}")
-        
-        # Create fullscreen display on specified screen
-        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        screen_info = pygame.display.Info()
-        screen_width = screen_info.current_w
-        screen_height = screen_info.current_h
-        print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
-    except Exception as e:
-        print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
+def init_audio():
+    """Startup stage: open the mixer with the selected profile on the first device that works."""
+    global selected_device
+    # Audio device selection - try to use a specific device to ensure all sounds go to same output
+    selected_device = init_mixer(audio_profile)
+
+def init_display():
+    """Startup stage: open the display on the selected screen and create the game surface."""
+    global screen, screen_width, screen_height, offset_x, offset_y, game_surface, button_box
+    # Create display based on screen parameter
+    if screen_number is not None:
+        # Use specified screen number
+        try:
+            # Set the display environment variable for pygame
+            os.environ['DISPLAY'] = f':0.{screen_number}'
+            print(f"Setting display to screen {screen_number}")
+
+            # Create fullscreen display on specified screen
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+            print(f"Fullscreen mode on screen {screen_number}: {screen_width}x{screen_height}")
+        except Exception as e:
+            print(f"Failed to use specified screen {screen_number}, falling back to default: {e}")
+            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            screen_info = pygame.display.Info()
+            screen_width = screen_info.current_w
+            screen_height = screen_info.current_h
+    else:
+        # Use default fullscreen behavior
         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
         screen_info = pygame.display.Info()
         screen_width = screen_info.current_w
         screen_height = screen_info.current_h
-else:
-    # Use default fullscreen behavior
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-    screen_info = pygame.display.Info()
-    screen_width = screen_info.current_w
-    screen_height = screen_info.current_h
-    print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
+        print(f"Fullscreen mode (default): {screen_width}x{screen_height}")
 
-# Hide cursor for experiment
-pygame.mouse.set_visible(False)
-print("Cursor hidden for experiment")
+    # Hide cursor for experiment
+    pygame.mouse.set_visible(False)
+    print("Cursor hidden for experiment")
 
-# Calculate the offset to center the game area
-offset_x = (screen_width - WIN_WIDTH) // 2
-offset_y = (screen_height - WIN_HEIGHT) // 2
+    # Calculate the offset to center the game area
+    offset_x = (screen_width - WIN_WIDTH) // 2
+    offset_y = (screen_height - WIN_HEIGHT) // 2
 
-# Create a surface for the game content
-game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+    # Create a surface for the game content
+    game_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
 
-pygame.display.set_caption("Practice Game")
-clock = pygame.time.Clock()
+    pygame.display.set_caption("Practice Game")
+    button_box = ButtonBox(clock)
 
 # ---------------------------
 # Initialize Sounds - Unified Audio Device
 # ---------------------------
-# Load sounds
-try:
-    beep_sound = pygame.mixer.Sound(BEEP_SOUND_PATH)
-    print("Beep sound loaded successfully")
-except Exception as e:
-    print(f"Error loading beep sound: {e}")
-    beep_sound = None
-
-try:
-    target_sound = pygame.mixer.Sound(TARGET_SOUND_PATH)
-    print("Target sound loaded successfully")
-except Exception as e:
-    print(f"Error loading target sound: {e}")
-    target_sound = None
-
-# Reserve two channels for audio - both will use the same audio device
-try:
-    pygame.mixer.set_reserved(2)
-    beep_channel = pygame.mixer.Channel(0)
-    target_channel = pygame.mixer.Channel(1)
-    print("Audio channels reserved successfully")
-    print(f"Both channels will use audio device: {selected_device or 'System Default'}")
-    
-    # Set sound volumes
-    if beep_sound is not None:
-        beep_sound.set_volume(0.8)
-    if target_sound is not None:
-        target_sound.set_volume(1.0)
-        
-except Exception as e:
-    print(f"Warning: Could not reserve audio channels: {e}")
-    beep_channel = None
-    target_channel = None
+def load_sounds():
+    """Startup stage: load the beep and target sounds and reserve their audio channels."""
+    global beep_sound, target_sound, audio_player, beep_channel, target_channel
+    # Load sounds
+    try:
+        beep_sound = pygame.mixer.Sound(resolve_sound_path(BEEP_SOUND_PATH))
+        print("Beep sound loaded successfully")
+    except Exception as e:
+        print(f"Error loading beep sound: {e}")
+        beep_sound = None
+
+    try:
+        target_sound = pygame.mixer.Sound(resolve_sound_path(TARGET_SOUND_PATH))
+        print("Target sound loaded successfully")
+    except Exception as e:
+        print(f"Error loading target sound: {e}")
+        target_sound = None
+
+    # Reserve two channels for audio - both will use the same audio device
+    try:
+        audio_player = AudioPlayer(roles=('beep', 'target'), profile=audio_profile, clock=clock)
+        beep_channel = audio_player.channel('beep')
+        target_channel = audio_player.channel('target')
+        print("Audio channel pool ready")
+        print(f"Both channels will use audio device: {selected_device or 'System Default'}")
+
+        # Set sound volumes
+        if beep_sound is not None:
+            beep_sound.set_volume(0.8)
+        if target_sound is not None:
+            target_sound.set_volume(1.0)
+
+    except Exception as e:
+        print(f"Warning: Could not reserve audio channels: {e}")
+        audio_player = None
+        beep_channel = None
+        target_channel = None
 
 # ---------------------------
 # Helper functions
@@ -431,8 +432,8 @@ def show_image(image_path, duration=None):
     
     if duration is not None:
         # Wait for specified duration
-        start_time = time.time()
-        while time.time() - start_time < duration:
+        start_time = clock.time()
+        while clock.time() - start_time < duration:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -480,9 +481,9 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     
     # Log fixation start event if continuous_log is provided
     if continuous_log is not None:
-        fixation_start_time = time.time()
+        fixation_start_time = clock.time()
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "trial": trial_counter if trial_counter is not None else "fixation",
             "phase": "fixation",
@@ -497,8 +498,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
         continuous_log.append(entry)
     
     # Wait for specified duration
-    start_time = time.time()
-    while time.time() - start_time < duration:
+    start_time = clock.time()
+    while clock.time() - start_time < duration:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -512,8 +513,8 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
                     # Log fixation end event if continuous_log is provided
                     if continuous_log is not None:
                         entry = {
-                            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
-                            "trial_time": time.time() - start_time,
+                            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
+                            "trial_time": clock.time() - start_time,
                             "trial": trial_counter if trial_counter is not None else "fixation",
                             "phase": "fixation",
                             "event": "fixation_skipped",
@@ -531,7 +532,7 @@ def show_fixation(duration=6.0, continuous_log=None, trial_counter=None, trial_i
     # Log fixation end event if continuous_log is provided
     if continuous_log is not None:
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": duration,
             "trial": trial_counter if trial_counter is not None else "fixation",
             "phase": "fixation",
@@ -575,7 +576,7 @@ def run_practice_game():
             trigger_time = float(trigger_received_time)
             # Log trigger received event
             trigger_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": 0.0,
                 "trial": str(run_number),
                 "phase": "trigger",
@@ -604,7 +605,7 @@ def run_practice_game():
         else:
             trial_info = "practice"
         fixation_start_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": 0.0,  # Fixation is before trial starts
             "trial": trial_info,
             "phase": "fixation",
@@ -619,8 +620,8 @@ def run_practice_game():
         fixation_logs.append(fixation_start_entry)
         
         # Show fixation for the determined number of TRs (no frame-by-frame logging)
-        fixation_start_time = time.time()
-        while time.time() - fixation_start_time < (fixation_trs * TR):
+        fixation_start_time = clock.time()
+        while clock.time() - fixation_start_time < (fixation_trs * TR):
             screen.fill(BACKGROUND_COLOR)
             game_surface.fill(BACKGROUND_COLOR)
             
@@ -634,6 +635,7 @@ def run_practice_game():
             
             screen.blit(game_surface, (offset_x, offset_y))
             pygame.display.flip()
+            clock.poll()  # Lets a virtual clock move on; no-op on the real clock
             
             # Check for ESC key to exit
             for event in pygame.event.get():
@@ -643,7 +645,7 @@ def run_practice_game():
         
         # Log fixation end event
         fixation_end_entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": fixation_trs * TR,
             "trial": trial_info,
             "phase": "fixation",
@@ -672,20 +674,19 @@ def run_practice_game():
     score = 0
     target_radius = 0.1  # meters
     
-    # Track active keys for MRI control box compatibility
-    active_keys = set()
-    
     # Initialize logging
     continuous_log = []
     target_locations = []
     target_reach_times = []
-    game_start_time = time.time()
+    game_start_time = clock.time()
     last_target_time = game_start_time
     
+    # Button-box keys are tracked from timestamped events (see button_box.py)
+    button_box.reset()
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0  # Get time since last frame in seconds
-        current_time = time.time() - game_start_time
+        clock.tick(60, idle=button_box.pump)  # Frame cap; key events are timestamped while waiting
+        current_time = clock.time() - game_start_time
         
         # Continuous logging
         if MODE == 'fmri':
@@ -695,7 +696,7 @@ def run_practice_game():
         else:
             trial_info = "practice"
         entry = {
-            "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+            "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
             "trial_time": round(current_time, 3),
             "trial": trial_info,
             "phase": "gameplay",
@@ -709,7 +710,7 @@ def run_practice_game():
         }
         continuous_log.append(entry)
         
-        for event in pygame.event.get():
+        for event in button_box.frame():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -719,38 +720,31 @@ def run_practice_game():
                     sys.exit()
                 elif event.key == pygame.K_k:  # Only 'K' key can end the game
                     running = False
-                # Track number key presses for MRI control box
-                elif event.key in [pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_0]:
-                    active_keys.add(event.key)
-            if event.type == pygame.KEYUP:
-                # Remove keys when released
-                if event.key in [pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_0]:
-                    active_keys.discard(event.key)
 
         # Handle movement with number keys - compatible with MRI control box
-        # Use both active_keys tracking and get_pressed() for maximum compatibility
+        # Each key moves for the time it was actually held during the frame
         
         # Rotation controls
-        if pygame.K_7 in active_keys or pygame.key.get_pressed()[pygame.K_7]:  # Rotate left
-            player_angle -= PRACTICE_ROTATE_SPEED * dt
-        if pygame.K_0 in active_keys or pygame.key.get_pressed()[pygame.K_0]:  # Rotate right
-            player_angle += PRACTICE_ROTATE_SPEED * dt
+        if button_box[pygame.K_7]:  # Rotate left
+            player_angle -= PRACTICE_ROTATE_SPEED * button_box.held(pygame.K_7)
+        if button_box[pygame.K_0]:  # Rotate right
+            player_angle += PRACTICE_ROTATE_SPEED * button_box.held(pygame.K_0)
             
         # Movement controls
-        if pygame.K_8 in active_keys or pygame.key.get_pressed()[pygame.K_8]:  # Move forward
+        if button_box[pygame.K_8]:  # Move forward
             rad = math.radians(player_angle)
-            dx = MOVE_SPEED * dt * math.sin(rad)
-            dy = MOVE_SPEED * dt * math.cos(rad)
+            dx = MOVE_SPEED * button_box.held(pygame.K_8) * math.sin(rad)
+            dy = MOVE_SPEED * button_box.held(pygame.K_8) * math.cos(rad)
             new_x = player_pos[0] + dx
             new_y = player_pos[1] + dy
             if within_arena([new_x, new_y]):
                 player_pos[0] = new_x
                 player_pos[1] = new_y
                 
-        if pygame.K_9 in active_keys or pygame.key.get_pressed()[pygame.K_9]:  # Move backward
+        if button_box[pygame.K_9]:  # Move backward
             rad = math.radians(player_angle)
-            dx = MOVE_SPEED * dt * math.sin(rad)
-            dy = MOVE_SPEED * dt * math.cos(rad)
+            dx = MOVE_SPEED * button_box.held(pygame.K_9) * math.sin(rad)
+            dy = MOVE_SPEED * button_box.held(pygame.K_9) * math.cos(rad)
             new_x = player_pos[0] - dx
             new_y = player_pos[1] - dy
             if within_arena([new_x, new_y]):
@@ -761,7 +755,7 @@ def run_practice_game():
         if math.hypot(player_pos[0], player_pos[1]) >= (ARENA_RADIUS - BORDER_THRESHOLD):
             if beep_sound is not None and beep_channel is not None:
                 if not beep_channel.get_busy():
-                    beep_channel.play(beep_sound, loops=-1)
+                    audio_player.play('beep', beep_sound, name='beep', loops=-1)
         else:
             if beep_channel is not None:
                 if beep_channel.get_busy():
@@ -777,13 +771,13 @@ def run_practice_game():
             score += 1
             
             # Log target reached event
-            target_reach_time = time.time() - game_start_time
+            target_reach_time = clock.time() - game_start_time
             target_locations.append([round(target_pos[0], 3), round(target_pos[1], 3)])
             target_reach_times.append(round(target_reach_time, 3))
             
             # Add event to continuous log
             event_entry = {
-                "RealTime": datetime.now().strftime('%H:%M:%S.%f')[:-3],
+                "RealTime": clock.now().strftime('%H:%M:%S.%f')[:-3],
                 "trial_time": round(target_reach_time, 3),
                 "trial": "anatomical" if MODE == 'anatomical' else trial_info,
                 "phase": "gameplay",
@@ -801,7 +795,7 @@ def run_practice_game():
             target_pos = random_position_in_arena()
             # Play target sound when reaching target
             if target_sound is not None and target_channel is not None:
-                target_channel.play(target_sound)
+                audio_player.play('target', target_sound, name='target')
             elif target_sound is not None:
                 target_sound.play()
 
@@ -821,6 +815,9 @@ def run_practice_game():
         draw_score_and_timer(score, time_remaining)
         draw_trial_counter()
         
+        # What this frame shows, for observers such as synthetic_participant.py
+        button_box.show(phase="gameplay", player_pos=player_pos, player_angle=player_angle,
+                        target_pos=target_pos, endless=TRIAL_DURATION is None)
         screen.blit(game_surface, (offset_x, offset_y))
         pygame.display.flip()
 
@@ -835,7 +832,7 @@ def run_practice_game():
         target_channel.stop()
     
     # Create discrete log entry
-    game_duration = time.time() - game_start_time
+    game_duration = clock.time() - game_start_time
     discrete_log = {
         "trial": trial_info,
         "final_score": score,
@@ -868,6 +865,9 @@ def run_practice_game():
     # Save logs after all fixation data is included
     save_continuous_log(continuous_log, continuous_filename)
     save_discrete_log([discrete_log], discrete_filename)
+    if audio_player is not None:
+        audio_player.save_events(audio_filename)
+    button_box.save_events(button_filename)
     
     if TRIAL_DURATION is not None:
         print(f"Snake game complete! Final score: {score} in {TRIAL_DURATION} seconds")
@@ -877,7 +877,41 @@ def run_practice_game():
         print(f"Trial {current_trial}/{total_trials} completed")
     print(f"Data saved to: {continuous_filename}")
 
-if __name__ == "__main__":
+# ---------------------------
+# Startup
+# ---------------------------
+# Import only defines constants and functions; setup() runs the startup stages in order
+STARTUP_BUDGET = {  # seconds per stage, one second in total (see startup_profile.py)
+    "interpreter": 0.05,
+    "imports": 0.50,
+    "arguments": 0.01,
+    "results files": 0.01,
+    "mixer": 0.15,
+    "pygame": 0.05,
+    "display": 0.20,
+    "sounds": 0.03,
+}
+
+
+def setup(argv=None):
+    """Run the startup stages; returns (parsed arguments, StartupTimer with the time of each stage)."""
+    timer = StartupTimer()
+    args = timer.run("arguments", parse_arguments, argv)
+    timer.run("results files", setup_results_files)
+    # The mixer is opened before pygame.init(), which would otherwise open it with pygame's defaults
+    timer.run("mixer", init_audio)
+    timer.run("pygame", pygame.init)
+    timer.run("display", init_display)
+    timer.run("sounds", load_sounds)
+    return args, timer
+
+
+def main(argv=None):
+    args, timer = setup(argv)
+    if args.profile_startup:
+        over_budget = report_startup("snake", timer, STARTUP_BUDGET)
+        pygame.quit()
+        return 1 if over_budget else 0
     print(f"Starting Snake Game")
     print(f"Mode: {MODE}")
     print(f"Participant: {player_initials}")
@@ -890,4 +924,7 @@ if __name__ == "__main__":
     
     run_practice_game()
     pygame.quit()
-    sys.exit() 
\ No newline at end of file
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spatial Index Module for fMRI Navigation Experiments
+Uniform-grid index over arena positions (targets, landmarks, distractors) for fast
+radius queries, so per-frame encounter checks do not scan every target.
+
+Build it once per arena from the target coordinates (e.g. ArenaSpec.coords) with a
+cell size close to the query radius; a query then only touches the 3x3 block of cells
+around the player. Large radii or batch queries use a vectorized NumPy path instead.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def radius_query(coords: np.ndarray, point: Sequence[float], radius: float) -> np.ndarray:
+    """Vectorized fallback: indices of all coords within radius of point (inclusive)."""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if len(coords) == 0:
+        return np.empty(0, dtype=np.intp)
+    d2 = np.sum((coords - np.asarray(point, dtype=float)) ** 2, axis=1)
+    return np.flatnonzero(d2 <= radius * radius)
+
+
+def pairwise_distances(points: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """Distance matrix of shape (len(points), len(coords))."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    return np.hypot(points[:, None, 0] - coords[None, :, 0], points[:, None, 1] - coords[None, :, 1])
+
+
+class SpatialIndex:
+    """
+    Uniform-grid spatial hash over 2D points (arena coordinates in meters).
+
+    Args:
+        coords: (n, 2) array of positions
+        cell_size: Grid cell size in meters (use roughly the typical query radius)
+        labels: Optional name per point (e.g. target names), returned by query_labels()
+    """
+
+    # Above this many cells per query, a single vectorized pass is cheaper than the grid walk
+    MAX_GRID_CELLS = 25
+    # Query points per vectorized block, bounding the distance matrix to ~BATCH_SIZE x n floats
+    BATCH_SIZE = 4096
+
+    def __init__(self, coords, cell_size: float, labels: Optional[Sequence[str]] = None):
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        self.labels = list(labels) if labels is not None else None
+        self._points: List[Tuple[float, float]] = [(float(x), float(y)) for x, y in self.coords]
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, (x, y) in enumerate(self._points):
+            self._cells.setdefault(self._cell(x, y), []).append(i)
+
+    @classmethod
+    def from_targets(cls, targets: Dict[str, Tuple[float, float]], cell_size: float) -> 'SpatialIndex':
+        """Build an index from a {name: (x, y)} dict (the form run_arena receives)."""
+        names = list(targets.keys())
+        coords = np.array([targets[n] for n in names], dtype=float).reshape(-1, 2)
+        return cls(coords, cell_size, labels=names)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def query_radius(self, point: Sequence[float], radius: float) -> List[int]:
+        """Indices of points within radius of point (inclusive), in ascending order."""
+        x, y = float(point[0]), float(point[1])
+        reach = int(math.ceil(radius / self.cell_size))
+        if (2 * reach + 1) ** 2 > self.MAX_GRID_CELLS:
+            return radius_query(self.coords, (x, y), radius).tolist()
+
+        cx, cy = self._cell(x, y)
+        r2 = radius * radius
+        hits = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                bucket = self._cells.get((gx, gy))
+                if not bucket:
+                    continue
+                for i in bucket:
+                    px, py = self._points[i]
+                    if (px - x) * (px - x) + (py - y) * (py - y) <= r2:
+                        hits.append(i)
+        hits.sort()
+        return hits
+
+    def query_labels(self, point: Sequence[float], radius: float) -> List[str]:
+        """Labels of points within radius of point (requires labels at construction)."""
+        return [self.labels[i] for i in self.query_radius(point, radius)]
+
+    def query_radius_many(self, points, radius: float) -> List[np.ndarray]:
+        """Batch radius query: one index array per query point (vectorized)."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0 or len(self._points) == 0:
+            return [np.empty(0, dtype=np.intp) for _ in range(len(points))]
+        results = []
+        for start in range(0, len(points), self.BATCH_SIZE):
+            within = pairwise_distances(points[start:start + self.BATCH_SIZE], self.coords) <= radius
+            results.extend(np.flatnonzero(row) for row in within)
+        return results
+
+    def nearest(self, points) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest indexed point for each query point (vectorized).
+
+        Returns:
+            (indices, distances), each of shape (len(points),)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(self._points) == 0:
+            return np.full(len(points), -1, dtype=np.intp), np.full(len(points), np.inf)
+        indices = np.empty(len(points), dtype=np.intp)
+        distances = np.empty(len(points), dtype=float)
+        for start in range(0, len(points), self.BATCH_SIZE):
+            dist = pairwise_distances(points[start:start + self.BATCH_SIZE], self.coords)
+            idx = np.argmin(dist, axis=1)
+            indices[start:start + len(idx)] = idx
+            distances[start:start + len(idx)] = dist[np.arange(len(idx)), idx]
+        return indices, distances
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup Stages and Budgets for the Task Scripts
+Importing multi_arena.py, one_target.py or snake.py only defines constants and
+functions; their main() runs the startup in explicit stages (arguments, results files,
+pygame, mixer, display, sounds), each timed with a StartupTimer. With --profile-startup
+a task reports the time of every stage against its STARTUP_BUDGET, together with the
+interpreter's -X importtime data for the task module (measured in a fresh interpreter,
+since the running one has already imported everything), and exits before the experiment.
+
+Usage:
+    python multi_arena.py practice --profile-startup
+    python one_target.py fmri --participant TS263 --profile-startup
+    python startup_profile.py snake                 # -X importtime data of one module only
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class ImportTime(NamedTuple):
+    """One line of -X importtime output (times in seconds)."""
+    name: str
+    depth: int
+    self_s: float
+    cumulative_s: float
+
+
+class StartupTimer:
+    """Runs startup stages and records the wall time of each, in order."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    def run(self, name: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.stages)
+
+
+def import_times(module: str, cwd: Optional[str] = None) -> List[ImportTime]:
+    """-X importtime entries of `import module` in a fresh interpreter (children before parents)."""
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append(ImportTime(name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def split_import_times(entries: List[ImportTime], module: str) -> Tuple[float, float, List[ImportTime]]:
+    """
+    Split -X importtime entries into interpreter startup and the module's own import.
+
+    Returns:
+        (interpreter startup s, module import s, the module's direct imports by cumulative time)
+    """
+    position = next((i for i, e in enumerate(entries) if e.name == module and e.depth == 0), None)
+    if position is None:
+        return sum(e.cumulative_s for e in entries if e.depth == 0), 0.0, []
+    interpreter = sum(e.cumulative_s for e in entries[:position] if e.depth == 0)
+    start = max((i + 1 for i, e in enumerate(entries[:position]) if e.depth == 0), default=0)
+    children = [e for e in entries[start:position] if e.depth == 1]
+    return interpreter, entries[position].cumulative_s, sorted(children, key=lambda e: -e.cumulative_s)
+
+
+def report_startup(module: str, timer: StartupTimer, budget: Dict[str, float], top: int = 8) -> List[str]:
+    """
+    Print the time of every startup stage (including interpreter startup and imports)
+    against its budget and the slowest imports of the module.
+
+    Returns:
+        Names of the stages over budget
+    """
+    interpreter, imports, children = split_import_times(import_times(module), module)
+    stages = [("interpreter", interpreter), ("imports", imports)] + timer.stages
+    over = [name for name, seconds in stages if name in budget and seconds > budget[name]]
+
+    print(f"\nStartup profile: {module}")
+    print(f"  {'stage':<16}{'time':>10}{'budget':>10}")
+    for name, seconds in stages:
+        limit = f"{budget[name] * 1000:.0f} ms" if name in budget else "-"
+        flag = "  OVER" if name in over else ""
+        print(f"  {name:<16}{seconds * 1000:>7.1f} ms{limit:>10}{flag}")
+    total = sum(seconds for _, seconds in stages)
+    total_budget = sum(budget.get(name, 0.0) for name, _ in stages)
+    print(f"  {'total':<16}{total * 1000:>7.1f} ms{total_budget * 1000:>7.0f} ms")
+    print("  (interpreter and imports measured in a fresh interpreter with -X importtime)")
+    if children:
+        print(f"Slowest imports of {module} (cumulative):")
+        for entry in children[:top]:
+            print(f"  {entry.name:<28}{entry.cumulative_s * 1000:>7.1f} ms")
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(description='-X importtime data of a task module')
+    parser.add_argument('module', help='Module to import (e.g. multi_arena, one_target, snake)')
+    parser.add_argument('--top', type=int, default=15, help='Number of imports to list (default: 15)')
+    args = parser.parse_args()
+
+    interpreter, imports, children = split_import_times(import_times(args.module), args.module)
+    print(f"Interpreter startup: {interpreter * 1000:.1f} ms")
+    print(f"import {args.module}: {imports * 1000:.1f} ms")
+    for entry in children[:args.top]:
+        print(f"  {entry.name:<28}{entry.cumulative_s * 1000:>7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic Participant for Accelerated End-to-End Runs
+Runs a task script (multi_arena.py, one_target.py, snake.py) or a wrapper that launches
+them (full_arena_run.py, one_target_run.py, ...) unmodified on the virtual task clock
+(--clock virtual, see task_clock.py), with a scripted participant at the keys.
+
+Virtual clock: the tasks read all their time from the task clock, which only advances
+when a loop ticks or polls. Durations, TR alignment and every timestamp in the logs are
+therefore what a real session would produce, and a run takes as long as its frames take
+to compute. Most of that is drawing, so every frame is DEFAULT_STEP virtual seconds long
+instead of the game's 1/60 s: a wrapper run goes about 30x faster than real time, with
+phase ends and log rows on a 0.1 s grid. --step 0 keeps the game's frame rate.
+
+Participant: it is called by the virtual clock at every tick and poll (before the frame's
+time passes) and posts KEYDOWN/KEYUP events to pygame's queue, where the task's ButtonBox
+stamps them like button-box input. The game loops describe each frame with
+ButtonBox.show() (phase, player_pos, targets, ...), which is all the participant sees:
+- other screens (instructions, intro, fixation): '1'/ENTER after a reaction time
+- exploration / gameplay: the movement policy holds 7/8/9/0
+    random-walk   forward runs and turns, turning away from the wall
+    wall-follow   circles the arena just inside the border
+    go-to-targets visits the (true) target positions, nearest first
+    scripted      drives through the waypoints of --path, in a loop
+- one_target: presses ENTER a few seconds after the target is placed, drives the
+  annotation marker back to it and confirms
+- multi_arena annotation: drives to each target found during exploration (with
+  --memory-noise), types its Hebrew name and confirms; clicks Finished in practice
+- feedback: ENTER; endless snake (practice): 'K' after --snake-duration seconds
+
+Task scripts that a wrapper starts with clock.run() are run through this driver too
+(TASK_CLOCK_DRIVER), continuing the same virtual clock, so a full wrapper run produces
+the per-trial logs and the wrapper's timing log in one go. SDL's dummy video and audio
+drivers are used unless --visible is given.
+
+Usage:
+    python synthetic_participant.py multi_arena.py fmri --participant SYN --arena hospital --trial 2 --total-trials 12
+    python synthetic_participant.py --policy wall-follow --seed 1 -- one_target.py practice --participant SYN
+    python synthetic_participant.py --results-dir /tmp/syn --trigger full_arena_run.py --participant SYN --run 3
+    python synthetic_participant.py --policy scripted --path waypoints.csv snake.py practice
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import runpy
+import argparse
+from collections import deque
+from typing import List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import pygame
+
+import task_clock
+from button_box import ButtonBox
+
+ARENA_RADIUS = 3.3 / 2.0
+REACTION_TIME = 0.4           # Seconds before answering an instruction/intro/feedback screen
+REACH_DISTANCE = 0.1          # Meters; a goal closer than this counts as reached
+HEADING_TOLERANCE = 8.0       # Degrees; turn in place until the goal is this close to straight ahead
+WALL_MARGIN = 0.35            # random-walk turns back when this close to the border
+WALL_FOLLOW_MARGIN = 0.25     # wall-follow keeps this far inside the border
+DEFAULT_STEP = 0.1            # Virtual seconds per frame (the tasks ask for 1/60)
+
+ROTATE_LEFT, FORWARD, BACKWARD, ROTATE_RIGHT = pygame.K_7, pygame.K_8, pygame.K_9, pygame.K_0
+KEY_CHARS = {pygame.K_7: '7', pygame.K_8: '8', pygame.K_9: '9', pygame.K_0: '0',
+             pygame.K_1: '1', pygame.K_k: 'k', pygame.K_RETURN: '\r'}
+
+POLICIES = ["random-walk", "wall-follow", "go-to-targets", "scripted"]
+
+
+# ---------------------------
+# Movement policies
+# ---------------------------
+class View(NamedTuple):
+    """What a policy sees each frame."""
+    t: float                                  # Virtual seconds since the screen started
+    pos: Tuple[float, float]
+    angle: float                              # Degrees, 0 = up, clockwise
+    targets: List[Tuple[float, float]]        # Known target positions not yet reached
+
+
+def heading_to(pos, goal) -> float:
+    """Heading (task convention: 0 = +y, clockwise) from pos to goal."""
+    return math.degrees(math.atan2(goal[0] - pos[0], goal[1] - pos[1])) % 360
+
+
+def steer(pos, angle, goal) -> Set[int]:
+    """Keys that turn in place towards goal, then drive straight at it."""
+    error = (heading_to(pos, goal) - angle + 180) % 360 - 180
+    if abs(error) > HEADING_TOLERANCE:
+        return {ROTATE_RIGHT if error > 0 else ROTATE_LEFT}
+    return {FORWARD}
+
+
+class RandomWalk:
+    """Forward runs of 1-3 s alternating with 0.2-1 s turns; turns back near the wall."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.keys_held: Set[int] = set()
+        self.until = 0.0
+
+    def keys(self, view: View) -> Set[int]:
+        x, y = view.pos
+        rad = math.radians(view.angle)
+        outward = x * math.sin(rad) + y * math.cos(rad) > 0
+        if math.hypot(x, y) >= ARENA_RADIUS - WALL_MARGIN and outward:
+            self.until = view.t
+            return steer(view.pos, view.angle, (0.0, 0.0))
+        if view.t >= self.until:
+            if FORWARD in self.keys_held:
+                self.keys_held = {self.rng.choice((ROTATE_LEFT, ROTATE_RIGHT))}
+                self.until = view.t + self.rng.uniform(0.2, 1.0)
+            else:
+                self.keys_held = {FORWARD}
+                self.until = view.t + self.rng.uniform(1.0, 3.0)
+        return self.keys_held
+
+
+class WallFollow:
+    """Circles clockwise just inside the border."""
+
+    def keys(self, view: View) -> Set[int]:
+        x, y = view.pos
+        radius = ARENA_RADIUS - WALL_FOLLOW_MARGIN
+        if math.hypot(x, y) < radius - 0.2:
+            bearing = math.atan2(x, y) if (x, y) != (0.0, 0.0) else math.radians(view.angle)
+            return steer(view.pos, view.angle, (radius * math.sin(bearing), radius * math.cos(bearing)))
+        ahead = math.atan2(x, y) + math.radians(20)
+        return steer(view.pos, view.angle, (radius * math.sin(ahead), radius * math.cos(ahead)))
+
+
+class GoToTargets:
+    """Drives to the nearest known target; random walk when none is known."""
+
+    def __init__(self, rng: random.Random):
+        self.fallback = RandomWalk(rng)
+
+    def keys(self, view: View) -> Set[int]:
+        if not view.targets:
+            return self.fallback.keys(view)
+        goal = min(view.targets, key=lambda p: math.hypot(p[0] - view.pos[0], p[1] - view.pos[1]))
+        return steer(view.pos, view.angle, goal)
+
+
+class ScriptedPath:
+    """Drives through a fixed list of waypoints, starting over after the last one."""
+
+    def __init__(self, waypoints: Sequence[Tuple[float, float]]):
+        self.waypoints = list(waypoints)
+        self.index = 0
+
+    def keys(self, view: View) -> Set[int]:
+        goal = self.waypoints[self.index]
+        if math.hypot(goal[0] - view.pos[0], goal[1] - view.pos[1]) < REACH_DISTANCE:
+            self.index = (self.index + 1) % len(self.waypoints)
+            goal = self.waypoints[self.index]
+        return steer(view.pos, view.angle, goal)
+
+
+def load_waypoints(spec: str) -> List[Tuple[float, float]]:
+    """Waypoints from a CSV with x,y columns, or inline as 'x,y;x,y;...'."""
+    if os.path.exists(spec):
+        with open(spec, newline='', encoding='utf-8-sig') as f:
+            return [(float(row['x']), float(row['y'])) for row in csv.DictReader(f)]
+    return [tuple(float(v) for v in point.split(',')) for point in spec.split(';') if point.strip()]
+
+
+def make_policy(name: str, rng: random.Random, path: Optional[str] = None):
+    if name == "wall-follow":
+        return WallFollow()
+    if name == "go-to-targets":
+        return GoToTargets(rng)
+    if name == "scripted":
+        if not path:
+            raise ValueError("the scripted policy needs --path")
+        return ScriptedPath(load_waypoints(path))
+    return RandomWalk(rng)
+
+
+# ---------------------------
+# Participant
+# ---------------------------
+def key_event(kind, key, char=None):
+    return pygame.event.Event(kind, key=key, unicode=KEY_CHARS.get(key, '') if char is None else char,
+                              mod=0, scancode=0)
+
+
+def tap(key, char=None):
+    return [key_event(pygame.KEYDOWN, key, char), key_event(pygame.KEYUP, key, char)]
+
+
+class SyntheticParticipant:
+    """
+    Decides, at every tick/poll of the virtual clock, which keys are down and which events to send.
+
+    Registered in VirtualClock.input_hooks (act) and ButtonBox.observers (loop_started,
+    screen_shown).
+    """
+
+    def __init__(self, policy_name: str, rng: random.Random, path=None,
+                 memory_noise=0.1, linger=5.0, snake_duration=60.0, reaction=REACTION_TIME):
+        self.policy_name = policy_name
+        self.path = path
+        self.rng = rng
+        self.memory_noise = memory_noise
+        self.linger = linger
+        self.snake_duration = snake_duration
+        self.reaction = reaction
+
+        self.now = None               # Virtual time of the current tick/poll
+        self.latest = None            # Latest virtual time seen (for the run summary)
+        self.held: Set[int] = set()
+        self.queue = deque()          # Event lists to send on the following frames
+        self.shown = None             # Screen the game loop showed since the last tick/poll
+        self.in_loop = False          # A game loop (ButtonBox) is running
+        self.loop_fresh = False       # ... and has not shown its first frame yet
+        self.phase = None
+        self.screen_start = None
+        self.last_press = -math.inf
+        self.policy = None
+        self.memory = {}              # Target name -> true position, remembered when found / placed
+        self.plan = []                # Annotations still to make: (goal, typed name)
+        self.placed_at = None
+        self.frames = 0
+        self.events_sent = 0
+
+    # ButtonBox observer
+    def loop_started(self):
+        """A game loop started (ButtonBox.reset): a new trial or game."""
+        self.in_loop = True
+        self.loop_fresh = True
+        self.shown = None
+        self.new_screen()
+        # Keys held in the previous loop are not down for the new loop's ButtonBox
+        self.held = set()
+        self.policy = make_policy(self.policy_name, self.rng, self.path)
+        self.memory = {}
+        self.plan = None
+        self.placed_at = None
+
+    def screen_shown(self, screen):
+        self.shown = screen
+        self.loop_fresh = False
+
+    # VirtualClock input hook
+    def act(self, clock):
+        self.now = clock.time()
+        self.latest = self.now if self.latest is None else max(self.latest, self.now)
+        if self.screen_start is None:
+            self.screen_start = self.now
+        if not pygame.display.get_init():
+            return
+        screen, self.shown = self.shown, None
+        if screen is None and self.in_loop and not self.loop_fresh:
+            # The game loop is over: instructions, fixation or the next intro follow
+            self.in_loop = False
+            self.new_screen()
+        for event in self.frame(screen):
+            pygame.event.post(event)
+
+    def frame(self, screen) -> list:
+        self.frames += 1
+        phase = screen.get("phase") if screen else None
+        if phase != self.phase:
+            self.screen_start = self.now
+        self.phase = phase
+
+        if self.queue:
+            events = self.release() + self.queue.popleft()
+        elif screen is not None:
+            events = self.respond(screen)
+        elif self.in_loop:
+            events = self.release()
+        else:
+            events = self.press_after_reaction()
+        self.events_sent += len(events)
+        return events
+
+    def new_screen(self):
+        """A different screen started: restart the reaction timer and drop pending input."""
+        self.screen_start = self.now
+        self.queue.clear()
+
+    def set_held(self, keys) -> list:
+        """KEYDOWN/KEYUP events that turn the held set into keys."""
+        keys = set(keys)
+        events = [key_event(pygame.KEYUP, k) for k in sorted(self.held - keys)]
+        events += [key_event(pygame.KEYDOWN, k) for k in sorted(keys - self.held)]
+        self.held = keys
+        return events
+
+    def release(self) -> list:
+        return self.set_held(())
+
+    def press_after_reaction(self, key=pygame.K_RETURN) -> list:
+        if self.now - max(self.screen_start, self.last_press) < self.reaction:
+            return self.release()
+        self.last_press = self.now
+        return self.release() + tap(key)
+
+    def respond(self, screen) -> list:
+        phase = screen.get("phase") or "gameplay"
+        if phase in ("exploration", "gameplay"):
+            return self.navigate(screen)
+        if phase == "annotation":
+            return self.annotate(screen)
+        return self.press_after_reaction()
+
+    def navigate(self, screen) -> list:
+        now = self.now
+        targets = screen.get("targets")
+        # multi_arena: remember where each found target is
+        if isinstance(targets, dict):
+            for name in screen.get("found_targets", ()):
+                self.memory.setdefault(name, tuple(targets[name]))
+        # one_target: wait a little after the target appears, then go to annotation
+        if screen.get("target_placed"):
+            if self.placed_at is None:
+                self.placed_at = now
+                self.memory["target"] = tuple(screen["target_position"])
+            if now - self.placed_at >= self.linger:
+                return self.press_after_reaction()
+        # snake without a time limit (practice): stop with 'K'
+        if screen.get("endless") and now - self.screen_start >= self.snake_duration:
+            return self.press_after_reaction(pygame.K_k)
+
+        if isinstance(targets, dict):
+            known = [tuple(p) for name, p in targets.items() if name not in screen.get("found_targets", ())]
+        elif screen.get("target_pos") is not None:
+            known = [tuple(screen["target_pos"])]
+        else:
+            known = []
+        view = View(now - self.screen_start, tuple(screen["player_pos"]), screen["player_angle"], known)
+        return self.set_held(self.policy.keys(view))
+
+    def recall(self, position):
+        return (position[0] + self.rng.gauss(0.0, self.memory_noise),
+                position[1] + self.rng.gauss(0.0, self.memory_noise))
+
+    def annotate(self, screen) -> list:
+        # one_target: drive the annotation marker back to the target, then confirm
+        if "annotation_marker_pos" in screen:
+            if self.plan is None:
+                self.plan = [(self.recall(self.memory.get("target", (0.0, 0.0))), None)]
+            if not self.plan:
+                return self.release()
+            goal = self.plan[0][0]
+            pos = tuple(screen["annotation_marker_pos"])
+            if math.hypot(goal[0] - pos[0], goal[1] - pos[1]) < REACH_DISTANCE:
+                self.plan.pop(0)
+                return self.release() + tap(pygame.K_RETURN)
+            return self.set_held(steer(pos, screen["annotation_marker_angle"], goal))
+
+        # multi_arena: go to each remembered target, type its name, confirm
+        if self.plan is None:
+            hebrew = screen.get("hebrew_names") or {}
+            self.plan = [(self.recall(p), hebrew.get(name) or name) for name, p in self.memory.items()]
+        if screen.get("typing_active"):
+            return self.release()
+        if self.plan:
+            goal, name = self.plan[0]
+            pos = tuple(screen["player_pos"])
+            if math.hypot(goal[0] - pos[0], goal[1] - pos[1]) < REACH_DISTANCE or \
+                    math.hypot(*goal) > ARENA_RADIUS - REACH_DISTANCE:
+                self.plan.pop(0)
+                self.queue.extend([[key_event(pygame.KEYDOWN, 0, ch)] for ch in name])
+                self.queue.append(tap(pygame.K_RETURN))
+                return self.release() + tap(pygame.K_RETURN)
+            return self.set_held(steer(pos, screen["player_angle"], goal))
+        # Practice mode has no annotation time limit: click Finished
+        button = screen.get("finish_button")
+        if button is not None:
+            if self.now - self.last_press < self.reaction:
+                return self.release()
+            self.last_press = self.now
+            return self.release() + [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=button.center, button=1)]
+        return self.release()
+
+
+# ---------------------------
+# Running a script
+# ---------------------------
+def run_script(script: str, script_args: List[str]) -> int:
+    """Run a task or wrapper script in this process, as `python script args` would."""
+    script = os.path.abspath(script)
+    sys.argv = [script] + list(script_args)
+    sys.path.insert(0, os.path.dirname(script))
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a task or wrapper script with a synthetic participant on the virtual clock',
+        usage='%(prog)s [options] [--] SCRIPT [SCRIPT ARGS ...]')
+    parser.add_argument('--policy', choices=POLICIES, default='random-walk',
+                       help='Movement policy during exploration/gameplay (default: random-walk)')
+    parser.add_argument('--path', default=None,
+                       help="Waypoints for the scripted policy: CSV with x,y columns or 'x,y;x,y;...'")
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Seed for the participant and the tasks (same seed, same run)')
+    parser.add_argument('--memory-noise', type=float, default=0.1,
+                       help='SD (m) of remembered target positions when annotating (default: 0.1)')
+    parser.add_argument('--linger', type=float, default=5.0,
+                       help='one_target: seconds to keep exploring after the target appears (default: 5)')
+    parser.add_argument('--snake-duration', type=float, default=60.0,
+                       help="Seconds before ending an untimed snake game with 'K' (default: 60)")
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP,
+                       help=f"Virtual seconds per frame (coarser = faster; default: {DEFAULT_STEP}, "
+                            f"0 = the game's own frame rate)")
+    parser.add_argument('--results-dir', default=None,
+                       help='Write the task logs here (sets CENTRALIZED_RESULTS_DIR)')
+    parser.add_argument('--trigger', action='store_true',
+                       help='Set TRIGGER_RECEIVED_TIME to the start of the run if it is not set')
+    parser.add_argument('--visible', action='store_true',
+                       help='Open the game window and audio device instead of the dummy drivers')
+    parser.add_argument('--start-at', type=float, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('script', help='Script to run (relative to the current directory)')
+    parser.add_argument('script_args', nargs=argparse.REMAINDER, help='Arguments for the script')
+    args = parser.parse_args()
+
+    if not args.visible:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    if args.results_dir:
+        os.makedirs(args.results_dir, exist_ok=True)
+        os.environ['CENTRALIZED_RESULTS_DIR'] = os.path.abspath(args.results_dir)
+
+    # The script's make_clock() picks these up; a run started by a wrapper continues its clock
+    os.environ[task_clock.CLOCK_ENV] = "virtual"
+    if args.start_at is not None or not os.getenv(task_clock.START_ENV):
+        os.environ[task_clock.START_ENV] = repr(time.time() if args.start_at is None else args.start_at)
+    start = float(os.environ[task_clock.START_ENV])
+    if args.step:
+        os.environ[task_clock.STEP_ENV] = repr(args.step)
+    else:
+        os.environ.pop(task_clock.STEP_ENV, None)
+    if args.trigger and not os.getenv('TRIGGER_RECEIVED_TIME'):
+        os.environ['TRIGGER_RECEIVED_TIME'] = repr(start)
+
+    forward_args = ['--policy', args.policy, '--memory-noise', str(args.memory_noise),
+                    '--linger', str(args.linger), '--snake-duration', str(args.snake_duration),
+                    '--step', repr(args.step)]
+    if args.path:
+        forward_args += ['--path', os.path.abspath(args.path) if os.path.exists(args.path) else args.path]
+    if args.seed is not None:
+        forward_args += ['--seed', str(args.seed)]
+    if args.visible:
+        forward_args.append('--visible')
+    os.environ[task_clock.DRIVER_ENV] = json.dumps([os.path.abspath(__file__), *forward_args, '--'])
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    participant = SyntheticParticipant(args.policy, random.Random(args.seed), args.path, args.memory_noise,
+                                       args.linger, args.snake_duration)
+    task_clock.VirtualClock.input_hooks.append(participant.act)
+    ButtonBox.observers.append(participant)
+
+    script_args = args.script_args[1:] if args.script_args[:1] == ['--'] else args.script_args
+    wall_start = time.perf_counter()
+    code = run_script(args.script, script_args)
+    wall = time.perf_counter() - wall_start
+    elapsed = (participant.latest or start) - start
+    print(f"Synthetic participant ({args.policy}): {elapsed:.1f}s of session time in {wall:.1f}s "
+          f"({elapsed / max(wall, 1e-9):.0f}x), {participant.frames} frames, "
+          f"{participant.events_sent} events", file=sys.stderr)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
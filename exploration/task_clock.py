@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Task Clocks for the Navigation Tasks and Their Wrappers
+Every timer in multi_arena.py, one_target.py, snake.py and the run wrappers reads the
+task clock instead of time.time()/datetime.now(), and the per-frame dt comes from its
+tick(), so the same trial can run against different notions of time:
+
+- real:    wall-clock time measured with time.monotonic (immune to system clock
+           adjustments during a run); tick() paces frames like pygame.time.Clock
+- virtual: time only moves when the task advances it (tick, sleep, poll); frames run
+           as fast as they can be drawn, but every logged duration is exactly what a
+           real-time run would have produced
+- scaled:  real time multiplied by a speed factor (e.g. --clock-speed 4 for a quick
+           look at a whole trial)
+
+The clock is chosen with --clock/--clock-speed (or TASK_CLOCK/TASK_CLOCK_SPEED) and is
+handed to child processes started with clock.run(), which continue the parent's time.
+
+Nobody can press keys in virtual time, so the virtual clock has two hooks for a simulated
+participant (synthetic_participant.py): VirtualClock.input_hooks are called at every tick
+and poll before time moves on, and TASK_CLOCK_DRIVER names a script that task scripts
+started with clock.run() are run through.
+
+Usage:
+    SDL_VIDEODRIVER=dummy python synthetic_participant.py snake.py fmri  # input for headless runs
+    python snake.py practice --clock scaled --clock-speed 4
+    python full_arena_run.py --participant TS263 --run 1 --clock virtual
+"""
+
+import os
+import abc
+import json
+import time
+import atexit
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Callable, List, Optional
+
+CLOCKS = ["real", "virtual", "scaled"]
+FRAME_TIME = 1.0 / 60.0  # Virtual time per poll() and per tick() without a framerate
+
+# Environment handed to child processes (see TaskClock.run)
+CLOCK_ENV = 'TASK_CLOCK'
+SPEED_ENV = 'TASK_CLOCK_SPEED'
+START_ENV = 'TASK_CLOCK_START'      # Parent's clock time when the child was started
+ANCHOR_ENV = 'TASK_CLOCK_ANCHOR'    # Parent's time.time() at that moment
+FILE_ENV = 'TASK_CLOCK_FILE'        # Where a virtual child writes its final time
+STEP_ENV = 'TASK_CLOCK_STEP'        # Virtual seconds per frame instead of what tick() asks for
+DRIVER_ENV = 'TASK_CLOCK_DRIVER'    # JSON list: script and options that virtual children run through
+
+
+class TaskClock(abc.ABC):
+    """Common interface: seconds since the epoch, datetimes and pygame-style frame ticks."""
+
+    kind = "real"
+    speed = 1.0
+
+    @abc.abstractmethod
+    def time(self) -> float:
+        """Seconds since the epoch on this clock."""
+
+    @abc.abstractmethod
+    def sleep(self, seconds: float):
+        """Let seconds pass on this clock."""
+
+    @abc.abstractmethod
+    def tick(self, framerate: float = 0, idle: Optional[Callable[[], None]] = None) -> int:
+        """
+        End a frame (capped at framerate if given) and return its length in ms.
+
+        idle, if given, must be called before the frame's time has passed (e.g.
+        ButtonBox.pump, to timestamp input within the frame): clocks that wait for the
+        cap call it about every millisecond while waiting, the virtual clock once before
+        it advances.
+        """
+
+    def poll(self):
+        """Called by loops that poll events without tick(); lets virtual time move on."""
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time())
+
+    def strftime(self, fmt: str) -> str:
+        return self.now().strftime(fmt)
+
+    def wait(self, milliseconds: int) -> int:
+        """pygame.time.wait() on this clock."""
+        self.sleep(milliseconds / 1000.0)
+        return milliseconds
+
+    def child_env(self) -> dict:
+        """Environment variables that make a child process continue this clock."""
+        return {CLOCK_ENV: self.kind, SPEED_ENV: repr(self.speed),
+                START_ENV: repr(self.time()), ANCHOR_ENV: repr(time.time())}
+
+    def run(self, cmd, **kwargs) -> subprocess.CompletedProcess:
+        """subprocess.run() for a task script, continuing this clock in the child."""
+        env = dict(kwargs.pop('env', None) or os.environ)
+        env.update(self.child_env())
+        return subprocess.run(cmd, env=env, **kwargs)
+
+
+class ScaledClock(TaskClock):
+    """Real time multiplied by speed, from a monotonic source."""
+
+    kind = "scaled"
+
+    def __init__(self, speed: float = 1.0, start: Optional[float] = None, anchor: Optional[float] = None):
+        if speed <= 0:
+            raise ValueError(f"Clock speed must be positive, got {speed}")
+        self.speed = speed
+        self._start = time.time() if start is None else start
+        self._origin = time.monotonic()
+        if anchor is not None:
+            # Time that passed between the parent's handoff and now also counts
+            self._origin -= max(0.0, time.time() - anchor)
+        self._frames = None
+        self._last_tick = time.monotonic()
+
+    def time(self) -> float:
+        return self._start + (time.monotonic() - self._origin) * self.speed
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def tick(self, framerate: float = 0, idle: Optional[Callable[[], None]] = None) -> int:
+        if self._frames is None:
+            import pygame
+            self._frames = pygame.time.Clock()
+        if idle is not None and framerate:
+            # Wait out the frame in 1 ms steps instead of one SDL_Delay
+            frame_end = self._last_tick + 1.0 / (framerate * self.speed)
+            idle()
+            remaining = frame_end - time.monotonic()
+            while remaining > 0:
+                time.sleep(min(0.001, remaining))
+                idle()
+                remaining = frame_end - time.monotonic()
+            milliseconds = self._frames.tick()
+        else:
+            milliseconds = self._frames.tick(framerate * self.speed)
+        self._last_tick = time.monotonic()
+        return int(round(milliseconds * self.speed))
+
+
+class RealClock(ScaledClock):
+    """Wall-clock time; the default for experiment sessions."""
+
+    kind = "real"
+
+    def __init__(self):
+        super().__init__(1.0)
+
+    def child_env(self) -> dict:
+        return {CLOCK_ENV: self.kind}
+
+
+class VirtualClock(TaskClock):
+    """Seconds since the epoch that only move when advanced."""
+
+    kind = "virtual"
+
+    # Called with the clock at every tick() and poll(), before time moves on: the input of a
+    # simulated participant, which it sends by posting events to pygame's queue
+    input_hooks: List[Callable[['VirtualClock'], None]] = []
+
+    def __init__(self, start: Optional[float] = None, frame_time: float = FRAME_TIME,
+                 step: Optional[float] = None):
+        self._now = time.time() if start is None else start
+        self.frame_time = frame_time
+        self.step = step  # Seconds per tick() and poll() whatever the framerate (coarser = faster)
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self._now += seconds
+
+    sleep = advance
+
+    def _input(self):
+        for hook in self.input_hooks:
+            hook(self)
+
+    def tick(self, framerate: float = 0, idle: Optional[Callable[[], None]] = None) -> int:
+        seconds = self.step or (1.0 / framerate if framerate else self.frame_time)
+        milliseconds = max(1, int(round(1000.0 * seconds)))
+        self._input()
+        if idle is not None:
+            # Input that arrived during the frame is stamped at its start, not after the frame's time
+            idle()
+        self.advance(milliseconds / 1000.0)
+        return milliseconds
+
+    def poll(self):
+        self._input()
+        self.advance(self.step or self.frame_time)
+
+    def run(self, cmd, **kwargs) -> subprocess.CompletedProcess:
+        fd, clock_file = tempfile.mkstemp(suffix='.clock')
+        os.close(fd)
+        env = dict(kwargs.pop('env', None) or os.environ)
+        env[FILE_ENV] = clock_file
+        driver = env.get(DRIVER_ENV)
+        if driver and isinstance(cmd, (list, tuple)) and len(cmd) > 1 and str(cmd[1]).endswith('.py'):
+            cmd = [cmd[0], *json.loads(driver), *cmd[1:]]
+        try:
+            return super().run(cmd, env=env, **kwargs)
+        finally:
+            # Continue from wherever the child's virtual time ended
+            with open(clock_file) as f:
+                content = f.read().strip()
+            if content:
+                self._now = max(self._now, float(content))
+            os.remove(clock_file)
+
+
+def make_clock(kind: Optional[str] = None, speed: Optional[float] = None) -> TaskClock:
+    """
+    Create the task clock; arguments left as None are taken from the environment.
+
+    A process started through TaskClock.run() continues its parent's clock.
+    """
+    kind = kind or os.getenv(CLOCK_ENV) or "real"
+    if kind not in CLOCKS:
+        raise ValueError(f"Unknown clock '{kind}' (choose from {', '.join(CLOCKS)})")
+    start = float(os.environ[START_ENV]) if os.getenv(START_ENV) else None
+    if kind == "real":
+        return RealClock()
+    if kind == "scaled":
+        speed = speed or float(os.getenv(SPEED_ENV) or 1.0)
+        anchor = float(os.environ[ANCHOR_ENV]) if os.getenv(ANCHOR_ENV) else None
+        return ScaledClock(speed, start, anchor)
+
+    clock = VirtualClock(start, step=float(os.environ[STEP_ENV]) if os.getenv(STEP_ENV) else None)
+    clock_file = os.getenv(FILE_ENV)
+    if clock_file:
+        def save_time():
+            with open(clock_file, 'w') as f:
+                f.write(repr(clock.time()))
+        atexit.register(save_time)
+    return clock
+
+
+def add_clock_arguments(parser):
+    """Add --clock and --clock-speed to a task's or wrapper's argument parser."""
+    parser.add_argument('--clock', choices=CLOCKS, default=None,
+                        help='Task clock: real (default), virtual or scaled (see task_clock.py)')
+    parser.add_argument('--clock-speed', type=float, default=None,
+                        help='Speed factor of the scaled clock (default: 1)')
@@ -42,6 +42,8 @@ def test_arena_logging():
         print("\nTest 1: Running with arena-specific suffix...")
         env = os.environ.copy()
         env['ARENA_LOG_SUFFIX'] = '_full_test_arena'
+        # multi_arena.py imports sibling modules (e.g. audio_cache) from the exploration folder
+        env['PYTHONPATH'] = original_dir
         
         # Run a quick test (just show instructions to avoid long wait)
         cmd = [sys.executable, 'multi_arena.py', 'practice', '--participant', 'TEST', 
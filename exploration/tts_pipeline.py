@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Pipeline Module for fMRI Navigation Experiments
+Concurrent, content-addressed speech synthesis for the target-word sounds.
+
+Every job is keyed on a hash of (backend, voice, text, custom sentence). Synthesized
+audio is stored once under sounds/cache/tts/<key>.<ext> and copied to its target path,
+so a word is only sent to the TTS service when its wording actually changed. Jobs run
+concurrently under an asyncio semaphore.
+
+Interactive listening is kept out of this module: new files are appended to a review
+queue (in the state file), which generate_hebrew_audio.py --review works through.
+
+Backends:
+    edge: Microsoft Edge TTS via the edge_tts package (network)
+    stub: offline tone generator for testing the pipeline without network or edge_tts
+"""
+
+import os
+import json
+import math
+import array
+import wave
+import shutil
+import asyncio
+import hashlib
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence
+
+SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+TTS_CACHE_DIR = os.path.join(SOUNDS_DIR, "cache", "tts")
+STATE_FILE = os.path.join(TTS_CACHE_DIR, "state.json")
+DEFAULT_CONCURRENCY = 8
+MIN_OUTPUT_BYTES = 1000  # Anything smaller is a placeholder or a failed synthesis
+
+
+class EdgeTTSBackend:
+    """Edge TTS (network). Imports edge_tts lazily so other backends work without it."""
+    name = "edge"
+    extension = ".mp3"
+
+    async def synthesize(self, text: str, voice: str, output_path: str):
+        import edge_tts
+        communicate = edge_tts.Communicate(text, voice)
+        await communicate.save(output_path)
+
+
+class StubBackend:
+    """
+    Offline backend for tests: writes a short 16-bit WAV tone whose pitch and length
+    are derived from the text, optionally after a simulated network delay.
+    """
+    name = "stub"
+    extension = ".wav"
+    frequency = 22050
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def synthesize(self, text: str, voice: str, output_path: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        seed = int(hashlib.sha256(f"{voice}|{text}".encode('utf-8')).hexdigest()[:8], 16)
+        pitch = 300 + seed % 500
+        n_frames = int(self.frequency * (0.3 + 0.05 * len(text)))
+        samples = array.array('h', (int(8000 * math.sin(2 * math.pi * pitch * i / self.frequency))
+                                    for i in range(n_frames)))
+        with wave.open(output_path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.frequency)
+            wav.writeframes(samples.tobytes())
+
+
+BACKENDS = {
+    'edge': EdgeTTSBackend,
+    'stub': StubBackend,
+}
+
+
+@dataclass
+class TTSJob:
+    """One word to synthesize into output_path."""
+    arena: str
+    target: str
+    text: str                       # Hebrew word as written in the arena CSV
+    output_path: str
+    voice: str
+    sentence: Optional[str] = None  # Custom sentence spoken instead of the bare word
+
+    @property
+    def spoken_text(self) -> str:
+        return self.sentence or self.text
+
+
+def job_key(backend_name: str, voice: str, text: str, sentence: Optional[str] = None) -> str:
+    """Content key of a synthesis request."""
+    payload = json.dumps([backend_name, voice, text, sentence or ""], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def load_state(state_file: str = STATE_FILE) -> dict:
+    """
+    Load pipeline state:
+        outputs:      {output path relative to SOUNDS_DIR: key that produced it}
+        rejected:     keys rejected during review (skipped when choosing a sentence)
+        review_queue: generated files waiting for a listening check
+    """
+    state = {'outputs': {}, 'rejected': [], 'review_queue': []}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return state
+
+
+def save_state(state: dict, state_file: str = STATE_FILE):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    tmp_path = state_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_file)
+
+
+def _state_path(path: str) -> str:
+    """Key used for a path in the state file (relative to SOUNDS_DIR when inside it)."""
+    path = os.path.abspath(path)
+    if path.startswith(SOUNDS_DIR + os.sep):
+        return os.path.relpath(path, SOUNDS_DIR).replace(os.sep, '/')
+    return path
+
+
+def choose_sentence(candidates: Sequence[Optional[str]], backend_name: str, voice: str, text: str,
+                    rejected: Sequence[str]) -> Optional[str]:
+    """First candidate sentence whose output has not been rejected in review (falls back to the last one)."""
+    rejected = set(rejected)
+    for sentence in candidates:
+        if job_key(backend_name, voice, text, sentence) not in rejected:
+            return sentence
+    return candidates[-1]
+
+
+class TTSPipeline:
+    """
+    Runs TTSJobs concurrently against one backend, reusing cached outputs.
+
+    Args:
+        backend: Backend instance (see BACKENDS)
+        concurrency: Maximum simultaneous synthesis requests
+        force: Re-synthesize even when a cached output exists
+        adopt_existing: Treat an existing output with no state entry as current
+                        (so files generated before the pipeline are not redone)
+    """
+
+    def __init__(self, backend, concurrency: int = DEFAULT_CONCURRENCY, force: bool = False,
+                 adopt_existing: bool = True, cache_dir: str = TTS_CACHE_DIR, state_file: str = STATE_FILE):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.force = force
+        self.adopt_existing = adopt_existing
+        self.cache_dir = cache_dir
+        self.state_file = state_file
+        self.state = load_state(state_file)
+
+    def key_for(self, job: TTSJob) -> str:
+        return job_key(self.backend.name, job.voice, job.text, job.sentence)
+
+    def cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:20] + self.backend.extension)
+
+    def _install(self, cache_path: str, output_path: str):
+        """Copy a cached output into place unless the file there is already identical."""
+        if os.path.exists(output_path) and _file_digest(output_path) == _file_digest(cache_path):
+            return
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = output_path + '.tmp'
+        shutil.copyfile(cache_path, tmp_path)
+        os.replace(tmp_path, output_path)
+
+    async def _run_job(self, job: TTSJob, semaphore: asyncio.Semaphore) -> Dict[str, str]:
+        key = self.key_for(job)
+        cache_path = self.cache_path(key)
+        state_path = _state_path(job.output_path)
+        result = {'arena': job.arena, 'target': job.target, 'output_path': job.output_path, 'key': key}
+
+        try:
+            if not self.force and os.path.exists(cache_path):
+                self._install(cache_path, job.output_path)
+                result['status'] = 'cached'
+            elif (not self.force and self.adopt_existing and state_path not in self.state['outputs']
+                  and os.path.exists(job.output_path) and os.path.getsize(job.output_path) >= MIN_OUTPUT_BYTES):
+                shutil.copyfile(job.output_path, cache_path)
+                result['status'] = 'adopted'
+            else:
+                async with semaphore:
+                    tmp_path = cache_path + '.tmp'
+                    await self.backend.synthesize(job.spoken_text, job.voice, tmp_path)
+                size = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+                if size < MIN_OUTPUT_BYTES:
+                    raise RuntimeError(f"output too small ({size} bytes)")
+                os.replace(tmp_path, cache_path)
+                self._install(cache_path, job.output_path)
+                result['status'] = 'generated'
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            return result
+
+        self.state['outputs'][state_path] = key
+        if result['status'] == 'generated':
+            queue = [item for item in self.state['review_queue'] if item['output_path'] != job.output_path]
+            queue.append(dict(asdict(job), key=key))
+            self.state['review_queue'] = queue
+        return result
+
+    async def _run_shared(self, jobs: Sequence[TTSJob], semaphore: asyncio.Semaphore) -> List[Dict[str, str]]:
+        """
+        Run jobs that share a key: the first one synthesizes (or reuses) the cache entry,
+        the others only install it, so no two jobs ever write the same cache file.
+        """
+        first = await self._run_job(jobs[0], semaphore)
+        results = [first]
+        for job in jobs[1:]:
+            result = {'arena': job.arena, 'target': job.target, 'output_path': job.output_path, 'key': first['key']}
+            if first['status'] == 'failed':
+                result.update(status='failed', error=first['error'])
+            else:
+                try:
+                    self._install(self.cache_path(first['key']), job.output_path)
+                    result['status'] = 'cached'
+                    self.state['outputs'][_state_path(job.output_path)] = first['key']
+                except Exception as e:
+                    result.update(status='failed', error=str(e))
+            results.append(result)
+        return results
+
+    async def run(self, jobs: Sequence[TTSJob]) -> List[Dict[str, str]]:
+        """Run all jobs and persist the state; returns one result dict per job (in job order)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # The same word in several arenas has one key; synthesize it once
+        groups: Dict[str, List[int]] = {}
+        for index, job in enumerate(jobs):
+            groups.setdefault(self.key_for(job), []).append(index)
+        grouped = await asyncio.gather(*(self._run_shared([jobs[i] for i in indices], semaphore)
+                                         for indices in groups.values()))
+        results: List[Optional[Dict[str, str]]] = [None] * len(jobs)
+        for indices, group_results in zip(groups.values(), grouped):
+            for index, result in zip(indices, group_results):
+                results[index] = result
+        save_state(self.state, self.state_file)
+        return results
+
+    def record_review(self, item: dict, accepted: bool):
+        """Remove a reviewed item from the queue; a rejection blocks its key from being reused."""
+        self.state['review_queue'] = [i for i in self.state['review_queue'] if i['key'] != item['key']]
+        if not accepted and item['key'] not in self.state['rejected']:
+            self.state['rejected'].append(item['key'])
+        save_state(self.state, self.state_file)
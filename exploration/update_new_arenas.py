@@ -9,7 +9,7 @@ import math
 import csv
 import os
 import sys
-from generate_target_locations import generate_target_locations
+from layout_optimizer import optimize_layouts
 
 # Dor's existing arenas (to avoid overlap)
 DOR_ARENAS = [
@@ -142,9 +142,11 @@ def generate_updated_arenas_csv():
     # Create the updated arenas list
     updated_arenas_data = []
     
+    # Generate 5 target locations per arena, balanced in difficulty across arenas
+    layouts, _ = optimize_layouts(UPDATED_ARENAS, num_targets=5, min_distance=0.3)
+    
     for arena_name in UPDATED_ARENAS:
-        # Generate 5 target locations for this arena
-        locations = generate_target_locations(5, min_distance=0.3)
+        locations = layouts[arena_name]
         targets = UPDATED_ARENA_TARGETS[arena_name]
         
         # Add each target with its location
@@ -6,53 +6,30 @@ Shows each arena as a 2D plot with target positions and Hebrew labels.
 
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
-import csv
-import re
 import numpy as np
 from matplotlib.patches import Circle
 import os
+from arena_registry import load_registry
 
 # Set up Hebrew font support
 plt.rcParams['font.family'] = ['DejaVu Sans', 'Arial Unicode MS', 'SimHei']
 
-def parse_coordinates(coord_str):
-    """Parse coordinate string like '(0.65; 0.06)' to (x, y)."""
-    match = re.search(r'\(([^;]+);\s*([^)]+)\)', coord_str)
-    if match:
-        x = float(match.group(1))
-        y = float(match.group(2))
-        return x, y
-    return None, None
-
 def load_arena_data(csv_file="Final_New_Arenas.csv"):
-    """Load arena data from CSV file."""
-    arenas = {}
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                arena = row['theme']
-                target = row['target']
-                coords = row['coords']
-                hebrew = row['hebrew_name']
-                
-                if arena not in arenas:
-                    arenas[arena] = []
-                
-                x, y = parse_coordinates(coords)
-                if x is not None and y is not None:
-                    arenas[arena].append({
-                        'target': target,
-                        'hebrew': hebrew,
-                        'x': x,
-                        'y': y
-                    })
-        
-        print(f"Loaded {len(arenas)} arenas with {sum(len(t) for t in arenas.values())} targets")
-        return arenas
-    except FileNotFoundError:
+    """Load arena data from CSV file via the arena registry."""
+    registry = load_registry(os.path.join(os.path.dirname(os.path.abspath(__file__)), csv_file), with_sounds=False)
+    if not registry:
         print(f"Error: {csv_file} not found")
         return {}
+    
+    arenas = {}
+    for arena, spec in registry.items():
+        arenas[arena] = [
+            {'target': target, 'hebrew': hebrew, 'x': float(x), 'y': float(y)}
+            for target, hebrew, (x, y) in zip(spec.target_names, spec.hebrew_names, spec.coords)
+        ]
+    
+    print(f"Loaded {len(arenas)} arenas with {sum(len(t) for t in arenas.values())} targets")
+    return arenas
 
 def create_arena_visualization(arena_name, targets, figsize=(10, 8)):
     """Create a visualization for a single arena."""
@@ -0,0 +1,347 @@
+"""
+GLM inputs for the fMRI runs: an events table and TR-binned parametric regressors.
+
+A run is one scan: the OT (one_target + snake) or FA (multi_arena + snake) trials that
+one run wrapper started after one scanner trigger. Rows are assigned to the wrapper's run
+number from the trial labels the tasks log in fMRI mode, read across all of a context's
+logs in time order (Full_arena_split.m scans two FA runs with separate triggers). Every row is put on the session clock with
+session_timeline.align_log() and expressed in seconds since its run's first
+trigger_received entry, then:
+
+- events: onset / duration / trial_type per run, one row per phase segment of a trial
+  (trial_type '<task>_<phase>', e.g. 'multi_arena_exploration') and one zero-duration
+  row per logged event (found_*, target_placed, target_annotated, ...)
+- regressors: one row per TR with the mean speed (m/s), total rotation (deg) and mean
+  distance to the nearest target (m) while navigating (exploration / gameplay),
+  binned with np.bincount over all rows at once
+
+Target positions come from the logs themselves: snake rows carry target_x/target_y,
+one_target's discrete log has each trial's target_location (used from the
+target_placed event on), and multi_arena arenas are looked up in the arena registry.
+TRs without navigation have zero speed and rotation and an empty target distance.
+
+Usage:
+    python fmri_regressors.py                          # every participant's OT and FA runs
+    python fmri_regressors.py --participant TS263 --workers 4
+    python fmri_regressors.py --self-test                # one synthetic one_target_run.py session must be one OT run
+
+Writes <SubID>_<OT|FA>_events.tsv and <SubID>_<OT|FA>_regressors.tsv next to the logs
+(<SubID>_<OT|FA>_run<n>_... when a participant has more than one run of a kind).
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from trajectory_metrics import (load_continuous_log, trial_column, segment_starts, step_metrics,
+                                NAVIGATION_PHASES)
+from cohort_analysis import default_results_dir, discover_logs, discrete_log_path
+from session_timeline import align_log, parse_trigger_time, seconds_since
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "exploration"))
+from arena_registry import load_registry  # noqa: E402
+
+TR = 2.01  # Fixed TR for fMRI experiments
+RUN_CONTEXTS = ("OT", "FA")
+SKIPPED_PHASES = ("trigger",)
+SKIPPED_EVENTS = ("trigger_received",)
+
+RUN_LABEL = re.compile(r"_run(\d+)$")  # multi_arena RoundName in fMRI mode
+EXPLORATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exploration")
+SELF_TEST_STEP = 0.05  # Virtual clock step of the self-test session (s)
+
+EVENT_COLUMNS = ["onset", "duration", "trial_type", "task", "trial", "phase"]
+REGRESSOR_COLUMNS = ["tr", "onset", "speed", "rotation_deg", "target_distance", "navigation_s"]
+
+
+def fmri_runs(results_dir, participants=None):
+    """{(participant, context): [LogFile, ...]} for the OT and FA logs (split into scan runs by load_runs)."""
+    runs = {}
+    for log in discover_logs(results_dir, participants):
+        if log.context in RUN_CONTEXTS:
+            runs.setdefault((log.participant, log.context), []).append(log)
+    return runs
+
+
+def one_target_locations(continuous_path):
+    """{trial: (x, y)} from the one_target discrete log next to a continuous log."""
+    path = discrete_log_path(continuous_path)
+    if not os.path.exists(path):
+        return {}
+    discrete = pd.read_csv(path, encoding='utf-8-sig')
+    locations = {}
+    for trial, location in zip(discrete["trial"].astype(str), discrete["target_location"]):
+        if isinstance(location, str) and location.strip():
+            locations[trial] = tuple(json.loads(location))
+    return locations
+
+
+def target_distance(df, task, log_path, registry):
+    """Distance (m) from every row's position to the nearest known target, NaN where none is known."""
+    x = df["x"].to_numpy(dtype=float)
+    y = df["y"].to_numpy(dtype=float)
+    distance = np.full(len(df), np.nan)
+
+    if task == "snake" and "target_x" in df.columns:
+        tx = pd.to_numeric(df["target_x"], errors='coerce').to_numpy()
+        ty = pd.to_numeric(df["target_y"], errors='coerce').to_numpy()
+        distance = np.hypot(x - tx, y - ty)
+
+    elif task == "one_target":
+        locations = one_target_locations(log_path)
+        trials = df["trial"].astype(str)
+        target = np.array([locations.get(t, (np.nan, np.nan)) for t in trials], dtype=float).reshape(-1, 2)
+        # The target only exists from its target_placed event on
+        placed = (df["event"] == "target_placed").groupby(trials.to_numpy()).cummax().to_numpy()
+        distance = np.where(placed, np.hypot(x - target[:, 0], y - target[:, 1]), np.nan)
+
+    elif task == "multi_arena":
+        rounds = df["RoundName"].astype(str).to_numpy()
+        for name in pd.unique(rounds):
+            spec = registry.get(name) or registry.get(name.split('_')[0])
+            if spec is None or not len(spec):
+                continue
+            rows = np.flatnonzero(rounds == name)
+            offsets = np.stack([x[rows], y[rows]], axis=1)[:, None, :] - spec.coords[None, :, :]
+            distance[rows] = np.linalg.norm(offsets, axis=2).min(axis=1)
+
+    return distance
+
+
+def scan_run_numbers(tasks, labels):
+    """
+    Run number the wrapper passed to the tasks, for every row of a context's logs in time order.
+
+    In fMRI mode multi_arena rounds are labelled '..._run<n>' and snake rows '<n>'; one_target
+    logs only its trial number, so its rows take the run of the rows before them (the snake
+    the wrapper started first), whichever log those are in. '' where no log has a run label.
+    """
+    labels = pd.Series(labels, dtype=str).str.strip()
+    runs = labels.str.extract(RUN_LABEL, expand=False)
+    is_snake = pd.Series(tasks, index=labels.index) == "snake"
+    runs = runs.fillna(labels.where(is_snake & labels.str.fullmatch(r"\d+")))
+    return runs.ffill().bfill().fillna("").to_numpy()
+
+
+def load_runs(logs, trigger_time=None, registry=None):
+    """
+    All rows of a participant's OT or FA logs, split into scan runs, with onset (seconds
+    since the run's trigger) and per-row step columns.
+
+    Returns:
+        [(run number ('' if unknown), DataFrame sorted by onset,
+          anchor source: 'argument', 'trigger_received' or 'first_row')] in run order
+    """
+    registry = registry if registry is not None else load_registry(with_sounds=False)
+    frames = []
+    for log in logs:
+        df = load_continuous_log(log.path)
+        if df.empty:
+            continue
+        trial_col = trial_column(df)
+        wall, _ = align_log(df)
+        steps = step_metrics(df, trial_col)
+        events = df["event"].fillna("").astype(str).str.strip() if "event" in df.columns else ""
+        frames.append(pd.DataFrame({
+            "wall_time": wall,
+            "task": log.task,
+            "source": os.path.basename(log.path),
+            "trial": df[trial_col].astype(str).to_numpy() if trial_col else "",
+            "phase": df["phase"].to_numpy() if "phase" in df.columns else "",
+            "event": events,
+            "dt": steps["dt"].to_numpy(),
+            "step_m": steps["step_m"].to_numpy(),
+            "turn_deg": steps["turn_deg"].to_numpy(),
+            "target_distance": target_distance(df, log.task, log.path, registry),
+            "segment_start": segment_starts(df, trial_col),
+        }))
+    if not frames:
+        return []
+    rows = pd.concat(frames, ignore_index=True)
+    rows = rows.sort_values("wall_time", kind="mergesort", na_position="last").reset_index(drop=True)
+    rows["scan_run"] = scan_run_numbers(rows["task"], rows["trial"])
+
+    runs = []
+    for scan_run, run in rows.groupby("scan_run", sort=False):
+        run = run.copy()
+        if trigger_time is not None:
+            anchor, anchor_source = parse_trigger_time(trigger_time), "argument"
+        else:
+            triggers = run.loc[run["event"] == "trigger_received", "wall_time"].dropna()
+            if len(triggers):
+                anchor, anchor_source = triggers.min(), "trigger_received"
+            else:
+                anchor, anchor_source = run["wall_time"].min(), "first_row"
+        run["onset"] = seconds_since(run["wall_time"], anchor)
+        run = run[np.isfinite(run["onset"])]
+        runs.append((scan_run, run.sort_values("onset", kind="mergesort").reset_index(drop=True), anchor_source))
+    return sorted(runs, key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+
+
+def events_table(run):
+    """Onset / duration / trial_type rows for the phase segments and logged events of a run."""
+    rows = run[~run["phase"].isin(SKIPPED_PHASES)]
+    # Segments are contiguous within each log file; sort by file first to find their ends
+    by_file = rows.sort_values(["source", "onset"], kind="mergesort")
+    segment_id = np.cumsum(by_file["segment_start"].to_numpy() |
+                           (by_file["source"] != by_file["source"].shift()).to_numpy())
+    segments = by_file.groupby(segment_id, sort=False).agg(
+        onset=("onset", "first"), end=("onset", "last"),
+        task=("task", "first"), trial=("trial", "first"), phase=("phase", "first"))
+    segments["duration"] = segments["end"] - segments["onset"]
+    segments["trial_type"] = segments["task"] + "_" + segments["phase"].astype(str)
+
+    logged = rows[(rows["event"] != "") & ~rows["event"].isin(SKIPPED_EVENTS)]
+    events = pd.DataFrame({
+        "onset": logged["onset"], "duration": 0.0, "trial_type": logged["event"],
+        "task": logged["task"], "trial": logged["trial"], "phase": logged["phase"],
+    })
+    table = pd.concat([segments[EVENT_COLUMNS], events[EVENT_COLUMNS]], ignore_index=True)
+    return table.sort_values("onset", kind="mergesort").reset_index(drop=True)
+
+
+def tr_regressors(run, tr=TR, n_trs=None):
+    """
+    Parametric regressors per TR from the navigation rows of a run.
+
+    Each row's step is counted in the TR its sample falls in; speed is path length over
+    the sampled navigation time of that TR.
+    """
+    nav = run[run["phase"].isin(NAVIGATION_PHASES) & (run["onset"] >= 0)]
+    if n_trs is None:
+        n_trs = int(run["onset"].max() // tr) + 1 if len(run) else 0
+    bins = (nav["onset"].to_numpy() // tr).astype(int)
+    inside = bins < n_trs
+    bins = bins[inside]
+
+    def per_tr(values):
+        return np.bincount(bins, weights=np.asarray(values, dtype=float)[inside], minlength=n_trs)
+
+    path = per_tr(nav["step_m"])
+    nav_time = per_tr(nav["dt"])
+    distance = nav["target_distance"].to_numpy(dtype=float)
+    has_distance = np.isfinite(distance)
+    distance_sum = per_tr(np.where(has_distance, distance, 0.0))
+    distance_n = per_tr(has_distance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(nav_time > 0, path / nav_time, 0.0)
+        mean_distance = np.where(distance_n > 0, distance_sum / distance_n, np.nan)
+
+    return pd.DataFrame({
+        "tr": np.arange(n_trs),
+        "onset": np.arange(n_trs) * tr,
+        "speed": speed,
+        "rotation_deg": per_tr(nav["turn_deg"]),
+        "target_distance": mean_distance,
+        "navigation_s": nav_time,
+    })
+
+
+def export_run(key, logs, output_dir=None, tr=TR):
+    """Worker: write the events and regressors TSVs of each scan run in logs; returns one summary dict per run."""
+    participant, context = key
+    runs = load_runs(logs)
+    output_dir = output_dir or os.path.dirname(logs[0].path)
+    os.makedirs(output_dir, exist_ok=True)
+    summaries = []
+    for scan_run, run, anchor_source in runs:
+        label = f"{context} run {scan_run}" if len(runs) > 1 else context
+        if run.empty:
+            summaries.append({'participant': participant, 'run': label, 'rows': 0})
+            continue
+        events = events_table(run)
+        regressors = tr_regressors(run, tr)
+        stem = os.path.join(output_dir, f"{participant}_{context}" + (f"_run{scan_run}" if len(runs) > 1 else ""))
+        events.to_csv(stem + "_events.tsv", sep="\t", index=False, float_format='%.3f', encoding='utf-8')
+        regressors.to_csv(stem + "_regressors.tsv", sep="\t", index=False, float_format='%.4f',
+                          na_rep='n/a', encoding='utf-8')
+        summaries.append({'participant': participant, 'run': label, 'rows': len(run),
+                          'files': int(run["source"].nunique()), 'events': len(events), 'trs': len(regressors),
+                          'anchor': anchor_source})
+    return summaries
+
+
+def run_self_test(wrapper="one_target_run.py", context="OT"):
+    """
+    Run one headless session of a run wrapper with exploration/synthetic_participant.py and
+    check that its logs make exactly one scan run. Returns the runs' (participant, label) list.
+    """
+    with tempfile.TemporaryDirectory() as results_dir:
+        env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+        cmd = [sys.executable, "synthetic_participant.py", "--seed", "1", "--step", str(SELF_TEST_STEP),
+               "--results-dir", results_dir, "--trigger", wrapper, "--participant", "SYN", "--run", "1"]
+        result = subprocess.run(cmd, cwd=EXPLORATION_DIR, env=env, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            raise RuntimeError(f"{wrapper} session exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+        runs = []
+        for (participant, run_context), logs in fmri_runs(results_dir).items():
+            if run_context == context:
+                runs.extend((participant, scan_run) for scan_run, _, _ in load_runs(logs))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export fMRI events tables and TR-binned regressors')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--participant', action='append', default=None,
+                       help='Only this participant (repeatable)')
+    parser.add_argument('--output-dir', default=None,
+                       help='Write all TSVs here (default: each participant folder)')
+    parser.add_argument('--tr', type=float, default=TR, help=f'TR in seconds (default: {TR})')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--self-test', action='store_true',
+                       help='Check that one synthetic one_target_run.py session exports as one OT run')
+    args = parser.parse_args()
+
+    if args.self_test:
+        runs = run_self_test()
+        print(f"one_target_run.py session: {len(runs)} OT run(s) {[label for _, label in runs]}")
+        if len(runs) != 1:
+            print("FAILED: expected exactly one OT run")
+            return 1
+        print("OK")
+        return 0
+
+    results_dir = args.results_dir or default_results_dir()
+    runs = fmri_runs(results_dir, args.participant)
+    if not runs:
+        print(f"No OT/FA fMRI logs found in {results_dir}")
+        return 1
+
+    failed = 0
+    exported = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [(key, pool.submit(export_run, key, logs, args.output_dir, args.tr))
+                   for key, logs in sorted(runs.items())]
+        for (participant, context), future in futures:
+            try:
+                summaries = future.result()
+            except Exception as e:
+                print(f"Warning: Could not export {participant} {context}: {e}")
+                failed += 1
+                continue
+            for summary in summaries:
+                if not summary['rows']:
+                    print(f"{participant} {summary['run']}: no rows")
+                    continue
+                note = "" if summary['anchor'] == "trigger_received" else " (no trigger_received entry; onsets from the first row)"
+                print(f"{participant} {summary['run']}: {summary['files']} logs, {summary['events']} events, "
+                      f"{summary['trs']} TRs{note}")
+                exported += 1
+    print(f"Exported {exported} runs" + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
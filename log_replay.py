@@ -0,0 +1,497 @@
+"""
+Headless, faster-than-real-time replay of a continuous log through the games' drawing.
+
+Each logged row becomes one frame drawn by the task's own draw_* functions
+(multi_arena.py, one_target.py, snake.py): the task module's game_surface is pointed at
+an offscreen surface, so nothing opens a window or waits for a frame cap. Importing a
+task only defines its functions. Its settings (mode, trial counter, phase durations) come
+from its own parse_arguments(), given what the log's file name tells (mode, participant,
+trial; see cohort_analysis.LOG_PATTERNS).
+
+Everything a frame depends on that the games keep as running state (thermometer
+distance, dial angle, whether the participant has moved yet, when the phase started,
+the annotations made so far) is computed for all rows up front, so any frame can be
+drawn on its own: seeking to a timestamp is a binary search in the per-trial index, and
+frames can be sampled at any rate without replaying the rows in between. What the logs
+do not record is not drawn: the name being typed in multi_arena's annotation phase, the
+debug timing panel and the instruction screens.
+
+Usage:
+    python log_replay.py Results/TS263/TS263_FA_fa2_continuous.csv                # render all, report speed
+    python log_replay.py LOG --contact-sheet sheet.png --interval 2
+    python log_replay.py LOG --frames frames/ --fps 10 --trial hospital
+    python log_replay.py LOG --at hospital:12.5 --output frame.png
+    python log_replay.py LOG --reveal                                             # as with the debug keys held
+"""
+
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import numpy as np
+import pandas as pd
+import pygame
+
+from trajectory_metrics import ARENA_RADIUS, BORDER_THRESHOLD, load_continuous_log, trial_column, segment_starts
+from cohort_analysis import LOG_PATTERNS, discrete_log_path
+from fmri_regressors import one_target_locations
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "exploration"))
+from arena_registry import load_registry  # noqa: E402
+import multi_arena  # noqa: E402
+import one_target  # noqa: E402
+import snake  # noqa: E402
+
+TASK_MODULES = {"multi_arena": multi_arena, "one_target": one_target, "snake": snake}
+
+# Trials per run of one_target_run.py and full_arena_run.py (runs 1 and 2), for the trial counter
+RUN_TRIALS = {"OT": 12, "FA": 4}
+
+HUD_COLOR = (120, 120, 120)
+
+FRAME_COLUMNS = ("trial", "phase", "trial_time", "phase_start", "x", "y", "rotation_angle", "event",
+                 "score", "target_x", "target_y", "target_placed")
+
+# one_target condition_type -> visibility rule of the exploration phase
+OT_VISIBILITY = {"test": "none", "dark_training": "limited"}
+
+
+def log_task(df):
+    """Task that wrote a continuous log, from its columns."""
+    if "score" in df.columns:
+        return "snake"
+    if "RoundName" in df.columns:
+        return "multi_arena"
+    return "one_target"
+
+
+def task_arguments(log_path, task, total_trials=None):
+    """Arguments for the task's parse_arguments(), as far as the log's file name tells."""
+    filename = os.path.basename(log_path)
+    participant, context, trial = "TEST", "", ""
+    for pattern_task, pattern in LOG_PATTERNS:
+        match = pattern.match(filename)
+        if match and pattern_task == task:
+            groups = match.groupdict()
+            participant, context, trial = groups["pid"], groups.get("context") or "", groups.get("run") or ""
+            break
+    mode = context if context in ("practice", "anatomical") else "fmri"
+    trial = int(trial) if trial else 1
+    total_trials = total_trials or max(RUN_TRIALS.get(context, trial), trial)
+    return [mode, "--participant", participant, "--trial", str(trial), "--total-trials", str(total_trials)]
+
+
+def visibility_modes(df, task):
+    """Per-row visibility rule: 'full', 'limited' or 'none'."""
+    if task == "multi_arena" and "visibility" in df.columns:
+        return df["visibility"].fillna("full").astype(str).to_numpy()
+    if task == "one_target" and "condition_type" in df.columns:
+        return df["condition_type"].map(OT_VISIBILITY).fillna("full").to_numpy()
+    return np.full(len(df), "full")
+
+
+def _indicator(t, amount, active, segment, fade_time):
+    """
+    (shown, accumulated) for a fading indicator, per row.
+
+    The indicator is shown while active and fade_time after; the accumulated amount
+    restarts every time it reappears, as in the games.
+    """
+    last_active = pd.Series(np.where(active, t, -np.inf)).groupby(segment).cummax().to_numpy()
+    shown = (t - last_active) <= fade_time
+    starts = shown & ~np.concatenate(([False], shown[:-1]))
+    starts |= np.concatenate(([True], segment[1:] != segment[:-1])) & shown
+    total = np.cumsum(np.where(shown, amount, 0.0))
+    base = pd.Series(np.where(starts, total - amount, np.nan)).ffill().fillna(0.0).to_numpy()
+    return shown, np.where(shown, total - base, 0.0)
+
+
+def replay_state(df, task):
+    """
+    Per-row drawing state of the whole log (vectorized).
+
+    Returns:
+        DataFrame with visible, show_thermometer, distance_moved, show_clock, angle_rotated
+    """
+    n = len(df)
+    trial_col = trial_column(df)
+    starts = segment_starts(df, trial_col)
+    segment = np.cumsum(starts)
+    t = df["trial_time"].to_numpy(dtype=float)
+    x = df["x"].to_numpy(dtype=float)
+    y = df["y"].to_numpy(dtype=float)
+    angle = df["rotation_angle"].to_numpy(dtype=float)
+
+    step = np.zeros(n)
+    turn = np.zeros(n)
+    if n > 1:
+        step[1:] = np.hypot(np.diff(x), np.diff(y))
+        turn[1:] = (np.diff(angle) + 180.0) % 360.0 - 180.0
+    step = np.where(starts | ~np.isfinite(step), 0.0, step)
+    turn = np.where(starts | ~np.isfinite(turn), 0.0, turn)
+    moving = step > 1e-6
+    rotating = np.abs(turn) > 1e-6
+
+    fade_time = getattr(TASK_MODULES[task], "MOVEMENT_FADE_TIME", 0.1)
+    show_thermometer, distance_moved = _indicator(t, step, moving, segment, fade_time)
+    show_clock, angle_rotated = _indicator(t, turn, rotating, segment, fade_time)
+
+    # The avatar hides once the participant starts moving in the trial (none / limited)
+    phase = df["phase"].astype(str).to_numpy() if "phase" in df.columns else np.full(n, "exploration")
+    trials = df[trial_col].astype(str).to_numpy() if trial_col else np.zeros(n)
+    exploring = phase == "exploration"
+    started = pd.Series((moving | rotating) & exploring).groupby(trials).cummax().to_numpy()
+    near_border = np.hypot(x, y) >= ARENA_RADIUS - BORDER_THRESHOLD
+    mode = visibility_modes(df, task)
+    visible = ~exploring | (mode == "full") | ~started | ((mode == "limited") & near_border)
+
+    return pd.DataFrame({
+        "visible": visible,
+        "show_thermometer": show_thermometer & np.isin(phase, ["exploration", "annotation"]),
+        "distance_moved": distance_moved,
+        "show_clock": show_clock & np.isin(phase, ["exploration", "annotation"]),
+        "angle_rotated": angle_rotated,
+    }, index=df.index)
+
+
+class Replay:
+    """One continuous log prepared for random-access rendering through its task's draw functions."""
+
+    def __init__(self, log_path, hud=True, reveal=False, total_trials=None):
+        self.path = log_path
+        self.hud = hud
+        self.reveal = reveal
+        df = load_continuous_log(log_path)
+        self.task = log_task(df)
+        self.module = TASK_MODULES[self.task]
+        # The task's own settings; one Replay per task module at a time
+        self.module.parse_arguments(task_arguments(log_path, self.task, total_trials))
+        self.state = replay_state(df, self.task)
+
+        trial_col = trial_column(df)
+        starts = segment_starts(df, trial_col)
+        df = df.assign(trial=df[trial_col].astype(str) if trial_col else "",
+                       phase_start=pd.Series(np.where(starts, df["trial_time"], np.nan), index=df.index).ffill())
+        for col in FRAME_COLUMNS:
+            if col not in df.columns:
+                df[col] = np.nan
+        for col in ("score", "target_x", "target_y"):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        placed = df["event"].astype(str).eq("target_placed")
+        df["target_placed"] = placed.groupby(df["trial"]).cummax()
+        self.df = df.reset_index(drop=True)
+        self.state = self.state.reset_index(drop=True)
+
+        pygame.font.init()
+        self.surface = pygame.Surface((self.module.WIN_WIDTH, self.module.WIN_HEIGHT))
+        self._fonts = {}
+        self.targets = self._targets()
+        self.annotations = self._annotations() if self.task == "multi_arena" else {}
+        self.trial_infos = self._trial_infos() if self.task == "one_target" else {}
+        self.durations = self._durations() if self.task == "snake" else {}
+        self._tip_cells = {}
+        # Drawing only needs these columns; build the row tuples once instead of per frame
+        self.rows = list(self.df[list(FRAME_COLUMNS)].itertuples(index=False, name="Row"))
+        self.states = list(self.state.itertuples(index=False, name="State"))
+
+        # Index: for every trial, its row positions ordered by trial_time
+        self.index = {}
+        for trial, rows in self.df.groupby("trial", sort=False).indices.items():
+            times = self.df["trial_time"].to_numpy(dtype=float)[rows]
+            order = np.argsort(times, kind="stable")
+            self.index[trial] = (times[order], rows[order])
+
+    def _targets(self):
+        """Per trial: one_target's (x, y); multi_arena's ({name: (x, y)}, {name: hebrew name})."""
+        if self.task == "one_target":
+            return one_target_locations(self.path)
+        if self.task == "multi_arena":
+            registry = load_registry(with_sounds=False)
+            targets = {}
+            for trial in self.df["trial"].unique():
+                spec = registry.get(trial) or registry.get(trial.split('_')[0])
+                targets[trial] = (spec.targets(), spec.hebrew_lookup()) if spec else ({}, {})
+            return targets
+        return {}
+
+    def _annotations(self):
+        """{trial: [(row, 'x,y', name), ...]} in the order they were made (positions from the discrete log)."""
+        chosen = {}
+        discrete_path = discrete_log_path(self.path)
+        if os.path.exists(discrete_path):
+            discrete = pd.read_csv(discrete_path, encoding='utf-8-sig')
+            if {"RoundName", "ChosenPosition"} <= set(discrete.columns):
+                for trial, rows in discrete.groupby(discrete["RoundName"].astype(str), sort=False):
+                    chosen[trial] = list(rows["ChosenPosition"].astype(str))
+        events = self.df["event"].astype(str)
+        made = self.df[events.str.endswith("_annotated")]
+        annotations = {}
+        for trial, rows in made.groupby("trial", sort=False):
+            positions = chosen.get(trial, [])
+            annotations[trial] = [
+                (i, positions[k] if k < len(positions) else f"{x:.3f},{y:.3f}", event[:-len("_annotated")])
+                for k, (i, x, y, event) in enumerate(zip(rows.index, rows["x"], rows["y"], rows["event"]))]
+        return annotations
+
+    def _trial_infos(self):
+        """{trial: 'training 2', ...}: the trial_info one_target's practice counter shows."""
+        if "condition_type" not in self.df.columns:
+            return {}
+        trials = self.df.drop_duplicates("trial")
+        ordinal = trials.groupby("condition_type").cumcount() + 1
+        return {trial: f"{condition} {n}" for trial, condition, n in
+                zip(trials["trial"], trials["condition_type"].astype(str), ordinal)}
+
+    def _durations(self):
+        """{trial: seconds} of the fMRI snake games, whose TR-aligned length is drawn at random."""
+        if self.module.MODE != 'fmri':
+            return {}
+        gameplay = self.df[self.df["phase"].astype(str) == "gameplay"]
+        last = gameplay.groupby("trial")["trial_time"].max()
+        return {trial: round(t / self.module.TR) * self.module.TR for trial, t in last.items()}
+
+    @property
+    def trials(self):
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.df)
+
+    def locate(self, trial, trial_time):
+        """Row shown at trial_time of trial (the last row logged at or before it)."""
+        times, rows = self.index[str(trial)]
+        i = max(np.searchsorted(times, trial_time, side='right') - 1, 0)
+        return int(rows[i])
+
+    def font(self, size):
+        if size not in self._fonts:
+            self._fonts[size] = pygame.font.SysFont("Arial", size)
+        return self._fonts[size]
+
+    def annotations_at(self, i):
+        """multi_arena's annotations dict ('x,y' -> name) when row i was drawn."""
+        return {pos: name for row, pos, name in self.annotations.get(self.rows[i].trial, ()) if row <= i}
+
+    def visited_cells(self, i):
+        """one_target's visited grid cells when row i was drawn: the cells the avatar's tip has left."""
+        trial = self.rows[i].trial
+        if trial not in self._tip_cells:
+            _, rows = self.index[trial]
+            rows = np.array([r for r in rows if self.rows[r].phase == "exploration"], dtype=int)
+            cells = [one_target.get_grid_cell(one_target.get_player_tip_position(
+                (self.rows[r].x, self.rows[r].y), self.rows[r].rotation_angle)) for r in rows]
+            self._tip_cells[trial] = (rows, cells)
+        rows, cells = self._tip_cells[trial]
+        k = int(np.searchsorted(rows, i, side='right')) if len(rows) else 0
+        return {cells[j] for j in range(k - 1) if cells[j] != cells[j + 1]}
+
+    def draw_indicators(self, state):
+        """Thermometer and rotation dial, shown while moving/rotating and MOVEMENT_FADE_TIME after."""
+        if state.show_thermometer:
+            self.module.draw_thermometer(state.distance_moved, True, None, 0.0)
+        if state.show_clock:
+            self.module.draw_clock(state.angle_rotated, True, None, 0.0)
+
+    def draw_fixation(self):
+        """The cross of the tasks' show_fixation()."""
+        cross = self.font(200).render('+', True, self.module.WHITE)
+        self.surface.blit(cross, cross.get_rect(center=self.module.CENTER_SCREEN))
+
+    def draw_multi_arena(self, i, row, state):
+        m = multi_arena
+        pos = (row.x, row.y)
+        targets, hebrew_names = self.targets.get(row.trial, ({}, {}))
+        elapsed = row.trial_time - row.phase_start
+        if row.phase == "exploration":
+            if state.visible or self.reveal:
+                m.draw_arena()
+                m.draw_player_avatar(pos, row.rotation_angle)
+            if self.reveal:
+                m.draw_targets(targets, show_names=True, hebrew_names=hebrew_names)
+            self.draw_indicators(state)
+            time_left = m.EXPLORATION_TRs * m.TR - elapsed
+            if time_left > 0:
+                m.draw_timer(time_left)
+        elif row.phase == "annotation":
+            m.draw_arena()
+            m.draw_player_avatar(pos, row.rotation_angle)
+            if self.reveal:
+                m.draw_targets(targets, show_names=True, hebrew_names=hebrew_names)
+            m.draw_annotations(self.annotations_at(i), None)
+            self.draw_indicators(state)
+            m.draw_finished_button()
+            if m.MODE == 'fmri':
+                time_left = m.ANNOTATION_TRs * m.TR - elapsed
+                if time_left > 0:
+                    m.draw_timer(time_left)
+            m.draw_instruction(m.ANNOTATION_INSTRUCTION)
+        elif row.phase == "feedback" and m.MODE != 'fmri':
+            m.draw_feedback(targets, self.annotations_at(i), hebrew_names)
+        m.draw_trial_counter()
+
+    def draw_one_target(self, i, row, state):
+        o = one_target
+        pos = (row.x, row.y)
+        target = self.targets.get(row.trial)
+        if row.phase == "exploration":
+            if state.visible:
+                o.draw_arena()
+                o.draw_player_avatar(pos, row.rotation_angle)
+            o.draw_instruction("exploration")
+            self.draw_indicators(state)
+        elif row.phase == "annotation":
+            o.draw_arena()
+            o.draw_instruction("annotation")
+            o.draw_player_avatar(pos, row.rotation_angle, color=o.CLOCK_COLOR)
+        elif row.phase == "feedback":
+            o.draw_arena()
+            if target is not None:
+                o.draw_target(target)
+            o.draw_player_avatar(pos, row.rotation_angle, color=o.CLOCK_COLOR)
+            o.draw_instruction("feedback")
+        o.draw_trial_counter(self.trial_infos.get(row.trial, ""))
+        if self.reveal and row.phase in ("exploration", "annotation", "feedback"):
+            # What K shows: arena, avatar, the placed target and the visited-cell grid
+            o.draw_arena()
+            o.draw_player_avatar(pos, row.rotation_angle,
+                                 color=o.AVATAR_COLOR if row.phase == "exploration" else o.CLOCK_COLOR)
+            if target is not None and (row.target_placed or row.phase != "exploration"):
+                o.draw_target(target)
+            o.draw_grid(self.visited_cells(i))
+
+    def draw_snake(self, i, row, state):
+        s = snake
+        if row.phase != "gameplay":
+            return
+        s.draw_arena()
+        if np.isfinite(row.target_x) and np.isfinite(row.target_y):
+            s.draw_target((row.target_x, row.target_y))
+        s.draw_player_avatar((row.x, row.y), row.rotation_angle)
+        duration = self.durations.get(row.trial, s.TRIAL_DURATION)
+        time_remaining = None if duration is None else max(0, duration - row.trial_time)
+        s.draw_score_and_timer(int(row.score) if np.isfinite(row.score) else 0, time_remaining)
+        s.draw_trial_counter()
+
+    def draw_hud(self, row):
+        event = row.event if isinstance(row.event, str) else ""
+        label = self.font(16).render(f"trial {row.trial}  {row.phase}  t={row.trial_time:.3f}s  {event}",
+                                     True, HUD_COLOR)
+        self.surface.blit(label, (10, self.module.WIN_HEIGHT - 22))
+
+    def frame(self, i):
+        """Surface for row i (reused between calls; copy it to keep it)."""
+        row, state = self.rows[i], self.states[i]
+        self.module.game_surface = self.surface
+        self.surface.fill(self.module.BACKGROUND_COLOR)
+        if row.phase == "fixation":
+            self.draw_fixation()
+        else:
+            getattr(self, f"draw_{self.task}")(i, row, state)
+        if self.hud:
+            self.draw_hud(row)
+        return self.surface
+
+    def sample_rows(self, fps=None, trials=None):
+        """Rows to render: every row, or one per 1/fps seconds of each trial."""
+        selected = []
+        for trial in (trials or self.trials):
+            times, rows = self.index[str(trial)]
+            if fps is None:
+                selected.append(rows)
+                continue
+            finite = np.isfinite(times)
+            if not finite.any():
+                continue
+            grid = np.arange(times[finite][0], times[finite][-1] + 1e-9, 1.0 / fps)
+            picks = np.maximum(np.searchsorted(times, grid, side='right') - 1, 0)
+            selected.append(rows[picks])
+        return np.concatenate(selected) if selected else np.zeros(0, dtype=int)
+
+    def render_all(self, rows=None):
+        """Draw every selected frame without saving; returns frames per second."""
+        rows = np.arange(len(self)) if rows is None else rows
+        start = time.perf_counter()
+        for i in rows:
+            self.frame(i)
+        return len(rows) / max(time.perf_counter() - start, 1e-9)
+
+    def save_frames(self, output_dir, rows):
+        os.makedirs(output_dir, exist_ok=True)
+        for n, i in enumerate(rows):
+            pygame.image.save(self.frame(i), os.path.join(output_dir, f"frame_{n:06d}.png"))
+        return len(rows)
+
+    def contact_sheet(self, output_path, rows, columns=8, thumb_width=250):
+        """Thumbnails of the given rows in one image, left to right, top to bottom."""
+        width, height = self.surface.get_size()
+        thumb = (thumb_width, int(thumb_width * height / width))
+        n_rows = max(1, int(np.ceil(len(rows) / columns)))
+        sheet = pygame.Surface((thumb[0] * columns, thumb[1] * n_rows))
+        sheet.fill(self.module.BACKGROUND_COLOR)
+        for n, i in enumerate(rows):
+            image = pygame.transform.smoothscale(self.frame(i), thumb)
+            sheet.blit(image, ((n % columns) * thumb[0], (n // columns) * thumb[1]))
+            pygame.draw.rect(sheet, HUD_COLOR, ((n % columns) * thumb[0], (n // columns) * thumb[1]) + thumb, 1)
+        pygame.image.save(sheet, output_path)
+        return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a continuous log through the task drawing, headless')
+    parser.add_argument('log', help='Continuous log CSV')
+    parser.add_argument('--trial', action='append', default=None, help='Only this trial / RoundName (repeatable)')
+    parser.add_argument('--fps', type=float, default=None,
+                       help='Sample frames at this rate (default: every logged row)')
+    parser.add_argument('--frames', default=None, help='Write frame PNGs to this directory')
+    parser.add_argument('--contact-sheet', default=None, help='Write a contact sheet PNG')
+    parser.add_argument('--interval', type=float, default=2.0,
+                       help='Seconds between contact sheet thumbnails (default: 2)')
+    parser.add_argument('--columns', type=int, default=8, help='Contact sheet columns (default: 8)')
+    parser.add_argument('--at', default=None, metavar='TRIAL:TIME', help='Render the frame at this trial time')
+    parser.add_argument('--output', default=None, help='PNG for --at (default: <log>_<trial>_<time>.png)')
+    parser.add_argument('--no-hud', action='store_true', help='Do not print trial/phase/time on the frames')
+    parser.add_argument('--reveal', action='store_true',
+                       help='Draw what the debug keys show: the targets, and one_target\'s visited-cell grid')
+    parser.add_argument('--total-trials', type=int, default=None,
+                       help='Trials in the run, for the trial counter (default: from the log name, '
+                            f'{RUN_TRIALS["OT"]} for OT and {RUN_TRIALS["FA"]} for FA logs)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    replay = Replay(args.log, hud=not args.no_hud, reveal=args.reveal, total_trials=args.total_trials)
+    print(f"Loaded {len(replay)} rows, {len(replay.trials)} trials ({replay.task}) "
+          f"in {time.perf_counter() - start:.2f}s")
+    trials = args.trial
+    if trials and any(t not in replay.index for t in trials):
+        print(f"Error: unknown trial; available: {', '.join(replay.trials)}")
+        return 1
+
+    if args.at:
+        trial, _, at = args.at.rpartition(':')
+        trial = trial or replay.trials[0]
+        i = replay.locate(trial, float(at))
+        output = args.output or f"{os.path.splitext(args.log)[0]}_{trial}_{float(at):.2f}.png"
+        pygame.image.save(replay.frame(i), output)
+        print(f"Frame at {trial}:{at} (row {i}) saved to: {output}")
+        return 0
+
+    if args.contact_sheet:
+        rows = replay.sample_rows(1.0 / args.interval, trials)
+        replay.contact_sheet(args.contact_sheet, rows, args.columns)
+        print(f"Contact sheet with {len(rows)} frames saved to: {args.contact_sheet}")
+    if args.frames:
+        start = time.perf_counter()
+        count = replay.save_frames(args.frames, replay.sample_rows(args.fps, trials))
+        print(f"{count} frames saved to {args.frames} in {time.perf_counter() - start:.2f}s")
+    if not args.contact_sheet and not args.frames:
+        rows = replay.sample_rows(args.fps, trials)
+        fps = replay.render_all(rows)
+        print(f"Rendered {len(rows)} frames at {fps:.0f} frames/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Occupancy and coverage of the arena, accumulated as fixed-resolution dwell-time grids.
+
+Every navigation sample (exploration / gameplay) adds the time until the next sample
+to the grid cell it falls in (one np.histogramdd call per log). All grids
+share the same edges (CELL_SIZE, the cell size one_target.py uses for visited_cells,
+over the 3.3 m arena), so grids of trials, participants and visibility conditions are
+merged by plain array addition.
+
+Grids are computed once per log and kept in <results dir>/.occupancy_cache (keyed on
+the log's size and modification time, like the cohort metrics cache), so adding a
+participant or a new trial file only reads those logs; the cohort is then aggregated
+from the cached arrays in one vectorized pass.
+
+For each aggregated grid:
+- coverage: fraction of the arena's cells with any dwell time
+- entropy: Shannon entropy of the dwell distribution over the arena's cells, normalised
+  to 0 (one cell) .. 1 (uniform)
+
+Usage:
+    python occupancy.py                                     # per participant, task and condition
+    python occupancy.py --by task condition --participant TS263
+    python occupancy.py --no-images --output-dir occupancy
+"""
+
+import os
+import sys
+import argparse
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.patches import Circle
+import numpy as np
+import pandas as pd
+
+from trajectory_metrics import ARENA_RADIUS, NAVIGATION_PHASES, load_continuous_log, trial_column, step_metrics
+from cohort_analysis import TASKS, MetricsCache, default_results_dir, discover_logs, map_logs
+
+CELL_SIZE = 0.05   # meters, as GRID_SIZE in one_target.py
+CACHE_DIR_NAME = ".occupancy_cache"
+CACHE_VERSION = 1  # Bump when the grid layout or weighting changes
+OUTPUT_DIR_NAME = "occupancy"
+
+KEY_COLUMNS = ["participant", "task", "context", "file", "trial", "condition"]
+GROUPINGS = ["participant", "task", "context", "condition", "trial"]
+
+
+def grid_edges(cell_size=CELL_SIZE):
+    """Bin edges shared by all grids: a square of whole cells covering the arena."""
+    n_cells = int(np.ceil(2 * ARENA_RADIUS / cell_size))
+    half = n_cells * cell_size / 2
+    return np.linspace(-half, half, n_cells + 1)
+
+
+def arena_mask(cell_size=CELL_SIZE):
+    """Cells whose center lies inside the arena (the denominator of coverage)."""
+    edges = grid_edges(cell_size)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return np.hypot(centers[:, None], centers[None, :]) <= ARENA_RADIUS
+
+
+def dwell_times(df, trial_col=None):
+    """Seconds spent at each row's position: the time until the next sample of the same trial and phase."""
+    dt = step_metrics(df, trial_col)["dt"].to_numpy()
+    dwell = np.zeros(len(df))
+    dwell[:-1] = dt[1:]  # dt is zero across trial/phase boundaries
+    return dwell
+
+
+def condition_column(df):
+    """Per-row condition: visibility (FA), condition_type (OT), '' otherwise."""
+    for col in ("visibility", "condition_type"):
+        if col in df.columns:
+            return df[col].fillna("").astype(str).to_numpy()
+    return np.full(len(df), "")
+
+
+def log_grids(log, cell_size=CELL_SIZE):
+    """
+    Worker: dwell-time grid of every (trial, condition) in one log.
+
+    Returns:
+        (keys DataFrame with KEY_COLUMNS, grids array of shape (len(keys), n, n))
+    """
+    df = load_continuous_log(log.path)
+    trial_col = trial_column(df)
+    dwell = dwell_times(df, trial_col)
+    nav = df["phase"].isin(NAVIGATION_PHASES).to_numpy() if "phase" in df.columns else np.ones(len(df), bool)
+    nav = nav & np.isfinite(df["x"].to_numpy(dtype=float)) & np.isfinite(df["y"].to_numpy(dtype=float))
+
+    samples = pd.DataFrame({
+        "trial": df[trial_col].astype(str).to_numpy() if trial_col else "",
+        "condition": condition_column(df),
+    })[nav]
+    group = samples.groupby(["trial", "condition"], sort=False).ngroup().to_numpy()
+    keys = samples.drop_duplicates(["trial", "condition"]).reset_index(drop=True)
+    for col, value in (("participant", log.participant), ("task", log.task),
+                       ("context", log.context), ("file", os.path.basename(log.path))):
+        keys[col] = value
+
+    # One 3D histogram (group, x, y) bins every sample of the log in a single call
+    edges = grid_edges(cell_size)
+    if keys.empty:
+        return keys[KEY_COLUMNS], np.zeros((0, len(edges) - 1, len(edges) - 1))
+    grids, _ = np.histogramdd(
+        (group, df["x"].to_numpy(dtype=float)[nav], df["y"].to_numpy(dtype=float)[nav]),
+        bins=(np.arange(len(keys) + 1) - 0.5, edges, edges),
+        weights=dwell[nav],
+    )
+    return keys[KEY_COLUMNS], grids
+
+
+def collect_grids(results_dir, participants=None, tasks=None, workers=None, cache_dir=None, use_cache=True):
+    """
+    Grids of every trial in the cohort, computing only logs not in the cache.
+
+    Returns:
+        (keys DataFrame, grids array (n_trials, n, n), {'cached': n, 'computed': n, 'failed': n})
+    """
+    logs = discover_logs(results_dir, participants, tasks)
+    cache = MetricsCache(cache_dir or os.path.join(results_dir, CACHE_DIR_NAME), CACHE_VERSION) if use_cache else None
+    results, counts = map_logs(logs, log_grids, cache, workers)
+    ordered = [results[log.path] for log in logs if log.path in results]
+    n = len(grid_edges()) - 1
+    if not ordered:
+        return pd.DataFrame(columns=KEY_COLUMNS), np.zeros((0, n, n)), counts
+    keys = pd.concat([k for k, _ in ordered], ignore_index=True)
+    grids = np.concatenate([g for _, g in ordered])
+    return keys, grids, counts
+
+
+def aggregate(keys, grids, by):
+    """Sum grids over all trials sharing the values of the `by` columns (array addition)."""
+    if not by:
+        return pd.DataFrame(index=[0]), grids.sum(axis=0, keepdims=True)
+    grouped = keys.groupby(by, sort=True, dropna=False)
+    group = grouped.ngroup().to_numpy()
+    groups = grouped.size().reset_index()[by]
+    totals = np.zeros((len(groups),) + grids.shape[1:])
+    np.add.at(totals, group, grids)
+    return groups, totals
+
+
+def coverage(grids, mask=None):
+    """Fraction of the arena's cells visited, per grid of a (k, n, n) stack."""
+    mask = arena_mask() if mask is None else mask
+    return (grids[:, mask] > 0).mean(axis=1)
+
+
+def entropy(grids, mask=None):
+    """Normalised Shannon entropy of the dwell distribution over the arena, per grid (NaN when empty)."""
+    mask = arena_mask() if mask is None else mask
+    dwell = grids[:, mask]
+    total = dwell.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = dwell / total
+        h = -np.where(p > 0, p * np.log(p), 0.0).sum(axis=1)
+    return np.where(total[:, 0] > 0, h / np.log(mask.sum()), np.nan)
+
+
+def summarize(groups, totals):
+    summary = groups.copy()
+    summary["dwell_s"] = totals.sum(axis=(1, 2))
+    summary["coverage"] = coverage(totals)
+    summary["entropy"] = entropy(totals)
+    return summary
+
+
+def save_heatmap(grid, title, path, dpi=120):
+    """Dwell-time heatmap (seconds per cell) with the arena outline."""
+    edges = grid_edges()
+    fig, ax = plt.subplots(figsize=(6, 5))
+    shown = np.ma.masked_where(~arena_mask() | (grid <= 0), grid)
+    image = ax.pcolormesh(edges, edges, shown.T, cmap='viridis', shading='flat')
+    ax.add_patch(Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=1.5))
+    ax.set_xlim(edges[0], edges[-1])
+    ax.set_ylim(edges[0], edges[-1])
+    ax.set_aspect('equal')
+    ax.set_xlabel('X Position (m)')
+    ax.set_ylabel('Y Position (m)')
+    ax.set_title(title)
+    fig.colorbar(image, ax=ax, label='Dwell time (s)')
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Occupancy heatmaps and coverage for the cohort')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--participant', action='append', default=None,
+                       help='Only this participant (repeatable)')
+    parser.add_argument('--task', action='append', choices=TASKS, default=None,
+                       help='Only this task (repeatable)')
+    parser.add_argument('--by', nargs='*', choices=GROUPINGS, default=["participant", "task", "condition"],
+                       help='Columns to aggregate by (default: participant task condition)')
+    parser.add_argument('--output-dir', default=None,
+                       help=f'Output directory (default: <results dir>/{OUTPUT_DIR_NAME})')
+    parser.add_argument('--no-images', action='store_true', help='Only write the summary and grids')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Recompute every log and leave the cache untouched')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    keys, grids, counts = collect_grids(results_dir, args.participant, args.task, args.workers,
+                                        use_cache=not args.no_cache)
+    print(f"Logs: {counts['computed']} computed, {counts['cached']} cached, {counts['failed']} failed")
+    if keys.empty:
+        print("No navigation samples found.")
+        return 0
+
+    groups, totals = aggregate(keys, grids, args.by)
+    summary = summarize(groups, totals)
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    output_dir = args.output_dir or os.path.join(results_dir, OUTPUT_DIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    summary.to_csv(os.path.join(output_dir, "occupancy_summary.csv"), index=False, encoding='utf-8-sig')
+    np.savez_compressed(os.path.join(output_dir, "occupancy_grids.npz"), grids=totals, edges=grid_edges(),
+                        **{col: groups[col].astype(str).to_numpy() for col in groups.columns})
+    if not args.no_images:
+        for i, grid in enumerate(totals):
+            labels = [str(v) or "all" for v in groups.iloc[i]]
+            name = "_".join(labels) or "cohort"
+            save_heatmap(grid, " / ".join(labels) or "Cohort", os.path.join(output_dir, f"{name}.png"))
+    print(f"Occupancy saved to: {output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
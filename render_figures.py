@@ -0,0 +1,302 @@
+"""
+Headless batch renderer for per-trial QC figures.
+
+Renders a trajectory figure and a time-series figure for every trial of every
+continuous log found by cohort_analysis.discover_logs(), without a display:
+
+- The Agg backend is forced before pyplot is imported, so nothing blocks on a GUI.
+- Logs are rendered in worker processes. Each worker builds its figure templates once
+  (arena, axes, labels, legend) and only swaps the data of the existing artists for
+  each trial, instead of building a new figure per plot.
+- Trajectories are drawn simplified (trajectory_simplify: RDP within 2 mm, LTTB for
+  the time series), which keeps rendering time and PNG size down on long logs.
+- A manifest next to the figures records each log's path, size and modification time
+  (plus the render settings); logs whose inputs have not changed are skipped.
+
+Usage:
+    python render_figures.py                                  # whole cohort
+    python render_figures.py --participant TS263 --dpi 150
+    python render_figures.py --results-dir Results --output-dir qc --force
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.patches import Circle
+import numpy as np
+
+from trajectory_metrics import ARENA_RADIUS, load_continuous_log, trial_column, step_metrics, compute_metrics
+from trajectory_simplify import simplify_trajectory, downsample_series
+from cohort_analysis import TASKS, default_results_dir, discover_logs
+
+RENDER_VERSION = 2  # Bump when the figure layout changes to re-render everything
+DEFAULT_DPI = 120
+FIGURES_DIR_NAME = "qc_figures"
+MANIFEST_NAME = ".render_manifest.json"
+
+PHASE_COLORS = {'fixation': 'gray', 'exploration': 'blue', 'annotation': 'green',
+                'feedback': 'red', 'gameplay': 'orange'}
+TARGET_EVENTS = ('target_placed', 'target_reached')
+
+
+def is_target_event(event):
+    """Events marking where a target was placed or found (OT, snake and FA)."""
+    return event in TARGET_EVENTS or event.startswith('found_')
+
+
+def is_annotation_event(event):
+    """Events marking an annotated position (OT target_annotated, FA <name>_annotated)."""
+    return event.endswith('_annotated')
+
+
+class TrajectoryTemplate:
+    """Arena view with one line per phase, event markers and a statistics box."""
+
+    name = "trajectory"
+
+    def __init__(self):
+        self.fig, self.ax = plt.subplots(figsize=(8, 8))
+        ax = self.ax
+        ax.add_patch(Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=2))
+        self.lines = {phase: ax.plot([], [], color=color, alpha=0.7, linewidth=1.2, label=phase)[0]
+                      for phase, color in PHASE_COLORS.items()}
+        self.targets, = ax.plot([], [], 'rx', markersize=10, markeredgewidth=2, label='Target')
+        self.annotations, = ax.plot([], [], 'go', markersize=9, fillstyle='none',
+                                    markeredgewidth=2, label='Annotation')
+        self.stats = ax.text(0.02, 0.98, "", transform=ax.transAxes, fontsize=9, verticalalignment='top',
+                             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+        ax.set_xlim(-ARENA_RADIUS - 0.1, ARENA_RADIUS + 0.1)
+        ax.set_ylim(-ARENA_RADIUS - 0.1, ARENA_RADIUS + 0.1)
+        ax.set_aspect('equal')
+        ax.grid(True, alpha=0.3)
+        ax.set_xlabel('X position (meters)')
+        ax.set_ylabel('Y position (meters)')
+        ax.legend(loc='upper right', fontsize=8)
+
+    def update(self, trial, title, metrics):
+        path = simplify_trajectory(trial, per_trial=False)
+        for phase, line in self.lines.items():
+            rows = path[path['phase'] == phase]
+            line.set_data(rows['x'].to_numpy(), rows['y'].to_numpy())
+
+        events = trial['event'].fillna('').astype(str)
+        targets = trial[events.map(is_target_event)]
+        annotations = trial[events.map(is_annotation_event)]
+        self.targets.set_data(targets['x'].to_numpy(), targets['y'].to_numpy())
+        self.annotations.set_data(annotations['x'].to_numpy(), annotations['y'].to_numpy())
+
+        whole = metrics[metrics['phase'] == 'all'].iloc[0]
+        self.stats.set_text(f"Duration: {whole['duration_s']:.1f}s\n"
+                            f"Distance: {whole['path_length_m']:.2f}m\n"
+                            f"Mean speed: {whole['mean_speed']:.2f}m/s\n"
+                            f"Idle: {whole['idle_time_s']:.1f}s  Border: {whole['border_time_s']:.1f}s")
+        self.ax.set_title(title, fontsize=11, fontweight='bold')
+
+
+class TimeSeriesTemplate:
+    """Position, rotation and speed over time with the phases shaded."""
+
+    name = "timeseries"
+
+    def __init__(self):
+        self.fig, self.axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+        ax_pos, ax_rot, ax_speed = self.axes
+        self.x_line, = ax_pos.plot([], [], 'b-', alpha=0.7, linewidth=1.2, label='X position')
+        self.y_line, = ax_pos.plot([], [], 'r-', alpha=0.7, linewidth=1.2, label='Y position')
+        self.rotation_line, = ax_rot.plot([], [], color='purple', alpha=0.7, linewidth=1.2)
+        self.speed_line, = ax_speed.plot([], [], color='orange', alpha=0.7, linewidth=1.2)
+        ax_pos.set_ylabel('Position (meters)')
+        ax_rot.set_ylabel('Rotation (degrees)')
+        ax_speed.set_ylabel('Speed (m/s)')
+        ax_speed.set_xlabel('Time (seconds)')
+        phase_handles = [plt.Rectangle((0, 0), 1, 1, color=c, alpha=0.2) for c in PHASE_COLORS.values()]
+        ax_pos.legend([self.x_line, self.y_line] + phase_handles, ['X position', 'Y position'] + list(PHASE_COLORS),
+                      loc='upper right', fontsize=7, ncol=2)
+        for ax in self.axes:
+            ax.grid(True, alpha=0.3)
+        self.spans = []
+
+    def update(self, trial, title, metrics):
+        t = trial['trial_time'].to_numpy()
+        speed = step_metrics(trial, per_trial=False)['speed'].to_numpy()
+        valid = np.isfinite(speed)
+        self.x_line.set_data(*downsample_series(t, trial['x']))
+        self.y_line.set_data(*downsample_series(t, trial['y']))
+        self.rotation_line.set_data(*downsample_series(t, trial['rotation_angle']))
+        self.speed_line.set_data(*downsample_series(t[valid], speed[valid]))
+
+        for span in self.spans:
+            span.remove()
+        self.spans = []
+        phases = metrics[metrics['phase'].isin(PHASE_COLORS.keys())]
+        for row in phases.itertuples():
+            for ax in self.axes:
+                self.spans.append(ax.axvspan(row.start_time, row.end_time, alpha=0.2,
+                                             color=PHASE_COLORS[row.phase]))
+
+        for ax in self.axes:
+            ax.relim()
+            ax.autoscale_view()
+        self.axes[0].set_title(title, fontsize=11, fontweight='bold')
+
+
+TEMPLATE_CLASSES = [TrajectoryTemplate, TimeSeriesTemplate]
+
+# Per-process templates, built once by _init_worker()
+_templates = None
+
+
+def _init_worker():
+    global _templates
+    _templates = [cls() for cls in TEMPLATE_CLASSES]
+
+
+def split_trials(df):
+    """(trial label, rows) per trial; a log without a trial column is a single trial."""
+    trial_col = trial_column(df)
+    if trial_col is None:
+        return [("", df)]
+    return [(str(label), rows) for label, rows in df.groupby(trial_col, sort=False)]
+
+
+def figure_stem(log_path):
+    """Log filename without extension and the '_continuous' part, e.g. 'TS263_OT_ot2'."""
+    return os.path.splitext(os.path.basename(log_path))[0].replace('_continuous', '')
+
+
+def figure_paths(output_dir, log_path, trial_labels):
+    """PNG path for every (trial, template) of one log."""
+    stem = figure_stem(log_path)
+    paths = []
+    for label in trial_labels:
+        suffix = f"_{label}" if label else ""
+        paths.extend(os.path.join(output_dir, f"{stem}{suffix}_{cls.name}.png") for cls in TEMPLATE_CLASSES)
+    return paths
+
+
+def render_log(task):
+    """Worker: render every trial of one log; returns the figure paths written."""
+    log_path, output_dir, dpi = task
+    if _templates is None:
+        _init_worker()
+    df = load_continuous_log(log_path)
+    os.makedirs(output_dir, exist_ok=True)
+    stem = figure_stem(log_path)
+
+    written = []
+    for label, trial in split_trials(df):
+        metrics = compute_metrics(trial, per_trial=False)
+        title = f"{stem} - {label}" if label else stem
+        paths = figure_paths(output_dir, log_path, [label])
+        for template, path in zip(_templates, paths):
+            template.update(trial, title, metrics)
+            template.fig.savefig(path, dpi=dpi)
+            written.append(path)
+    return written
+
+
+def _signature(path, dpi):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, dpi, RENDER_VERSION]
+
+
+def load_manifest(output_root):
+    try:
+        with open(os.path.join(output_root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_root, manifest):
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def render_cohort(results_dir, output_root, participants=None, tasks=None, dpi=DEFAULT_DPI,
+                  workers=None, force=False):
+    """
+    Render figures for every discovered log whose inputs changed since the last run.
+
+    Figures go to output_root/<participant>/.
+
+    Returns:
+        {'rendered': n logs, 'skipped': n logs, 'failed': n logs, 'figures': n files}
+    """
+    logs = discover_logs(results_dir, participants, tasks)
+    manifest = load_manifest(output_root)
+    counts = {'rendered': 0, 'skipped': 0, 'failed': 0, 'figures': 0}
+
+    pending = []
+    for log in logs:
+        entry = manifest.get(os.path.abspath(log.path))
+        if (not force and entry and entry['signature'] == _signature(log.path, dpi)
+                and all(os.path.exists(p) for p in entry['figures'])):
+            counts['skipped'] += 1
+        else:
+            pending.append(log)
+
+    if pending:
+        tasks = [(log.path, os.path.join(output_root, log.participant), dpi) for log in pending]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [(log, pool.submit(render_log, task)) for log, task in zip(pending, tasks)]
+            for log, future in futures:
+                try:
+                    written = future.result()
+                except Exception as e:
+                    print(f"Warning: Could not render {log.path}: {e}")
+                    counts['failed'] += 1
+                    continue
+                manifest[os.path.abspath(log.path)] = {'signature': _signature(log.path, dpi), 'figures': written}
+                counts['rendered'] += 1
+                counts['figures'] += len(written)
+                print(f"  Rendered {len(written)} figures for {os.path.basename(log.path)}")
+        save_manifest(output_root, manifest)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render per-trial QC figures for all participants (headless)')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory with one folder per participant '
+                            '(default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--output-dir', default=None,
+                       help=f'Figure directory (default: <results dir>/{FIGURES_DIR_NAME})')
+    parser.add_argument('--participant', action='append', default=None,
+                       help='Only this participant (repeatable)')
+    parser.add_argument('--task', action='append', choices=TASKS, default=None,
+                       help='Only this task (repeatable)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                       help=f'Figure resolution (default: {DEFAULT_DPI})')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-render figures even when their inputs have not changed')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    if not os.path.isdir(results_dir):
+        print(f"Error: Results directory not found: {results_dir}")
+        return 1
+    output_root = args.output_dir or os.path.join(results_dir, FIGURES_DIR_NAME)
+    print(f"Rendering figures from {results_dir} into {output_root}")
+
+    counts = render_cohort(results_dir, output_root, args.participant, args.task, args.dpi,
+                           args.workers, args.force)
+    print(f"Logs: {counts['rendered']} rendered ({counts['figures']} figures), "
+          f"{counts['skipped']} unchanged, {counts['failed']} failed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
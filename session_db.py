@@ -0,0 +1,500 @@
+"""
+SQLite index over every participant's continuous and discrete logs.
+
+Cross-session questions ("mean error_distance on One Target test trials by run", "time
+to first found_* in hospital") are answered from one local database instead of
+globbing and parsing CSVs each time:
+
+- files: one row per ingested log (participant, task, context, scan run, trial, kind, hash);
+  trial is the number in the filename (one per trial in fMRI mode) and run the run wrapper's
+  run, from the log's own labels or, for one_target logs (which log only the trial number),
+  from the participant's log of the same context before it
+- samples: continuous log rows (trial, condition, phase, event, time, position, ...);
+  wall_time is seconds since midnight of the log's first row on one clock for every row
+  (session_timeline.align_log), so durations also cover fixation rows whose trial_time is 0
+- one_target_trials / multi_arena_annotations / snake_trials: the discrete logs
+
+with indexes on participant/run (files), trial/phase, and event (samples).
+
+Ingest is incremental: a file whose size and mtime are unchanged is skipped, a changed
+one is re-hashed and only re-ingested when its SHA-1 differs; files that disappeared
+(e.g. per-trial logs merged by combine_logs.py) are dropped from the index.
+
+Usage:
+    python session_db.py ingest                             # <results dir>/session_logs.sqlite
+    python session_db.py list
+    python session_db.py query ot_error_by_run
+    python session_db.py query first_found --param arena=hospital
+    python session_db.py sql "SELECT COUNT(*) FROM samples"
+
+    from session_db import canned, query
+    errors = canned("ot_error_by_run")
+
+annotation_scoring.py reads its annotations and cohort_analysis.py --outcomes its task
+outcomes through the canned queries.
+"""
+
+import os
+import sys
+import hashlib
+import sqlite3
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cohort_analysis import default_results_dir, discover_logs, discrete_log_path
+from session_timeline import align_log, seconds_since
+from fmri_regressors import scan_run_numbers
+
+DB_NAME = "session_logs.sqlite"
+SCHEMA_VERSION = 3  # Bump when the tables change; the database is then rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    participant TEXT NOT NULL,
+    task TEXT NOT NULL,
+    context TEXT NOT NULL,
+    run TEXT NOT NULL,
+    labelled_run TEXT NOT NULL,
+    trial TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sha1 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    n_rows INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_participant ON files(participant, task);
+CREATE INDEX IF NOT EXISTS idx_files_run ON files(run);
+
+CREATE TABLE IF NOT EXISTS samples (
+    file_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    trial TEXT,
+    condition TEXT,
+    phase TEXT,
+    event TEXT,
+    real_time TEXT,
+    trial_time REAL,
+    wall_time REAL,
+    x REAL,
+    y REAL,
+    rotation_angle REAL,
+    score REAL,
+    target_x REAL,
+    target_y REAL,
+    PRIMARY KEY (file_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_samples_trial ON samples(file_id, trial, phase);
+CREATE INDEX IF NOT EXISTS idx_samples_phase ON samples(phase);
+CREATE INDEX IF NOT EXISTS idx_samples_event ON samples(event) WHERE event IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS one_target_trials (
+    file_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    trial TEXT,
+    condition_type TEXT,
+    assigned_delay REAL,
+    movement_start_time REAL,
+    target_placement_time REAL,
+    exploration_time REAL,
+    annotation_time REAL,
+    target_location TEXT,
+    target_annotation TEXT,
+    error_distance REAL,
+    PRIMARY KEY (file_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_one_target_trials_trial ON one_target_trials(trial);
+
+CREATE TABLE IF NOT EXISTS multi_arena_annotations (
+    file_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    trial TEXT,
+    typed_name TEXT,
+    chosen_x REAL,
+    chosen_y REAL,
+    time_to_annotation REAL,
+    PRIMARY KEY (file_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_multi_arena_annotations_trial ON multi_arena_annotations(trial);
+
+CREATE TABLE IF NOT EXISTS snake_trials (
+    file_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    trial TEXT,
+    final_score REAL,
+    trial_duration REAL,
+    target_locations TEXT,
+    target_reach_times TEXT,
+    game_duration REAL,
+    PRIMARY KEY (file_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_snake_trials_trial ON snake_trials(trial);
+"""
+
+# {table: [(db column, CSV column(s) in order of preference, numeric)]}
+SAMPLE_COLUMNS = [
+    ("trial", ("RoundName", "trial"), False),
+    ("condition", ("visibility", "condition_type"), False),
+    ("phase", ("phase",), False),
+    ("event", ("event",), False),
+    ("real_time", ("RealTime",), False),
+    ("trial_time", ("trial_time",), True),
+    ("wall_time", ("wall_time",), True),
+    ("x", ("x",), True),
+    ("y", ("y",), True),
+    ("rotation_angle", ("rotation_angle",), True),
+    ("score", ("score",), True),
+    ("target_x", ("target_x",), True),
+    ("target_y", ("target_y",), True),
+]
+DISCRETE_TABLES = {
+    "one_target": ("one_target_trials", [
+        ("trial", ("trial",), False),
+        ("condition_type", ("condition_type",), False),
+        ("assigned_delay", ("assigned_delay",), True),
+        ("movement_start_time", ("movement_start_time",), True),
+        ("target_placement_time", ("target_placement_time",), True),
+        ("exploration_time", ("exploration_time",), True),
+        ("annotation_time", ("annotation_time",), True),
+        ("target_location", ("target_location",), False),
+        ("target_annotation", ("target_annotation",), False),
+        ("error_distance", ("error_distance",), True),
+    ]),
+    "multi_arena": ("multi_arena_annotations", [
+        ("trial", ("RoundName",), False),
+        ("typed_name", ("TypedName",), False),
+        ("chosen_x", ("chosen_x",), True),
+        ("chosen_y", ("chosen_y",), True),
+        ("time_to_annotation", ("TimeToAnnotation",), True),
+    ]),
+    "snake": ("snake_trials", [
+        ("trial", ("trial",), False),
+        ("final_score", ("final_score",), True),
+        ("trial_duration", ("trial_duration",), True),
+        ("target_locations", ("target_locations",), False),
+        ("target_reach_times", ("target_reach_times",), False),
+        ("game_duration", ("game_duration",), True),
+    ]),
+}
+DATA_TABLES = ["samples"] + [table for table, _ in DISCRETE_TABLES.values()]
+
+# Canned queries: {name: (description, SQL)}; named parameters default to NULL (= all)
+QUERIES = {
+    "ot_error_by_run": (
+        "Mean One Target error_distance on test trials per participant and run",
+        """SELECT f.participant, f.context, f.run, COUNT(*) AS trials,
+                  AVG(t.error_distance) AS mean_error_distance
+           FROM one_target_trials t JOIN files f USING (file_id)
+           WHERE t.condition_type = 'test' AND (:participant IS NULL OR f.participant = :participant)
+           GROUP BY f.participant, f.context, f.run
+           ORDER BY f.participant, f.context, CAST(f.run AS INTEGER)""",
+    ),
+    "first_found": (
+        "Time from exploration start to the first found_* event per Multi Arena trial (param: arena)",
+        """SELECT f.participant, f.context, f.run, s.trial,
+                  MIN(s.wall_time) - (SELECT MIN(e.wall_time) FROM samples e
+                                      WHERE e.file_id = s.file_id AND e.trial = s.trial
+                                        AND e.phase = 'exploration') AS time_to_first_found,
+                  COUNT(*) AS found_events
+           FROM samples s JOIN files f USING (file_id)
+           WHERE f.task = 'multi_arena' AND s.event LIKE 'found\\_%' ESCAPE '\\'
+             AND (:arena IS NULL OR s.trial = :arena OR s.trial LIKE :arena || '\\_%' ESCAPE '\\')
+             AND (:participant IS NULL OR f.participant = :participant)
+           GROUP BY s.file_id, s.trial
+           ORDER BY f.participant, f.context, f.run, s.trial""",
+    ),
+    "phase_durations": (
+        "Duration of every phase of every trial (first to last sample of each stretch of the phase, summed)",
+        """WITH marked AS (
+               SELECT s.file_id, s.row, s.trial, s.phase, s.wall_time,
+                      CASE WHEN s.phase IS LAG(s.phase) OVER w AND s.trial IS LAG(s.trial) OVER w
+                           THEN 0 ELSE 1 END AS starts
+               FROM samples s JOIN files f USING (file_id)
+               WHERE (:participant IS NULL OR f.participant = :participant)
+               WINDOW w AS (PARTITION BY s.file_id ORDER BY s.row)),
+           stretches AS (
+               SELECT file_id, trial, phase, MAX(wall_time) - MIN(wall_time) AS duration_s,
+                      COUNT(*) AS samples, MIN(row) AS first_row
+               FROM (SELECT *, SUM(starts) OVER (PARTITION BY file_id ORDER BY row) AS stretch FROM marked)
+               GROUP BY file_id, stretch)
+           SELECT f.participant, f.task, f.context, f.run, p.trial, p.phase,
+                  SUM(p.duration_s) AS duration_s, COUNT(*) AS stretches, SUM(p.samples) AS samples
+           FROM stretches p JOIN files f USING (file_id)
+           GROUP BY p.file_id, p.trial, p.phase
+           ORDER BY f.participant, f.task, f.context, f.run, MIN(p.first_row)""",
+    ),
+    "event_counts": (
+        "Number of each logged event per participant and task",
+        """SELECT f.participant, f.task, s.event, COUNT(*) AS n
+           FROM samples s JOIN files f USING (file_id)
+           WHERE s.event IS NOT NULL AND (:participant IS NULL OR f.participant = :participant)
+           GROUP BY f.participant, f.task, s.event
+           ORDER BY f.participant, f.task, n DESC""",
+    ),
+    "snake_scores": (
+        "Mean snake score and trial duration per participant and context",
+        """SELECT f.participant, f.context, COUNT(*) AS trials,
+                  AVG(t.final_score) AS mean_score, AVG(t.trial_duration) AS mean_duration_s
+           FROM snake_trials t JOIN files f USING (file_id)
+           WHERE (:participant IS NULL OR f.participant = :participant)
+           GROUP BY f.participant, f.context
+           ORDER BY f.participant, f.context""",
+    ),
+    "annotations": (
+        "Every Multi Arena annotation with its chosen position (used by annotation_scoring.py)",
+        """SELECT f.participant, f.context, f.name AS file, t.trial AS RoundName,
+                  COALESCE(t.typed_name, '') AS TypedName, t.chosen_x AS x, t.chosen_y AS y
+           FROM multi_arena_annotations t JOIN files f USING (file_id)
+           WHERE (:participant IS NULL OR f.participant = :participant)
+           ORDER BY f.participant, f.name, t.row""",
+    ),
+    "annotations_per_arena": (
+        "Number of Multi Arena annotations and mean annotation time per participant and arena",
+        """SELECT f.participant, f.context, t.trial AS arena, COUNT(*) AS annotations,
+                  AVG(t.time_to_annotation) AS mean_time_to_annotation
+           FROM multi_arena_annotations t JOIN files f USING (file_id)
+           WHERE (:participant IS NULL OR f.participant = :participant)
+           GROUP BY f.participant, f.context, t.trial
+           ORDER BY f.participant, f.context, t.trial""",
+    ),
+}
+
+
+def default_db_path(results_dir=None):
+    return os.path.join(results_dir or default_results_dir(), DB_NAME)
+
+
+def connect(db_path=None):
+    """Open (and create or upgrade) the log database."""
+    db_path = db_path or default_db_path()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        for table in ["files"] + DATA_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _column(df, names, numeric):
+    """First of names present in df (NULL when none is), as object values ready for sqlite."""
+    for name in names:
+        if name in df.columns:
+            values = pd.to_numeric(df[name], errors='coerce') if numeric else df[name]
+            values = values.astype(object).where(values.notna(), None)
+            if not numeric:
+                values = values.map(lambda v: None if v is None or str(v).strip() == "" else str(v))
+            return values.to_numpy()
+    return np.full(len(df), None, dtype=object)
+
+
+def wall_times(df):
+    """Seconds since midnight of the first row for every row of a continuous log (NaN where unknown)."""
+    if "trial_time" not in df.columns:
+        return np.full(len(df), np.nan)
+    aligned = df.copy()
+    aligned["trial_time"] = pd.to_numeric(aligned["trial_time"], errors='coerce')
+    wall, _ = align_log(aligned)
+    finite = wall[np.isfinite(wall)]
+    if len(finite) == 0:
+        return wall
+    # Unwrap a session running past midnight onto the first row's day
+    return seconds_since(wall, finite[0]) + finite[0]
+
+
+def _read_rows(path, kind, task):
+    """(table, db columns, row tuples, scan run from the log's own labels or '') for one log file."""
+    df = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    if kind == "continuous":
+        table, columns = "samples", SAMPLE_COLUMNS
+        df["wall_time"] = wall_times(df)
+    else:
+        table, columns = DISCRETE_TABLES[task]
+        if task == "multi_arena" and "ChosenPosition" in df.columns:
+            position = df["ChosenPosition"].str.extract(r"^\s*\(?\s*([-+\d.eE]+)\s*[,;]\s*([-+\d.eE]+)")
+            df["chosen_x"], df["chosen_y"] = position[0], position[1]
+    values = [_column(df, names, numeric) for _, names, numeric in columns]
+    rows = list(zip(range(len(df)), *values))
+    labels = values[0] if kind == "continuous" else []
+    runs = scan_run_numbers(np.full(len(labels), task), pd.Series(labels, dtype=object).fillna(""))
+    return table, [name for name, _, _ in columns], rows, runs[0] if len(runs) else ""
+
+
+def _delete_file(conn, file_id):
+    for table in DATA_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+
+
+def log_files(results_dir, participants=None):
+    """(LogFile, kind, path) for every continuous log and the discrete log next to it."""
+    for log in discover_logs(results_dir, participants):
+        yield log, "continuous", log.path
+        discrete = discrete_log_path(log.path)
+        if discrete != log.path and os.path.exists(discrete):
+            yield log, "discrete", discrete
+
+
+def ingest(results_dir, db_path=None, participants=None):
+    """
+    Bring the database up to date with the logs on disk.
+
+    Returns:
+        {'added': n, 'updated': n, 'unchanged': n, 'removed': n, 'failed': n}
+    """
+    conn = connect(db_path or default_db_path(results_dir))
+    known = {path: (file_id, sha1, size, mtime_ns) for file_id, path, sha1, size, mtime_ns
+             in conn.execute("SELECT file_id, path, sha1, size, mtime_ns FROM files")}
+    counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'failed': 0}
+    seen = set()
+
+    for log, kind, path in log_files(results_dir, participants):
+        path = os.path.abspath(path)
+        seen.add(path)
+        stat = os.stat(path)
+        previous = known.get(path)
+        if previous and previous[2:] == (stat.st_size, stat.st_mtime_ns):
+            counts['unchanged'] += 1
+            continue
+        sha1 = file_sha1(path)
+        if previous and previous[1] == sha1:
+            # Touched (e.g. copied) but identical: only refresh the signature
+            conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE file_id = ?",
+                         (stat.st_size, stat.st_mtime_ns, previous[0]))
+            conn.commit()
+            counts['unchanged'] += 1
+            continue
+        try:
+            table, columns, rows, labelled_run = _read_rows(path, kind, log.task)
+        except Exception as e:
+            print(f"Warning: Could not ingest {path}: {e}")
+            counts['failed'] += 1
+            continue
+
+        with conn:  # One transaction per file
+            if previous:
+                _delete_file(conn, previous[0])
+            cursor = conn.execute(
+                "INSERT INTO files (path, name, participant, task, context, run, labelled_run, trial, kind, "
+                "sha1, size, mtime_ns, n_rows) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, os.path.basename(path), log.participant, log.task, log.context, labelled_run, labelled_run,
+                 log.run, kind, sha1, stat.st_size, stat.st_mtime_ns, len(rows)))
+            file_id = cursor.lastrowid
+            placeholders = ", ".join("?" * (len(columns) + 2))
+            conn.executemany(f"INSERT INTO {table} (file_id, row, {', '.join(columns)}) VALUES ({placeholders})",
+                             ((file_id,) + row for row in rows))
+        counts['updated' if previous else 'added'] += 1
+
+    # Logs that are gone (merged or deleted); limited to the participants ingested
+    with conn:
+        for path, (file_id, *_) in known.items():
+            in_scope = not participants or any(os.sep + p + os.sep in path for p in participants)
+            if path not in seen and in_scope:
+                _delete_file(conn, file_id)
+                counts['removed'] += 1
+        assign_scan_runs(conn)
+    conn.close()
+    return counts
+
+
+def assign_scan_runs(conn):
+    """
+    Set files.run of every log to its scan run: its labelled run, else the labelled run of
+    the participant's log of the same context that started before it (after it for the
+    first logs). A discrete log takes the run of its continuous log.
+    """
+    files = pd.read_sql_query(
+        """SELECT f.participant, f.task, f.context, f.trial, f.labelled_run, MIN(s.wall_time) AS start
+           FROM files f LEFT JOIN samples s USING (file_id)
+           WHERE f.kind = 'continuous'
+           GROUP BY f.file_id""", conn)
+    files = files.sort_values(["participant", "context", "start"], kind="mergesort", na_position="last")
+    labelled = files["labelled_run"].where(files["labelled_run"] != "")
+    keys = [files["participant"], files["context"]]
+    runs = labelled.groupby(keys).ffill().groupby(keys).bfill().fillna("")
+    conn.executemany("UPDATE files SET run = ? WHERE participant = ? AND task = ? AND context = ? AND trial = ?",
+                     zip(runs, files["participant"], files["task"], files["context"], files["trial"]))
+
+
+def query(sql, params=None, db_path=None):
+    """Run a SELECT against the log database and return a DataFrame."""
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params or {})
+    finally:
+        conn.close()
+
+
+def canned(name, db_path=None, **params):
+    """Run one of QUERIES by name; parameters that are not given match everything."""
+    if name not in QUERIES:
+        raise KeyError(f"Unknown query '{name}' (available: {', '.join(QUERIES)})")
+    sql = QUERIES[name][1]
+    names = {"participant", "arena"}
+    return query(sql, {key: params.get(key) for key in names | set(params)}, db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite index over all session logs')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--db', default=None, help=f'Database file (default: <results dir>/{DB_NAME})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help='Add new and changed logs to the database')
+    ingest_parser.add_argument('--participant', action='append', default=None,
+                               help='Only this participant (repeatable)')
+    commands.add_parser('list', help='List the canned queries')
+    query_parser = commands.add_parser('query', help='Run a canned query')
+    query_parser.add_argument('name', choices=sorted(QUERIES))
+    query_parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                              help='Query parameter, e.g. arena=hospital or participant=TS263')
+    query_parser.add_argument('--output', default=None, help='Also write the result to this CSV')
+    sql_parser = commands.add_parser('sql', help='Run an SQL query')
+    sql_parser.add_argument('sql')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    db_path = args.db or default_db_path(results_dir)
+
+    if args.command == 'ingest':
+        counts = ingest(results_dir, db_path, args.participant)
+        print(f"{db_path}: {counts['added']} added, {counts['updated']} updated, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed, {counts['failed']} failed")
+        return 1 if counts['failed'] else 0
+
+    if args.command == 'list':
+        for name, (description, _) in QUERIES.items():
+            print(f"{name:24s} {description}")
+        return 0
+
+    if not os.path.exists(db_path):
+        print(f"Error: Database not found: {db_path} (run 'python session_db.py ingest' first)")
+        return 1
+    if args.command == 'query':
+        params = dict(p.split('=', 1) for p in args.param)
+        result = canned(args.name, db_path, **params)
+    else:
+        result = query(args.sql, db_path=db_path)
+    print(result.to_string(index=False))
+    if getattr(args, 'output', None):
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
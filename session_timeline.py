@@ -0,0 +1,224 @@
+"""
+Unified session timeline: every log of one fMRI session on a single clock.
+
+Each task logs its own time base:
+- multi_arena.py: trial_time is seconds since EXPERIMENT_START_TIME (0.0 in fixation
+  entries); RealTime is a wall-clock string, or seconds since start in quit entries
+- snake.py: trial_time is seconds since game_start_time
+- one_target.py: trial_time is seconds since trial_start_time
+and the block wrappers (full_arena_run.py, one_target_run.py) write *_timing.csv files
+with wall-clock trial start/end times.
+
+The builder converts every row to wall-clock seconds in one vectorized pass. Within each
+trial of each log, trial_time is mapped onto the wall clock with the median offset
+between RealTime and trial_time (so rows keep trial_time's sub-millisecond precision);
+rows whose trial_time is not on that base (fixation/trigger entries, or more than
+MAX_CLOCK_DISAGREEMENT off) use RealTime directly. Times are then expressed as seconds
+since the scanner trigger and sorted into one table indexed by session_time.
+
+The trigger anchor is, in order of preference: an explicit --trigger-time, the earliest
+trigger_received row (logged when the first trial starts, right after the trigger;
+TRIGGER_RECEIVED_TIME itself comes from MATLAB's GetSecs, which is not wall-clock time
+on the scanner PC), or the earliest logged time.
+
+Usage:
+    timeline, info = build_timeline(results_dir, "TS263")
+    timeline.loc[0:120.6]                          # first 60 TRs of the session
+
+    python session_timeline.py TS263
+    python session_timeline.py TS263 --trigger-time 14:03:12.412 --include-practice
+"""
+
+import io
+import os
+import sys
+import glob
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from trajectory_metrics import load_continuous_log, trial_column
+from cohort_analysis import default_results_dir, discover_logs
+
+UNCLOCKED_PHASES = ("fixation", "trigger")  # trial_time is not on the task's time base here
+MAX_CLOCK_DISAGREEMENT = 1.0                # seconds between trial_time-derived and RealTime
+SECONDS_PER_DAY = 86400.0
+
+TIMELINE_COLUMNS = ["wall_time", "source", "task", "context", "run", "trial", "phase", "event",
+                    "x", "y", "rotation_angle", "trial_time", "RealTime", "time_source"]
+
+_CLOCK_PATTERN = r"^\s*(\d{1,2}):(\d{2}):(\d{2}(?:\.\d+)?)\s*$"
+
+
+def parse_clock(values):
+    """Seconds since midnight for 'HH:MM:SS.fff' strings (NaN for anything else)."""
+    parts = pd.Series(values).astype(str).str.extract(_CLOCK_PATTERN)
+    return (parts[0].astype(float) * 3600 + parts[1].astype(float) * 60 + parts[2].astype(float)).to_numpy()
+
+
+def parse_trigger_time(value):
+    """Trigger time as seconds since midnight, from 'HH:MM:SS.fff' or an epoch timestamp."""
+    clock = parse_clock([value])[0]
+    if np.isfinite(clock):
+        return clock
+    moment = datetime.fromtimestamp(float(value))
+    return moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1e6
+
+
+def align_log(df):
+    """
+    Wall-clock seconds for every row of one continuous log.
+
+    Returns:
+        (wall_time array, time_source array of 'trial_time' / 'RealTime' / '')
+    """
+    real = parse_clock(df["RealTime"]) if "RealTime" in df.columns else np.full(len(df), np.nan)
+    trial_time = df["trial_time"].to_numpy(dtype=float)
+    unclocked = df["phase"].isin(UNCLOCKED_PHASES).to_numpy() if "phase" in df.columns else np.zeros(len(df), bool)
+    clocked = np.isfinite(real) & np.isfinite(trial_time) & ~unclocked
+
+    # Median offset between the two clocks per trial (each trial may have its own trial_time origin)
+    trial_col = trial_column(df)
+    keys = df[trial_col].astype(str).to_numpy() if trial_col else np.zeros(len(df))
+    offset = pd.Series(np.where(clocked, real - trial_time, np.nan)).groupby(keys).transform('median').to_numpy()
+    from_trial = trial_time + offset
+
+    use_trial = np.isfinite(from_trial) & ~unclocked
+    use_trial &= ~(np.isfinite(real) & (np.abs(from_trial - real) > MAX_CLOCK_DISAGREEMENT))
+    wall = np.where(use_trial, from_trial, real)
+    source = np.where(use_trial, "trial_time", np.where(np.isfinite(real), "RealTime", ""))
+    return wall, source
+
+
+def seconds_since(wall_time, anchor):
+    """Seconds from anchor to wall_time (both seconds since midnight); a session running past midnight wraps forward."""
+    elapsed = np.asarray(wall_time, dtype=float) - anchor
+    return np.where(elapsed < -SECONDS_PER_DAY / 2, elapsed + SECONDS_PER_DAY, elapsed)
+
+
+def read_timing_log(path):
+    """Trial start/end rows of a *_timing.csv from full_arena_run.py / one_target_run.py."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+    # The trial table ends at the blank line before the gap analysis
+    end = lines.index("") if "" in lines else len(lines)
+    table = pd.read_csv(io.StringIO("\n".join(lines[:end])), dtype=str)
+    if table.empty:
+        return pd.DataFrame()
+    context = "FA" if "full_arena" in os.path.basename(path) else "OT"
+    rows = []
+    for event, column in (("trial_start", "Start Time"), ("trial_end", "End Time")):
+        rows.append(pd.DataFrame({
+            "wall_time": parse_clock(table[column]),
+            "source": os.path.basename(path),
+            "task": table["Type"],
+            "context": context,
+            "trial": table["Trial"],
+            "phase": "block",
+            "event": event,
+            "RealTime": table[column],
+            "time_source": "RealTime",
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def find_timing_logs(subid_dir, participant_id):
+    pattern = os.path.join(glob.escape(subid_dir), f"{glob.escape(participant_id)}_*_timing*.csv")
+    return sorted(glob.glob(pattern))
+
+
+def build_timeline(results_dir, participant_id, trigger_time=None, include_practice=False):
+    """
+    Align all continuous logs and timing logs of one participant's session.
+
+    Args:
+        trigger_time: Optional trigger time ('HH:MM:SS.fff' or epoch seconds)
+        include_practice: Also include practice logs (they precede the scan, so their
+                          session_time is negative)
+
+    Returns:
+        (DataFrame indexed by session_time (seconds since the trigger, increasing),
+         info dict with 'anchor' (seconds since midnight) and 'anchor_source')
+    """
+    frames = []
+    for log in discover_logs(results_dir, [participant_id]):
+        if log.context == "practice" and not include_practice:
+            continue
+        df = load_continuous_log(log.path)
+        wall, source = align_log(df)
+        trial_col = trial_column(df)
+        df = df.rename(columns={trial_col: "trial"}) if trial_col and trial_col != "trial" else df
+        df = df.assign(wall_time=wall, time_source=source, source=os.path.basename(log.path),
+                       task=log.task, context=log.context, run=log.run)
+        frames.append(df)
+    subid_dir = os.path.join(results_dir, participant_id)
+    frames.extend(read_timing_log(path) for path in find_timing_logs(subid_dir, participant_id))
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=TIMELINE_COLUMNS), {'anchor': None, 'anchor_source': None}
+
+    timeline = pd.concat(frames, ignore_index=True)
+    timeline["trial"] = timeline["trial"].astype(str) if "trial" in timeline.columns else ""
+
+    # Anchor at the scanner trigger
+    if trigger_time is not None:
+        anchor, anchor_source = parse_trigger_time(trigger_time), "argument"
+    else:
+        triggers = timeline.loc[timeline["event"] == "trigger_received", "wall_time"].dropna()
+        if len(triggers):
+            anchor, anchor_source = triggers.min(), "trigger_received"
+        else:
+            anchor, anchor_source = timeline["wall_time"].min(), "first_row"
+
+    timeline.insert(0, "session_time", seconds_since(timeline["wall_time"].to_numpy(), anchor))
+
+    extra = [c for c in timeline.columns if c not in TIMELINE_COLUMNS and c != "session_time"]
+    timeline = timeline.reindex(columns=["session_time"] + TIMELINE_COLUMNS + extra)
+    timeline = timeline.sort_values("session_time", kind="mergesort", na_position="last")
+    timeline = timeline.set_index("session_time")
+    return timeline, {'anchor': anchor, 'anchor_source': anchor_source}
+
+
+def format_clock(seconds):
+    seconds = float(seconds) % SECONDS_PER_DAY
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build one session timeline aligned to the scanner trigger')
+    parser.add_argument('participant_id', help='Participant ID')
+    parser.add_argument('--results-dir', default=None,
+                       help='Results directory (default: CENTRALIZED_RESULTS_DIR or exploration/results)')
+    parser.add_argument('--trigger-time', default=None,
+                       help='Scanner trigger time (HH:MM:SS.fff or epoch seconds); '
+                            'default: earliest trigger_received entry')
+    parser.add_argument('--include-practice', action='store_true',
+                       help='Include practice logs (negative session times)')
+    parser.add_argument('--output', default=None,
+                       help='CSV to write (default: <results>/<SubID>/<SubID>_session_timeline.csv)')
+    args = parser.parse_args()
+
+    results_dir = args.results_dir or default_results_dir()
+    timeline, info = build_timeline(results_dir, args.participant_id, args.trigger_time, args.include_practice)
+    if timeline.empty:
+        print(f"No logs found for {args.participant_id} in {results_dir}")
+        return 1
+
+    print(f"Anchor: {format_clock(info['anchor'])} ({info['anchor_source']})")
+    print(f"Rows: {len(timeline)} from {timeline['source'].nunique()} files, "
+          f"session time {timeline.index.min():.2f}s to {timeline.index.max():.2f}s")
+    unaligned = int(np.isnan(timeline.index.to_numpy(dtype=float)).sum())
+    if unaligned:
+        print(f"Warning: {unaligned} rows have no usable time and are listed last")
+
+    output = args.output or os.path.join(results_dir, args.participant_id,
+                                         f"{args.participant_id}_session_timeline.csv")
+    timeline.to_csv(output, encoding='utf-8-sig', float_format='%.4f')
+    print(f"Session timeline saved to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Circle
 import os
+from trajectory_metrics import load_continuous_log, compute_metrics, first_events, get_metric
+from trajectory_simplify import simplify_trajectory
 
 # Arena parameters (in meters)
 ARENA_DIAMETER = 3.3
@@ -14,18 +16,18 @@ def visualize_exploration_annotation_trajectories(csv_file):
     
     print(f"Analyzing trial data from: {csv_file}")
     
-    # Load data
-    df = pd.read_csv(csv_file)
-    df['trial_time'] = pd.to_numeric(df['trial_time'], errors='coerce')
+    # Load data and compute per-phase metrics once
+    df = load_continuous_log(csv_file)
+    metrics = compute_metrics(df, per_trial=False)
     
     # Create figure
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
     # Plot 1: Exploration trajectory
-    plot_exploration_trajectory(ax1, df)
+    plot_exploration_trajectory(ax1, df, metrics)
     
     # Plot 2: Annotation trajectory
-    plot_annotation_trajectory(ax2, df)
+    plot_annotation_trajectory(ax2, df, metrics)
     
     plt.tight_layout()
     
@@ -37,9 +39,9 @@ def visualize_exploration_annotation_trajectories(csv_file):
     plt.show()
     
     # Print key statistics
-    print_trajectory_statistics(df)
+    print_trajectory_statistics(df, metrics)
 
-def plot_exploration_trajectory(ax, df):
+def plot_exploration_trajectory(ax, df, metrics):
     """Plot exploration phase trajectory."""
     
     # Filter exploration data
@@ -53,16 +55,17 @@ def plot_exploration_trajectory(ax, df):
     arena_circle = Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=2)
     ax.add_patch(arena_circle)
     
-    # Plot trajectory
-    ax.plot(exploration_data['x'], exploration_data['y'], 
+    # Plot trajectory (simplified to within 2 mm, event rows kept)
+    path = simplify_trajectory(exploration_data, per_trial=False)
+    ax.plot(path['x'], path['y'], 
            color='blue', alpha=0.7, linewidth=2, label='Exploration path')
     
     # Plot key events
     plot_exploration_events(ax, exploration_data)
     
     # Add statistics
-    duration = exploration_data['trial_time'].max() - exploration_data['trial_time'].min()
-    distance = calculate_path_distance(exploration_data)
+    duration = get_metric(metrics, 'exploration', 'duration_s')
+    distance = get_metric(metrics, 'exploration', 'path_length_m')
     
     stats_text = f"""Exploration Phase:
 Duration: {duration:.2f}s
@@ -82,7 +85,7 @@ Points: {len(exploration_data)}"""
     ax.set_title('Exploration Trajectory', fontsize=14, fontweight='bold')
     ax.legend()
 
-def plot_annotation_trajectory(ax, df):
+def plot_annotation_trajectory(ax, df, metrics):
     """Plot annotation phase trajectory."""
     
     # Filter annotation data
@@ -96,16 +99,17 @@ def plot_annotation_trajectory(ax, df):
     arena_circle = Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=2)
     ax.add_patch(arena_circle)
     
-    # Plot trajectory
-    ax.plot(annotation_data['x'], annotation_data['y'], 
+    # Plot trajectory (simplified to within 2 mm, event rows kept)
+    path = simplify_trajectory(annotation_data, per_trial=False)
+    ax.plot(path['x'], path['y'], 
            color='green', alpha=0.7, linewidth=2, label='Annotation path')
     
     # Plot key events
     plot_annotation_events(ax, annotation_data)
     
     # Add statistics
-    duration = annotation_data['trial_time'].max() - annotation_data['trial_time'].min()
-    distance = calculate_path_distance(annotation_data)
+    duration = get_metric(metrics, 'annotation', 'duration_s')
+    distance = get_metric(metrics, 'annotation', 'path_length_m')
     
     stats_text = f"""Annotation Phase:
 Duration: {duration:.2f}s
@@ -160,57 +164,44 @@ def calculate_path_distance(data):
     if len(data) < 2:
         return 0.0
     
-    dx = data['x'].diff()
-    dy = data['y'].diff()
-    distance = np.sqrt(dx**2 + dy**2)
-    return distance.sum()
+    metrics = compute_metrics(data, by_phase=False, per_trial=False)
+    return get_metric(metrics, 'all', 'path_length_m')
 
-def print_trajectory_statistics(df):
+def print_trajectory_statistics(df, metrics=None):
     """Print detailed statistics about the trajectories."""
     
+    if metrics is None:
+        metrics = compute_metrics(df, per_trial=False)
+    events = first_events(df, per_trial=False).set_index('event')
+    
     print("\n" + "="*60)
     print("TRAJECTORY ANALYSIS")
     print("="*60)
     
-    # Exploration statistics
-    exploration_data = df[df['phase'] == 'exploration']
-    if len(exploration_data) > 0:
-        print(f"\nEXPLORATION PHASE:")
-        print(f"  Duration: {exploration_data['trial_time'].max() - exploration_data['trial_time'].min():.2f} seconds")
-        print(f"  Data points: {len(exploration_data)}")
-        print(f"  Distance traveled: {calculate_path_distance(exploration_data):.2f} meters")
-        print(f"  Average speed: {calculate_path_distance(exploration_data)/(exploration_data['trial_time'].max() - exploration_data['trial_time'].min()):.3f} m/s")
-        print(f"  Position range: X[{exploration_data['x'].min():.3f}, {exploration_data['x'].max():.3f}], Y[{exploration_data['y'].min():.3f}, {exploration_data['y'].max():.3f}]")
-        
-        # Target placement
-        target_placed = exploration_data[exploration_data['event'] == 'target_placed']
-        if not target_placed.empty:
-            target_pos = (target_placed.iloc[0]['x'], target_placed.iloc[0]['y'])
-            print(f"  Target placed at: ({target_pos[0]:.3f}, {target_pos[1]:.3f}) at {target_placed.iloc[0]['trial_time']:.2f}s")
-    
-    # Annotation statistics
-    annotation_data = df[df['phase'] == 'annotation']
-    if len(annotation_data) > 0:
-        print(f"\nANNOTATION PHASE:")
-        print(f"  Duration: {annotation_data['trial_time'].max() - annotation_data['trial_time'].min():.2f} seconds")
-        print(f"  Data points: {len(annotation_data)}")
-        print(f"  Distance traveled: {calculate_path_distance(annotation_data):.2f} meters")
-        print(f"  Average speed: {calculate_path_distance(annotation_data)/(annotation_data['trial_time'].max() - annotation_data['trial_time'].min()):.3f} m/s")
-        print(f"  Position range: X[{annotation_data['x'].min():.3f}, {annotation_data['x'].max():.3f}], Y[{annotation_data['y'].min():.3f}, {annotation_data['y'].max():.3f}]")
+    for phase, event, label in [('exploration', 'target_placed', 'Target placed'),
+                                ('annotation', 'target_annotated', 'Target annotated')]:
+        phase_rows = metrics[metrics['phase'] == phase]
+        if phase_rows.empty:
+            continue
+        row = phase_rows.iloc[0]
+        bounds = df.loc[df['phase'] == phase, ['x', 'y']].agg(['min', 'max'])
+        print(f"\n{phase.upper()} PHASE:")
+        print(f"  Duration: {row['duration_s']:.2f} seconds")
+        print(f"  Data points: {row['n_samples']}")
+        print(f"  Distance traveled: {row['path_length_m']:.2f} meters")
+        print(f"  Average speed: {row['path_length_m']/row['duration_s']:.3f} m/s")
+        print(f"  Idle time: {row['idle_time_s']:.2f} seconds, near border: {row['border_time_s']:.2f} seconds")
+        print(f"  Position range: X[{bounds.loc['min', 'x']:.3f}, {bounds.loc['max', 'x']:.3f}], Y[{bounds.loc['min', 'y']:.3f}, {bounds.loc['max', 'y']:.3f}]")
         
-        # Target annotation
-        target_annotated = annotation_data[annotation_data['event'] == 'target_annotated']
-        if not target_annotated.empty:
-            annotation_pos = (target_annotated.iloc[0]['x'], target_annotated.iloc[0]['y'])
-            print(f"  Target annotated at: ({annotation_pos[0]:.3f}, {annotation_pos[1]:.3f}) at {target_annotated.iloc[0]['trial_time']:.2f}s")
+        # Target placement / annotation
+        if event in events.index and events.loc[event, 'phase'] == phase:
+            pos = events.loc[event]
+            print(f"  {label} at: ({pos['x']:.3f}, {pos['y']:.3f}) at {pos['trial_time']:.2f}s")
     
     # Calculate error if both target placement and annotation exist
-    target_placed = df[df['event'] == 'target_placed']
-    target_annotated = df[df['event'] == 'target_annotated']
-    
-    if not target_placed.empty and not target_annotated.empty:
-        target_pos = (target_placed.iloc[0]['x'], target_placed.iloc[0]['y'])
-        annotation_pos = (target_annotated.iloc[0]['x'], target_annotated.iloc[0]['y'])
+    if 'target_placed' in events.index and 'target_annotated' in events.index:
+        target_pos = (events.loc['target_placed', 'x'], events.loc['target_placed', 'y'])
+        annotation_pos = (events.loc['target_annotated', 'x'], events.loc['target_annotated', 'y'])
         error_distance = np.sqrt((target_pos[0] - annotation_pos[0])**2 + (target_pos[1] - annotation_pos[1])**2)
         print(f"\nPERFORMANCE METRICS:")
         print(f"  Target placement: ({target_pos[0]:.3f}, {target_pos[1]:.3f})")
@@ -0,0 +1,203 @@
+"""
+Trajectory metrics for the continuous logs (OT, FA, snake and practice).
+
+All metrics come from one vectorized pass: per-row step columns (time step, distance,
+speed, turn, border) are computed once with NumPy, then aggregated per trial and phase
+with a single groupby. Works on one log or on many logs concatenated together (add a
+'participant' and/or 'file' column to keep them apart).
+
+Steps are only counted between consecutive rows of the same trial and phase, so the
+position reset at a phase change (e.g. back to (0, 0) for annotation) is not movement.
+
+Usage:
+    df = load_continuous_log("Results/test/test_OT_ot2_continuous.csv")
+    metrics = compute_metrics(df)     # one row per (trial, phase), plus phase == 'all'
+    events = first_events(df)         # first occurrence of every event per trial
+"""
+
+import numpy as np
+import pandas as pd
+
+# Arena parameters (in meters)
+ARENA_DIAMETER = 3.3
+ARENA_RADIUS = ARENA_DIAMETER / 2.0
+BORDER_THRESHOLD = 0.1   # Within this distance of the wall counts as border time
+
+IDLE_SPEED = 0.01        # m/s; slower than this (and not turning) counts as idle
+IDLE_ANGULAR_SPEED = 1.0 # deg/s
+ALL_PHASES = "all"
+NAVIGATION_PHASES = ("exploration", "gameplay")  # Phases in which the participant moves through the arena
+
+# Columns that separate logs when several are concatenated (in grouping order)
+SOURCE_COLUMNS = ["participant", "task", "file"]
+
+METRIC_COLUMNS = [
+    "n_samples", "start_time", "end_time", "duration_s", "path_length_m", "mean_speed",
+    "max_speed", "moving_time_s", "idle_time_s", "total_rotation_deg",
+    "mean_angular_velocity", "border_time_s",
+]
+
+
+def load_continuous_log(csv_file):
+    """Read a continuous log with numeric trial_time/x/y/rotation_angle columns."""
+    df = pd.read_csv(csv_file, encoding='utf-8-sig')
+    for col in ("trial_time", "x", "y", "rotation_angle"):
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def trial_column(df):
+    """Name of the trial identifier column ('RoundName' in FA logs, 'trial' otherwise)."""
+    if "RoundName" in df.columns:
+        return "RoundName"
+    if "trial" in df.columns:
+        return "trial"
+    return None
+
+
+def group_columns(df, trial_col=None, per_trial=True):
+    """Source columns present in df followed by the trial column (unless per_trial is False)."""
+    trial_col = trial_col or trial_column(df)
+    cols = [c for c in SOURCE_COLUMNS if c in df.columns]
+    if trial_col and per_trial:
+        cols.append(trial_col)
+    return cols
+
+
+def segment_starts(df, trial_col=None, per_trial=True):
+    """Boolean array marking the first row of every (trial, phase) segment."""
+    n = len(df)
+    keys = group_columns(df, trial_col, per_trial) + (["phase"] if "phase" in df.columns else [])
+    starts = np.zeros(n, dtype=bool)
+    if n:
+        starts[0] = True
+    for col in keys:
+        values = df[col].to_numpy()
+        same = pd.Series(values[1:]).eq(pd.Series(values[:-1])).to_numpy() | (
+            pd.isna(values[1:]) & pd.isna(values[:-1]))
+        starts[1:] |= ~same
+    return starts
+
+
+def step_metrics(df, trial_col=None, per_trial=True):
+    """
+    Per-row step quantities, aligned with df.index (df itself is not copied or modified).
+
+    Each row's step runs from the previous row of the same trial and phase; the first
+    row of every segment has a zero step.
+
+    Returns:
+        DataFrame with dt, step_m, speed, turn_deg, angular_velocity, idle, at_border
+    """
+    n = len(df)
+    same_segment = ~segment_starts(df, trial_col, per_trial)
+
+    t = df["trial_time"].to_numpy(dtype=float)
+    x = df["x"].to_numpy(dtype=float)
+    y = df["y"].to_numpy(dtype=float)
+    angle = df["rotation_angle"].to_numpy(dtype=float) if "rotation_angle" in df.columns else np.zeros(n)
+
+    dt = np.zeros(n)
+    step = np.zeros(n)
+    turn = np.zeros(n)
+    if n > 1:
+        dt[1:] = np.diff(t)
+        step[1:] = np.hypot(np.diff(x), np.diff(y))
+        turn[1:] = np.abs((np.diff(angle) + 180.0) % 360.0 - 180.0)
+    valid = same_segment & np.isfinite(dt) & (dt > 0)
+    dt = np.where(valid, dt, 0.0)
+    step = np.where(valid & np.isfinite(step), step, 0.0)
+    turn = np.where(valid & np.isfinite(turn), turn, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(dt > 0, step / dt, np.nan)
+        angular_velocity = np.where(dt > 0, turn / dt, np.nan)
+    idle = (dt > 0) & (speed < IDLE_SPEED) & (angular_velocity < IDLE_ANGULAR_SPEED)
+    at_border = (dt > 0) & (np.hypot(x, y) >= ARENA_RADIUS - BORDER_THRESHOLD)
+
+    return pd.DataFrame({
+        "dt": dt,
+        "step_m": step,
+        "speed": speed,
+        "turn_deg": turn,
+        "angular_velocity": angular_velocity,
+        "idle": idle,
+        "at_border": at_border,
+    }, index=df.index)
+
+
+def _aggregate(frame, keys):
+    grouped = frame.groupby(keys, sort=False, dropna=False)
+    out = grouped.agg(
+        n_samples=("dt", "size"),
+        start_time=("trial_time", "min"),
+        end_time=("trial_time", "max"),
+        path_length_m=("step_m", "sum"),
+        max_speed=("speed", "max"),
+        moving_time_s=("moving_dt", "sum"),
+        idle_time_s=("idle_dt", "sum"),
+        total_rotation_deg=("turn_deg", "sum"),
+        border_time_s=("border_dt", "sum"),
+        step_time_s=("dt", "sum"),
+    ).reset_index()
+    out["duration_s"] = out["end_time"] - out["start_time"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out["mean_speed"] = np.where(out["step_time_s"] > 0, out["path_length_m"] / out["step_time_s"], np.nan)
+        out["mean_angular_velocity"] = np.where(out["step_time_s"] > 0,
+                                                out["total_rotation_deg"] / out["step_time_s"], np.nan)
+    return out.drop(columns="step_time_s")
+
+
+def compute_metrics(df, trial_col=None, by_phase=True, per_trial=True):
+    """
+    Per-trial (and per-phase) movement metrics as a tidy table.
+
+    per_trial=False treats each log as a single trial (the single-file scripts use this).
+
+    Returns:
+        DataFrame with the group columns, 'phase' (ALL_PHASES for the whole trial) and
+        METRIC_COLUMNS; speeds in m/s, angular velocity in deg/s, times in seconds
+    """
+    steps = step_metrics(df, trial_col, per_trial)
+    keys = group_columns(df, trial_col, per_trial)
+    frame = pd.DataFrame({col: df[col] for col in keys})
+    frame["phase"] = df["phase"] if "phase" in df.columns else ALL_PHASES
+    frame["trial_time"] = df["trial_time"].to_numpy(dtype=float)
+    frame = frame.join(steps[["dt", "step_m", "speed", "turn_deg"]])
+    frame["moving_dt"] = np.where(steps["idle"], 0.0, steps["dt"])
+    frame["idle_dt"] = np.where(steps["idle"], steps["dt"], 0.0)
+    frame["border_dt"] = np.where(steps["at_border"], steps["dt"], 0.0)
+
+    whole = _aggregate(frame, keys) if keys else _aggregate(frame.assign(_all=0), ["_all"]).drop(columns="_all")
+    whole.insert(len(keys), "phase", ALL_PHASES)
+    tables = [whole]
+    if by_phase and "phase" in df.columns:
+        tables.append(_aggregate(frame, keys + ["phase"]))
+    result = pd.concat(tables, ignore_index=True)
+    return result[keys + ["phase"] + METRIC_COLUMNS]
+
+
+def first_events(df, trial_col=None, per_trial=True):
+    """
+    First occurrence of every logged event per trial (per log if per_trial is False).
+
+    Returns:
+        DataFrame with the group columns, event, phase, trial_time, x, y
+    """
+    keys = group_columns(df, trial_col, per_trial)
+    events = df[df["event"].notna() & (df["event"].astype(str) != "")]
+    cols = keys + ["event"] + [c for c in ("phase", "trial_time", "x", "y") if c in df.columns]
+    return events[cols].drop_duplicates(subset=keys + ["event"], keep="first").reset_index(drop=True)
+
+
+def phase_spans(metrics):
+    """{phase: (start_time, end_time)} from a compute_metrics(..., per_trial=False) table of one log."""
+    rows = metrics[metrics["phase"] != ALL_PHASES]
+    return {row.phase: (row.start_time, row.end_time) for row in rows.itertuples()}
+
+
+def get_metric(metrics, phase, column, default=0.0):
+    """Look up one metric for one phase of a compute_metrics(..., per_trial=False) table of one log."""
+    rows = metrics.loc[metrics["phase"] == phase, column]
+    return rows.iloc[0] if len(rows) else default
@@ -0,0 +1,210 @@
+"""
+Trajectory simplification for plotting and archival export of the continuous logs.
+
+Two vectorized NumPy reducers:
+- Ramer-Douglas-Peucker (rdp_mask): drops samples while keeping every dropped sample
+  within a tolerance (in meters) of the simplified path. All open segments are split
+  in the same pass, so the loop runs once per recursion level rather than per point.
+- Largest-Triangle-Three-Buckets (lttb_mask): keeps a fixed number of points of a time
+  series (position, rotation, speed over time) while preserving its visual shape.
+
+Rows carrying an event (found_*, phase_change, target_placed, ...) and the first and
+last row of every trial/phase segment are always kept, so events and phase resets
+stay exact.
+
+Metrics (path length, idle time, ...) should be computed from the full log with
+trajectory_metrics; simplified data is meant for drawing and storage.
+
+Usage:
+    simplified = simplify_trajectory(df, tolerance=0.002)
+    keep = lttb_mask(df['trial_time'], df['rotation_angle'], 2000)
+
+    python trajectory_simplify.py Results/TS263/TS263_snake_practice_continuous_log.csv
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+
+from trajectory_metrics import load_continuous_log, segment_starts
+
+DEFAULT_TOLERANCE = 0.002      # meters; well below a pixel on the trajectory figures
+DEFAULT_ANGLE_TOLERANCE = 1.0  # degrees; used by the archival export to keep heading changes
+DEFAULT_MAX_POINTS = 2000      # points per time-series line
+
+
+def anchor_mask(df, trial_col=None, per_trial=True):
+    """Rows that must survive simplification: event rows and segment boundaries."""
+    anchors = segment_starts(df, trial_col, per_trial)
+    if len(anchors):
+        anchors[-1] = True
+        anchors[:-1] |= anchors[1:]  # Last row of each segment
+    if "event" in df.columns:
+        events = df["event"]
+        anchors |= (events.notna() & (events.astype(str).str.strip() != "")).to_numpy()
+    return anchors
+
+
+def _segment_distance(points, starts, ends):
+    """Distance from each point to the segment between its start and end points (any dimension)."""
+    chord = ends - starts
+    length2 = np.einsum('ij,ij->i', chord, chord)
+    offset = points - starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(length2 > 0, np.einsum('ij,ij->i', offset, chord) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.linalg.norm(offset - t[:, None] * chord, axis=1)
+
+
+def rdp_mask(points, tolerance=DEFAULT_TOLERANCE, anchors=None):
+    """
+    Ramer-Douglas-Peucker over a polyline.
+
+    Args:
+        points: (n, d) array (x, y in meters, optionally further scaled columns)
+        tolerance: Maximum distance of a dropped point from the simplified path
+        anchors: Optional boolean mask of points that must be kept
+
+    Returns:
+        Boolean keep mask of length n
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    keep = np.zeros(n, dtype=bool) if anchors is None else np.asarray(anchors, dtype=bool).copy()
+    if n <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    # Samples without a position cannot be approximated; keep them and their neighbours
+    missing = ~np.isfinite(points).all(axis=1)
+    keep |= missing
+    keep[1:] |= missing[:-1]
+    keep[:-1] |= missing[1:]
+    positions = np.arange(n)
+
+    while True:
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, positions, side='right') - 1
+        segment = np.minimum(segment, len(kept) - 2)
+        starts, ends = kept[segment], kept[segment + 1]
+        dist = _segment_distance(points, points[starts], points[ends])
+        dist[keep | ~np.isfinite(dist)] = 0.0
+
+        # Farthest point of every segment (reduceat over the kept positions)
+        seg_max = np.maximum.reduceat(dist, kept[:-1])
+        split = seg_max > tolerance
+        if not split.any():
+            return keep
+        candidates = np.flatnonzero(split[segment] & (dist == seg_max[segment]) & (dist > 0))
+        _, first = np.unique(segment[candidates], return_index=True)
+        keep[candidates[first]] = True
+
+
+def lttb_mask(t, values, max_points=DEFAULT_MAX_POINTS, anchors=None):
+    """
+    Largest-Triangle-Three-Buckets downsampling of one time series.
+
+    The first and last samples are kept and the rest are split into max_points - 2
+    buckets; from each bucket the sample forming the largest triangle with the previously
+    kept sample and the next bucket's mean is kept. The areas of a bucket are computed
+    in one vectorized step.
+
+    Returns:
+        Boolean keep mask (anchors, when given, are added on top of the max_points)
+    """
+    t = np.asarray(t, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(t)
+    keep = np.zeros(n, dtype=bool) if anchors is None else np.asarray(anchors, dtype=bool).copy()
+    valid = np.isfinite(t) & np.isfinite(values)
+    if n <= max_points or max_points < 3:
+        keep[:] = True
+        return keep
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    counts = np.diff(edges)
+    tv = np.where(valid, t, 0.0)
+    vv = np.where(valid, values, 0.0)
+    # Mean of every bucket from cumulative sums (ignoring invalid samples)
+    csum_t = np.concatenate(([0.0], np.cumsum(tv)))
+    csum_v = np.concatenate(([0.0], np.cumsum(vv)))
+    csum_n = np.concatenate(([0], np.cumsum(valid)))
+    bucket_n = np.maximum(csum_n[edges[1:]] - csum_n[edges[:-1]], 1)
+    mean_t = (csum_t[edges[1:]] - csum_t[edges[:-1]]) / bucket_n
+    mean_v = (csum_v[edges[1:]] - csum_v[edges[:-1]]) / bucket_n
+    # The last bucket looks ahead to the final sample
+    next_t = np.append(mean_t[1:], t[-1])
+    next_v = np.append(mean_v[1:], values[-1])
+
+    keep[0] = keep[-1] = True
+    prev = 0
+    for b in range(len(counts)):
+        lo, hi = edges[b], edges[b + 1]
+        if hi <= lo:
+            continue
+        bt, bv = t[lo:hi], values[lo:hi]
+        area = np.abs((t[prev] - next_t[b]) * (bv - values[prev]) - (t[prev] - bt) * (next_v[b] - values[prev]))
+        area = np.where(valid[lo:hi], area, -1.0)
+        prev = lo + int(np.argmax(area))
+        keep[prev] = True
+    keep |= ~valid
+    return keep
+
+
+def simplify_trajectory(df, tolerance=DEFAULT_TOLERANCE, angle_tolerance=None, trial_col=None, per_trial=True):
+    """
+    Drop samples that do not change the drawn path by more than tolerance meters.
+
+    Each trial/phase segment is simplified separately, and event rows are always kept.
+    With angle_tolerance (degrees), heading changes larger than that are kept as well
+    (the rotation is added as a third, scaled coordinate), which the archival export
+    uses so turning on the spot is not lost.
+
+    Returns:
+        The kept rows of df (original index preserved)
+    """
+    if len(df) <= 2:
+        return df
+    columns = [df["x"].to_numpy(dtype=float), df["y"].to_numpy(dtype=float)]
+    if angle_tolerance and "rotation_angle" in df.columns:
+        angle = df["rotation_angle"].to_numpy(dtype=float)
+        finite = np.isfinite(angle)
+        unwrapped = angle.copy()
+        unwrapped[finite] = np.degrees(np.unwrap(np.radians(angle[finite])))
+        columns.append(unwrapped * (tolerance / angle_tolerance))
+    keep = rdp_mask(np.column_stack(columns), tolerance, anchor_mask(df, trial_col, per_trial))
+    return df[keep]
+
+
+def downsample_series(t, values, max_points=DEFAULT_MAX_POINTS, anchors=None):
+    """(t, values) reduced with lttb_mask(), as arrays ready for plotting."""
+    t = np.asarray(t, dtype=float)
+    values = np.asarray(values, dtype=float)
+    keep = lttb_mask(t, values, max_points, anchors)
+    return t[keep], values[keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a simplified copy of a continuous log for archiving')
+    parser.add_argument('csv_file', help='Continuous log CSV')
+    parser.add_argument('output', nargs='?', default=None,
+                       help='Output CSV (default: <input>_simplified.csv)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help=f'Position tolerance in meters (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--angle-tolerance', type=float, default=DEFAULT_ANGLE_TOLERANCE,
+                       help=f'Heading tolerance in degrees (default: {DEFAULT_ANGLE_TOLERANCE})')
+    args = parser.parse_args()
+
+    df = load_continuous_log(args.csv_file)
+    simplified = simplify_trajectory(df, args.tolerance, args.angle_tolerance)
+    output = args.output or os.path.splitext(args.csv_file)[0] + "_simplified.csv"
+    simplified.to_csv(output, index=False, encoding='utf-8-sig')
+    print(f"Kept {len(simplified)} of {len(df)} rows ({100.0 * len(simplified) / max(len(df), 1):.1f}%)")
+    print(f"Simplified log saved to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,9 @@ from matplotlib.patches import Circle, Rectangle
 import seaborn as sns
 from datetime import datetime
 import os
+import sys
+from trajectory_metrics import load_continuous_log, step_metrics, compute_metrics, first_events, get_metric
+from trajectory_simplify import simplify_trajectory, downsample_series
 
 # Set style for better plots
 plt.style.use('default')
@@ -19,13 +22,10 @@ def load_and_analyze_data(csv_file):
     """Load and analyze the trial data."""
     print(f"Loading data from: {csv_file}")
     
-    # Read the CSV file
-    df = pd.read_csv(csv_file)
+    # Read the CSV file (trial_time, x, y and rotation_angle converted to numeric)
+    df = load_continuous_log(csv_file)
     print(f"Loaded {len(df)} data points")
     
-    # Convert trial_time to numeric, handling any non-numeric values
-    df['trial_time'] = pd.to_numeric(df['trial_time'], errors='coerce')
-    
     # Basic statistics
     print(f"\nData Summary:")
     print(f"Phases: {df['phase'].unique()}")
@@ -34,8 +34,8 @@ def load_and_analyze_data(csv_file):
     
     return df
 
-def create_comprehensive_visualization(df, output_dir="."):
-    """Create a comprehensive visualization of the trial."""
+def create_comprehensive_visualization(df, output_dir=".", show=True, dpi=300):
+    """Create a comprehensive visualization of the trial (show=False closes the figures instead of blocking)."""
     
     # Create figure with subplots
     fig = plt.figure(figsize=(20, 16))
@@ -70,14 +70,31 @@ def create_comprehensive_visualization(df, output_dir="."):
     
     # Save the comprehensive plot
     output_file = os.path.join(output_dir, "trial_comprehensive_analysis.png")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     print(f"Comprehensive analysis saved to: {output_file}")
     
     # Create separate detailed plots
-    create_detailed_trajectory_plot(df, output_dir)
-    create_time_analysis_plots(df, output_dir)
+    create_detailed_trajectory_plot(df, output_dir, show=False, dpi=dpi)
+    create_time_analysis_plots(df, output_dir, show=False, dpi=dpi)
     
-    plt.show()
+    finish_figure(fig, show)
+
+def finish_figure(fig, show):
+    """Show the figure (blocks until closed) or close it when rendering headless."""
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+
+PHASE_COLORS = {'fixation': 'gray', 'exploration': 'blue', 'annotation': 'green', 'feedback': 'red'}
+
+def shade_phases(ax, df, with_labels=False):
+    """Shade each phase's time span (one groupby instead of a scan per phase)."""
+    spans = df.groupby('phase', sort=False)['trial_time'].agg(['min', 'max'])
+    for phase, (start_time, end_time) in spans.iterrows():
+        if phase in PHASE_COLORS:
+            ax.axvspan(start_time, end_time, alpha=0.2, color=PHASE_COLORS[phase],
+                       label=f'{phase} phase' if with_labels else None)
 
 def plot_trajectory(ax, df, title):
     """Plot trajectory with arena, target, and key events."""
@@ -86,22 +103,12 @@ def plot_trajectory(ax, df, title):
     arena_circle = Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=2, alpha=0.7)
     ax.add_patch(arena_circle)
     
-    # Plot trajectory for each phase
-    phases = df['phase'].unique()
-    colors = {
-        'fixation': 'gray',
-        'exploration': 'blue', 
-        'annotation': 'green', 
-        'feedback': 'red'
-    }
-    
-    for phase in phases:
-        if phase in colors:
-            phase_data = df[df['phase'] == phase]
-            if len(phase_data) > 0:
-                ax.plot(phase_data['x'], phase_data['y'], 
-                       color=colors[phase], alpha=0.6, linewidth=1.5,
-                       label=f'{phase} trajectory')
+    # Plot trajectory for each phase (simplified to within 2 mm, event rows kept)
+    for phase, phase_data in simplify_trajectory(df, per_trial=False).groupby('phase', sort=False):
+        if phase in PHASE_COLORS:
+            ax.plot(phase_data['x'], phase_data['y'], 
+                   color=PHASE_COLORS[phase], alpha=0.6, linewidth=1.5,
+                   label=f'{phase} trajectory')
     
     # Plot key events
     plot_key_events(ax, df)
@@ -147,21 +154,12 @@ def plot_key_events(ax, df):
 def plot_position_time_series(ax, df):
     """Plot X and Y position over time."""
     
-    # Plot position over time
-    ax.plot(df['trial_time'], df['x'], 'b-', alpha=0.7, label='X position', linewidth=1.5)
-    ax.plot(df['trial_time'], df['y'], 'r-', alpha=0.7, label='Y position', linewidth=1.5)
+    # Plot position over time (LTTB-downsampled for drawing)
+    ax.plot(*downsample_series(df['trial_time'], df['x']), 'b-', alpha=0.7, label='X position', linewidth=1.5)
+    ax.plot(*downsample_series(df['trial_time'], df['y']), 'r-', alpha=0.7, label='Y position', linewidth=1.5)
     
     # Add phase boundaries
-    phases = df['phase'].unique()
-    colors = {'fixation': 'gray', 'exploration': 'blue', 'annotation': 'green', 'feedback': 'red'}
-    
-    for phase in phases:
-        if phase in colors:
-            phase_data = df[df['phase'] == phase]
-            if len(phase_data) > 0:
-                start_time = phase_data['trial_time'].min()
-                end_time = phase_data['trial_time'].max()
-                ax.axvspan(start_time, end_time, alpha=0.2, color=colors[phase], label=f'{phase} phase')
+    shade_phases(ax, df, with_labels=True)
     
     ax.set_xlabel('Time (seconds)')
     ax.set_ylabel('Position (meters)')
@@ -172,19 +170,10 @@ def plot_position_time_series(ax, df):
 def plot_rotation_time_series(ax, df):
     """Plot rotation angle over time."""
     
-    ax.plot(df['trial_time'], df['rotation_angle'], 'purple', alpha=0.7, linewidth=1.5)
+    ax.plot(*downsample_series(df['trial_time'], df['rotation_angle']), 'purple', alpha=0.7, linewidth=1.5)
     
     # Add phase boundaries
-    phases = df['phase'].unique()
-    colors = {'fixation': 'gray', 'exploration': 'blue', 'annotation': 'green', 'feedback': 'red'}
-    
-    for phase in phases:
-        if phase in colors:
-            phase_data = df[df['phase'] == phase]
-            if len(phase_data) > 0:
-                start_time = phase_data['trial_time'].min()
-                end_time = phase_data['trial_time'].max()
-                ax.axvspan(start_time, end_time, alpha=0.2, color=colors[phase])
+    shade_phases(ax, df)
     
     ax.set_xlabel('Time (seconds)')
     ax.set_ylabel('Rotation Angle (degrees)')
@@ -194,37 +183,22 @@ def plot_rotation_time_series(ax, df):
 def plot_speed_analysis(ax, df):
     """Plot movement speed over time."""
     
-    # Calculate speed (distance between consecutive points)
-    df_copy = df.copy()
-    df_copy['dx'] = df_copy['x'].diff()
-    df_copy['dy'] = df_copy['y'].diff()
-    df_copy['speed'] = np.sqrt(df_copy['dx']**2 + df_copy['dy']**2) / df_copy['trial_time'].diff()
+    # Speed between consecutive points (undefined where no time elapsed)
+    speed = step_metrics(df, per_trial=False)['speed']
+    valid = np.isfinite(speed)
     
-    # Remove infinite and NaN values
-    df_copy = df_copy.dropna(subset=['speed'])
-    df_copy = df_copy[np.isfinite(df_copy['speed'])]
-    
-    if len(df_copy) > 0:
-        ax.plot(df_copy['trial_time'], df_copy['speed'], 'orange', alpha=0.7, linewidth=1.5)
+    if valid.any():
+        ax.plot(*downsample_series(df['trial_time'][valid], speed[valid]), 'orange', alpha=0.7, linewidth=1.5)
         
         # Add phase boundaries
-        phases = df['phase'].unique()
-        colors = {'fixation': 'gray', 'exploration': 'blue', 'annotation': 'green', 'feedback': 'red'}
-        
-        for phase in phases:
-            if phase in colors:
-                phase_data = df[df['phase'] == phase]
-                if len(phase_data) > 0:
-                    start_time = phase_data['trial_time'].min()
-                    end_time = phase_data['trial_time'].max()
-                    ax.axvspan(start_time, end_time, alpha=0.2, color=colors[phase])
+        shade_phases(ax, df)
     
     ax.set_xlabel('Time (seconds)')
     ax.set_ylabel('Speed (m/s)')
     ax.set_title('Movement Speed Over Time', fontsize=12, fontweight='bold')
     ax.grid(True, alpha=0.3)
 
-def create_detailed_trajectory_plot(df, output_dir):
+def create_detailed_trajectory_plot(df, output_dir, show=True, dpi=300):
     """Create a detailed trajectory plot with annotations."""
     
     fig, ax = plt.subplots(figsize=(12, 12))
@@ -233,14 +207,15 @@ def create_detailed_trajectory_plot(df, output_dir):
     arena_circle = Circle((0, 0), ARENA_RADIUS, fill=False, color='black', linewidth=3)
     ax.add_patch(arena_circle)
     
-    # Plot exploration trajectory
-    exploration_data = df[df['phase'] == 'exploration']
+    # Plot exploration trajectory (simplified to within 2 mm, event rows kept)
+    path = simplify_trajectory(df, per_trial=False)
+    exploration_data = path[path['phase'] == 'exploration']
     if len(exploration_data) > 0:
         ax.plot(exploration_data['x'], exploration_data['y'], 
                color='blue', alpha=0.8, linewidth=2, label='Exploration')
     
     # Plot annotation trajectory
-    annotation_data = df[df['phase'] == 'annotation']
+    annotation_data = path[path['phase'] == 'annotation']
     if len(annotation_data) > 0:
         ax.plot(annotation_data['x'], annotation_data['y'], 
                color='green', alpha=0.8, linewidth=2, label='Annotation')
@@ -249,12 +224,13 @@ def create_detailed_trajectory_plot(df, output_dir):
     plot_key_events(ax, df)
     
     # Add statistics text
+    metrics = compute_metrics(df, per_trial=False)
     stats_text = f"""
     Trial Statistics:
     - Total duration: {df['trial_time'].max():.2f}s
-    - Exploration time: {exploration_data['trial_time'].max() - exploration_data['trial_time'].min():.2f}s
-    - Annotation time: {annotation_data['trial_time'].max() - annotation_data['trial_time'].min():.2f}s
-    - Total distance: {calculate_total_distance(df):.2f}m
+    - Exploration time: {get_metric(metrics, 'exploration', 'duration_s'):.2f}s
+    - Annotation time: {get_metric(metrics, 'annotation', 'duration_s'):.2f}s
+    - Total distance: {get_metric(metrics, 'all', 'path_length_m'):.2f}m
     """
     
     ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, fontsize=10,
@@ -270,11 +246,11 @@ def create_detailed_trajectory_plot(df, output_dir):
     ax.legend(loc='upper right')
     
     output_file = os.path.join(output_dir, "detailed_trajectory.png")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     print(f"Detailed trajectory saved to: {output_file}")
-    plt.show()
+    finish_figure(fig, show)
 
-def create_time_analysis_plots(df, output_dir):
+def create_time_analysis_plots(df, output_dir, show=True, dpi=300):
     """Create time-based analysis plots."""
     
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
@@ -296,16 +272,11 @@ def create_time_analysis_plots(df, output_dir):
     ax2.set_title('Time Distribution by Phase', fontweight='bold')
     
     # 3. Movement patterns
-    df_copy = df.copy()
-    df_copy['dx'] = df_copy['x'].diff()
-    df_copy['dy'] = df_copy['y'].diff()
-    df_copy['distance'] = np.sqrt(df_copy['dx']**2 + df_copy['dy']**2)
-    
-    # Remove NaN values
-    df_copy = df_copy.dropna(subset=['distance'])
+    steps = step_metrics(df, per_trial=False)
+    distance = steps.loc[steps['dt'] > 0, 'step_m']
     
-    if len(df_copy) > 0:
-        ax3.hist(df_copy['distance'], bins=50, alpha=0.7, color='skyblue', edgecolor='black')
+    if len(distance) > 0:
+        ax3.hist(distance, bins=50, alpha=0.7, color='skyblue', edgecolor='black')
         ax3.set_xlabel('Distance between consecutive points (meters)')
         ax3.set_ylabel('Frequency')
         ax3.set_title('Movement Distance Distribution', fontweight='bold')
@@ -321,17 +292,14 @@ def create_time_analysis_plots(df, output_dir):
     plt.tight_layout()
     
     output_file = os.path.join(output_dir, "time_analysis.png")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     print(f"Time analysis saved to: {output_file}")
-    plt.show()
+    finish_figure(fig, show)
 
 def calculate_total_distance(df):
     """Calculate total distance traveled."""
-    df_copy = df.copy()
-    df_copy['dx'] = df_copy['x'].diff()
-    df_copy['dy'] = df_copy['y'].diff()
-    df_copy['distance'] = np.sqrt(df_copy['dx']**2 + df_copy['dy']**2)
-    return df_copy['distance'].sum()
+    metrics = compute_metrics(df, by_phase=False, per_trial=False)
+    return get_metric(metrics, 'all', 'path_length_m')
 
 def print_trial_summary(df):
     """Print a comprehensive summary of the trial."""
@@ -344,28 +312,26 @@ def print_trial_summary(df):
     print(f"Trial duration: {df['trial_time'].max():.2f} seconds")
     print(f"Total data points: {len(df)}")
     
+    # All metrics in one pass
+    metrics = compute_metrics(df, per_trial=False)
+    
     # Phase analysis
     print(f"\nPhase Analysis:")
-    for phase in df['phase'].unique():
-        phase_data = df[df['phase'] == phase]
-        duration = phase_data['trial_time'].max() - phase_data['trial_time'].min()
-        print(f"  {phase}: {duration:.2f}s ({len(phase_data)} points)")
+    for row in metrics[metrics['phase'] != 'all'].itertuples():
+        print(f"  {row.phase}: {row.duration_s:.2f}s ({row.n_samples} points)")
     
     # Key events
     print(f"\nKey Events:")
-    events = df['event'].dropna().unique()
-    for event in events:
-        event_data = df[df['event'] == event]
-        if len(event_data) > 0:
-            time = event_data.iloc[0]['trial_time']
-            pos = (event_data.iloc[0]['x'], event_data.iloc[0]['y'])
-            print(f"  {event}: {time:.2f}s at position ({pos[0]:.3f}, {pos[1]:.3f})")
+    for row in first_events(df, per_trial=False).itertuples():
+        print(f"  {row.event}: {row.trial_time:.2f}s at position ({row.x:.3f}, {row.y:.3f})")
     
     # Movement statistics
-    total_distance = calculate_total_distance(df)
+    total_distance = get_metric(metrics, 'all', 'path_length_m')
     print(f"\nMovement Statistics:")
     print(f"  Total distance traveled: {total_distance:.2f} meters")
     print(f"  Average speed: {total_distance/df['trial_time'].max():.3f} m/s")
+    print(f"  Idle time: {get_metric(metrics, 'all', 'idle_time_s'):.2f} seconds")
+    print(f"  Time near border: {get_metric(metrics, 'all', 'border_time_s'):.2f} seconds")
     
     # Position statistics
     print(f"\nPosition Statistics:")
@@ -376,13 +342,14 @@ def print_trial_summary(df):
     # Rotation statistics
     print(f"\nRotation Statistics:")
     print(f"  Rotation range: [{df['rotation_angle'].min():.1f}, {df['rotation_angle'].max():.1f}] degrees")
-    print(f"  Total rotation: {abs(df['rotation_angle'].diff()).sum():.1f} degrees")
+    print(f"  Total rotation: {get_metric(metrics, 'all', 'total_rotation_deg'):.1f} degrees")
+    print(f"  Mean angular velocity: {get_metric(metrics, 'all', 'mean_angular_velocity'):.1f} deg/s")
 
 def main():
     """Main function to run the visualization."""
     
-    # File path
-    csv_file = "Results/test/test_OT_ot2_continuous.csv"
+    # File path (pass a log on the command line; cohort_analysis.py covers all participants)
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "Results/test/test_OT_ot2_continuous.csv"
     
     # Check if file exists
     if not os.path.exists(csv_file):